@@ -57,6 +57,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'webapp.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -145,6 +146,24 @@ MFA_LOGIN = env.bool('MFA_LOGIN', default=True)
 #Para activar/desactivar el envio de correo de tasas al hacer login
 CORREO_TASAS_LOGIN = env.bool('CORREO_TASAS_LOGIN', default=True)
 
+#Modo de límites de intercambio: "calendario" (saldos por día/mes) o "ventana" (24 h / 30 días móviles)
+LIMITES_MODO = env('LIMITES_MODO', default='calendario')
+
+#Auditoría de transacciones: días que quedan en la tabla antes de pasar a los archivos comprimidos (MEDIA_ROOT/auditoria)
+AUDITORIA_RETENCION_DIAS = env.int('AUDITORIA_RETENCION_DIAS', default=180)
+
+#Datos iniciales (manage.py sembrar): aplicarlos también después de cada migrate. Los seeders sin cambios se saltean
+SEED_EN_MIGRATE = env.bool('SEED_EN_MIGRATE', default=True)
+
+#Métricas por vista en /metrics (Prometheus): fracción de requests medidos, 0 = apagado
+METRICAS_MUESTREO = env.float('METRICAS_MUESTREO', default=0.1)
+
+#Token Bearer para leer /metrics; vacío = solo staff (o DEBUG)
+METRICAS_TOKEN = env('METRICAS_TOKEN', default='')
+
+#Telemetría de tareas Celery (duración, espera en cola, reintentos, omitidas) en el mismo /metrics
+METRICAS_TAREAS = env.bool('METRICAS_TAREAS', default=True)
+
 #Stripe
 STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
@@ -174,13 +193,21 @@ CELERY_BEAT_SCHEDULE = {
         "task": "webapp.tasks.cancelar_transacciones_vencidas_tauser",
         "schedule": crontab(minute="*/2"),  # cada 2 minutos
     },
+    "liberar_holds_stock_vencidos": {
+        "task": "webapp.tasks.liberar_holds_stock_vencidos",
+        "schedule": crontab(minute="*/2"),  # cada 2 minutos
+    },
     "limpiar_codigos_mfa_cada_hora": {
         "task": "webapp.tasks.cleanup_expired_mfa_codes",
         "schedule": crontab(minute=0, hour="*/1"),  # cada hora
     },
     "check_limite_intercambio_schedule": {
         "task": "webapp.tasks.check_and_reset_limites_intercambio",
-        "schedule": crontab(minute="*/2"),  # cada 120 segundos
+        "schedule": crontab(minute="*/30"),  # compactación de saldos viejos (el reseteo es perezoso)
+    },
+    "archivar_auditoria_transacciones": {
+        "task": "webapp.tasks.archivar_auditoria_transacciones",
+        "schedule": crontab(minute=30, hour=3),  # una vez por día, de madrugada
     },
     "sync-facturas-cada-2min": {
         "task": "webapp.tasks.sync_facturas_pendientes_task",
@@ -197,12 +224,31 @@ MESSAGE_TAGS = {
     messages.INFO: 'info',
 }
 
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
+# Cache compartida entre procesos web y workers: matriz de cotizaciones, snapshots de
+# cotización, catálogo, eventos SSE, locks y métricas. Tiene que ser la misma para todos los
+# procesos, así que por defecto es el Redis que ya usa Celery (otra base).
+# CACHE_LOCAL=True usa la memoria del proceso: solo para desarrollo o tests con un único proceso.
+REDIS_CACHE_URL = env("REDIS_CACHE_URL", default="redis://localhost:6379/1")
+CACHE_LOCAL = env.bool("CACHE_LOCAL", default=False)
+if CACHE_LOCAL and not DEBUG:
+    from django.core.exceptions import ImproperlyConfigured
+    raise ImproperlyConfigured("CACHE_LOCAL=True solo se admite con DEBUG: cada proceso tendría su propia cache.")
+if CACHE_LOCAL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "unique-snowflake",
+            # el default (300) expulsa claves al azar; la serie guarda bastantes más
+            "OPTIONS": {"MAX_ENTRIES": 100_000},
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_CACHE_URL,
+        }
     }
-}
 
 LOGGING = {
     "version": 1,
@@ -6,5 +6,4 @@ class WebappConfig(AppConfig):
 
     def ready(self):
         import webapp.signals
-        from django.db.models.signals import post_migrate
-        post_migrate.connect(webapp.signals.clear_sessions, sender=self)
+        import webapp.checks
@@ -0,0 +1,11 @@
+from .casos import CASOS, Escenario, ProxyFalso, correr
+from .runner import Caso, medir
+
+__all__ = [
+    "CASOS",
+    "Caso",
+    "Escenario",
+    "ProxyFalso",
+    "correr",
+    "medir",
+]
@@ -0,0 +1,165 @@
+# webapp/benchmarks/casos.py
+"""
+Caminos calientes medidos sobre el dataset sintético (services/dataset_sintetico.py).
+
+Los presupuestos de latencia están calibrados para el dataset de referencia
+(`generate_dataset --clients 10000 --transactions 1000000 --tausers 20`) en
+una máquina de desarrollo, con holgura de ~1.5-2x; `--factor-latencia` los
+escala para otras máquinas. Las consultas por ejecución no dependen del
+tamaño, salvo en el recálculo por cambio de cotización: ahí son un puñado
+por lote de rate_impact.TAMANO_LOTE (ver su caso).
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, F, Max
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from webapp.models import ClienteUsuario, Factura, Tauser, Transaccion
+from webapp.services import dataset_sintetico, invoice_sync, rate_impact
+from webapp.views.compraventa_y_conversión import recalcularMontosAmbosTauser
+from webapp.views.cotizaciones import promtCancelacionTransaccionCambioCotizacion
+
+from . import runner
+from .runner import Caso
+
+MONEDA_RECALCULO = "USD"
+DIAS_REPORTE_HTML = 1
+DIAS_REPORTE_CSV = 7
+FACTURAS_A_SINCRONIZAR = 200
+TRANSACCIONES_TAUSER = 50
+
+
+class ProxyFalso:
+    """Reemplazo de services/fs_proxy: estado del DE derivado del id, sin red ni base del proxy."""
+
+    ESTADOS = ["Aprobado"] * 6 + ["Rechazado"] * 2 + ["Enviado"] * 2
+
+    def get_de_status(self, de_id):
+        estado = self.ESTADOS[de_id % len(self.ESTADOS)]
+        return {
+            "id": de_id, "dEst": None, "dPunExp": None, "dNumDoc": None,
+            "estado": estado, "estado_sifen": estado, "desc_sifen": None, "error_sifen": None,
+            "fch_sifen": "2025-01-01 00:00:00",
+        }
+
+
+class Escenario:
+    """Cliente, usuarios y sesiones sobre los que corren los casos (se crean dentro de la transacción descartada)."""
+
+    def __init__(self):
+        dataset = Transaccion.objects.filter(cliente__correo__endswith=f"@{dataset_sintetico.DOMINIO}")
+        top = dataset.values("cliente_id").annotate(n=Count("id")).order_by("-n", "cliente_id").first()
+        if not top:
+            raise ValueError("No hay dataset sintético con transacciones; correr antes `manage.py generate_dataset`.")
+        self.cliente_id, self.transacciones_cliente = top["cliente_id"], top["n"]
+        self.fin = timezone.localdate(dataset.aggregate(fin=Max("fecha_creacion"))["fin"])
+
+        # Cliente de la web: el que más opera
+        usuario = ClienteUsuario.objects.filter(cliente_id=self.cliente_id).select_related("usuario").first().usuario
+        self.web = self._sesion(usuario, cliente_id=self.cliente_id)
+
+        # Reportes: un admin creado para la corrida
+        admin = get_user_model().objects.create_superuser(
+            username="benchmark_admin", email="benchmark_admin@example.invalid", password=None,
+        )
+        self.admin = self._sesion(admin)
+
+        # Kiosco: la sucursal con más Tausers del dataset
+        tausers = Tauser.objects.filter(nombre__startswith=dataset_sintetico.PREFIJO_TAUSER)
+        sucursal = tausers.values("ubicacion").annotate(n=Count("id")).order_by("-n", "ubicacion").first()
+        self.ubicacion = sucursal["ubicacion"] if sucursal else None
+        self.kiosco = self._sesion(None, tauser_ubicacion=self.ubicacion)
+
+        ct_tauser = ContentType.objects.get_for_model(Tauser)
+        self.tauser_a_tauser = list(
+            dataset.filter(estado=Transaccion.Estado.PENDIENTE, medio_pago_type=ct_tauser, medio_cobro_type=ct_tauser)
+            .select_related("cliente__categoria", "moneda_origen", "moneda_destino")
+            .prefetch_related("medio_pago", "medio_cobro")
+            .order_by("id")[:TRANSACCIONES_TAUSER]
+        )
+        if not self.tauser_a_tauser:
+            raise ValueError("El dataset no tiene transacciones Tauser → Tauser pendientes; generarlo con --tausers.")
+
+        self.facturas = list(
+            Factura.objects.filter(cliente__correo__endswith=f"@{dataset_sintetico.DOMINIO}")
+            .order_by("id").values_list("id", flat=True)[:FACTURAS_A_SINCRONIZAR]
+        )
+
+    @staticmethod
+    def _sesion(usuario, **datos):
+        http = Client()
+        if usuario:
+            http.force_login(usuario)
+        session = http.session
+        session.update(datos)
+        session.save()
+        return http
+
+    def resumen(self) -> dict:
+        return {
+            "cliente_id": self.cliente_id,
+            "transacciones_cliente": self.transacciones_cliente,
+            "transacciones_dataset": Transaccion.objects.filter(
+                cliente__correo__endswith=f"@{dataset_sintetico.DOMINIO}").count(),
+            "ubicacion_tauser": self.ubicacion,
+            "fin": self.fin.isoformat(),
+        }
+
+
+def _reporte(esc, dias, **extra):
+    # Días cerrados: el último día del dataset concentra todas las pendientes y pagadas
+    hasta = esc.fin - timedelta(days=1)
+    filtros = {"fecha_inicio": (hasta - timedelta(days=dias - 1)).isoformat(), "fecha_fin": hasta.isoformat()}
+    return esc.admin.get(reverse("reporte_transacciones"), {**filtros, **extra})
+
+
+def _recalculo_por_cotizacion(esc, i):
+    # La vista solo encola; se mide también lo que corre la tarea
+    promtCancelacionTransaccionCambioCotizacion(moneda=MONEDA_RECALCULO)
+    rate_impact.recalcular_pendientes(MONEDA_RECALCULO)
+
+
+def _facturas_emitidas(esc):
+    Factura.objects.filter(pk__in=esc.facturas).update(estado="emitida", de_id=F("id"))
+
+
+def _sincronizar_facturas(esc, i):
+    with mock.patch.object(invoice_sync, "sql", ProxyFalso()):
+        invoice_sync.sync_facturas_pendientes(limit=FACTURAS_A_SINCRONIZAR, fetch_files=False)
+
+
+CASOS = [
+    Caso("api_active_currencies", lambda esc, i: esc.web.get(reverse("api_active_currencies")),
+         max_consultas=4, p95_ms=25),
+    Caso("get_metodos_pago_cobro",
+         lambda esc, i: esc.web.get(reverse("get_metodos_pago_cobro"), {"from": "PYG", "to": "USD", "solo_par": "1"}),
+         max_consultas=3, p95_ms=25),
+    Caso("transaccion_list", lambda esc, i: esc.web.get(reverse("transaccion_list")),
+         max_consultas=16, p95_ms=500),
+    Caso("tauser_home", lambda esc, i: esc.kiosco.get(reverse("tauser_home")),
+         max_consultas=9, p95_ms=1000),
+    Caso("reporte_transacciones_html", lambda esc, i: _reporte(esc, DIAS_REPORTE_HTML),
+         max_consultas=17, p95_ms=12_000, repeticiones=3),
+    Caso("reporte_transacciones_csv", lambda esc, i: _reporte(esc, DIAS_REPORTE_CSV, export_csv="1"),
+         max_consultas=6, p95_ms=8000, repeticiones=3),
+    Caso("recalcularMontosAmbosTauser",
+         lambda esc, i: recalcularMontosAmbosTauser(esc.tauser_a_tauser[i % len(esc.tauser_a_tauser)]),
+         max_consultas=6, p95_ms=15, repeticiones=50),
+    # ~7 consultas por lote de 500 (lectura, medios, stock, cupo, marcado, auditoría): ~80 lotes en USD en la referencia
+    Caso("promtCancelacionTransaccionCambioCotizacion", _recalculo_por_cotizacion,
+         max_consultas=700, p95_ms=120_000, repeticiones=2),
+    # Una consulta para la página de facturas y a lo sumo un UPDATE por factura
+    Caso("sync_facturas_pendientes", _sincronizar_facturas, preparar=_facturas_emitidas,
+         max_consultas=FACTURAS_A_SINCRONIZAR + 1, p95_ms=400, repeticiones=5),
+]
+
+
+def correr(solo=None, **kwargs) -> dict:
+    """Corre los casos (todos o los de `solo`) sobre el dataset cargado; ver runner.correr."""
+    casos = [c for c in CASOS if not solo or c.nombre in solo]
+    return runner.correr(casos, Escenario, **kwargs)
@@ -0,0 +1,117 @@
+# webapp/benchmarks/runner.py
+"""
+Medición de los casos: cada repetición corre en un savepoint que se descarta,
+así los casos que escriben (recálculos, sincronización de facturas) miden
+siempre el mismo trabajo. Se cuentan las consultas SQL (execute_wrapper) y
+se toma el tiempo.
+"""
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+
+@dataclass(frozen=True)
+class Caso:
+    """Un camino caliente con sus presupuestos (consultas por ejecución y p95 en ms)."""
+    nombre: str
+    ejecutar: Callable                       # ejecutar(escenario, i)
+    max_consultas: int
+    p95_ms: float
+    preparar: Optional[Callable] = None      # preparar(escenario): fuera de la medición, dentro del savepoint
+    repeticiones: int = 20
+
+
+def _percentil(ordenadas, q):
+    return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))]
+
+
+class _Contador:
+    """execute_wrapper que solo cuenta (sin el tope ni el costo de guardar cada consulta)."""
+
+    def __init__(self):
+        self.consultas = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.consultas += 1
+        return execute(sql, params, many, context)
+
+
+def _una_vez(caso, escenario, i):
+    contador = _Contador()
+    with transaction.atomic():
+        if caso.preparar:
+            caso.preparar(escenario)
+        with connection.execute_wrapper(contador):
+            inicio = time.perf_counter()
+            caso.ejecutar(escenario, i)
+            segundos = time.perf_counter() - inicio
+        transaction.set_rollback(True)
+    return contador.consultas, segundos * 1000
+
+
+def medir(caso: Caso, escenario, repeticiones: int | None = None, factor_latencia: float = 1.0) -> dict:
+    """
+    Corre el caso una vez en frío y `repeticiones` veces más. Devuelve el
+    resultado para el JSON, con la lista de presupuestos excedidos.
+    `factor_latencia` escala el presupuesto de p95 (0 = no controlar latencia).
+    """
+    consultas_frio, ms_frio = _una_vez(caso, escenario, 0)
+    muestras = [_una_vez(caso, escenario, i) for i in range(1, (repeticiones or caso.repeticiones) + 1)]
+
+    consultas = max(n for n, _ in muestras)
+    tiempos = sorted(ms for _, ms in muestras)
+    p95 = _percentil(tiempos, 0.95)
+
+    excedidos = []
+    if consultas > caso.max_consultas:
+        excedidos.append(f"consultas {consultas} > {caso.max_consultas}")
+    if factor_latencia and p95 > caso.p95_ms * factor_latencia:
+        excedidos.append(f"p95 {p95:.1f} ms > {caso.p95_ms * factor_latencia:.1f} ms")
+
+    return {
+        "consultas": consultas,
+        "consultas_frio": consultas_frio,
+        "ms_frio": round(ms_frio, 2),
+        "p50_ms": round(_percentil(tiempos, 0.50), 2),
+        "p95_ms": round(p95, 2),
+        "max_ms": round(tiempos[-1], 2),
+        "media_ms": round(statistics.mean(tiempos), 2),
+        "repeticiones": len(muestras),
+        "presupuesto": {"consultas": caso.max_consultas, "p95_ms": caso.p95_ms * factor_latencia or None},
+        "excedidos": excedidos,
+    }
+
+
+def correr(casos, crear_escenario, repeticiones: int | None = None, factor_latencia: float = 1.0,
+           log=lambda nombre, resultado: None) -> dict:
+    """
+    Mide los casos en una transacción que se descarta al final (el escenario
+    crea usuarios y sesiones). Los correos se arman pero no se envían ni se
+    acumulan, y 'testserver' queda habilitado para el cliente HTTP de Django.
+    """
+    resultados = {}
+    with override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+        EMAIL_BACKEND="django.core.mail.backends.dummy.EmailBackend",
+    ):
+        with transaction.atomic():
+            escenario = crear_escenario()
+            for caso in casos:
+                r = resultados[caso.nombre] = medir(caso, escenario, repeticiones, factor_latencia)
+                log(caso.nombre, r)
+            transaction.set_rollback(True)
+
+    return {
+        "fecha": timezone.now().isoformat(),
+        "base": connection.vendor,
+        "escenario": escenario.resumen(),
+        "factor_latencia": factor_latencia,
+        "casos": resultados,
+        "ok": not any(r["excedidos"] for r in resultados.values()),
+    }
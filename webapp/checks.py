@@ -0,0 +1,32 @@
+# webapp/checks.py
+"""
+Chequeos de sistema (`manage.py check --deploy`).
+"""
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends que no comparten datos entre procesos
+CACHES_NO_COMPARTIDAS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+@register(Tags.caches, deploy=True)
+def cache_compartida(app_configs, **kwargs):
+    """
+    Los snapshots de cotización (y su reclamo), la matriz, las versiones de
+    los catálogos y los eventos SSE se leen desde cualquier proceso: con una
+    cache por proceso el paso MFA → PIN → confirmar cae en otro worker y la
+    cotización "expira", y el reclamo atómico solo protege a un proceso.
+    """
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    if backend in CACHES_NO_COMPARTIDAS:
+        return [
+            Error(
+                f"La cache 'default' ({backend}) no se comparte entre procesos.",
+                hint="Configurá REDIS_CACHE_URL y dejá CACHE_LOCAL=False.",
+                id="webapp.E001",
+            )
+        ]
+    return []
@@ -199,29 +199,19 @@ def send_fallo_acreditacion_email(transaccion, error=None) -> None:
         fail_silently=True,
     )
 
-def send_transaction_cancellation_prompt(
-    request,
+def _mensaje_cancellation_prompt(
     transaccion,
+    detalle_transaccion_url: str,
     *,
     tasa_actual: Decimal,
     tasa_antigua: Decimal,
     montoOrigenNuevo: Decimal,
     montoDestinoNuevo: Decimal,
-) -> None:
-    """
-    Envía aviso al usuario cuando la cotización cambia.
-    NO asume ningún setting adicional como SITE_URL.
-    Devuelve URLs relativas sin tocar configuraciones externas.
-    """
-
-    project_name = getattr(settings, "PROJECT_NAME", "Global Exchange")
-    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", None)
-
-    user = transaccion.usuario
-
-    # URL RELATIVA — no inventamos settings inexistentes
-    detalle_transaccion = reverse("transaccion_list")
-    detalle_transaccion_url = request.build_absolute_uri(detalle_transaccion)
+):
+    """Arma el correo de aviso de cambio de cotización (None si el usuario no tiene email)."""
+    usuario_email = getattr(transaccion.usuario, "email", None)
+    if not usuario_email:
+        return None
 
     moneda = None
     try:
@@ -233,10 +223,10 @@ def send_transaction_cancellation_prompt(
         print("La transacción no tiene asignada moneda")
 
     context = {
-        "user": user,
+        "user": transaccion.usuario,
         "transaccion": transaccion,
-        "project_name": project_name,
-        "detalles_transaccion_url": detalle_transaccion_url,  # ← URL relativa segura
+        "project_name": getattr(settings, "PROJECT_NAME", "Global Exchange"),
+        "detalles_transaccion_url": detalle_transaccion_url,
         "tasa_anterior": tasa_antigua,
         "tasa_actual": tasa_actual,
         "montoOrigenNuevo": montoOrigenNuevo,
@@ -244,21 +234,69 @@ def send_transaction_cancellation_prompt(
         "moneda": moneda,
     }
 
-    # --------------------------------------
-    # 1) Correo al usuario
-    # --------------------------------------
-    usuario_email = getattr(user, "email", None)
-    if usuario_email:
-        subject_usuario = "Tu transacción cambió de cotización"
+    text_body = render_to_string("emails/transaction_cancellation_promt.txt", context)
+    html_body = render_to_string("emails/transaction_cancellation_promt.html", context)
 
-        text_body = render_to_string("emails/transaction_cancellation_promt.txt", context)
-        html_body = render_to_string("emails/transaction_cancellation_promt.html", context)
+    email = EmailMultiAlternatives(
+        "Tu transacción cambió de cotización",
+        text_body,
+        getattr(settings, "DEFAULT_FROM_EMAIL", None),
+        [usuario_email],
+    )
+    email.attach_alternative(html_body, "text/html")
+    return email
 
-        send_mail(
-            subject=subject_usuario,
-            message=text_body,
-            from_email=from_email,
-            recipient_list=[usuario_email],
-            html_message=html_body,
-            fail_silently=True,
-        )
\ No newline at end of file
+
+def send_transaction_cancellation_prompt(
+    request,
+    transaccion,
+    *,
+    tasa_actual: Decimal,
+    tasa_antigua: Decimal,
+    montoOrigenNuevo: Decimal,
+    montoDestinoNuevo: Decimal,
+) -> None:
+    """
+    Envía aviso al usuario cuando la cotización cambia.
+    Sin request (p. ej. desde Celery) el enlace se arma con SITE_URL.
+    """
+    detalle_transaccion = reverse("transaccion_list")
+    if request is not None:
+        detalle_transaccion_url = request.build_absolute_uri(detalle_transaccion)
+    else:
+        detalle_transaccion_url = f"{settings.SITE_URL}{detalle_transaccion}"
+
+    email = _mensaje_cancellation_prompt(
+        transaccion,
+        detalle_transaccion_url,
+        tasa_actual=tasa_actual,
+        tasa_antigua=tasa_antigua,
+        montoOrigenNuevo=montoOrigenNuevo,
+        montoDestinoNuevo=montoDestinoNuevo,
+    )
+    if email:
+        email.send(fail_silently=True)
+
+
+def send_transaction_cancellation_prompts(avisos) -> int:
+    """
+    Envío por lotes de los avisos de cambio de cotización: una sola conexión
+    SMTP para todos los correos. Cada aviso es un dict con "transaccion",
+    "tasa_actual", "tasa_antigua", "montoOrigenNuevo" y "montoDestinoNuevo".
+
+    Devuelve la cantidad de correos enviados.
+    """
+    detalle_transaccion_url = f"{settings.SITE_URL}{reverse('transaccion_list')}"
+
+    mensajes = []
+    for aviso in avisos:
+        aviso = dict(aviso)
+        email = _mensaje_cancellation_prompt(aviso.pop("transaccion"), detalle_transaccion_url, **aviso)
+        if email:
+            mensajes.append(email)
+
+    if not mensajes:
+        return 0
+
+    connection = get_connection(fail_silently=True)
+    return connection.send_messages(mensajes) or 0
@@ -0,0 +1,21 @@
+# webapp/management/commands/archivar_auditoria.py
+from django.core.management.base import BaseCommand
+
+from webapp.services import auditoria_archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve la auditoría de transacciones más vieja que la retención a archivos "
+        "mensuales comprimidos (MEDIA_ROOT/auditoria) y borra esas filas en lotes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=None, help="Retención en días (default AUDITORIA_RETENCION_DIAS)")
+        parser.add_argument("--lote", type=int, default=None, help="Filas por lote / miembro gzip")
+
+    def handle(self, *args, **opts):
+        resumen = auditoria_archivo.archivar(dias=opts["dias"], lote=opts["lote"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Archivadas {resumen['filas']} filas en {resumen['miembros']} lotes → {auditoria_archivo.directorio()}"
+        ))
@@ -0,0 +1,89 @@
+# webapp/management/commands/benchmark_cambio.py
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from webapp.services import cambio_billetes
+
+# Juegos de denominaciones habituales en los Tausers
+DENOMINACIONES = {
+    "USD": [100, 50, 20, 10, 5, 1],
+    "EUR": [500, 200, 100, 50, 20, 10, 5],
+    "BRL": [200, 100, 50, 20, 10, 5, 2],
+    "ARS": [2000, 1000, 500, 200, 100],
+}
+
+
+def greedy(monto, filas):
+    """El algoritmo anterior: denominación descendente, tomando lo que entra."""
+    restante = Decimal(monto)
+    for valor, qty in sorted(filas, key=lambda f: f[0], reverse=True):
+        usar = restante // valor if qty is None else min(restante // valor, qty)
+        restante -= usar * valor
+        if restante <= 0:
+            return True
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el cambio óptimo (programación dinámica) contra el greedy anterior "
+        "sobre tablas de stock sintéticas: aciertos, billetes usados y llamadas/segundo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tablas", type=int, default=50, help="Tablas de stock por moneda")
+        parser.add_argument("--montos", type=int, default=200, help="Montos consultados por tabla")
+        parser.add_argument("--max-billetes", type=int, default=40, help="Tope de billetes por denominación")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        rnd = random.Random(opts["seed"])
+
+        casos = []
+        for code, valores in DENOMINACIONES.items():
+            for _ in range(opts["tablas"]):
+                # Stock realista: algunas denominaciones agotadas, el resto con pocas unidades
+                filas = [(Decimal(v), rnd.choice([0, 0] + list(range(1, opts["max_billetes"] + 1))))
+                         for v in valores]
+                filas = [f for f in filas if f[1] > 0]
+                total = sum(v * q for v, q in filas)
+                if not total:
+                    continue
+                paso = min(v for v, _ in filas)
+                for _ in range(opts["montos"]):
+                    casos.append((Decimal(rnd.randint(1, int(total // paso))) * paso, filas))
+
+        inicio = time.perf_counter()
+        resultado_greedy = [greedy(m, f) for m, f in casos]
+        t_greedy = time.perf_counter() - inicio
+
+        cambio_billetes.limpiar_memo()
+        inicio = time.perf_counter()
+        resultado_dp = [cambio_billetes.resolver(m, f) for m, f in casos]
+        t_dp = time.perf_counter() - inicio
+
+        # Consultas repetidas (p. ej. recálculos sobre el mismo stock): las que entran en el memo
+        repetidos = casos[:cambio_billetes.MEMO_MAX]
+        for m, f in repetidos:
+            cambio_billetes.resolver(m, f)
+        inicio = time.perf_counter()
+        for m, f in repetidos:
+            cambio_billetes.resolver(m, f)
+        t_memo = time.perf_counter() - inicio
+
+        factibles = sum(1 for d in resultado_dp if d is not None)
+        rechazos_greedy = sum(1 for g, d in zip(resultado_greedy, resultado_dp) if d is not None and not g)
+        falsos_greedy = sum(1 for g, d in zip(resultado_greedy, resultado_dp) if g and d is None)
+
+        def _tasa(segundos, n=len(casos)):
+            return f"{n / segundos:,.0f} llamadas/s" if segundos else "-"
+
+        self.stdout.write(f"Casos: {len(casos)}  Factibles: {factibles}")
+        self.stdout.write(f"Greedy rechazó montos factibles: {rechazos_greedy}")
+        self.stdout.write(f"Greedy aceptó montos imposibles: {falsos_greedy}")
+        self.stdout.write(f"Greedy:       {t_greedy:.3f}s ({_tasa(t_greedy)})")
+        self.stdout.write(f"DP (en frío): {t_dp:.3f}s ({_tasa(t_dp)})")
+        self.stdout.write(self.style.SUCCESS(f"DP (memo):    {t_memo:.3f}s ({_tasa(t_memo, len(repetidos))})"))
@@ -0,0 +1,105 @@
+# webapp/management/commands/benchmark_limites_ventana.py
+import random
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from webapp.models import Categoria, Cliente, Currency, UsoLimiteIntercambio
+from webapp.services import limites_ventana
+
+
+class _Deshacer(Exception):
+    """Sale del bloque atómico para descartar los datos sintéticos."""
+
+
+def _percentiles(muestras):
+    ordenadas = sorted(muestras)
+    p = lambda q: ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))] * 1000
+    return f"p50 {p(0.50):.3f} ms  p95 {p(0.95):.3f} ms  p99 {p(0.99):.3f} ms  media {statistics.mean(ordenadas) * 1000:.3f} ms"
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide la latencia por control de límite en modo ventana (uso de 24 h y 30 días) "
+        "con un libro de uso sintético. Todo corre en una transacción que se descarta al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=1_000_000, help="Filas del libro de uso")
+        parser.add_argument("--clientes", type=int, default=500, help="Clientes entre los que se reparten")
+        parser.add_argument("--dias", type=int, default=60, help="Antigüedad máxima de las filas")
+        parser.add_argument("--controles", type=int, default=2000, help="Controles medidos")
+        parser.add_argument("--seed", type=int, default=7)
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._medir(opts)
+                raise _Deshacer
+        except _Deshacer:
+            self.stdout.write("Datos sintéticos descartados.")
+
+    def _medir(self, opts):
+        rnd = random.Random(opts["seed"])
+        moneda = Currency.objects.exclude(code="PYG").order_by("id").first()
+        categoria = Categoria.objects.order_by("id").first()
+
+        clientes = Cliente.objects.bulk_create([
+            Cliente(
+                nombre=f"Bench {i}", documento=f"BENCH{i}", correo=f"bench{i}@example.invalid", categoria=categoria,
+            )
+            for i in range(opts["clientes"])
+        ])
+        ids = [c.id for c in clientes]
+
+        inicio = time.perf_counter()
+        with connection.cursor() as cur:
+            cur.execute(
+                f"""
+                INSERT INTO {UsoLimiteIntercambio._meta.db_table} (cliente_id, moneda_id, tipo, monto, fecha)
+                SELECT (%s::bigint[])[1 + (g %% %s)], %s, 'CONSUMO',
+                       round((random() * 500)::numeric, 2),
+                       NOW() - random() * make_interval(days => %s)
+                  FROM generate_series(1, %s) AS g
+                """,
+                [ids, len(ids), moneda.id, opts["dias"], opts["filas"]],
+            )
+            cur.execute(f"ANALYZE {UsoLimiteIntercambio._meta.db_table}")
+        self.stdout.write(f"Libro: {opts['filas']:,} filas en {len(ids)} clientes ({time.perf_counter() - inicio:.1f}s de carga)")
+
+        muestra = rnd.choice(ids)
+        ahora = timezone.now()
+        with connection.cursor() as cur:
+            sql, params = (
+                UsoLimiteIntercambio.objects
+                .filter(cliente_id=muestra, moneda_id=moneda.id, fecha__gt=ahora - limites_ventana.VENTANA_MES)
+                .values("monto").query.sql_with_params()
+            )
+            cur.execute(f"EXPLAIN {sql}", params)
+            self.stdout.write("Plan: " + cur.fetchone()[0].strip())
+
+        # Control en fresco (lo que hace consumir() bajo el candado del saldo)
+        frio = []
+        for _ in range(opts["controles"]):
+            cliente_id = rnd.choice(ids)
+            t0 = time.perf_counter()
+            limites_ventana.uso(cliente_id, moneda.id)
+            frio.append(time.perf_counter() - t0)
+
+        # Lecturas para mostrar saldos: cache chica por cliente
+        cache.delete_many([limites_ventana._clave_uso(c) for c in ids])
+        calientes = []
+        for _ in range(opts["controles"]):
+            cliente_id = rnd.choice(ids[:50])
+            t0 = time.perf_counter()
+            limites_ventana.uso_por_moneda(cliente_id)
+            calientes.append(time.perf_counter() - t0)
+        cache.delete_many([limites_ventana._clave_uso(c) for c in ids])
+
+        self.stdout.write(f"Filas por cliente (prom.): {opts['filas'] // len(ids):,}")
+        self.stdout.write(f"Uso 24 h + 30 d, en fresco:  {_percentiles(frio)}")
+        self.stdout.write(self.style.SUCCESS(f"Uso por moneda, con cache: {_percentiles(calientes)}"))
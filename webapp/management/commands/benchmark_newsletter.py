@@ -0,0 +1,68 @@
+# webapp/management/commands/benchmark_newsletter.py
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from webapp.services import rates_newsletter
+
+BACKENDS = {
+    "file": "django.core.mail.backends.filebased.EmailBackend",
+    "console": "django.core.mail.backends.console.EmailBackend",
+    "locmem": "django.core.mail.backends.locmem.EmailBackend",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide el envío del boletín de tasas (mensajes/segundo) con destinatarios "
+        "sintéticos y un backend de correo local (archivo, consola o memoria)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--destinatarios", type=int, default=1000)
+        parser.add_argument("--clientes", type=int, default=2, help="Clientes asociados por destinatario")
+        parser.add_argument("--backend", choices=sorted(BACKENDS), default="file")
+        parser.add_argument("--rate", type=float, default=0, help="Mensajes/segundo del token bucket (0 = sin límite)")
+        parser.add_argument("--burst", type=float, default=10)
+
+    def handle(self, *args, **opts):
+        descuentos = [Decimal("0"), Decimal("0.05"), Decimal("0.10")]
+        categorias = [SimpleNamespace(descuento=d) for d in descuentos]
+
+        def sinteticos():
+            for i in range(opts["destinatarios"]):
+                user = SimpleNamespace(pk=i + 1, email=f"bench{i}@example.com", unsubscribe_token=f"tok{i}")
+                clientes = [
+                    SimpleNamespace(nombre=f"Cliente {i}-{j}", categoria=categorias[(i + j) % len(categorias)])
+                    for j in range(opts["clientes"])
+                ]
+                yield user, clientes
+
+        backend_kwargs = {}
+        if opts["backend"] == "file":
+            backend_kwargs["file_path"] = tempfile.mkdtemp(prefix="newsletter_bench_")
+        elif opts["backend"] == "console":
+            backend_kwargs["stream"] = StringIO()
+        connection = get_connection(BACKENDS[opts["backend"]], **backend_kwargs)
+
+        inicio = time.monotonic()
+        fragmentos = rates_newsletter.Fragmentos(descuentos)
+        resumen = rates_newsletter.enviar(
+            sinteticos(),
+            fragmentos,
+            connection=connection,
+            bucket=rates_newsletter.TokenBucket(opts["rate"], opts["burst"]),
+        )
+        total = time.monotonic() - inicio
+
+        enviados = resumen["enviados"]
+        self.stdout.write(f"Backend: {opts['backend']} {backend_kwargs.get('file_path', '')}".rstrip())
+        self.stdout.write(f"Monedas por tabla: {len(fragmentos.monedas)}")
+        self.stdout.write(f"Enviados: {enviados}  Fallidos: {resumen['fallidos']}")
+        self.stdout.write(f"Tiempo total: {total:.2f}s (espera del limitador: {resumen['espera']:.2f}s)")
+        self.stdout.write(self.style.SUCCESS(f"Throughput: {enviados / total if total else 0:.1f} mensajes/s"))
@@ -0,0 +1,86 @@
+# webapp/management/commands/celery_top.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from webapp.services import telemetria_tareas
+
+ORDENES = {
+    "tiempo": lambda f: f["segundos"],
+    "ejecuciones": lambda f: f["ejecuciones"],
+    "p95": lambda f: f["p95"] or 0,
+    "espera": lambda f: f["espera_p95"] or 0,
+    "fallos": lambda f: f["fallos"] + f["reintentos"],
+}
+
+COLUMNAS = ("TAREA", "EJEC", "/MIN", "OK", "FALLOS", "REINT", "OMIT", "MEDIA", "P95", "ESPERA", "ESP P95", "TOTAL")
+
+
+def _duracion(segundos):
+    if segundos is None:
+        return "-"
+    if segundos < 1:
+        return f"{segundos * 1000:.0f}ms"
+    if segundos < 120:
+        return f"{segundos:.1f}s"
+    return f"{segundos / 60:.1f}m"
+
+
+class Command(BaseCommand):
+    help = (
+        "Vista tipo top de las tareas Celery: ejecuciones, ritmo, fallos, reintentos, omitidas por lock, "
+        "duración y espera en cola (services/telemetria_tareas.py). Lee la cache compartida, así que con "
+        "Redis ve lo de todos los workers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--intervalo", type=float, default=2.0, help="Segundos entre refrescos")
+        parser.add_argument("--iteraciones", type=int, default=0, help="Refrescos a mostrar (0 = hasta Ctrl+C)")
+        parser.add_argument("--orden", choices=sorted(ORDENES), default="tiempo")
+
+    def handle(self, *args, **opts):
+        limpiar = opts["iteraciones"] != 1 and self.stdout.isatty()
+        anteriores, hecho = {}, 0
+        try:
+            while True:
+                filas = sorted(telemetria_tareas.resumen(), key=ORDENES[opts["orden"]], reverse=True)
+                if limpiar:
+                    self.stdout.write("\x1b[2J\x1b[H", ending="")
+                self._pantalla(filas, anteriores, opts["intervalo"] if hecho else None)
+                anteriores = {f["tarea"]: f["ejecuciones"] for f in filas}
+
+                hecho += 1
+                if opts["iteraciones"] and hecho >= opts["iteraciones"]:
+                    break
+                time.sleep(opts["intervalo"])
+        except KeyboardInterrupt:
+            pass
+
+    def _pantalla(self, filas, anteriores, intervalo):
+        total = sum(f["ejecuciones"] for f in filas)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"celery_top — {time.strftime('%H:%M:%S')} — {len(filas)} tareas, {total} ejecuciones"
+        ))
+        if not filas:
+            self.stdout.write("Sin datos todavía (¿workers corriendo con METRICAS_TAREAS y cache compartida?)")
+            return
+
+        tabla = [COLUMNAS]
+        for f in filas:
+            if intervalo:
+                ritmo = f"{(f['ejecuciones'] - anteriores.get(f['tarea'], 0)) * 60 / intervalo:.1f}"
+            else:
+                ritmo = "-"
+            tabla.append((
+                f["tarea"].removeprefix("webapp.tasks."), str(f["ejecuciones"]), ritmo, str(f["ok"]),
+                str(f["fallos"]), str(f["reintentos"]), str(f["omitidas"]),
+                _duracion(f["media"]), _duracion(f["p95"]),
+                _duracion(f["espera_media"]), _duracion(f["espera_p95"]), _duracion(f["segundos"]),
+            ))
+
+        anchos = [max(len(fila[i]) for fila in tabla) for i in range(len(COLUMNAS))]
+        for n, fila in enumerate(tabla):
+            linea = "  ".join(
+                c.ljust(anchos[i]) if i == 0 else c.rjust(anchos[i]) for i, c in enumerate(fila)
+            )
+            self.stdout.write(self.style.SQL_FIELD(linea) if n == 0 else linea)
@@ -0,0 +1,43 @@
+# webapp/management/commands/generate_dataset.py
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from webapp.services import dataset_sintetico
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga un dataset sintético a escala de producción (clientes, medios, límites, Tausers y stock, "
+        "transacciones en todos los estados, facturas e históricos). Determinista por --seed; usa COPY en Postgres."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=1000, help="Clientes a generar")
+        parser.add_argument("--transactions", type=int, default=10_000, help="Transacciones a generar")
+        parser.add_argument("--tausers", type=int, default=10, help="Tausers nuevos (con stock por billete)")
+        parser.add_argument("--days", type=int, default=365, help="Días hacia atrás que cubren los datos")
+        parser.add_argument("--seed", type=int, default=1)
+        parser.add_argument("--fin", type=date.fromisoformat, default=None,
+                            help="Último día de los datos (AAAA-MM-DD, default hoy); fijarlo para corridas comparables")
+        parser.add_argument("--lote", type=int, default=10_000, help="Filas por lote cuando no hay COPY")
+        parser.add_argument("--limpiar", action="store_true", help="Borrar antes un dataset generado previamente")
+
+    def handle(self, *args, **opts):
+        if opts["limpiar"]:
+            borrados = dataset_sintetico.limpiar()
+            self.stdout.write(f"Dataset anterior borrado: {sum(borrados.values()):,} filas")
+
+        inicio = time.perf_counter()
+        try:
+            resumen = dataset_sintetico.generar(
+                clientes=opts["clients"], transacciones=opts["transactions"], tausers=opts["tausers"],
+                dias=opts["days"], seed=opts["seed"], fin=opts["fin"], lote=opts["lote"], log=self.stdout.write,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        total = sum(n for n, _ in resumen.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"{total:,} filas en {time.perf_counter() - inicio:.1f}s (seed {opts['seed']})"
+        ))
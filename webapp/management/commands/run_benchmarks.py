@@ -0,0 +1,55 @@
+# webapp/management/commands/run_benchmarks.py
+import json
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from webapp import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Mide consultas SQL y latencia (p50/p95) de los caminos calientes sobre el dataset sintético, "
+        "escribe los resultados en JSON y falla si algún caso excede su presupuesto."
+    )
+
+    def add_arguments(self, parser):
+        nombres = [c.nombre for c in benchmarks.CASOS]
+        parser.add_argument("--solo", action="append", choices=nombres, default=None, metavar="CASO",
+                            help=f"Limitar a estos casos (repetible): {', '.join(nombres)}")
+        parser.add_argument("--repeticiones", type=int, default=None, help="Repeticiones por caso (default: las del caso)")
+        parser.add_argument("--factor-latencia", type=float, default=1.0,
+                            help="Escala los presupuestos de p95 (0 = solo controlar consultas)")
+        parser.add_argument("--salida", default="benchmarks.json", help="Archivo JSON de resultados")
+        parser.add_argument("--generar", action="store_true",
+                            help="Regenerar antes el dataset de referencia (generate_dataset --limpiar)")
+        parser.add_argument("--clients", type=int, default=10_000)
+        parser.add_argument("--transactions", type=int, default=1_000_000)
+        parser.add_argument("--tausers", type=int, default=20)
+
+    def handle(self, *args, **opts):
+        if opts["generar"]:
+            call_command(
+                "generate_dataset", "--limpiar", "--clients", opts["clients"], "--transactions", opts["transactions"],
+                "--tausers", opts["tausers"], stdout=self.stdout,
+            )
+
+        def log(nombre, r):
+            linea = (f"{nombre:<44} {r['consultas']:>5} consultas  p50 {r['p50_ms']:>9.1f} ms  "
+                     f"p95 {r['p95_ms']:>9.1f} ms")
+            self.stdout.write(self.style.ERROR(f"{linea}  ✗ {'; '.join(r['excedidos'])}") if r["excedidos"] else linea)
+
+        try:
+            resultado = benchmarks.correr(
+                solo=opts["solo"], repeticiones=opts["repeticiones"], factor_latencia=opts["factor_latencia"], log=log,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        Path(opts["salida"]).write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        self.stdout.write(f"Resultados en {opts['salida']}")
+        if not resultado["ok"]:
+            excedidos = [n for n, r in resultado["casos"].items() if r["excedidos"]]
+            raise CommandError(f"Presupuestos excedidos: {', '.join(excedidos)}")
+        self.stdout.write(self.style.SUCCESS("Todos los casos dentro de presupuesto."))
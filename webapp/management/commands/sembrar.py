@@ -0,0 +1,41 @@
+# webapp/management/commands/sembrar.py
+from django.core.management.base import BaseCommand, CommandError
+
+from webapp.models import SeedRegistro
+from webapp.services import seeds
+
+
+class Command(BaseCommand):
+    help = (
+        "Carga los datos iniciales (roles, monedas, clientes de prueba, límites, medios, stock…). "
+        "Solo aplica los seeders cuya huella cambió desde la última vez."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--forzar", action="store_true", help="Re-aplicar aunque la huella no haya cambiado")
+        parser.add_argument("--solo", action="append", default=None, metavar="SEEDER", help="Limitar a estos seeders (repetible)")
+        parser.add_argument("--listar", action="store_true", help="Mostrar los seeders y su último aplicado, sin ejecutar")
+        parser.add_argument("--limpiar-sesiones", action="store_true", help="Cerrar todas las sesiones al terminar")
+
+    def handle(self, *args, **opts):
+        nombres = [s.nombre for s in seeds.SEEDERS]
+        desconocidos = set(opts["solo"] or []) - set(nombres)
+        if desconocidos:
+            raise CommandError(f"Seeders desconocidos: {', '.join(sorted(desconocidos))}. Disponibles: {', '.join(nombres)}")
+
+        if opts["listar"]:
+            registros = {r.nombre: r for r in SeedRegistro.objects.all()}
+            for nombre in nombres:
+                r = registros.get(nombre)
+                self.stdout.write(f"{nombre:<20} {r.aplicado_en:%Y-%m-%d %H:%M} {r.huella[:12]}" if r else f"{nombre:<20} (nunca)")
+            return
+
+        resultado = seeds.sembrar(forzar=opts["forzar"], solo=opts["solo"])
+        for nombre, estado in resultado.items():
+            estilo = {"aplicado": self.style.SUCCESS, "error": self.style.ERROR}.get(estado, str)
+            self.stdout.write(estilo(f"{nombre:<20} {estado}"))
+
+        if opts["limpiar_sesiones"]:
+            self.stdout.write(f"Sesiones cerradas: {seeds.limpiar_sesiones()}")
+        if "error" in resultado.values():
+            raise CommandError("Algunos seeders fallaron (ver log); se reintentan en la próxima ejecución.")
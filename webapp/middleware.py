@@ -0,0 +1,40 @@
+# webapp/middleware.py
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from webapp.services import metricas
+
+
+class MetricasMiddleware:
+    """
+    Mide latencia, consultas SQL, tiempo en SQL y consultas repetidas por vista
+    (nombre de la URL resuelta) en una fracción de los requests
+    (settings.METRICAS_MUESTREO; 0 lo apaga). Ver services/metricas.py.
+    Va primero en MIDDLEWARE para incluir sesión y autenticación.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        muestreo = getattr(settings, "METRICAS_MUESTREO", 0)
+        if not muestreo or random.random() >= muestreo:
+            return self.get_response(request)
+
+        medicion = metricas.Medicion()
+        with ExitStack() as wrappers:
+            for alias in connections:
+                wrappers.enter_context(connections[alias].execute_wrapper(medicion))
+            inicio = time.perf_counter()
+            response = self.get_response(request)
+            segundos = time.perf_counter() - inicio
+
+        match = getattr(request, "resolver_match", None)
+        vista = (match.url_name or match.view_name) if match else "<sin_ruta>"
+        if vista != "metricas":
+            metricas.registrar_request(vista, segundos, medicion)
+        return response
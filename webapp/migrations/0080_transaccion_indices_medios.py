@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 09:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('webapp', '0079_transaccion_cambio_pendiente_transaccionauditoria'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(fields=['medio_pago_type', 'medio_pago_id', 'estado'], name='tx_medio_pago_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaccion',
+            index=models.Index(fields=['medio_cobro_type', 'medio_cobro_id', 'estado'], name='tx_medio_cobro_estado_idx'),
+        ),
+    ]
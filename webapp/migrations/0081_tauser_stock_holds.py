@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0080_transaccion_indices_medios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tausercurrencystock',
+            name='reservado',
+            field=models.PositiveIntegerField(default=0, verbose_name='Billetes reservados'),
+        ),
+        migrations.CreateModel(
+            name='TauserStockHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.PositiveIntegerField(verbose_name='Cantidad de billetes')),
+                ('estado', models.CharField(choices=[('ACTIVA', 'Activa'), ('CONSUMIDA', 'Consumida'), ('LIBERADA', 'Liberada')], default='ACTIVA', max_length=10)),
+                ('expira_en', models.DateTimeField(blank=True, null=True, verbose_name='Vence')),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='webapp.tausercurrencystock', verbose_name='Stock')),
+                ('transaccion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds_stock', to='webapp.transaccion', verbose_name='Transacción')),
+            ],
+            options={
+                'verbose_name': 'Reserva de stock de Tauser',
+                'verbose_name_plural': 'Reservas de stock de Tauser',
+                'indexes': [models.Index(fields=['transaccion', 'estado'], name='hold_tx_estado_idx'), models.Index(fields=['estado', 'expira_en'], name='hold_estado_expira_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def vincular_logs_existentes(apps, schema_editor):
+    # Los logs previos solo conocían la transacción: se resuelve el saldo por
+    # cliente + categoría actual + moneda destino (lo que hacía la señal)
+    LimiteIntercambioLog = apps.get_model("webapp", "LimiteIntercambioLog")
+    LimiteIntercambioCliente = apps.get_model("webapp", "LimiteIntercambioCliente")
+
+    saldo = LimiteIntercambioCliente.objects.filter(
+        cliente_id=OuterRef("transaccion__cliente_id"),
+        config__categoria_id=OuterRef("transaccion__cliente__categoria_id"),
+        config__moneda_id=OuterRef("transaccion__moneda_destino_id"),
+    ).values("id")[:1]
+    for log in LimiteIntercambioLog.objects.filter(limite__isnull=True).annotate(saldo_id=Subquery(saldo)):
+        if log.saldo_id:
+            LimiteIntercambioLog.objects.filter(pk=log.pk).update(limite_id=log.saldo_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0081_tauser_stock_holds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='limiteintercambiolog',
+            name='limite',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs', to='webapp.limiteintercambiocliente'),
+        ),
+        migrations.RunPython(vincular_logs_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:30
+
+import calendar
+from datetime import date, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def _periodo_dia(ahora, hour, minute):
+    corte = ahora.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return ahora.date() if ahora >= corte else ahora.date() - timedelta(days=1)
+
+
+def _periodo_mes(ahora, month_day, hour, minute):
+    # Meses más cortos que month_day cortan el último día
+    dia = min(month_day, calendar.monthrange(ahora.year, ahora.month)[1])
+    corte = ahora.replace(day=dia, hour=hour, minute=minute, second=0, microsecond=0)
+    if ahora >= corte:
+        return corte.date()
+    anio, mes = (ahora.year, ahora.month - 1) if ahora.month > 1 else (ahora.year - 1, 12)
+    return date(anio, mes, min(month_day, calendar.monthrange(anio, mes)[1]))
+
+
+def sellar_periodo_vigente(apps, schema_editor):
+    # Hasta ahora los saldos se reseteaban con el UPDATE masivo: pertenecen al período vigente.
+    # Copia del cálculo de services/limites.py al momento de esta migración (no importar código vivo)
+    LimiteIntercambioCliente = apps.get_model("webapp", "LimiteIntercambioCliente")
+    LimiteIntercambioScheduleConfig = apps.get_model("webapp", "LimiteIntercambioScheduleConfig")
+
+    cronograma = {c.frequency: c for c in LimiteIntercambioScheduleConfig.objects.all()}
+    ahora = timezone.localtime()
+
+    # Sin config diaria se usa la que crearía get_by_frequency (00:00, activa)
+    diario = cronograma.get("daily")
+    activo, hour, minute = (diario.is_active, diario.hour, diario.minute) if diario else (True, 0, 0)
+    dia = _periodo_dia(ahora, hour, minute) if activo else None
+
+    mensual = cronograma.get("monthly")
+    mes = None
+    if mensual and mensual.is_active and mensual.month_day:
+        mes = _periodo_mes(ahora, mensual.month_day, mensual.hour, mensual.minute)
+
+    LimiteIntercambioCliente.objects.update(periodo_dia=dia, periodo_mes=mes)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0082_limite_log_limite'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='limiteintercambiocliente',
+            name='periodo_dia',
+            field=models.DateField(blank=True, null=True, verbose_name='Período diario'),
+        ),
+        migrations.AddField(
+            model_name='limiteintercambiocliente',
+            name='periodo_mes',
+            field=models.DateField(blank=True, null=True, verbose_name='Período mensual'),
+        ),
+        migrations.RunPython(sellar_periodo_vigente, migrations.RunPython.noop),
+    ]
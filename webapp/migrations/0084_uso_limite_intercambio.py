@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:35
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0083_limites_periodo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsoLimiteIntercambio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('CONSUMO', 'Consumo'), ('DEVOLUCION', 'Devolución')], default='CONSUMO', max_length=10)),
+                ('monto', models.DecimalField(decimal_places=8, max_digits=23)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usos_limite', to='webapp.cliente')),
+                ('moneda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usos_limite', to='webapp.currency')),
+                ('transaccion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='usos_limite', to='webapp.transaccion')),
+            ],
+            options={
+                'verbose_name': 'Uso de límite de intercambio',
+                'verbose_name_plural': 'Usos de límites de intercambio',
+                'indexes': [models.Index(fields=['cliente', 'moneda', 'fecha'], include=('monto',), name='uso_limite_cli_mon_fecha_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('transaccion__isnull', False)), fields=('transaccion', 'tipo'), name='uso_limite_tx_tipo_uniq')],
+            },
+        ),
+    ]
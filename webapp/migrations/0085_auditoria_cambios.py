@@ -0,0 +1,91 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:44
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('webapp', '0084_uso_limite_intercambio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaccionauditoria',
+            name='cambios',
+            field=models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='comision_vta_com',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='desc_cliente',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='medio_cobro_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='medio_cobro_porc',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='medio_cobro_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='contenttypes.contenttype'),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='medio_pago_id',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='medio_pago_porc',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='medio_pago_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='contenttypes.contenttype'),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='moneda_destino',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='moneda_origen',
+            field=models.CharField(blank=True, max_length=10, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='monto_base_moneda',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=16, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='monto_destino',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='monto_origen',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='transaccionauditoria',
+            name='tasa_cambio',
+            field=models.DecimalField(blank=True, decimal_places=8, max_digits=16, null=True),
+        ),
+    ]
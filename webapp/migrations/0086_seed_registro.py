@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0085_auditoria_cambios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeedRegistro',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=64, unique=True)),
+                ('huella', models.CharField(max_length=64)),
+                ('aplicado_en', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
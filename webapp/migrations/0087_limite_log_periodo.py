@@ -0,0 +1,37 @@
+# Generated by Django 5.2.5 on 2026-10-18 18:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def sellar_periodo_de_logs(apps, schema_editor):
+    # Los logs con cupo por devolver se asumen del período que tiene hoy su saldo
+    LimiteIntercambioLog = apps.get_model("webapp", "LimiteIntercambioLog")
+    LimiteIntercambioCliente = apps.get_model("webapp", "LimiteIntercambioCliente")
+
+    saldo = LimiteIntercambioCliente.objects.filter(pk=OuterRef("limite_id"))
+    LimiteIntercambioLog.objects.filter(limite__isnull=False, monto_descontado__gt=0).update(
+        periodo_dia=Subquery(saldo.values("periodo_dia")[:1]),
+        periodo_mes=Subquery(saldo.values("periodo_mes")[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0086_seed_registro'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='limiteintercambiolog',
+            name='periodo_dia',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='limiteintercambiolog',
+            name='periodo_mes',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(sellar_periodo_de_logs, migrations.RunPython.noop),
+    ]
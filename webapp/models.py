@@ -5,6 +5,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models, transaction
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from decimal import Decimal, ROUND_DOWN
@@ -876,6 +877,13 @@ class TauserCurrencyStock(models.Model):
         verbose_name="Cantidad de billetes/monedas"
     )
 
+    # Suma de los TauserStockHold ACTIVOS de esta fila; se mantiene en las mismas
+    # sentencias que crean/liberan/consumen holds (disponible = quantity - reservado)
+    reservado = models.PositiveIntegerField(
+        default=0,
+        verbose_name="Billetes reservados"
+    )
+
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Última actualización")
 
     class Meta:
@@ -891,6 +899,50 @@ class TauserCurrencyStock(models.Model):
     def total_valor(self):
         return self.denomination.value * self.quantity
 
+    @property
+    def disponible(self):
+        return max(self.quantity - self.reservado, 0)
+
+
+class TauserStockHold(models.Model):
+    """
+    Reserva de billetes de un Tauser para una transacción que los va a entregar.
+    Se crea al confirmar, se consume al completar y se libera al cancelar o vencer.
+    """
+    class Estado(models.TextChoices):
+        ACTIVA = "ACTIVA", "Activa"
+        CONSUMIDA = "CONSUMIDA", "Consumida"
+        LIBERADA = "LIBERADA", "Liberada"
+
+    transaccion = models.ForeignKey(
+        "Transaccion",
+        on_delete=models.CASCADE,
+        related_name="holds_stock",
+        verbose_name="Transacción"
+    )
+    stock = models.ForeignKey(
+        TauserCurrencyStock,
+        on_delete=models.CASCADE,
+        related_name="holds",
+        verbose_name="Stock"
+    )
+    cantidad = models.PositiveIntegerField(verbose_name="Cantidad de billetes")
+    estado = models.CharField(max_length=10, choices=Estado.choices, default=Estado.ACTIVA)
+    expira_en = models.DateTimeField(null=True, blank=True, verbose_name="Vence")
+    creado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Reserva de stock de Tauser"
+        verbose_name_plural = "Reservas de stock de Tauser"
+        indexes = [
+            models.Index(fields=["transaccion", "estado"], name="hold_tx_estado_idx"),
+            models.Index(fields=["estado", "expira_en"], name="hold_estado_expira_idx"),
+        ]
+
+    def __str__(self):
+        return f"Hold #{self.pk} tx={self.transaccion_id} stock={self.stock_id} x {self.cantidad} ({self.estado})"
+
 
 # ------------------------------------------------------
 # Modelo Transaccion para el registro de la compraventa
@@ -998,12 +1050,33 @@ class Transaccion(models.Model):
     # ----------------------------------------------------------------------
     # 🔹 Control automático de fechas según estado
     # ----------------------------------------------------------------------
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Valores tal como se leyeron: la auditoría guarda solo lo que cambió
+        instancia = super().from_db(db, field_names, values)
+        instancia._loaded_values = dict(zip(field_names, values))
+        return instancia
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        campos = [self._meta.get_field(f) for f in fields] if fields else self._meta.concrete_fields
+        self._loaded_values = {
+            **getattr(self, "_loaded_values", {}),
+            **{
+                f.attname: self.__dict__[f.attname]
+                for f in campos if getattr(f, "concrete", False) and f.attname in self.__dict__
+            },
+        }
+
     def save(self, *args, **kwargs):
         """
         Controla automáticamente las fechas de pago y actualización.
         """
         estado_anterior = None
-        if self.pk:
+        cargados = getattr(self, "_loaded_values", None)
+        if self.pk and cargados and "estado" in cargados:
+            estado_anterior = cargados["estado"]
+        elif self.pk:
             estado_anterior = (
                 Transaccion.objects.filter(pk=self.pk)
                 .values_list("estado", flat=True)
@@ -1018,6 +1091,8 @@ class Transaccion(models.Model):
         if not self.pk or self.estado != estado_anterior:
             self.fecha_actualizacion = timezone.now()
 
+        # Para las señales post_save que reaccionan a transiciones de estado
+        self._estado_anterior = estado_anterior
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -1034,80 +1109,38 @@ class Transaccion(models.Model):
     @property
     def ganancia_en_pyg(self):
         """
-        Calcula la ganancia REAL en guaraníes, según si es COMPRA o VENTA
-        y según cuál moneda es PYG.
+        Calcula la ganancia REAL en guaraníes, según si es COMPRA o VENTA,
+        con los datos de precio congelados en la transacción.
+        (La misma fórmula existe como expresión ORM en pricing.ganancia_expression)
         """
+        from webapp.pricing import ganancia_pyg
+
+        return ganancia_pyg(
+            self.tipo,
+            self.monto_origen,
+            self.monto_destino,
+            self.monto_base_moneda,
+            self.comision_vta_com,
+            self.desc_cliente,
+        )
 
-        #rate_origen = Decimal(self.tasa_cambio)
-        #rate_destino = Decimal(self.tasa_cambio)
-
-
-        monto_orig = Decimal(self.monto_origen)
-        monto_dest = Decimal(self.monto_destino)
-        precio_base = int(self.monto_base_moneda)
-        print(self.medio_pago_porc)
-        print(self.desc_cliente)
-
-        #print(f"⬤ Tasa de cambio: {tasa}")
-
-        # 🔹 CASO 1 — VENTA
-        if self.tipo == "VENTA":
-            # El cliente entrega Gs y recibe divisa
-            # Valor real en Gs de la divisa entregada
-            """costo_real = monto_dest * precio_base
-
-            return monto_orig - costo_real
-            """
-
-            comision_vta = Decimal(self.comision_vta_com)
-
-            descuento_categoria = comision_vta * Decimal(self.desc_cliente)
-
-            tasa_venta_base = precio_base + comision_vta
-
-            tasa_venta = int(tasa_venta_base - descuento_categoria)
-
-            tc_venta = tasa_venta * monto_dest
-
-            costo_real = monto_dest * precio_base
-
-            return tc_venta - costo_real
-
-
-        # 🔹 CASO 2 — COMPRA
-        if self.tipo == "COMPRA":
-            # El cliente entrega divisa y recibe Gs
-            #monto_gs_pagado = monto_dest  # ya está expresado en Gs
-            #print(f"⬤ Monto en guaranies pagado: {monto_gs_pagado}")
-            #costo_real = monto_orig * tasa
-            #print(f"⬤ Costo Real: {costo_real}")
-
-            #print(f"⬤ Ganancia: {monto_gs_pagado - costo_real}")
-
-            comision_com = Decimal(self.comision_vta_com)
-
-            descuento_categoria = comision_com * Decimal(self.desc_cliente)
-
-            tasa_compra_base = precio_base - comision_com
-
-            tasa_compra = int(tasa_compra_base + descuento_categoria)
-
-            tc_compra = tasa_compra * monto_orig
-
-            costo_real = monto_orig * precio_base
-
-            return costo_real - tc_compra
-        
     class Meta:
         permissions = [
             ("ver_reportes", "Puede ver los reportes de la empresa"),
         ]
+        indexes = [
+            # Pantalla del Tauser: transacciones activas por medio de pago / cobro
+            models.Index(fields=["medio_pago_type", "medio_pago_id", "estado"], name="tx_medio_pago_estado_idx"),
+            models.Index(fields=["medio_cobro_type", "medio_cobro_id", "estado"], name="tx_medio_cobro_estado_idx"),
+        ]
 
 
 class TransaccionAuditoria(models.Model):
     """
-    Snapshot del estado de una Transaccion en el momento de un save().
-    Cada fila representa cómo estaba la transacción en ese instante.
+    Cambio de una Transaccion en un save() (o en una actualización en bloque).
+    `cambios` guarda solo los campos que cambiaron ({attname: valor nuevo});
+    al crearla, todos. Las filas viejas tienen la copia completa en las
+    columnas de snapshot, que ahora quedan vacías salvo tipo y estado.
     """
 
     transaccion = models.ForeignKey(
@@ -1132,36 +1165,44 @@ class TransaccionAuditoria(models.Model):
         help_text="usuario | sistema | tarea | otro"
     )
 
-    # Copia de los campos principales de Transaccion
+    # Estado de la transacción después del cambio
     tipo = models.CharField(max_length=10)     # COMPRA / VENTA
     estado = models.CharField(max_length=10)   # PENDIENTE / PAGADA / etc.
 
-    moneda_origen = models.CharField(max_length=10)
-    moneda_destino = models.CharField(max_length=10)
+    # Solo los campos modificados
+    cambios = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
 
-    tasa_cambio = models.DecimalField(max_digits=16, decimal_places=8)
-    monto_origen = models.DecimalField(max_digits=20, decimal_places=8)
-    monto_destino = models.DecimalField(max_digits=20, decimal_places=8)
+    # Snapshot completo (solo registros anteriores al formato por diferencias)
+    moneda_origen = models.CharField(max_length=10, null=True, blank=True)
+    moneda_destino = models.CharField(max_length=10, null=True, blank=True)
+
+    tasa_cambio = models.DecimalField(max_digits=16, decimal_places=8, null=True, blank=True)
+    monto_origen = models.DecimalField(max_digits=20, decimal_places=8, null=True, blank=True)
+    monto_destino = models.DecimalField(max_digits=20, decimal_places=8, null=True, blank=True)
 
     medio_pago_type = models.ForeignKey(
         ContentType,
         on_delete=models.PROTECT,
-        related_name="+"
+        related_name="+",
+        null=True,
+        blank=True,
     )
-    medio_pago_id = models.PositiveIntegerField()
+    medio_pago_id = models.PositiveIntegerField(null=True, blank=True)
 
     medio_cobro_type = models.ForeignKey(
         ContentType,
         on_delete=models.PROTECT,
-        related_name="+"
+        related_name="+",
+        null=True,
+        blank=True,
     )
-    medio_cobro_id = models.PositiveIntegerField()
+    medio_cobro_id = models.PositiveIntegerField(null=True, blank=True)
 
-    medio_pago_porc = models.DecimalField(max_digits=16, decimal_places=8, default=0)
-    medio_cobro_porc = models.DecimalField(max_digits=16, decimal_places=8, default=0)
-    desc_cliente = models.DecimalField(max_digits=16, decimal_places=8, default=0)
-    monto_base_moneda = models.DecimalField(max_digits=16, decimal_places=8, default=0)
-    comision_vta_com = models.DecimalField(max_digits=16, decimal_places=8, default=0)
+    medio_pago_porc = models.DecimalField(max_digits=16, decimal_places=8, null=True, blank=True)
+    medio_cobro_porc = models.DecimalField(max_digits=16, decimal_places=8, null=True, blank=True)
+    desc_cliente = models.DecimalField(max_digits=16, decimal_places=8, null=True, blank=True)
+    monto_base_moneda = models.DecimalField(max_digits=16, decimal_places=8, null=True, blank=True)
+    comision_vta_com = models.DecimalField(max_digits=16, decimal_places=8, null=True, blank=True)
 
     # Marca temporal del snapshot
     fecha_snapshot = models.DateTimeField(auto_now_add=True)
@@ -1230,9 +1271,61 @@ class LimiteIntercambioLog(models.Model):
         on_delete=models.CASCADE,
         related_name="limite_log"
     )
+    # Saldo del que se descontó (para devolverlo sin volver a resolver categoría + moneda)
+    limite = models.ForeignKey(
+        "LimiteIntercambioCliente",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="logs",
+    )
     monto_descontado = models.DecimalField(max_digits=23, decimal_places=8, default=Decimal('0'))
+    # Períodos del saldo al descontar: solo se devuelve a contadores del mismo período
+    periodo_dia = models.DateField(null=True, blank=True)
+    periodo_mes = models.DateField(null=True, blank=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+class UsoLimiteIntercambio(models.Model):
+    """
+    Libro de uso del cupo (solo se agregan filas) para el modo de ventana móvil
+    (LIMITES_MODO="ventana", ver services/limites_ventana.py). Una devolución
+    es otra fila con monto negativo y la misma fecha que el consumo, así que
+    resta exactamente de las mismas ventanas.
+    """
+
+    class Tipo(models.TextChoices):
+        CONSUMO = "CONSUMO", "Consumo"
+        DEVOLUCION = "DEVOLUCION", "Devolución"
+
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, related_name="usos_limite")
+    moneda = models.ForeignKey(Currency, on_delete=models.CASCADE, related_name="usos_limite")
+    transaccion = models.ForeignKey(
+        "Transaccion", on_delete=models.SET_NULL, null=True, blank=True, related_name="usos_limite",
+    )
+    tipo = models.CharField(max_length=10, choices=Tipo.choices, default=Tipo.CONSUMO)
+    monto = models.DecimalField(max_digits=23, decimal_places=8)
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Uso de límite de intercambio"
+        verbose_name_plural = "Usos de límites de intercambio"
+        indexes = [
+            # Suma por rango sin tocar la tabla (index-only scan)
+            models.Index(fields=["cliente", "moneda", "fecha"], include=["monto"], name="uso_limite_cli_mon_fecha_idx"),
+        ]
+        constraints = [
+            # Cada transacción consume y se devuelve a lo sumo una vez
+            models.UniqueConstraint(
+                fields=["transaccion", "tipo"],
+                condition=models.Q(transaccion__isnull=False),
+                name="uso_limite_tx_tipo_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.cliente_id} / {self.moneda_id} {self.monto} @ {self.fecha:%Y-%m-%d %H:%M}"
+
+
 class LimiteIntercambioConfig(models.Model):
     """
     Config de límites por CATEGORÍA + MONEDA.
@@ -1318,6 +1411,11 @@ class LimiteIntercambioCliente(models.Model):
         verbose_name="Límite Mensual (Actual)"
     )
 
+    # Período al que pertenecen los saldos (ver services/limites.py): si no es el
+    # vigente, el saldo real es el máximo de la config y se renueva al consumir
+    periodo_dia = models.DateField(null=True, blank=True, verbose_name="Período diario")
+    periodo_mes = models.DateField(null=True, blank=True, verbose_name="Período mensual")
+
     class Meta:
         verbose_name = "Límite de Intercambio (Cliente)"
         verbose_name_plural = "Límites de Intercambio (Cliente)"
@@ -1521,4 +1619,13 @@ class MFACode(models.Model):
 
 class SyncLog(models.Model):
     fecha = models.DateTimeField(auto_now_add=True)
-    resumen = models.JSONField()
\ No newline at end of file
+    resumen = models.JSONField()
+
+class SeedRegistro(models.Model):
+    """Huella del último aplicado de cada seeder (ver services/seeds.py)."""
+    nombre = models.CharField(max_length=64, unique=True)
+    huella = models.CharField(max_length=64)
+    aplicado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.huella[:12]})"
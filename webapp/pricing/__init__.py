@@ -0,0 +1,21 @@
+from .engine import (
+    Cotizacion,
+    TablaCotizaciones,
+    Tarifa,
+    factor_comisiones,
+    ganancia_expression,
+    ganancia_pyg,
+    quote_many,
+    quote_one,
+)
+
+__all__ = [
+    "Cotizacion",
+    "TablaCotizaciones",
+    "Tarifa",
+    "factor_comisiones",
+    "ganancia_expression",
+    "ganancia_pyg",
+    "quote_many",
+    "quote_one",
+]
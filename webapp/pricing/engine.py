@@ -0,0 +1,187 @@
+# webapp/pricing/engine.py
+"""
+Motor único de cotizaciones.
+
+Fórmula (la misma que usaban calcularTasa, api_active_currencies, la home y
+el correo de tasas):
+
+    venta  = base + comision_venta  * (1 - descuento)
+    compra = base - comision_compra * (1 - descuento)
+
+y, si hay métodos de pago/cobro, sus porcentajes se suman:
+
+    venta  *= 1 + (pago% + cobro%) / 100
+    compra *= 1 - (pago% + cobro%) / 100
+
+`quote_many` calcula de una vez la matriz monedas × descuentos: los factores
+que dependen del descuento y de las comisiones se calculan una sola vez por
+columna, no una vez por fila. Los helpers escalares se apoyan en ella.
+"""
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Iterable, Sequence
+
+from django.db.models import Case, DecimalField, ExpressionWrapper, F, When
+from django.db.models.functions import Floor
+
+CERO = Decimal("0")
+UNO = Decimal("1")
+
+
+@dataclass(frozen=True)
+class Tarifa:
+    """Datos de una moneda que intervienen en el precio."""
+    code: str
+    base: Decimal
+    com_venta: Decimal
+    com_compra: Decimal
+
+    @classmethod
+    def desde(cls, moneda) -> "Tarifa":
+        """Acepta una Tarifa, un Currency (o cualquier objeto con sus mismos atributos)."""
+        if isinstance(moneda, cls):
+            return moneda
+        return cls(
+            code=moneda.code,
+            base=Decimal(moneda.base_price),
+            com_venta=Decimal(moneda.comision_venta),
+            com_compra=Decimal(moneda.comision_compra),
+        )
+
+
+@dataclass(frozen=True)
+class Cotizacion:
+    venta: Decimal
+    compra: Decimal
+
+    def tasa(self, tipo) -> Decimal:
+        """VENTA (el cliente compra divisa) usa venta; COMPRA usa compra."""
+        return self.venta if str(tipo) == "VENTA" else self.compra
+
+
+class TablaCotizaciones:
+    """Resultado de quote_many: filas = monedas, columnas = descuentos."""
+
+    def __init__(self, codes, descuentos, venta, compra):
+        self.codes = list(codes)
+        self.descuentos = list(descuentos)
+        self.venta = venta
+        self.compra = compra
+        self._fila = {code: i for i, code in enumerate(self.codes)}
+        self._col = {d: j for j, d in enumerate(self.descuentos)}
+
+    def get(self, code, descuento=CERO) -> Cotizacion:
+        i = self._fila[code]
+        j = self._col[Decimal(descuento or 0)]
+        return Cotizacion(self.venta[i][j], self.compra[i][j])
+
+    def columna(self, descuento=CERO):
+        """Pares (code, Cotizacion) de un descuento, en el orden de entrada."""
+        j = self._col[Decimal(descuento or 0)]
+        return [(code, Cotizacion(self.venta[i][j], self.compra[i][j])) for i, code in enumerate(self.codes)]
+
+
+def factor_comisiones(pago_pct=CERO, cobro_pct=CERO):
+    """Factores (venta, compra) por las comisiones porcentuales de los métodos."""
+    porc = Decimal(pago_pct or 0) + Decimal(cobro_pct or 0)
+    return UNO + porc / 100, UNO - porc / 100
+
+
+def _redondear(valor: Decimal) -> Decimal:
+    # Las tasas se expresan siempre en PYG, sin decimales
+    return valor.quantize(UNO, rounding=ROUND_HALF_UP)
+
+
+def quote_many(
+    currencies: Iterable,
+    discounts: Sequence = (CERO,),
+    pago_pct=CERO,
+    cobro_pct=CERO,
+    redondear: bool = True,
+) -> TablaCotizaciones:
+    """
+    Calcula venta/compra para todas las monedas y todos los descuentos.
+
+    - currencies: Currency, Tarifa u objetos equivalentes
+    - discounts: descuentos de categoría (0.05 = 5%)
+    - pago_pct / cobro_pct: comisiones porcentuales de los métodos (2 = 2%)
+    - redondear: tasas enteras (ROUND_HALF_UP) como en la compraventa
+    """
+    tarifas = [Tarifa.desde(c) for c in currencies]
+    descuentos = [Decimal(d or 0) for d in dict.fromkeys(discounts)]
+    f_venta, f_compra = factor_comisiones(pago_pct, cobro_pct)
+
+    # Factores por columna: se calculan una sola vez
+    columnas = [UNO - d for d in descuentos]
+    fin = _redondear if redondear else (lambda v: v)
+
+    venta = []
+    compra = []
+    for t in tarifas:
+        venta.append([fin((t.base + t.com_venta * k) * f_venta) for k in columnas])
+        compra.append([fin((t.base - t.com_compra * k) * f_compra) for k in columnas])
+
+    return TablaCotizaciones([t.code for t in tarifas], descuentos, venta, compra)
+
+
+def quote_one(moneda, descuento=CERO, pago_pct=CERO, cobro_pct=CERO, redondear: bool = True) -> Cotizacion:
+    """Versión escalar de quote_many para una moneda y un descuento."""
+    tabla = quote_many([moneda], [descuento], pago_pct, cobro_pct, redondear)
+    return Cotizacion(tabla.venta[0][0], tabla.compra[0][0])
+
+
+# ----------------------------
+# Ganancia en PYG de una transacción
+# ----------------------------
+def ganancia_pyg(tipo, monto_origen, monto_destino, precio_base, comision, descuento) -> Decimal:
+    """
+    Ganancia de la casa en PYG con los datos congelados en la transacción.
+    La tasa se trunca a entero y no incluye comisiones de métodos.
+
+    - VENTA : el cliente entrega Gs y recibe divisa (monto_destino)
+    - COMPRA: el cliente entrega divisa (monto_origen) y recibe Gs
+    """
+    base = int(precio_base)
+    comision = Decimal(comision)
+    rebaja = comision * Decimal(descuento)
+
+    if tipo == "VENTA":
+        monto = Decimal(monto_destino)
+        tasa = int(base + comision - rebaja)
+        return tasa * monto - monto * base
+    if tipo == "COMPRA":
+        monto = Decimal(monto_origen)
+        tasa = int(base - comision + rebaja)
+        return monto * base - tasa * monto
+    return CERO
+
+
+def ganancia_expression():
+    """
+    Misma fórmula que ganancia_pyg como expresión del ORM, para agregar en la
+    base de datos (Floor equivale a int() porque las tasas son positivas).
+    """
+    salida = DecimalField(max_digits=28, decimal_places=8)
+    base = Floor(F("monto_base_moneda"))
+    rebaja = F("comision_vta_com") * F("desc_cliente")
+
+    return Case(
+        When(
+            tipo="VENTA",
+            then=ExpressionWrapper(
+                Floor(base + F("comision_vta_com") - rebaja) * F("monto_destino")
+                - F("monto_destino") * base,
+                output_field=salida,
+            ),
+        ),
+        When(
+            tipo="COMPRA",
+            then=ExpressionWrapper(
+                F("monto_origen") * base
+                - Floor(base - F("comision_vta_com") + rebaja) * F("monto_origen"),
+                output_field=salida,
+            ),
+        ),
+        default=CERO,
+        output_field=salida,
+    )
@@ -0,0 +1,121 @@
+# webapp/services/auditoria_archivo.py
+"""
+Archivo comprimido de TransaccionAuditoria.
+
+La auditoría crece sin límite. archivar() saca de la tabla los registros más
+viejos que AUDITORIA_RETENCION_DIAS y los guarda en archivos mensuales bajo
+MEDIA_ROOT/AUDITORIA_ARCHIVO_DIR:
+
+- Un archivo por mes (AAAA-MM.jsonl.gz). Cada lote es un miembro gzip
+  independiente (gzip admite miembros concatenados) con UNA línea JSON por
+  columnas: {"id": [...], "transaccion_id": [...], ...}. Las columnas
+  repetidas (estado, origen, snapshots vacíos) comprimen mucho mejor así.
+- Dentro del mes los lotes van ordenados por transacción, así cada miembro
+  cubre un rango chico de transaccion_id.
+- indice.json registra cada miembro (archivo, offset, largo, rango de
+  transacciones y de fechas). historial() solo descomprime los miembros cuyo
+  rango contiene la transacción pedida.
+- Orden por lote: se escribe el miembro, se actualiza el índice y recién
+  después se borran esas filas. Si algo se corta en el medio, el lote se
+  vuelve a archivar y historial() descarta los duplicados por id.
+"""
+import gzip
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from webapp.models import TransaccionAuditoria
+
+COLUMNAS = tuple(f.attname for f in TransaccionAuditoria._meta.concrete_fields)
+_CAMPOS = {f.attname: f for f in TransaccionAuditoria._meta.concrete_fields}
+
+
+def directorio() -> Path:
+    return Path(settings.MEDIA_ROOT) / getattr(settings, "AUDITORIA_ARCHIVO_DIR", "auditoria")
+
+
+def _ruta_indice() -> Path:
+    return directorio() / "indice.json"
+
+
+def leer_indice() -> list:
+    try:
+        return json.loads(_ruta_indice().read_text())["miembros"]
+    except FileNotFoundError:
+        return []
+
+
+def _guardar_indice(miembros) -> None:
+    tmp = _ruta_indice().with_suffix(".tmp")
+    tmp.write_text(json.dumps({"miembros": miembros}))
+    os.replace(tmp, _ruta_indice())
+
+
+def _escribir_miembro(nombre: str, filas: list) -> dict:
+    columnas = {c: [f[c] for f in filas] for c in COLUMNAS}
+    datos = gzip.compress(json.dumps(columnas, cls=DjangoJSONEncoder).encode() + b"\n")
+    ruta = directorio() / nombre
+    with open(ruta, "ab") as fh:
+        offset = fh.tell()
+        fh.write(datos)
+        fh.flush()
+        os.fsync(fh.fileno())
+    return {
+        "archivo": nombre, "offset": offset, "largo": len(datos), "filas": len(filas),
+        "tx_min": filas[0]["transaccion_id"], "tx_max": filas[-1]["transaccion_id"],
+        "desde": min(f["fecha_snapshot"] for f in filas).isoformat(),
+        "hasta": max(f["fecha_snapshot"] for f in filas).isoformat(),
+    }
+
+
+def archivar(dias: int | None = None, lote: int | None = None) -> dict:
+    """Archiva y borra en lotes lo anterior al corte. Devuelve {"filas", "miembros"}."""
+    dias = dias if dias is not None else getattr(settings, "AUDITORIA_RETENCION_DIAS", 180)
+    lote = lote or getattr(settings, "AUDITORIA_ARCHIVO_LOTE", 5000)
+    corte = timezone.now() - timedelta(days=dias)
+    viejos = TransaccionAuditoria.objects.filter(fecha_snapshot__lt=corte)
+
+    directorio().mkdir(parents=True, exist_ok=True)
+    indice = leer_indice()
+    resumen = {"filas": 0, "miembros": 0}
+    meses = viejos.annotate(mes=TruncMonth("fecha_snapshot")).values_list("mes", flat=True).distinct().order_by("mes")
+    for mes in list(meses):
+        siguiente = (mes + timedelta(days=32)).replace(day=1)
+        del_mes = viejos.filter(fecha_snapshot__gte=mes, fecha_snapshot__lt=siguiente).order_by("transaccion_id", "id")
+        while filas := list(del_mes.values(*COLUMNAS)[:lote]):
+            indice.append(_escribir_miembro(f"{mes:%Y-%m}.jsonl.gz", filas))
+            _guardar_indice(indice)
+            TransaccionAuditoria.objects.filter(id__in=[f["id"] for f in filas]).delete()
+            resumen["filas"] += len(filas)
+            resumen["miembros"] += 1
+    return resumen
+
+
+def _leer_miembro(miembro: dict) -> list:
+    with open(directorio() / miembro["archivo"], "rb") as fh:
+        fh.seek(miembro["offset"])
+        columnas = json.loads(gzip.decompress(fh.read(miembro["largo"])))
+    return [
+        {c: _CAMPOS[c].to_python(v) if v is not None and c != "cambios" else v for c, v in zip(COLUMNAS, valores)}
+        for valores in zip(*(columnas[c] for c in COLUMNAS))
+    ]
+
+
+def historial(transaccion_id) -> list:
+    """
+    Historial completo de auditoría de una transacción (tabla viva + archivos),
+    como dicts con las columnas de TransaccionAuditoria, del más viejo al más nuevo.
+    """
+    registros = {f["id"]: f for f in TransaccionAuditoria.objects.filter(transaccion_id=transaccion_id).values(*COLUMNAS)}
+    for miembro in leer_indice():
+        if miembro["tx_min"] <= transaccion_id <= miembro["tx_max"]:
+            for fila in _leer_miembro(miembro):
+                if fila["transaccion_id"] == transaccion_id:
+                    registros.setdefault(fila["id"], fila)
+    return sorted(registros.values(), key=lambda f: (f["fecha_snapshot"], f["id"]))
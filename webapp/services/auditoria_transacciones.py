@@ -0,0 +1,101 @@
+# webapp/services/auditoria_transacciones.py
+"""
+Auditoría de Transaccion por diferencias y en lote.
+
+- Se guardan solo los campos que cambiaron, en TransaccionAuditoria.cambios
+  ({attname: valor nuevo}). Con update_fields se miran solo esos; si no, se
+  compara contra los valores leídos de la base (Transaccion._loaded_values).
+  Un save() que no cambia nada no deja registro. Al crear se guarda todo.
+- Los registros se escriben en on_commit (si se hace rollback, no se
+  escribe nada; tampoco lo de un savepoint revertido): uno por save(), y un
+  solo bulk_create por llamada a registrar_lote() o actualizar().
+- actualizar() y registrar_lote() cubren los cambios que no pasan por save()
+  (QuerySet.update() de las tareas de vencimiento, bulk_update).
+"""
+from functools import partial
+
+from django.db import transaction
+
+from webapp.models import Transaccion, TransaccionAuditoria
+
+# Campos auditados (attname). fecha_actualizacion se deriva de estado.
+CAMPOS = tuple(
+    f.attname for f in Transaccion._meta.concrete_fields
+    if f.attname not in ("id", "fecha_creacion", "fecha_actualizacion")
+)
+
+
+def _encolar(registros) -> None:
+    """Escribe los registros al confirmar: si el bloque (o su savepoint) se revierte, on_commit los descarta."""
+    if registros:
+        transaction.on_commit(partial(TransaccionAuditoria.objects.bulk_create, registros))
+
+
+def _attname(campo: str) -> str:
+    return Transaccion._meta.get_field(campo).attname
+
+
+def cambios(instance: Transaccion, created: bool = False, update_fields=None) -> dict:
+    """{attname: valor} de lo que cambió respecto de lo leído de la base."""
+    if created:
+        return {c: getattr(instance, c) for c in CAMPOS}
+    candidatos = CAMPOS if update_fields is None else [a for a in map(_attname, update_fields) if a in CAMPOS]
+    original = getattr(instance, "_loaded_values", None)
+    if original is None:
+        # Instancia no leída de la base: no hay contra qué comparar
+        return {c: getattr(instance, c) for c in candidatos} if update_fields is not None else {}
+    return {c: getattr(instance, c) for c in candidatos if c not in original or original[c] != getattr(instance, c)}
+
+
+def _registro(transaccion_id, tipo, estado, datos, usuario=None, origen="sistema") -> TransaccionAuditoria:
+    return TransaccionAuditoria(
+        transaccion_id=transaccion_id, usuario=usuario, origen=origen, tipo=tipo, estado=estado, cambios=datos,
+    )
+
+
+def registrar(instance: Transaccion, created: bool = False, update_fields=None) -> None:
+    """Desde post_save. Usuario y origen pueden fijarse en la instancia (_usuario_accion / _origen_accion)."""
+    datos = cambios(instance, created, update_fields)
+    # Lo guardado pasa a ser el nuevo original
+    instance._loaded_values = {**getattr(instance, "_loaded_values", {}), **datos}
+    if not datos:
+        return
+    _encolar([_registro(
+        instance.pk, instance.tipo, instance.estado, datos,
+        getattr(instance, "_usuario_accion", None), getattr(instance, "_origen_accion", "sistema"),
+    )])
+
+
+def registrar_lote(transacciones, campos, usuario=None, origen="sistema") -> None:
+    """Para después de un bulk_update(transacciones, campos)."""
+    registros = []
+    for t in transacciones:
+        datos = cambios(t, update_fields=campos)
+        t._loaded_values = {**getattr(t, "_loaded_values", {}), **datos}
+        if datos:
+            registros.append(_registro(t.pk, t.tipo, t.estado, datos, usuario, origen))
+    _encolar(registros)
+
+
+def actualizar(queryset, usuario=None, origen="sistema", **valores) -> int:
+    """
+    QuerySet.update(**valores) auditado: bloquea las filas, las actualiza y
+    deja un registro por transacción con los valores nuevos. `valores` deben
+    ser literales (no expresiones F()).
+    """
+    datos = {}
+    for campo, valor in valores.items():
+        attname = _attname(campo)
+        if attname in CAMPOS:
+            datos[attname] = getattr(valor, "pk", valor)
+
+    with transaction.atomic():
+        filas = list(queryset.select_for_update().values_list("pk", "tipo", "estado"))
+        cantidad = Transaccion.objects.filter(pk__in=[pk for pk, _, _ in filas]).update(**valores)
+        if datos:
+            estado_nuevo = datos.get("estado")
+            _encolar([
+                _registro(pk, tipo, estado_nuevo or estado, datos, usuario, origen)
+                for pk, tipo, estado in filas
+            ])
+    return cantidad
@@ -0,0 +1,37 @@
+# webapp/services/cache_version.py
+"""
+Contadores en la cache compartida (sin TTL), usados como versión de las
+caches derivadas: quien lee incluye la versión en su clave o la compara, y
+quien modifica los datos la incrementa.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+
+def leer(clave: str) -> int:
+    return int(cache.get(clave) or 0)
+
+
+def incrementar(clave: str) -> int:
+    """incr atómico; si la clave no existe (o la cache la expulsó) arranca en 1."""
+    cache.add(clave, 0, None)
+    try:
+        return cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, None)
+        return 1
+
+
+def invalidar(clave: str, al_confirmar=None) -> None:
+    """
+    Incrementa ya y, si hay un bloque atómico abierto, de nuevo al confirmar:
+    así nadie cachea bajo la versión nueva lo que leyó antes del commit.
+    `al_confirmar` corre antes de ese segundo incremento.
+    """
+    incrementar(clave)
+    if transaction.get_connection().in_atomic_block:
+        def _confirmar():
+            if al_confirmar is not None:
+                al_confirmar()
+            incrementar(clave)
+        transaction.on_commit(_confirmar)
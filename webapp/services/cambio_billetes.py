@@ -0,0 +1,221 @@
+# webapp/services/cambio_billetes.py
+"""
+Cambio óptimo con las denominaciones de un Tauser.
+
+El greedy por denominación descendente falla con juegos no canónicos y con
+stock acotado: con billetes de 50 y 20, el 60 se rechazaba porque toma un 50
+y le queda 10 (la respuesta correcta es 3 × 20).
+
+Acá se resuelve exacto con programación dinámica sobre la red
+(denominación, resto), con memo:
+
+- Los montos se pasan a centavos enteros; un monto que no es múltiplo de 0.01
+  no se puede armar con billetes.
+- Se poda por MCD de las denominaciones restantes, por capacidad (suma de lo
+  que queda en stock) y por cota inferior de billetes, así que en la práctica
+  se visitan pocos estados. CAMBIO_MAX_ESTADOS pone un tope duro: si se
+  supera, se responde "no se puede" (criterio conservador) y se loguea.
+- El resultado se memoiza por (monto, stock): el stock normalizado hace de
+  versión, así que un cambio de stock nunca reutiliza una respuesta vieja.
+
+`cantidad=None` en una fila de stock significa stock ilimitado (lo que el
+Tauser puede RECIBIR: solo importa qué denominaciones maneja).
+"""
+import logging
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from math import gcd
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CENTAVOS = 100
+MEMO_MAX = 4096
+
+
+class PresupuestoAgotado(Exception):
+    """La búsqueda superó CAMBIO_MAX_ESTADOS."""
+
+
+@dataclass(frozen=True)
+class Desglose:
+    """Billetes a usar, de mayor a menor: ((valor, cantidad), ...)."""
+    billetes: tuple
+
+    @property
+    def cantidad_billetes(self) -> int:
+        return sum(c for _, c in self.billetes)
+
+    @property
+    def monto(self) -> Decimal:
+        return sum((v * c for v, c in self.billetes), Decimal("0"))
+
+    def __iter__(self):
+        return iter(self.billetes)
+
+
+def a_centavos(valor):
+    try:
+        centavos = Decimal(valor) * CENTAVOS
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    if centavos != centavos.to_integral_value():
+        return None
+    return int(centavos)
+
+
+def normalizar_stock(filas) -> tuple:
+    """
+    [(valor, cantidad | None), ...] → ((centavos, cantidad | None), ...) de mayor
+    a menor, agrupando valores repetidos y descartando cantidades <= 0.
+    """
+    agrupado = {}
+    for valor, cantidad in filas:
+        centavos = a_centavos(valor)
+        if not centavos or centavos <= 0:
+            continue
+        if cantidad is None or agrupado.get(centavos, 0) is None:
+            agrupado[centavos] = None
+        elif cantidad > 0:
+            agrupado[centavos] = agrupado.get(centavos, 0) + int(cantidad)
+    return tuple(sorted(agrupado.items(), reverse=True))
+
+
+def _max_estados() -> int:
+    return getattr(settings, "CAMBIO_MAX_ESTADOS", 200_000)
+
+
+@lru_cache(maxsize=MEMO_MAX)
+def _resolver(objetivo: int, stock: tuple, max_estados: int):
+    """
+    Cantidad de billetes por denominación (misma posición que `stock`) que suma
+    `objetivo` con la menor cantidad de billetes, o None si no hay forma.
+    """
+    n = len(stock)
+    valores = [v for v, _ in stock]
+
+    # capacidad[i]: suma máxima con las denominaciones i.. (None = sin tope)
+    # mcd[i]: MCD de las denominaciones i.. (todo resto armable es múltiplo)
+    capacidad = [0] * (n + 1)
+    mcd = [0] * (n + 1)
+    for i in range(n - 1, -1, -1):
+        v, q = stock[i]
+        capacidad[i] = None if q is None or capacidad[i + 1] is None else capacidad[i + 1] + v * q
+        mcd[i] = gcd(v, mcd[i + 1])
+
+    memo = {}
+    visitados = [0]
+
+    def mejor(i, resto):
+        if resto == 0:
+            return 0
+        if i == n or resto % mcd[i] or (capacidad[i] is not None and resto > capacidad[i]):
+            return None
+        clave = (i, resto)
+        if clave in memo:
+            return memo[clave][0]
+
+        visitados[0] += 1
+        if visitados[0] > max_estados:
+            raise PresupuestoAgotado
+
+        v, q = stock[i]
+        k_max = resto // v if q is None else min(q, resto // v)
+        k_min = 0
+        if capacidad[i + 1] is not None and resto > capacidad[i + 1]:
+            k_min = -(-(resto - capacidad[i + 1]) // v)
+        siguiente = valores[i + 1] if i + 1 < n else None
+
+        mejor_total, mejor_k = None, None
+        for k in range(k_max, k_min - 1, -1):
+            r = resto - k * v
+            if mejor_total is not None:
+                # Cota: con menos billetes grandes el resto solo crece (no decrece la cota) → cortar
+                cota = k + (-(-r // siguiente) if siguiente else 0)
+                if cota >= mejor_total:
+                    break
+            sub = mejor(i + 1, r)
+            if sub is not None and (mejor_total is None or k + sub < mejor_total):
+                mejor_total, mejor_k = k + sub, k
+
+        memo[clave] = (mejor_total, mejor_k)
+        return mejor_total
+
+    try:
+        if mejor(0, objetivo) is None:
+            return None
+    except PresupuestoAgotado:
+        logger.warning("Cambio de billetes: se superaron %s estados para %s", max_estados, objetivo)
+        return None
+
+    conteos, resto = [], objetivo
+    for i in range(n):
+        k = memo[(i, resto)][1] if resto else 0
+        conteos.append(k)
+        resto -= k * valores[i]
+    return tuple(conteos)
+
+
+def resolver(monto, filas) -> Desglose | None:
+    """
+    Desglose que suma exactamente `monto` con la menor cantidad de billetes,
+    respetando el stock de `filas` ([(valor, cantidad | None), ...]).
+    None si no se puede.
+    """
+    objetivo = a_centavos(monto)
+    stock = normalizar_stock(filas)
+    if not objetivo or objetivo <= 0 or not stock:
+        return None
+
+    conteos = _resolver(objetivo, stock, _max_estados())
+    if conteos is None:
+        return None
+    return Desglose(tuple(
+        (Decimal(v) / CENTAVOS, k) for (v, _), k in zip(stock, conteos) if k
+    ))
+
+
+def resolver_ilimitado(monto, valores) -> Desglose | None:
+    """Igual que resolver() pero con stock ilimitado de cada denominación."""
+    return resolver(monto, [(v, None) for v in valores])
+
+
+def montos_alcanzables(filas, hasta_centavos: int | None = None):
+    """
+    Todos los montos que se pueden armar con el stock acotado de `filas`,
+    como máscara de bits: el bit p encendido ⇔ se puede armar p × unidad
+    centavos (unidad = MCD de las denominaciones). Con `hasta_centavos` se
+    recortan los montos mayores. Devuelve (mascara, unidad), o None si el
+    stock está vacío, tiene filas ilimitadas o no entra en CAMBIO_MAX_BITS.
+    """
+    stock = normalizar_stock(filas)
+    if not stock or any(q is None for _, q in stock):
+        return None
+
+    unidad = 0
+    for v, _ in stock:
+        unidad = gcd(unidad, v)
+    tope = sum(v * q for v, q in stock) // unidad
+    if hasta_centavos is not None:
+        tope = min(tope, max(hasta_centavos, 0) // unidad)
+    if tope > getattr(settings, "CAMBIO_MAX_BITS", 5_000_000):
+        return None
+
+    recorte = (1 << (tope + 1)) - 1
+    mascara = 1
+    for v, q in stock:
+        paso = v // unidad
+        # Partición binaria de q (1, 2, 4, ..., resto): cada parte es un único corrimiento
+        parte = 1
+        while q > 0:
+            usar = min(parte, q)
+            mascara = (mascara | (mascara << (paso * usar))) & recorte
+            q -= usar
+            parte <<= 1
+    return mascara, unidad
+
+
+def limpiar_memo():
+    _resolver.cache_clear()
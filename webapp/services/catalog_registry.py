@@ -0,0 +1,304 @@
+# webapp/services/catalog_registry.py
+"""
+Registro en memoria (por proceso) de los catálogos chicos que casi no cambian:
+monedas, denominaciones, tipos de pago/cobro, categorías y la cuenta bancaria
+del negocio.
+
+- Cada proceso guarda un snapshot inmutable (dataclasses congeladas dentro de
+  MappingProxyType) y lo arma con una consulta por catálogo.
+- Las señales post_save/post_delete lo invalidan en el proceso que guardó e
+  incrementan un contador de versión en la cache compartida; los demás
+  workers (gunicorn, Celery) comparan ese contador como mucho cada
+  CATALOG_REGISTRY_CHECK_SECONDS y recargan si cambió. El contador tiene
+  que vivir en la cache compartida (Redis): con una cache por proceso solo
+  se enteraría el proceso que guardó.
+- Igual, ningún snapshot dura más de CATALOG_REGISTRY_MAX_SECONDS: cubre los
+  cambios que no pasan por señales (queryset.update(), SQL a mano) y una
+  versión expulsada de la cache.
+- Las búsquedas que no encuentran nada levantan el DoesNotExist del modelo,
+  igual que un .get() del ORM.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from types import MappingProxyType
+
+from django.conf import settings
+
+from webapp.services import cache_version
+
+KEY_VERSION = "catalog_registry:version"
+
+_lock = threading.Lock()
+_estado = {"snapshot": None, "chequeado": 0.0, "cargado": 0.0}
+
+
+# ----------------------------
+# Entradas (inmutables)
+# ----------------------------
+@dataclass(frozen=True)
+class Moneda:
+    id: int
+    code: str
+    name: str
+    symbol: str
+    base_price: Decimal
+    comision_venta: Decimal
+    comision_compra: Decimal
+    decimales_cotizacion: int
+    decimales_monto: int
+    is_active: bool
+    flag_url: str
+
+    @property
+    def pk(self):
+        return self.id
+
+
+@dataclass(frozen=True)
+class Denominacion:
+    id: int
+    currency_id: int
+    value: Decimal
+    type: str
+    is_active: bool
+
+    @property
+    def pk(self):
+        return self.id
+
+
+@dataclass(frozen=True)
+class Tipo:
+    """Tipo de pago o de cobro global."""
+    id: int
+    nombre: str
+    activo: bool
+    comision: Decimal
+
+    @property
+    def pk(self):
+        return self.id
+
+
+@dataclass(frozen=True)
+class Categoria:
+    id: int
+    nombre: str
+    descuento: Decimal
+
+    @property
+    def pk(self):
+        return self.id
+
+
+@dataclass(frozen=True)
+class CuentaNegocio:
+    id: int
+    numero_cuenta: str
+    alias_cbu: str
+    entidad_nombre: str
+    moneda_id: int
+
+    @property
+    def pk(self):
+        return self.id
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    version: int
+    monedas: MappingProxyType            # id → Moneda
+    monedas_por_code: MappingProxyType   # code → Moneda
+    denominaciones: MappingProxyType     # code → (Denominacion, ...) de mayor a menor
+    tipos_pago: MappingProxyType         # id → Tipo
+    tipos_pago_por_nombre: MappingProxyType
+    tipos_cobro: MappingProxyType
+    tipos_cobro_por_nombre: MappingProxyType
+    categorias: MappingProxyType         # id → Categoria
+    cuenta_negocio: CuentaNegocio | None
+
+
+def normalizar_nombre(nombre: str) -> str:
+    """'Tarjeta Nacional' / 'tarjeta_nacional' → 'tarjetanacional'."""
+    return (nombre or "").replace(" ", "").replace("_", "").lower()
+
+
+# ----------------------------
+# Carga
+# ----------------------------
+def _cargar(version: int) -> Snapshot:
+    from webapp import models
+
+    monedas = {}
+    for c in models.Currency.objects.all():
+        monedas[c.id] = Moneda(
+            id=c.id, code=c.code, name=c.name, symbol=c.symbol,
+            base_price=c.base_price, comision_venta=c.comision_venta, comision_compra=c.comision_compra,
+            decimales_cotizacion=c.decimales_cotizacion, decimales_monto=c.decimales_monto,
+            is_active=c.is_active, flag_url=c.flag_image.url if c.flag_image else "",
+        )
+
+    denominaciones = {}
+    for d in models.CurrencyDenomination.objects.order_by("currency_id", "-value"):
+        moneda = monedas.get(d.currency_id)
+        if moneda:
+            denominaciones.setdefault(moneda.code, []).append(
+                Denominacion(id=d.id, currency_id=d.currency_id, value=d.value, type=d.type, is_active=d.is_active)
+            )
+
+    def _tipos(modelo):
+        por_id = {t.id: Tipo(id=t.id, nombre=t.nombre, activo=t.activo, comision=t.comision)
+                  for t in modelo.objects.all()}
+        por_nombre = {normalizar_nombre(t.nombre): t for t in por_id.values()}
+        return MappingProxyType(por_id), MappingProxyType(por_nombre)
+
+    tipos_pago, tipos_pago_por_nombre = _tipos(models.TipoPago)
+    tipos_cobro, tipos_cobro_por_nombre = _tipos(models.TipoCobro)
+
+    categorias = {c.id: Categoria(id=c.id, nombre=c.nombre, descuento=c.descuento or Decimal("0"))
+                  for c in models.Categoria.objects.all()}
+
+    cuenta = models.CuentaBancariaNegocio.objects.select_related("entidad").order_by("id").first()
+    cuenta_negocio = None
+    if cuenta:
+        cuenta_negocio = CuentaNegocio(
+            id=cuenta.id, numero_cuenta=cuenta.numero_cuenta, alias_cbu=cuenta.alias_cbu,
+            entidad_nombre=cuenta.entidad.nombre, moneda_id=cuenta.moneda_id,
+        )
+
+    return Snapshot(
+        version=version,
+        monedas=MappingProxyType(monedas),
+        monedas_por_code=MappingProxyType({m.code: m for m in monedas.values()}),
+        denominaciones=MappingProxyType({k: tuple(v) for k, v in denominaciones.items()}),
+        tipos_pago=tipos_pago,
+        tipos_pago_por_nombre=tipos_pago_por_nombre,
+        tipos_cobro=tipos_cobro,
+        tipos_cobro_por_nombre=tipos_cobro_por_nombre,
+        categorias=MappingProxyType(categorias),
+        cuenta_negocio=cuenta_negocio,
+    )
+
+
+def _version_compartida() -> int:
+    return cache_version.leer(KEY_VERSION)
+
+
+def snapshot() -> Snapshot:
+    """Snapshot vigente del proceso (lo recarga si otro proceso lo invalidó o si venció)."""
+    ahora = time.monotonic()
+    snap = _estado["snapshot"]
+    intervalo = getattr(settings, "CATALOG_REGISTRY_CHECK_SECONDS", 1.0)
+    edad_maxima = getattr(settings, "CATALOG_REGISTRY_MAX_SECONDS", 60.0)
+
+    if snap is not None and ahora - _estado["cargado"] >= edad_maxima:
+        snap = None
+
+    if snap is not None and ahora - _estado["chequeado"] < intervalo:
+        return snap
+
+    version = _version_compartida()
+    if snap is not None and snap.version == version:
+        _estado["chequeado"] = ahora
+        return snap
+
+    with _lock:
+        snap = _estado["snapshot"]
+        vencido = ahora - _estado["cargado"] >= edad_maxima
+        if snap is None or snap.version != version or vencido:
+            snap = _cargar(version)
+            _estado["snapshot"] = snap
+            _estado["cargado"] = ahora
+        _estado["chequeado"] = ahora
+    return snap
+
+
+# ----------------------------
+# Búsquedas
+# ----------------------------
+def _obtener(tabla, clave, modelo):
+    try:
+        return tabla[clave]
+    except (KeyError, TypeError):
+        raise modelo.DoesNotExist(f"{modelo.__name__} {clave!r} no existe")
+
+
+def moneda(code: str) -> Moneda:
+    from webapp.models import Currency
+    return _obtener(snapshot().monedas_por_code, code, Currency)
+
+
+def moneda_por_id(moneda_id) -> Moneda:
+    from webapp.models import Currency
+    return _obtener(snapshot().monedas, _como_int(moneda_id), Currency)
+
+
+def denominaciones(code: str, solo_activas: bool = True) -> tuple:
+    todas = snapshot().denominaciones.get(code, ())
+    return tuple(d for d in todas if d.is_active) if solo_activas else todas
+
+
+def tipo_pago(tipo_id) -> Tipo:
+    from webapp.models import TipoPago
+    return _obtener(snapshot().tipos_pago, _como_int(tipo_id), TipoPago)
+
+
+def tipo_pago_por_nombre(nombre: str) -> Tipo:
+    from webapp.models import TipoPago
+    return _obtener(snapshot().tipos_pago_por_nombre, normalizar_nombre(nombre), TipoPago)
+
+
+def tipo_cobro(tipo_id) -> Tipo:
+    from webapp.models import TipoCobro
+    return _obtener(snapshot().tipos_cobro, _como_int(tipo_id), TipoCobro)
+
+
+def tipo_cobro_por_nombre(nombre: str) -> Tipo:
+    from webapp.models import TipoCobro
+    return _obtener(snapshot().tipos_cobro_por_nombre, normalizar_nombre(nombre), TipoCobro)
+
+
+def tipos_pago_activos() -> tuple:
+    """Tipos de pago activos, por nombre descendente (orden del selector de compraventa)."""
+    return tuple(sorted((t for t in snapshot().tipos_pago.values() if t.activo),
+                        key=lambda t: t.nombre, reverse=True))
+
+
+def tipos_cobro_activos() -> tuple:
+    return tuple(sorted((t for t in snapshot().tipos_cobro.values() if t.activo),
+                        key=lambda t: t.nombre, reverse=True))
+
+
+def categoria(categoria_id) -> Categoria:
+    from webapp.models import Categoria as CategoriaModel
+    return _obtener(snapshot().categorias, _como_int(categoria_id), CategoriaModel)
+
+
+def cuenta_negocio() -> CuentaNegocio | None:
+    return snapshot().cuenta_negocio
+
+
+def _como_int(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+# ----------------------------
+# Invalidación (llamada desde signals)
+# ----------------------------
+def _descartar_snapshot():
+    _estado["snapshot"] = None
+
+
+def invalidar():
+    """
+    Descarta el snapshot local y avisa al resto de los procesos. Si hay un
+    bloque atómico abierto se vuelve a avisar al confirmar, para que nadie se
+    quede con datos leídos antes del commit.
+    """
+    _descartar_snapshot()
+    cache_version.invalidar(KEY_VERSION, al_confirmar=_descartar_snapshot)
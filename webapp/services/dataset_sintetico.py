@@ -0,0 +1,567 @@
+# webapp/services/dataset_sintetico.py
+"""
+Dataset sintético a escala de producción (manage.py generate_dataset).
+
+- Determinista: cada tabla usa su propio random.Random(f"{seed}:{tabla}") y las
+  fechas se anclan a `fin` (por defecto hoy). Dos corridas con la misma
+  semilla sobre la misma base inicial cargan los mismos datos.
+- Los ids se reservan en Python (máximo actual + 1), así las FKs se arman sin
+  leer nada de vuelta; al final se reajustan las secuencias.
+- Carga con COPY … FROM STDIN (psycopg 3) en streaming desde generadores: la
+  memoria no crece con la cantidad de transacciones. Sin COPY (otro motor o
+  psycopg2) se inserta en lotes con executemany.
+- Escribe directo en las tablas: no corre save() ni señales. Lo que se
+  deriva de filas ya cargadas (saldos de límites, detalle y factura de cada
+  transacción facturada) se arma con INSERT … SELECT en la base. Las caches se
+  invalidan al final.
+- Todo queda marcado (correos en @dataset.invalid, Tausers "Dataset Tauser …")
+  para que limpiar() lo borre, también con SQL por conjuntos. CurrencyHistory solo completa días faltantes
+  y no se borra.
+"""
+import bisect
+import math
+import random
+import time as reloj
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import accumulate, chain, islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+from django.db.models import Exists, Max, OuterRef
+from django.utils import timezone
+
+from webapp.models import (
+    Billetera, BilleteraCobro, Categoria, Cliente, ClienteUsuario, CuentaBancaria, CuentaBancariaCobro, Currency,
+    CurrencyDenomination, CurrencyHistory, DetalleFactura, Entidad, Factura, LimiteIntercambioCliente,
+    LimiteIntercambioConfig, MedioCobro, MedioPago, TarjetaInternacional, TarjetaNacional, Tauser, TauserCurrencyStock,
+    TipoCobro, TipoPago, Transaccion,
+)
+from webapp.services import catalog_registry, metodos_cliente, quote_matrix, tauser_stock
+
+User = get_user_model()
+
+DOMINIO = "dataset.invalid"
+PREFIJO_TAUSER = "Dataset Tauser"
+CLIENTES_POR_USUARIO = 5
+
+NOMBRES = ["Juan", "María", "Carlos", "Ana", "Luis", "Rosa", "Jorge", "Lucía", "Diego", "Sofía", "Pedro", "Elena",
+           "Miguel", "Laura", "Andrés", "Carmen", "Ramón", "Gabriela", "Víctor", "Natalia"]
+APELLIDOS = ["González", "Benítez", "Martínez", "López", "Giménez", "Vera", "Duarte", "Rodríguez", "Ayala", "Ortiz",
+             "Báez", "Sánchez", "Ramírez", "Acosta", "Cáceres", "Villalba", "Franco", "Cabrera", "Fernández", "Rojas"]
+CIUDADES = ["Asunción", "San Lorenzo", "Luque", "Capiatá", "Lambaré", "Fernando de la Mora", "Limpio", "Ñemby",
+            "Encarnación", "Ciudad del Este", "Mariano Roque Alonso", "Itauguá"]
+SOCIEDADES = ["S.A.", "S.R.L.", "S.A.E.C.A.", "y Asociados"]
+
+# Mezcla aproximada de producción
+ESTADOS = {
+    Transaccion.Estado.COMPLETA: 55,
+    Transaccion.Estado.CANCELADA: 15,
+    Transaccion.Estado.ANULADA: 10,
+    Transaccion.Estado.PENDIENTE: 8,
+    Transaccion.Estado.PAGADA: 7,
+    Transaccion.Estado.AC_FALLIDA: 5,
+}
+CON_PAGO = {Transaccion.Estado.PAGADA, Transaccion.Estado.COMPLETA, Transaccion.Estado.AC_FALLIDA, Transaccion.Estado.ANULADA}
+CON_FACTURA = {Transaccion.Estado.COMPLETA, Transaccion.Estado.ANULADA}
+PROPORCION_TAUSER = 0.4        # transacciones pagadas/cobradas en Tauser
+PESO_USD = 3                   # USD pesa el triple que el resto de las extranjeras
+
+TIPOS_PAGO = ["billetera", "tarjeta_nacional", "tarjeta_internacional", "cuenta_bancaria"]
+TIPOS_COBRO = ["billetera", "cuenta_bancaria"]
+_DETALLE_PAGO = {
+    "billetera": Billetera, "tarjeta_nacional": TarjetaNacional,
+    "tarjeta_internacional": TarjetaInternacional, "cuenta_bancaria": CuentaBancaria,
+}
+_DETALLE_COBRO = {"billetera": BilleteraCobro, "cuenta_bancaria": CuentaBancariaCobro}
+
+
+# ================================================================
+# CARGA
+# ================================================================
+
+def _bloques(iterable, tamanio):
+    it = iter(iterable)
+    while bloque := list(islice(it, tamanio)):
+        yield bloque
+
+
+def cargar(modelo, filas, lote: int = 10_000) -> int:
+    """
+    Inserta filas ({attname: valor}) en la tabla del modelo sin pasar por el
+    ORM. Las columnas salen de la primera fila más los defaults del modelo;
+    la PK se omite si la primera fila no la trae (queda a la secuencia).
+    """
+    filas = iter(filas)
+    primera = next(filas, None)
+    if primera is None:
+        return 0
+    campos = [f for f in modelo._meta.concrete_fields if not (f.primary_key and f.attname not in primera)]
+    defaults = {f.attname: f.get_default() for f in campos if f.attname not in primera}
+    nombres = [f.attname for f in campos]
+    tuplas = (tuple(fila[c] if c in fila else defaults[c] for c in nombres) for fila in chain([primera], filas))
+
+    q = connection.ops.quote_name
+    tabla, columnas = q(modelo._meta.db_table), ", ".join(q(f.column) for f in campos)
+    n = 0
+    with connection.cursor() as cur:
+        crudo = cur.cursor
+        if connection.vendor == "postgresql" and hasattr(crudo, "copy"):
+            with crudo.copy(f"COPY {tabla} ({columnas}) FROM STDIN") as copia:
+                for t in tuplas:
+                    copia.write_row(t)
+                    n += 1
+        else:
+            sql = f"INSERT INTO {tabla} ({columnas}) VALUES ({', '.join(['%s'] * len(campos))})"
+            for bloque in _bloques(tuplas, lote):
+                cur.executemany(sql, bloque)
+                n += len(bloque)
+    return n
+
+
+def _siguiente_id(modelo) -> int:
+    return (modelo.objects.aggregate(m=Max("pk"))["m"] or 0) + 1
+
+
+_SALDOS_NUEVOS = f"""
+    INSERT INTO {LimiteIntercambioCliente._meta.db_table} (config_id, cliente_id, limite_dia_actual, limite_mes_actual)
+    SELECT cfg.id, c.id, cfg.limite_dia_max, cfg.limite_mes_max
+      FROM {Cliente._meta.db_table} c
+      JOIN {LimiteIntercambioConfig._meta.db_table} cfg ON cfg.categoria_id = c.categoria_id
+     WHERE c.id >= %s
+    ON CONFLICT (cliente_id, config_id) DO NOTHING
+"""
+
+
+# ================================================================
+# GENERACIÓN
+# ================================================================
+
+class _Contexto:
+    """Datos base leídos una vez y lo generado que necesitan las tablas siguientes."""
+
+    def __init__(self, clientes, transacciones, tausers, dias, seed, fin):
+        self.n_clientes, self.n_transacciones, self.n_tausers, self.dias, self.seed = (
+            clientes, transacciones, tausers, dias, seed,
+        )
+        self.cero = timezone.make_aware(datetime.combine(fin, time.min))
+        self.fin = fin
+
+        self.pyg = Currency.objects.filter(code="PYG").first()
+        self.extranjeras = list(Currency.objects.filter(is_active=True).exclude(code="PYG").order_by("id"))
+        self.monedas = [self.pyg, *self.extranjeras]
+        self.categorias = list(Categoria.objects.order_by("descuento", "id").values_list("id", "descuento"))
+        self.bancos = list(Entidad.objects.filter(tipo="banco", activo=True).order_by("id").values_list("id", flat=True))
+        self.billeteras = list(Entidad.objects.filter(tipo="telefono", activo=True).order_by("id").values_list("id", flat=True))
+        faltan = [
+            n for n, v in (("PYG", self.pyg), ("monedas extranjeras", self.extranjeras), ("categorías", self.categorias),
+                           ("bancos", self.bancos), ("billeteras", self.billeteras)) if not v
+        ]
+        if faltan:
+            raise ValueError(f"Faltan datos base ({', '.join(faltan)}); correr antes `manage.py sembrar`.")
+
+        tipos_pago = {t.nombre.lower(): t for t in TipoPago.objects.all()}
+        tipos_cobro = {t.nombre.lower(): t for t in TipoCobro.objects.all()}
+        nombre_tipo = lambda tipo: tipo.replace("_", " ")
+        self.tipo_pago = {t: getattr(tipos_pago.get(nombre_tipo(t)), "id", None) for t in TIPOS_PAGO}
+        self.tipo_cobro = {t: getattr(tipos_cobro.get(nombre_tipo(t)), "id", None) for t in TIPOS_COBRO}
+        self.porc_pago = {t: getattr(tipos_pago.get(nombre_tipo(t)), "comision", 0) for t in TIPOS_PAGO}
+        self.porc_cobro = {t: getattr(tipos_cobro.get(nombre_tipo(t)), "comision", 0) for t in TIPOS_COBRO}
+        self.tauser_pago = getattr(tipos_pago.get("tauser"), "id", None)
+        self.tauser_cobro = getattr(tipos_cobro.get("tauser"), "id", None)
+
+        # Las transacciones apuntan al subtipo (TarjetaNacional, BilleteraCobro, …), como las que arma la app
+        self.ct_tauser = ContentType.objects.get_for_model(Tauser).id
+        self.ct_detalle = {
+            m: ct.id for m, ct in ContentType.objects.get_for_models(*_DETALLE_PAGO.values(), *_DETALLE_COBRO.values()).items()
+        }
+        self.grupo_usuario = Group.objects.filter(name="Usuario").values_list("id", flat=True).first()
+        self.timbrado = int(getattr(settings, "TIMBRADO_NUM", 0) or 0)
+
+        # Ids reservados
+        self.u0, self.c0, self.p0, self.m0, self.t0, self.x0, self.d0, self.f0 = (
+            _siguiente_id(m) for m in (User, Cliente, MedioPago, MedioCobro, Tauser, Transaccion, DetalleFactura, Factura)
+        )
+        self.detalle0 = {m: _siguiente_id(m) for m in self.ct_detalle}
+        # Lo que generan clientes/medios para las transacciones
+        self.cliente_categoria = bytearray()
+        self.pagos, self.cobros = [], []          # por cliente: (primer id, cantidad)
+        self.tipos_medio_pago, self.tipos_medio_cobro = bytearray(), bytearray()     # índice en TIPOS_*
+        self.monedas_medio_pago, self.monedas_medio_cobro = bytearray(), bytearray()  # índice en self.monedas
+        self.detalles_pago, self.detalles_cobro = [], []      # por medio: id de su fila de subtipo
+        self.tausers = []
+
+    def rnd(self, tabla):
+        return random.Random(f"{self.seed}:{tabla}")
+
+    def hace(self, rnd, dias):
+        return self.cero - timedelta(seconds=rnd.uniform(0, dias * 86400))
+
+
+def _usuarios(ctx):
+    rnd = ctx.rnd("usuarios")
+    for k in range(math.ceil(ctx.n_clientes / CLIENTES_POR_USUARIO)):
+        uid = ctx.u0 + k
+        yield {
+            "id": uid, "password": "!", "username": f"dataset_{uid}", "email": f"u{uid}@{DOMINIO}",
+            "first_name": rnd.choice(NOMBRES), "last_name": rnd.choice(APELLIDOS), "is_active": True,
+            "date_joined": ctx.hace(rnd, ctx.dias * 3), "receive_exchange_emails": False,
+        }
+
+
+def _usuarios_grupos(ctx):
+    through = User.groups.through
+    col_usuario, col_grupo = (
+        next(f.attname for f in through._meta.concrete_fields if f.related_model is m) for m in (User, Group)
+    )
+    for k in range(math.ceil(ctx.n_clientes / CLIENTES_POR_USUARIO)):
+        yield {col_usuario: ctx.u0 + k, col_grupo: ctx.grupo_usuario}
+
+
+def _clientes(ctx):
+    rnd = ctx.rnd("clientes")
+    # Minorista la mayoría; las categorías con más descuento, cada vez menos
+    pesos = list(accumulate(1 / 4 ** i for i in range(len(ctx.categorias))))
+    for i in range(ctx.n_clientes):
+        cid = ctx.c0 + i
+        cat = bisect.bisect(pesos, rnd.random() * pesos[-1])
+        ctx.cliente_categoria.append(min(cat, 255))
+        documento = str(rnd.randint(1_000_000, 7_999_999))
+        apellido = rnd.choice(APELLIDOS)
+        juridica = rnd.random() < 0.2
+        yield {
+            "id": cid,
+            "tipoCliente": "persona_juridica" if juridica else "persona_fisica",
+            "nombre": f"{apellido} {rnd.choice(SOCIEDADES)}" if juridica else f"{rnd.choice(NOMBRES)} {apellido}",
+            "razonSocial": f"{apellido} Hermanos {rnd.choice(SOCIEDADES)}" if juridica else None,
+            "documento": documento,
+            "ruc": f"{documento}-{rnd.randint(0, 9)}" if juridica else None,
+            "correo": f"c{cid}@{DOMINIO}",
+            "telefono": f"09{rnd.randint(71, 99)}{rnd.randint(0, 999_999):06d}",
+            "direccion": f"Calle {rnd.randint(1, 3000)}, {rnd.choice(CIUDADES)}",
+            "categoria_id": ctx.categorias[cat][0],
+            "estado": rnd.random() < 0.97,
+            "fechaRegistro": ctx.hace(rnd, ctx.dias * 2),
+        }
+
+
+def _clientes_usuarios(ctx):
+    for i in range(ctx.n_clientes):
+        yield {"cliente_id": ctx.c0 + i, "usuario_id": ctx.u0 + i // CLIENTES_POR_USUARIO, "fecha_asignacion": ctx.cero}
+
+
+def _medios(ctx, tabla, tipos, pesos, inicio, por_cliente, tipos_medio, monedas_medio, tipo_fk, ids_tipo,
+            modelos, detalles):
+    rnd = ctx.rnd(tabla)
+    siguiente = inicio
+    usados = dict.fromkeys(modelos.values(), 0)
+    for i in range(ctx.n_clientes):
+        elegidos = rnd.sample(range(len(tipos)), rnd.choices(range(1, len(pesos) + 1), weights=pesos)[0])
+        por_cliente.append((siguiente, len(elegidos)))
+        for j in sorted(elegidos):
+            tipos_medio.append(j)
+            modelo = modelos[tipos[j]]
+            detalles.append(ctx.detalle0[modelo] + usados[modelo])
+            usados[modelo] += 1
+            monedas_medio.append(0 if rnd.random() < 0.85 else rnd.randrange(1, len(ctx.monedas)))
+            creado = ctx.hace(rnd, ctx.dias)
+            yield {
+                "id": siguiente, "cliente_id": ctx.c0 + i, "tipo": tipos[j], "nombre": f"{tipos[j]}_{siguiente}",
+                "activo": True, "fecha_creacion": creado, "fecha_actualizacion": creado,
+                tipo_fk: ids_tipo[tipos[j]], "moneda_id": ctx.monedas[monedas_medio[-1]].id,
+            }
+            siguiente += 1
+
+
+def _detalle(ctx, rnd, tipo, fk, medio_id, moneda_id):
+    fila = {fk: medio_id}
+    if tipo == "billetera":
+        fila.update(numero_celular=f"09{rnd.randint(71, 99)}{rnd.randint(0, 999_999):06d}",
+                    entidad_id=rnd.choice(ctx.billeteras))
+    elif tipo == "tarjeta_nacional":
+        fila.update(numero_tokenizado=f"tok_{medio_id}", ultimos_digitos=f"{rnd.randint(0, 9999):04d}",
+                    fecha_vencimiento=ctx.fin.replace(year=ctx.fin.year + rnd.randint(1, 5), day=1),
+                    entidad_id=rnd.choice(ctx.bancos))
+    elif tipo == "tarjeta_internacional":
+        return {fk: medio_id, "stripe_payment_method_id": "pm_card_visa", "ultimos_digitos": "4242",
+                "exp_month": rnd.randint(1, 12), "exp_year": ctx.fin.year + rnd.randint(1, 5)}
+    else:
+        fila.update(numero_cuenta=str(rnd.randint(10**8, 10**10)), alias_cbu=str(rnd.randint(10**9, 10**10)),
+                    entidad_id=rnd.choice(ctx.bancos))
+    fila["moneda_id"] = moneda_id
+    return fila
+
+
+def _detalles(ctx, tabla, tipos, tipos_medio, monedas_medio, detalles, inicio, fk, tipo):
+    """Subtipo de cada medio de `tipo` (un COPY por tabla de detalle), en la moneda del medio y con su id reservado."""
+    rnd = ctx.rnd(f"{tabla}:{tipo}")
+    for k, j in enumerate(tipos_medio):
+        if tipos[j] == tipo:
+            yield {"id": detalles[k], **_detalle(ctx, rnd, tipo, fk, inicio + k, ctx.monedas[monedas_medio[k]].id)}
+
+
+def _tausers(ctx):
+    rnd = ctx.rnd("tausers")
+    for k in range(ctx.n_tausers):
+        tid = ctx.t0 + k
+        creado = ctx.cero - timedelta(days=ctx.dias)
+        yield {
+            "id": tid, "tipo_pago_id": ctx.tauser_pago, "tipo_cobro_id": ctx.tauser_cobro,
+            "nombre": f"{PREFIJO_TAUSER} {tid}", "activo": True, "ubicacion": f"Sucursal {rnd.choice(CIUDADES)}",
+            "fecha_creacion": creado, "fecha_actualizacion": creado,
+        }
+
+
+def _stock(ctx):
+    rnd = ctx.rnd("stock")
+    billetes = list(
+        CurrencyDenomination.objects.filter(is_active=True, type="bill").order_by("id").values_list("id", "currency_id")
+    )
+    for k in range(ctx.n_tausers):
+        for denominacion, moneda in billetes:
+            yield {
+                "tauser_id": ctx.t0 + k, "currency_id": moneda, "denomination_id": denominacion,
+                "quantity": rnd.randint(0, 2000), "reservado": 0, "updated_at": ctx.cero,
+            }
+
+
+def _transacciones(ctx):
+    """
+    Transacciones con factura_asociada_id ya reservado (los detalles y las
+    facturas se derivan después en la base, ver _FACTURAS). Montos y tasas en
+    float redondeado: la columna numeric los toma tal cual y es varias veces
+    más rápido que Decimal por fila.
+    """
+    rnd = ctx.rnd("transacciones")
+    # Pocos clientes concentran la mayoría de las operaciones (Zipf ~0.8)
+    acumulado = list(accumulate(1 / (i + 1) ** 0.8 for i in range(ctx.n_clientes)))
+    estados, pesos_estado = list(ESTADOS), list(accumulate(ESTADOS.values()))
+    pesos_moneda = list(accumulate(PESO_USD if m.code == "USD" else 1 for m in ctx.extranjeras))
+    monedas = [
+        (m.id, float(m.base_price), m.comision_venta, m.comision_compra, float(m.comision_venta),
+         float(m.comision_compra), m.decimales_monto, m.decimales_cotizacion, m.base_price)
+        for m in ctx.extranjeras
+    ]
+    decimales_pyg, pyg = ctx.pyg.decimales_monto, ctx.pyg.id
+    tipo_venta, tipo_compra = Transaccion.Tipo.VENTA, Transaccion.Tipo.COMPRA
+    recientes = (Transaccion.Estado.PENDIENTE, Transaccion.Estado.PAGADA)
+    media = math.log(300)
+    factura = ctx.f0
+
+    for k in range(ctx.n_transacciones):
+        i = bisect.bisect(acumulado, rnd.random() * acumulado[-1])
+        estado = estados[bisect.bisect(pesos_estado, rnd.random() * pesos_estado[-1])]
+        moneda, precio, com_v, com_c, f_com_v, f_com_c, dec_monto, dec_tasa, base_price = (
+            monedas[bisect.bisect(pesos_moneda, rnd.random() * pesos_moneda[-1])]
+        )
+        venta = rnd.random() < 0.5
+
+        monto = round(max(rnd.lognormvariate(media, 1.0), 1.0), dec_monto)
+        base = precio * (1 + rnd.uniform(-0.03, 0.03))
+        tasa = round(base + f_com_v if venta else base - f_com_c, dec_tasa)
+        monto_pyg = round(monto * tasa, decimales_pyg)
+
+        # Pendientes y pagadas sin terminar: del último día
+        creado = ctx.hace(rnd, 1 if estado in recientes else ctx.dias)
+        pagado = creado + timedelta(minutes=rnd.uniform(1, 30)) if estado in CON_PAGO else None
+        actualizado = (pagado or creado) + timedelta(minutes=rnd.uniform(0, 60)) if estado != Transaccion.Estado.PENDIENTE else creado
+
+        primero, cantidad = ctx.pagos[i]
+        if ctx.tausers and rnd.random() < PROPORCION_TAUSER:
+            medio_pago = (ctx.ct_tauser, rnd.choice(ctx.tausers), 0)
+        else:
+            m = primero - ctx.p0 + rnd.randrange(cantidad)
+            tipo = TIPOS_PAGO[ctx.tipos_medio_pago[m]]
+            medio_pago = (ctx.ct_detalle[_DETALLE_PAGO[tipo]], ctx.detalles_pago[m], ctx.porc_pago[tipo])
+        primero, cantidad = ctx.cobros[i]
+        if ctx.tausers and rnd.random() < PROPORCION_TAUSER:
+            medio_cobro = (ctx.ct_tauser, rnd.choice(ctx.tausers), 0)
+        else:
+            m = primero - ctx.m0 + rnd.randrange(cantidad)
+            tipo = TIPOS_COBRO[ctx.tipos_medio_cobro[m]]
+            medio_cobro = (ctx.ct_detalle[_DETALLE_COBRO[tipo]], ctx.detalles_cobro[m], ctx.porc_cobro[tipo])
+
+        con_factura = estado in CON_FACTURA
+        yield {
+            "id": ctx.x0 + k,
+            "cliente_id": ctx.c0 + i, "usuario_id": ctx.u0 + i // CLIENTES_POR_USUARIO,
+            "tipo": tipo_venta if venta else tipo_compra, "estado": estado,
+            "fecha_creacion": creado, "fecha_pago": pagado, "fecha_actualizacion": actualizado,
+            "moneda_origen_id": pyg if venta else moneda,
+            "moneda_destino_id": moneda if venta else pyg,
+            "tasa_cambio": tasa,
+            "monto_origen": monto_pyg if venta else monto,
+            "monto_destino": monto if venta else monto_pyg,
+            "medio_pago_porc": medio_pago[2], "medio_cobro_porc": medio_cobro[2],
+            "desc_cliente": ctx.categorias[ctx.cliente_categoria[i]][1],
+            "monto_base_moneda": base_price, "comision_vta_com": com_v if venta else com_c,
+            "medio_pago_type_id": medio_pago[0], "medio_pago_id": medio_pago[1],
+            "medio_cobro_type_id": medio_cobro[0], "medio_cobro_id": medio_cobro[1],
+            "factura_asociada_id": factura if con_factura else None,
+            "cambio_pendiente": False,
+        }
+        factura += con_factura
+
+
+# Detalle y factura de cada transacción facturada, derivados en la base (sin
+# volver a generar en Python). El ~3 % de rechazadas sale de un hash del id.
+_DETALLES_FACTURA = f"""
+    INSERT INTO {DetalleFactura._meta.db_table} (id, transaccion_id, content_type_id, object_id, descripcion)
+    SELECT %(d0)s + (t.factura_asociada_id - %(f0)s), t.id, t.medio_pago_type_id, t.medio_pago_id,
+           'Servicio de cambio de divisas (' || t.tipo || ')'
+      FROM {Transaccion._meta.db_table} t
+     WHERE t.id >= %(x0)s AND t.factura_asociada_id IS NOT NULL
+"""
+_FACTURAS = f"""
+    INSERT INTO {Factura._meta.db_table}
+           (id, timbrado, usuario_id, cliente_id, "fechaEmision", "detalleFactura_id", estado, est, pun, d_num_doc)
+    SELECT t.factura_asociada_id, %(timbrado)s, t.usuario_id, t.cliente_id,
+           (COALESCE(t.fecha_pago, t.fecha_creacion) AT TIME ZONE %(zona)s)::date,
+           %(d0)s + (t.factura_asociada_id - %(f0)s),
+           CASE WHEN mod(t.id * 7919, 100) < 3 THEN 'rechazada' ELSE 'aprobada' END,
+           '001', '003', lpad((mod(t.factura_asociada_id, 9999999) + 1)::text, 7, '0')
+      FROM {Transaccion._meta.db_table} t
+     WHERE t.id >= %(x0)s AND t.factura_asociada_id IS NOT NULL
+"""
+
+
+def _historico(ctx):
+    rnd = ctx.rnd("historico")
+    desde = ctx.fin - timedelta(days=ctx.dias)
+    existentes = set(CurrencyHistory.objects.filter(date__gte=desde, date__lte=ctx.fin).values_list("currency_id", "date"))
+    for moneda in [ctx.pyg] + ctx.extranjeras:
+        precio = moneda.base_price
+        for d in range(ctx.dias + 1):
+            dia = ctx.fin - timedelta(days=d)
+            if moneda.id != ctx.pyg.id and d:
+                precio = max(precio * Decimal(1 + rnd.gauss(0, 0.004)), Decimal("0.01"))
+            if (moneda.id, dia) in existentes:
+                continue
+            yield {
+                "currency_id": moneda.id, "date": dia, "created_at": ctx.cero,
+                "compra": max(precio - moneda.comision_compra, Decimal("0.01")).quantize(Decimal("0.00000001")),
+                "venta": (precio + moneda.comision_venta).quantize(Decimal("0.00000001")),
+            }
+
+
+def generar(clientes: int, transacciones: int, tausers: int, dias: int, seed: int = 1, fin=None,
+            lote: int = 10_000, log=lambda mensaje: None) -> dict:
+    """
+    Genera y carga el dataset en una sola transacción.
+    Devuelve {tabla: (filas, segundos)}.
+    """
+    if transacciones and not clientes:
+        raise ValueError("Para generar transacciones hace falta al menos un cliente.")
+    ctx = _Contexto(clientes, transacciones, tausers, dias, seed, fin or timezone.localdate())
+    resumen = {}
+
+    def registrar(tabla, n, inicio):
+        resumen[tabla] = (n, reloj.perf_counter() - inicio)
+        log(f"{tabla:<28} {n:>12,} filas  {resumen[tabla][1]:7.1f}s")
+
+    def paso(modelo, filas):
+        inicio = reloj.perf_counter()
+        registrar(modelo._meta.db_table, cargar(modelo, filas, lote), inicio)
+
+    with transaction.atomic():
+        paso(User, _usuarios(ctx))
+        if ctx.grupo_usuario:
+            paso(User.groups.through, _usuarios_grupos(ctx))
+        paso(Cliente, _clientes(ctx))
+        paso(ClienteUsuario, _clientes_usuarios(ctx))
+        inicio = reloj.perf_counter()
+        with connection.cursor() as cur:
+            cur.execute(_SALDOS_NUEVOS, [ctx.c0])
+            registrar(LimiteIntercambioCliente._meta.db_table, cur.rowcount, inicio)
+
+        paso(MedioPago, _medios(ctx, "medios_pago", TIPOS_PAGO, [50, 35, 15], ctx.p0, ctx.pagos,
+                                ctx.tipos_medio_pago, ctx.monedas_medio_pago, "tipo_pago_id", ctx.tipo_pago,
+                                _DETALLE_PAGO, ctx.detalles_pago))
+        for tipo, modelo in _DETALLE_PAGO.items():
+            paso(modelo, _detalles(ctx, "detalle_pago", TIPOS_PAGO, ctx.tipos_medio_pago, ctx.monedas_medio_pago,
+                                   ctx.detalles_pago, ctx.p0, "medio_pago_id", tipo))
+        paso(MedioCobro, _medios(ctx, "medios_cobro", TIPOS_COBRO, [70, 30], ctx.m0, ctx.cobros,
+                                 ctx.tipos_medio_cobro, ctx.monedas_medio_cobro, "tipo_cobro_id", ctx.tipo_cobro,
+                                 _DETALLE_COBRO, ctx.detalles_cobro))
+        for tipo, modelo in _DETALLE_COBRO.items():
+            paso(modelo, _detalles(ctx, "detalle_cobro", TIPOS_COBRO, ctx.tipos_medio_cobro, ctx.monedas_medio_cobro,
+                                   ctx.detalles_cobro, ctx.m0, "medio_cobro_id", tipo))
+
+        paso(Tauser, _tausers(ctx))
+        paso(TauserCurrencyStock, _stock(ctx))
+        ctx.tausers = list(Tauser.objects.filter(activo=True).order_by("id").values_list("id", flat=True))
+
+        if clientes:
+            paso(Transaccion, _transacciones(ctx))
+            params = {"x0": ctx.x0, "d0": ctx.d0, "f0": ctx.f0, "timbrado": ctx.timbrado, "zona": settings.TIME_ZONE}
+            for modelo, sql in ((DetalleFactura, _DETALLES_FACTURA), (Factura, _FACTURAS)):
+                inicio = reloj.perf_counter()
+                with connection.cursor() as cur:
+                    cur.execute(sql, params)
+                    registrar(modelo._meta.db_table, cur.rowcount, inicio)
+        paso(CurrencyHistory, _historico(ctx))
+
+        with connection.cursor() as cur:
+            modelos = [User, User.groups.through, Cliente, ClienteUsuario, MedioPago, MedioCobro, Tauser,
+                       TauserCurrencyStock, Transaccion, DetalleFactura, Factura, CurrencyHistory,
+                       *_DETALLE_PAGO.values(), *_DETALLE_COBRO.values()]
+            for sql in connection.ops.sequence_reset_sql(no_style(), modelos):
+                cur.execute(sql)
+            for modelo in modelos if connection.vendor == "postgresql" else ():
+                cur.execute(f"ANALYZE {connection.ops.quote_name(modelo._meta.db_table)}")
+
+    _invalidar_caches()
+    return resumen
+
+
+def _invalidar_caches():
+    # Sin save()/delete() no corren las señales que mantienen estas caches
+    catalog_registry.invalidar()
+    tauser_stock.invalidar()
+    metodos_cliente.invalidar()
+    quote_matrix.invalidar_descuentos_clientes()
+
+
+def _borrar(qs, borrados: dict, anular: set) -> None:
+    """
+    DELETE de `qs` en SQL, borrando antes lo que lo referencia con CASCADE
+    (subconsultas, sin cargar filas: el Collector del ORM tarda minutos con
+    millones). Los SET_NULL se juntan en `anular` y se resuelven al final.
+    """
+    modelo = qs.model
+    for rel in modelo._meta.get_fields(include_hidden=True):
+        if not (rel.auto_created and not rel.concrete and (rel.one_to_many or rel.one_to_one)):
+            continue
+        if rel.on_delete is models.CASCADE:
+            _borrar(rel.related_model._base_manager.filter(**{f"{rel.field.name}__in": qs}), borrados, anular)
+        elif rel.on_delete is models.SET_NULL:
+            anular.add((rel.related_model, rel.field.name))
+    sql, params = qs.values("pk").query.sql_with_params()
+    q = connection.ops.quote_name
+    with connection.cursor() as cur:
+        cur.execute(f"DELETE FROM {q(modelo._meta.db_table)} WHERE {q(modelo._meta.pk.column)} IN ({sql})", params)
+        if cur.rowcount:
+            borrados[modelo._meta.db_table] = borrados.get(modelo._meta.db_table, 0) + cur.rowcount
+
+
+def limpiar() -> dict:
+    """Borra lo generado por corridas anteriores (y lo que se haya creado colgando de eso). Devuelve {tabla: filas}."""
+    borrados, anular = {}, set()
+    with transaction.atomic():
+        _borrar(Cliente.objects.filter(correo__endswith=f"@{DOMINIO}"), borrados, anular)
+        _borrar(User.objects.filter(email__endswith=f"@{DOMINIO}"), borrados, anular)
+        _borrar(Tauser.objects.filter(nombre__startswith=PREFIJO_TAUSER), borrados, anular)
+        # SET_NULL: solo las referencias que quedaron colgando (las filas que también se borraron ya no están)
+        for modelo, campo in anular:
+            padre = modelo._meta.get_field(campo).related_model
+            modelo._base_manager.filter(**{f"{campo}__isnull": False}).exclude(
+                Exists(padre._base_manager.filter(pk=OuterRef(campo)))
+            ).update(**{campo: None})
+    _invalidar_caches()
+    return borrados
+
+
@@ -0,0 +1,88 @@
+# webapp/services/keyset.py
+"""
+Paginación por cursor (keyset) sobre (campo de fecha, id), en orden descendente.
+
+A diferencia de OFFSET, cada página es un rango del índice: el costo no crece
+con la profundidad y las filas nuevas no corren a las demás de página.
+Los cursores son opacos (base64 de "fecha|id") y se pasan por querystring:
+?despues=<cursor> para la página siguiente, ?antes=<cursor> para la anterior.
+"""
+import base64
+import binascii
+from dataclasses import dataclass, field
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no se puede decodificar."""
+
+
+def codificar(valor, pk) -> str:
+    crudo = f"{valor.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def decodificar(cursor: str):
+    try:
+        crudo = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        valor, pk = crudo.rsplit("|", 1)
+        fecha = parse_datetime(valor)
+        if fecha is None:
+            raise ValueError(valor)
+        return fecha, int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise CursorInvalido(str(e))
+
+
+@dataclass
+class Pagina:
+    filas: list = field(default_factory=list)
+    siguiente: str | None = None   # cursor para ?despues=
+    anterior: str | None = None    # cursor para ?antes=
+
+    def __iter__(self):
+        return iter(self.filas)
+
+    def __len__(self):
+        return len(self.filas)
+
+
+def paginar(queryset, campo: str, tamano: int, despues: str | None = None, antes: str | None = None) -> Pagina:
+    """
+    Devuelve una Pagina de `queryset` ordenado por (-campo, -id).
+    Cursores inválidos se tratan como "primera página".
+    """
+    try:
+        cursor_despues = decodificar(despues) if despues else None
+        cursor_antes = decodificar(antes) if antes else None
+    except CursorInvalido:
+        cursor_despues = cursor_antes = None
+
+    if cursor_antes:
+        valor, pk = cursor_antes
+        qs = (queryset
+              .filter(Q(**{f"{campo}__gt": valor}) | Q(**{campo: valor, "id__gt": pk}))
+              .order_by(campo, "id"))
+        filas = list(qs[:tamano + 1])
+        hay_mas_nuevas = len(filas) > tamano
+        filas = filas[:tamano][::-1]
+        hay_mas_viejas = True
+    else:
+        qs = queryset.order_by(f"-{campo}", "-id")
+        if cursor_despues:
+            valor, pk = cursor_despues
+            qs = qs.filter(Q(**{f"{campo}__lt": valor}) | Q(**{campo: valor, "id__lt": pk}))
+        filas = list(qs[:tamano + 1])
+        hay_mas_viejas = len(filas) > tamano
+        filas = filas[:tamano]
+        hay_mas_nuevas = cursor_despues is not None
+
+    pagina = Pagina(filas=filas)
+    if filas:
+        if hay_mas_viejas:
+            pagina.siguiente = codificar(getattr(filas[-1], campo), filas[-1].pk)
+        if hay_mas_nuevas:
+            pagina.anterior = codificar(getattr(filas[0], campo), filas[0].pk)
+    return pagina
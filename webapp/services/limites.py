@@ -0,0 +1,393 @@
+# webapp/services/limites.py
+"""
+Consumo y devolución del cupo de intercambio (LimiteIntercambioCliente).
+
+- consumir() descuenta con UN UPDATE condicional (solo pasa si el saldo
+  diario y el mensual alcanzan) y devuelve el Consumo; si no alcanza levanta
+  LimiteExcedido sin haber tocado nada.
+- registrar() lo ata a la transacción recién creada (LimiteIntercambioLog,
+  con el saldo del que salió); devolver() lo revierte si la operación no
+  llegó a crearse.
+- restaurar() devuelve en una sola sentencia el cupo de muchas transacciones
+  canceladas/anuladas; el log queda en cero, así que no se devuelve dos veces.
+  El log guarda los períodos del saldo al descontar y cada contador solo
+  recibe lo que se consumió en su período actual.
+
+Períodos (reseteo perezoso):
+
+- Cada saldo guarda el período (periodo_dia / periodo_mes: fecha del último
+  corte según LimiteIntercambioScheduleConfig) al que pertenecen sus
+  contadores. Si no es el vigente, el saldo real es el máximo de la config.
+- El primer consumo del período nuevo renueva los contadores dentro del mismo
+  UPDATE condicional.
+- compactar() normaliza en lotes los saldos viejos de clientes inactivos
+  (opcional: la lectura ya los trata como renovados).
+
+Con LIMITES_MODO="ventana" el consumo y los saldos se delegan en
+services/limites_ventana.py (ventanas móviles sobre un libro de uso).
+"""
+import calendar
+from dataclasses import dataclass
+from datetime import date, timedelta
+from decimal import ROUND_DOWN, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from webapp.models import (
+    LimiteIntercambioCliente,
+    LimiteIntercambioConfig,
+    LimiteIntercambioLog,
+    LimiteIntercambioScheduleConfig,
+)
+from webapp.services import catalog_registry, limites_ventana
+
+_T_LIMITE = LimiteIntercambioCliente._meta.db_table
+_T_CONFIG = LimiteIntercambioConfig._meta.db_table
+_T_LOG = LimiteIntercambioLog._meta.db_table
+
+KEY_CRONOGRAMA = "limites:cronograma"
+
+
+class LimiteExcedido(ValueError):
+    """El monto supera el cupo disponible (o el cliente no tiene límite en esa moneda)."""
+
+
+@dataclass(frozen=True)
+class Consumo:
+    limite_id: int
+    monto: Decimal
+    uso_id: int | None = None  # fila del libro de uso (modo ventana)
+    periodo_dia: date | None = None  # períodos del saldo al descontar
+    periodo_mes: date | None = None
+
+
+@dataclass(frozen=True)
+class Periodos:
+    """Fecha del corte vigente; None si ese reseteo está desactivado."""
+    dia: date | None
+    mes: date | None
+
+
+# ----------------------------
+# Períodos
+# ----------------------------
+def periodo_dia(ahora, hour: int, minute: int) -> date:
+    corte = ahora.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    return ahora.date() if ahora >= corte else ahora.date() - timedelta(days=1)
+
+
+def periodo_mes(ahora, month_day: int, hour: int, minute: int) -> date:
+    # Meses más cortos que month_day cortan el último día (igual que el reset anterior)
+    dia = min(month_day, calendar.monthrange(ahora.year, ahora.month)[1])
+    corte = ahora.replace(day=dia, hour=hour, minute=minute, second=0, microsecond=0)
+    if ahora >= corte:
+        return corte.date()
+    anio, mes = (ahora.year, ahora.month - 1) if ahora.month > 1 else (ahora.year - 1, 12)
+    return date(anio, mes, min(month_day, calendar.monthrange(anio, mes)[1]))
+
+
+def periodos_desde(ahora, diario, mensual) -> Periodos:
+    """`diario`/`mensual`: (is_active, hour, minute, month_day) o None si no hay config."""
+    # Sin config diaria se usa la que crearía get_by_frequency (00:00, activa)
+    activo, hour, minute, _ = diario or (True, 0, 0, None)
+    dia = periodo_dia(ahora, hour, minute) if activo else None
+
+    mes = None
+    if mensual:
+        activo, hour, minute, month_day = mensual
+        if activo and month_day:
+            mes = periodo_mes(ahora, month_day, hour, minute)
+    return Periodos(dia=dia, mes=mes)
+
+
+def _cronograma():
+    datos = cache.get(KEY_CRONOGRAMA)
+    if datos is None:
+        datos = {
+            c.frequency: (c.is_active, c.hour, c.minute, c.month_day)
+            for c in LimiteIntercambioScheduleConfig.objects.all()
+        }
+        cache.set(KEY_CRONOGRAMA, datos, getattr(settings, "LIMITES_CRONOGRAMA_TTL", 300))
+    return datos
+
+
+def invalidar_cronograma():
+    cache.delete(KEY_CRONOGRAMA)
+
+
+def periodos_vigentes(ahora=None) -> Periodos:
+    datos = _cronograma()
+    return periodos_desde(timezone.localtime(ahora), datos.get("daily"), datos.get("monthly"))
+
+
+def _vigente_sql(campo: str, maximo: str, campo_periodo: str, periodo) -> tuple[str, list]:
+    """Expresión SQL del saldo vigente (el máximo si el período guardado quedó viejo)."""
+    if periodo is None:
+        return f"l.{campo}", []
+    return (
+        f"(CASE WHEN l.{campo_periodo} IS NOT DISTINCT FROM %s THEN l.{campo} ELSE c.{maximo} END)",
+        [periodo],
+    )
+
+
+def _vigente_orm(campo: str, maximo: str, campo_periodo: str, periodo):
+    if periodo is None:
+        return F(campo)
+    return Case(When(**{campo_periodo: periodo}, then=F(campo)), default=F(maximo))
+
+
+def saldos(cliente, ahora=None):
+    """
+    Saldos vigentes del cliente en su categoría (con el reseteo de período ya
+    aplicado, o las ventanas móviles en modo ventana): dicts con
+    config__moneda__code, config__moneda_id, dia y mes. Queryset de values()
+    en modo calendario, lista en modo ventana.
+    """
+    if limites_ventana.activo():
+        return limites_ventana.saldos(cliente)
+
+    p = periodos_vigentes(ahora)
+    return (
+        LimiteIntercambioCliente.objects
+        .filter(cliente=cliente, config__categoria_id=cliente.categoria_id)
+        .annotate(
+            dia=_vigente_orm("limite_dia_actual", "config__limite_dia_max", "periodo_dia", p.dia),
+            mes=_vigente_orm("limite_mes_actual", "config__limite_mes_max", "periodo_mes", p.mes),
+        )
+        .values("config__moneda__code", "config__moneda_id", "dia", "mes")
+    )
+
+
+def saldo(cliente, moneda_id, ahora=None) -> dict | None:
+    """Saldo vigente del cliente en esa moneda; None si no tiene límite configurado."""
+    return next((s for s in saldos(cliente, ahora) if s["config__moneda_id"] == moneda_id), None)
+
+
+def saldos_por_cliente(clientes_ids, ahora=None) -> dict:
+    """
+    {(cliente_id, moneda_id): {"dia", "mes"}} de muchos clientes en una
+    consulta, con el mismo cálculo que saldos() (para recorridos por lote).
+    """
+    ids = set(clientes_ids)
+    if not ids:
+        return {}
+    if limites_ventana.activo():
+        return limites_ventana.saldos_por_cliente(ids)
+
+    p = periodos_vigentes(ahora)
+    filas = (
+        LimiteIntercambioCliente.objects
+        .filter(cliente_id__in=ids, config__categoria_id=F("cliente__categoria_id"))
+        .annotate(
+            dia=_vigente_orm("limite_dia_actual", "config__limite_dia_max", "periodo_dia", p.dia),
+            mes=_vigente_orm("limite_mes_actual", "config__limite_mes_max", "periodo_mes", p.mes),
+        )
+        .values_list("cliente_id", "config__moneda_id", "dia", "mes")
+    )
+    return {(cliente_id, moneda_id): {"dia": dia, "mes": mes} for cliente_id, moneda_id, dia, mes in filas}
+
+
+# ----------------------------
+# Consumo
+# ----------------------------
+def aplica(moneda_origen_code: str) -> bool:
+    """Solo las ventas (origen PYG) consumen cupo."""
+    return moneda_origen_code == "PYG"
+
+
+def _normalizar(monto, moneda_id) -> Decimal:
+    # Mismo criterio que LimiteIntercambioCliente._quant
+    decimales = int(catalog_registry.moneda_por_id(moneda_id).decimales_cotizacion or 0)
+    return Decimal(monto).quantize(Decimal("1").scaleb(-decimales), rounding=ROUND_DOWN)
+
+
+def _motivo(cliente, moneda_id, monto, ahora) -> str:
+    saldo_actual = saldo(cliente, moneda_id, ahora)
+    code = catalog_registry.moneda_por_id(moneda_id).code
+    if saldo_actual is None:
+        return "No hay límites configurados para tu cuenta en esa moneda. Contactá soporte."
+    if monto > saldo_actual["dia"]:
+        return f"El monto {monto} supera el límite DIARIO disponible ({saldo_actual['dia']} {code})."
+    return f"El monto {monto} supera el límite MENSUAL disponible ({saldo_actual['mes']} {code})."
+
+
+def consumir(cliente, moneda_id, monto, ahora=None) -> Consumo:
+    """Descuenta `monto` del saldo diario y mensual del cliente en esa moneda, o levanta LimiteExcedido."""
+    monto = _normalizar(monto, moneda_id)
+    if monto <= 0:
+        raise LimiteExcedido("El monto debe ser positivo.")
+    if limites_ventana.activo():
+        return limites_ventana.consumir(cliente, moneda_id, monto)
+
+    p = periodos_vigentes(ahora)
+    dia, p_dia = _vigente_sql("limite_dia_actual", "limite_dia_max", "periodo_dia", p.dia)
+    mes, p_mes = _vigente_sql("limite_mes_actual", "limite_mes_max", "periodo_mes", p.mes)
+    # El primer consumo del período renueva los contadores en el mismo UPDATE
+    sello_dia = "%s" if p.dia else "l.periodo_dia"
+    sello_mes = "%s" if p.mes else "l.periodo_mes"
+
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            UPDATE {_T_LIMITE} AS l
+               SET limite_dia_actual = {dia} - %s,
+                   limite_mes_actual = {mes} - %s,
+                   periodo_dia = {sello_dia},
+                   periodo_mes = {sello_mes}
+              FROM {_T_CONFIG} AS c
+             WHERE l.config_id = c.id
+               AND l.cliente_id = %s
+               AND c.categoria_id = %s
+               AND c.moneda_id = %s
+               AND {dia} >= %s
+               AND {mes} >= %s
+         RETURNING l.id, l.periodo_dia, l.periodo_mes
+            """,
+            [
+                *p_dia, monto, *p_mes, monto,
+                *([p.dia] if p.dia else []), *([p.mes] if p.mes else []),
+                cliente.id, cliente.categoria_id, moneda_id,
+                *p_dia, monto, *p_mes, monto,
+            ],
+        )
+        fila = cur.fetchone()
+
+    if fila is None:
+        raise LimiteExcedido(_motivo(cliente, moneda_id, monto, ahora))
+    return Consumo(limite_id=fila[0], monto=monto, periodo_dia=fila[1], periodo_mes=fila[2])
+
+
+def registrar(transaccion, consumo: Consumo):
+    """Ata el consumo a la transacción creada (para poder devolverlo al cancelarla)."""
+    if consumo.uso_id:
+        return limites_ventana.registrar(transaccion, consumo)
+    return LimiteIntercambioLog.objects.create(
+        transaccion=transaccion, limite_id=consumo.limite_id, monto_descontado=consumo.monto,
+        periodo_dia=consumo.periodo_dia, periodo_mes=consumo.periodo_mes,
+    )
+
+
+# Cada contador recibe solo lo consumido en su período actual: lo de un período
+# ya cortado no se devuelve (el saldo se renovó). Nunca se supera el máximo.
+_DEVOLVER = f"""
+    UPDATE {_T_LIMITE} AS l
+       SET limite_dia_actual = LEAST(l.limite_dia_actual + d.dia, c.limite_dia_max),
+           limite_mes_actual = LEAST(l.limite_mes_actual + d.mes, c.limite_mes_max)
+      FROM (
+            SELECT x.limite_id,
+                   COALESCE(SUM(x.monto) FILTER (WHERE x.periodo_dia IS NOT DISTINCT FROM v.periodo_dia), 0) AS dia,
+                   COALESCE(SUM(x.monto) FILTER (WHERE x.periodo_mes IS NOT DISTINCT FROM v.periodo_mes), 0) AS mes
+              FROM {{origen}} AS x
+              JOIN {_T_LIMITE} AS v ON v.id = x.limite_id
+             GROUP BY x.limite_id
+           ) AS d,
+           {_T_CONFIG} AS c
+     WHERE l.id = d.limite_id AND c.id = l.config_id
+"""
+
+
+def devolver(consumo: Consumo) -> None:
+    """Revierte un consumo que no llegó a registrarse (la operación no se creó)."""
+    if consumo.uso_id:
+        return limites_ventana.devolver(consumo)
+    with connection.cursor() as cur:
+        cur.execute(
+            _DEVOLVER.format(
+                origen="(SELECT %s::bigint AS limite_id, %s::numeric AS monto, %s::date AS periodo_dia, %s::date AS periodo_mes)"
+            ),
+            [consumo.limite_id, consumo.monto, consumo.periodo_dia, consumo.periodo_mes],
+        )
+
+
+def restaurar(transacciones_ids) -> int:
+    """
+    Devuelve el cupo consumido por esas transacciones; cada log se devuelve una
+    sola vez. Cubre ambos modos (pudo cambiar con transacciones pendientes).
+    """
+    ids = list(transacciones_ids)
+    if not ids:
+        return 0
+    en_ventana = limites_ventana.restaurar(ids)
+
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            WITH devueltos AS (
+                UPDATE {_T_LOG} AS g
+                   SET monto_descontado = 0
+                  FROM (
+                        SELECT id, monto_descontado
+                          FROM {_T_LOG}
+                         WHERE transaccion_id = ANY(%s) AND monto_descontado > 0
+                           FOR UPDATE
+                       ) AS v
+                 WHERE g.id = v.id
+             RETURNING g.limite_id, v.monto_descontado AS monto, g.periodo_dia, g.periodo_mes
+            )
+            """
+            + _DEVOLVER.format(origen="devueltos"),
+            [ids],
+        )
+        return cur.rowcount + en_ventana
+
+
+# ----------------------------
+# Compactación (opcional)
+# ----------------------------
+def compactar(lote: int | None = None, ahora=None) -> int:
+    """
+    Renueva en lotes chicos los saldos cuyo período quedó viejo (clientes que
+    no operaron desde el corte). Cada lote es su propia sentencia: no hay una
+    transacción larga sobre toda la tabla. Devuelve las filas normalizadas.
+    """
+    lote = lote or getattr(settings, "LIMITES_COMPACTAR_LOTE", 1000)
+    p = periodos_vigentes(ahora)
+    if p.dia is None and p.mes is None:
+        return 0
+
+    viejo, params_viejo = [], []
+    if p.dia:
+        viejo.append("periodo_dia IS DISTINCT FROM %s")
+        params_viejo.append(p.dia)
+    if p.mes:
+        viejo.append("periodo_mes IS DISTINCT FROM %s")
+        params_viejo.append(p.mes)
+    dia, p_dia = _vigente_sql("limite_dia_actual", "limite_dia_max", "periodo_dia", p.dia)
+    mes, p_mes = _vigente_sql("limite_mes_actual", "limite_mes_max", "periodo_mes", p.mes)
+    sello_dia = "%s" if p.dia else "l.periodo_dia"
+    sello_mes = "%s" if p.mes else "l.periodo_mes"
+
+    total = 0
+    while True:
+        with connection.cursor() as cur:
+            cur.execute(
+                f"""
+                UPDATE {_T_LIMITE} AS l
+                   SET limite_dia_actual = {dia},
+                       limite_mes_actual = {mes},
+                       periodo_dia = {sello_dia},
+                       periodo_mes = {sello_mes}
+                  FROM {_T_CONFIG} AS c
+                 WHERE c.id = l.config_id
+                   AND l.id IN (
+                        SELECT id FROM {_T_LIMITE}
+                         WHERE {" OR ".join(viejo)}
+                         ORDER BY id
+                         LIMIT %s
+                           FOR UPDATE SKIP LOCKED
+                   )
+                """,
+                [
+                    *p_dia, *p_mes,
+                    *([p.dia] if p.dia else []), *([p.mes] if p.mes else []),
+                    *params_viejo, lote,
+                ],
+            )
+            filas = cur.rowcount
+        total += filas
+        if filas < lote:
+            return total
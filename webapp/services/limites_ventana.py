@@ -0,0 +1,191 @@
+# webapp/services/limites_ventana.py
+"""
+Modo alternativo de límites de intercambio: ventanas móviles de 24 h y 30
+días calculadas sobre un libro de uso (UsoLimiteIntercambio) en lugar de
+contadores por día/mes calendario. Se activa con LIMITES_MODO="ventana";
+services/limites.py delega acá cuando está activo.
+
+- Cada consumo agrega una fila (cliente, moneda, fecha, monto); una devolución
+  agrega otra con el monto negativo y la MISMA fecha, así que sale de las
+  mismas ventanas. No hay contadores que resetear ni que se desincronicen.
+- El uso es una suma por rango sobre el índice (cliente, moneda, fecha)
+  INCLUDE (monto): una sola consulta, sin leer la tabla.
+- Las lecturas para mostrar (saldos) pasan por una cache chica por cliente
+  de LIMITES_VENTANA_CACHE_TTL segundos; se borra con cada consumo o
+  devolución. Con el tiempo la cache solo puede sobreestimar el uso (lo que
+  sale de la ventana no se descuenta hasta recalcular), nunca subestimarlo.
+- El control al consumir no usa la cache: bloquea el saldo del cliente
+  (select_for_update) y suma en fresco, así dos operaciones simultáneas no
+  usan el mismo cupo.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from webapp.models import LimiteIntercambioCliente, UsoLimiteIntercambio
+from webapp.services import catalog_registry, limites
+
+VENTANA_DIA = timedelta(hours=24)
+VENTANA_MES = timedelta(days=30)
+
+_T_USO = UsoLimiteIntercambio._meta.db_table
+
+
+def activo() -> bool:
+    return getattr(settings, "LIMITES_MODO", "calendario") == "ventana"
+
+
+def _clave_uso(cliente_id) -> str:
+    return f"limites:uso:{cliente_id}"
+
+
+def _invalidar(clientes_ids):
+    claves = [_clave_uso(c) for c in set(clientes_ids)]
+    if not claves:
+        return
+    cache.delete_many(claves)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(claves))
+
+
+def _uso_qs(cliente_id, ahora):
+    return UsoLimiteIntercambio.objects.filter(cliente_id=cliente_id, fecha__gt=ahora - VENTANA_MES)
+
+
+def uso(cliente_id, moneda_id, ahora=None) -> tuple[Decimal, Decimal]:
+    """Uso en las últimas 24 h y 30 días, en fresco (sin cache)."""
+    ahora = ahora or timezone.now()
+    r = _uso_qs(cliente_id, ahora).filter(moneda_id=moneda_id).aggregate(
+        dia=Sum("monto", filter=Q(fecha__gt=ahora - VENTANA_DIA)), mes=Sum("monto"),
+    )
+    return r["dia"] or Decimal("0"), r["mes"] or Decimal("0")
+
+
+def uso_por_moneda(cliente_id) -> dict:
+    """{moneda_id: (uso 24 h, uso 30 días)} del cliente, desde la cache chica si está."""
+    clave = _clave_uso(cliente_id)
+    data = cache.get(clave)
+    if data is None:
+        ahora = timezone.now()
+        data = {
+            fila["moneda_id"]: (fila["dia"] or Decimal("0"), fila["mes"] or Decimal("0"))
+            for fila in _uso_qs(cliente_id, ahora)
+            .values("moneda_id")
+            .annotate(dia=Sum("monto", filter=Q(fecha__gt=ahora - VENTANA_DIA)), mes=Sum("monto"))
+        }
+        cache.set(clave, data, getattr(settings, "LIMITES_VENTANA_CACHE_TTL", 15))
+    return data
+
+
+def saldos(cliente) -> list:
+    """Mismo formato que limites.saldos(): máximo de la config menos el uso de cada ventana."""
+    usos = uso_por_moneda(cliente.id)
+    resultado = []
+    for fila in (
+        LimiteIntercambioCliente.objects
+        .filter(cliente=cliente, config__categoria_id=cliente.categoria_id)
+        .values("config__moneda__code", "config__moneda_id", "config__limite_dia_max", "config__limite_mes_max")
+    ):
+        uso_dia, uso_mes = usos.get(fila["config__moneda_id"], (Decimal("0"), Decimal("0")))
+        resultado.append({
+            "config__moneda__code": fila["config__moneda__code"],
+            "config__moneda_id": fila["config__moneda_id"],
+            "dia": max(fila["config__limite_dia_max"] - uso_dia, Decimal("0")),
+            "mes": max(fila["config__limite_mes_max"] - uso_mes, Decimal("0")),
+        })
+    return resultado
+
+
+def saldos_por_cliente(clientes_ids) -> dict:
+    """Mismo formato que limites.saldos_por_cliente(): una consulta de uso para todos los clientes."""
+    ahora = timezone.now()
+    usos = {
+        (fila["cliente_id"], fila["moneda_id"]): (fila["dia"] or Decimal("0"), fila["mes"] or Decimal("0"))
+        for fila in UsoLimiteIntercambio.objects
+        .filter(cliente_id__in=clientes_ids, fecha__gt=ahora - VENTANA_MES)
+        .values("cliente_id", "moneda_id")
+        .annotate(dia=Sum("monto", filter=Q(fecha__gt=ahora - VENTANA_DIA)), mes=Sum("monto"))
+    }
+    resultado = {}
+    for cliente_id, moneda_id, dia_max, mes_max in (
+        LimiteIntercambioCliente.objects
+        .filter(cliente_id__in=clientes_ids, config__categoria_id=F("cliente__categoria_id"))
+        .values_list("cliente_id", "config__moneda_id", "config__limite_dia_max", "config__limite_mes_max")
+    ):
+        uso_dia, uso_mes = usos.get((cliente_id, moneda_id), (Decimal("0"), Decimal("0")))
+        resultado[(cliente_id, moneda_id)] = {
+            "dia": max(dia_max - uso_dia, Decimal("0")),
+            "mes": max(mes_max - uso_mes, Decimal("0")),
+        }
+    return resultado
+
+
+def consumir(cliente, moneda_id, monto: Decimal, ahora=None) -> "limites.Consumo":
+    """`monto` ya normalizado por limites.consumir(). Levanta LimiteExcedido si no alcanza."""
+    ahora = ahora or timezone.now()
+    with transaction.atomic():
+        # El saldo del cliente hace de candado: serializa sus consumos en esa moneda
+        limite = (
+            LimiteIntercambioCliente.objects
+            .select_for_update(of=("self",))
+            .select_related("config")
+            .filter(cliente=cliente, config__categoria_id=cliente.categoria_id, config__moneda_id=moneda_id)
+            .first()
+        )
+        if limite is None:
+            raise limites.LimiteExcedido("No hay límites configurados para tu cuenta en esa moneda. Contactá soporte.")
+
+        uso_dia, uso_mes = uso(cliente.id, moneda_id, ahora)
+        code = catalog_registry.moneda_por_id(moneda_id).code
+        disponible_dia = limite.config.limite_dia_max - uso_dia
+        disponible_mes = limite.config.limite_mes_max - uso_mes
+        if monto > disponible_dia:
+            raise limites.LimiteExcedido(f"El monto {monto} supera el límite DIARIO disponible ({disponible_dia} {code}).")
+        if monto > disponible_mes:
+            raise limites.LimiteExcedido(f"El monto {monto} supera el límite MENSUAL disponible ({disponible_mes} {code}).")
+
+        registro = UsoLimiteIntercambio.objects.create(cliente=cliente, moneda_id=moneda_id, monto=monto, fecha=ahora)
+        _invalidar([cliente.id])
+    return limites.Consumo(limite_id=limite.id, monto=monto, uso_id=registro.id)
+
+
+def registrar(transaccion, consumo) -> None:
+    """Ata la fila del libro a la transacción creada."""
+    UsoLimiteIntercambio.objects.filter(pk=consumo.uso_id).update(transaccion=transaccion)
+
+
+def devolver(consumo) -> None:
+    """Revierte un consumo que no llegó a registrarse: fila negativa con la misma fecha."""
+    original = UsoLimiteIntercambio.objects.get(pk=consumo.uso_id)
+    UsoLimiteIntercambio.objects.create(
+        cliente_id=original.cliente_id, moneda_id=original.moneda_id, monto=-original.monto,
+        fecha=original.fecha, tipo=UsoLimiteIntercambio.Tipo.DEVOLUCION,
+    )
+    _invalidar([original.cliente_id])
+
+
+def restaurar(transacciones_ids) -> int:
+    """Devolución en bloque; la restricción única (transaccion, tipo) evita devolver dos veces."""
+    ids = list(transacciones_ids)
+    if not ids:
+        return 0
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            INSERT INTO {_T_USO} (cliente_id, moneda_id, transaccion_id, tipo, monto, fecha)
+            SELECT cliente_id, moneda_id, transaccion_id, %s, -monto, fecha
+              FROM {_T_USO}
+             WHERE transaccion_id = ANY(%s) AND tipo = %s
+            ON CONFLICT (transaccion_id, tipo) WHERE transaccion_id IS NOT NULL DO NOTHING
+         RETURNING cliente_id
+            """,
+            [UsoLimiteIntercambio.Tipo.DEVOLUCION, ids, UsoLimiteIntercambio.Tipo.CONSUMO],
+        )
+        clientes = [fila[0] for fila in cur.fetchall()]
+    _invalidar(clientes)
+    return len(clientes)
@@ -0,0 +1,177 @@
+# webapp/services/live_quotes.py
+"""
+Publicación de cambios de cotización y de stock de Tausers para el stream
+SSE de la pantalla de compraventa.
+
+Cada cambio se publica UNA vez en un log de eventos en la cache compartida:
+un contador secuencial + una clave por evento con TTL. Las cotizaciones se
+publican desde post_save; el stock además desde tauser_stock.invalidar(),
+que es por donde pasan los UPDATE masivos (holds, F()) que no disparan
+señales. Las conexiones SSE abiertas solo leen el contador y, si avanzó,
+los eventos nuevos.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "live_quotes"
+KEY_SEQ = f"{CACHE_PREFIX}:seq"
+EVENTO_TTL = 60 * 5          # segundos que un evento queda disponible para reconexiones
+MAX_EVENTOS_POR_LECTURA = 200
+# publicar() reserva el id antes de escribir el evento: un hueco se espera
+# este tiempo (más que el retry del navegador) antes de darlo por perdido
+GRACIA_HUECO_SEGUNDOS = 2
+# Cada stream ocupa un worker WSGI mientras está abierto: se corta pronto y el
+# navegador reconecta solo (retry + Last-Event-ID), sin perder eventos. Además
+# solo hay LIVE_QUOTES_MAX_STREAMS abiertos a la vez; el resto consulta la API.
+STREAM_MAX_SEGUNDOS = 30
+
+TIPO_COTIZACION = "quote"
+TIPO_STOCK = "stock"
+TIPO_RESET = "reset"         # el cliente perdió eventos: debe recargar todo
+
+
+def _clave_evento(seq: int) -> str:
+    return f"{CACHE_PREFIX}:evt:{seq}"
+
+
+def _clave_hueco(seq: int) -> str:
+    return f"{CACHE_PREFIX}:hueco:{seq}"
+
+
+def _clave_lugar(i: int) -> str:
+    return f"{CACHE_PREFIX}:stream:{i}"
+
+
+def tomar_lugar_stream():
+    """
+    Reserva uno de los LIVE_QUOTES_MAX_STREAMS lugares para un stream y
+    devuelve su clave, o None si están todos ocupados. El lugar vence solo
+    (por si el worker muere sin soltarlo).
+    """
+    maximo = int(getattr(settings, "LIVE_QUOTES_MAX_STREAMS", 10))
+    for i in range(maximo):
+        clave = _clave_lugar(i)
+        if cache.add(clave, True, STREAM_MAX_SEGUNDOS + 10):
+            return clave
+    return None
+
+
+def soltar_lugar_stream(clave: str):
+    cache.delete(clave)
+
+
+def ultimo_id() -> int:
+    return int(cache.get(KEY_SEQ) or 0)
+
+
+def publicar(tipo: str, data: dict) -> int:
+    """Agrega un evento al log y devuelve su id."""
+    cache.add(KEY_SEQ, 0, None)
+    seq = cache.incr(KEY_SEQ)
+    cache.set(_clave_evento(seq), {"tipo": tipo, "data": data}, EVENTO_TTL)
+    return seq
+
+
+def _publicar_al_confirmar(tipo: str, data: dict):
+    def _publicar():
+        try:
+            publicar(tipo, data)
+        except Exception as e:
+            # El stream es un extra: nunca debe romper el guardado
+            logger.warning("No se pudo publicar evento %s: %s", tipo, e)
+
+    transaction.on_commit(_publicar)
+
+
+def publicar_moneda(moneda):
+    """Delta compacto de una moneda: los datos con los que el cliente recalcula su tasa."""
+    _publicar_al_confirmar(TIPO_COTIZACION, {
+        "code": moneda.code,
+        "name": moneda.name,
+        "decimals": int(moneda.decimales_monto or 2),
+        "activo": bool(moneda.is_active),
+        "base": str(moneda.base_price),
+        "com_venta": str(moneda.comision_venta),
+        "com_compra": str(moneda.comision_compra),
+        "flag_url": moneda.flag_image.url if moneda.flag_image else "",
+    })
+
+
+def publicar_stock(stock_ids):
+    """
+    Deltas de filas TauserCurrencyStock (tauser, moneda, denominación). Se leen
+    al confirmar, así el evento lleva lo que quedó en la base; quantity es lo
+    disponible (en mano menos reservado), igual que en tauser_stock.snapshot().
+    """
+    from webapp.models import TauserCurrencyStock
+
+    ids = list(stock_ids)
+    if not ids:
+        return
+
+    def _publicar():
+        try:
+            filas = (
+                TauserCurrencyStock.objects
+                .filter(id__in=ids)
+                .values_list("tauser_id", "currency__code", "denomination__value", "quantity", "reservado")
+            )
+            for tauser_id, code, valor, quantity, reservado in filas:
+                publicar(TIPO_STOCK, {
+                    "tauser_id": tauser_id,
+                    "code": code,
+                    "value": float(valor),
+                    "quantity": max(quantity - reservado, 0),
+                })
+        except Exception as e:
+            logger.warning("No se pudo publicar evento %s: %s", TIPO_STOCK, e)
+
+    transaction.on_commit(_publicar)
+
+
+def _hueco_vencido(seq: int) -> bool:
+    """
+    True si el evento `seq` falta desde hace más de GRACIA_HUECO_SEGUNDOS. La
+    primera vez que alguien ve el hueco se anota la hora en la cache, así
+    todos los streams (y las reconexiones) cuentan desde el mismo momento.
+    """
+    ahora = time.time()
+    cache.add(_clave_hueco(seq), ahora, EVENTO_TTL)
+    return ahora - cache.get(_clave_hueco(seq), ahora) >= GRACIA_HUECO_SEGUNDOS
+
+
+def eventos_desde(desde_id: int):
+    """
+    Eventos con id > desde_id, como lista de (id, tipo, data), y el id hasta el que se leyó.
+
+    Si falta un evento puede ser uno cuyo id ya se reservó pero que todavía no
+    se escribió: se devuelven los anteriores y el id queda justo antes del
+    hueco, para volver a leer desde ahí. Solo si el hueco pasa la gracia
+    (el evento expiró o nunca se escribió) o si hay demasiados eventos se
+    devuelve un único RESET.
+    """
+    actual = ultimo_id()
+    if actual <= desde_id:
+        return [], actual
+
+    if actual - desde_id > MAX_EVENTOS_POR_LECTURA:
+        return [(actual, TIPO_RESET, {})], actual
+
+    claves = [_clave_evento(i) for i in range(desde_id + 1, actual + 1)]
+    encontrados = cache.get_many(claves)
+
+    eventos = []
+    for i, clave in zip(range(desde_id + 1, actual + 1), claves):
+        evt = encontrados.get(clave)
+        if evt is None:
+            if _hueco_vencido(i):
+                return [(actual, TIPO_RESET, {})], actual
+            return eventos, i - 1
+        eventos.append((i, evt["tipo"], evt["data"]))
+    return eventos, actual
@@ -0,0 +1,228 @@
+# webapp/services/metodos_cliente.py
+"""
+Payload materializado de los medios de pago y cobro de un cliente, cacheado
+por cliente_id: {"metodo_pago": [...], "metodo_cobro": [...]}.
+
+- construir() arma todo con una consulta por tipo de medio (joins incluidos)
+  más una para los Tausers activos, sin importar cuántos medios tenga el
+  cliente.
+- La clave lleva dos versiones: la global (TipoPago, TipoCobro, Tauser,
+  Entidad: afectan a todos los clientes) y la del cliente (sus MedioPago /
+  MedioCobro y los modelos específicos de cada uno). Las señales las
+  incrementan; dentro de un bloque atómico se vuelve a incrementar al
+  confirmar.
+- El filtro por moneda y el stock de los Tausers (services/tauser_stock) se
+  aplican en memoria en cada request.
+"""
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+
+from webapp.services import cache_version
+
+KEY_VERSION = "metodos_cliente:version"
+
+TIPO_TAUSER = "Tauser"  # Tauser.tipo
+
+# Tipos que se filtran por la moneda elegida (el resto se ofrece siempre)
+_FILTRA_POR_MONEDA = {"tarjeta_nacional", "billetera", "transferencia"}
+
+
+def _clave_version_cliente(cliente_id) -> str:
+    return f"{KEY_VERSION}:{cliente_id}"
+
+
+def _clave_payload(cliente_id) -> str:
+    versiones = cache.get_many([KEY_VERSION, _clave_version_cliente(cliente_id)])
+    return "metodos_cliente:payload:{}:{}:{}".format(
+        cliente_id,
+        int(versiones.get(KEY_VERSION) or 0),
+        int(versiones.get(_clave_version_cliente(cliente_id)) or 0),
+    )
+
+
+def _entidad(obj):
+    return {"nombre": obj.entidad.nombre} if obj.entidad else None
+
+
+def construir(cliente_id) -> dict:
+    """Arma el payload desde la base (consultas constantes)."""
+    from webapp.models import (
+        Billetera, BilleteraCobro, CuentaBancariaCobro, TarjetaInternacional, TarjetaNacional, Tauser,
+    )
+
+    cts = ContentType.objects.get_for_models(
+        TarjetaNacional, TarjetaInternacional, Billetera, Tauser, CuentaBancariaCobro, BilleteraCobro,
+    )
+
+    # ---------------- Métodos de Pago ----------------
+    metodo_pago = []
+
+    for t in (
+        TarjetaNacional.objects
+        .filter(medio_pago__cliente_id=cliente_id, medio_pago__activo=True)
+        .select_related("medio_pago__moneda", "entidad")
+    ):
+        metodo_pago.append({
+            "id": t.id,
+            "tipo": "tarjeta_nacional",
+            "nombre": f"{t.medio_pago.nombre} ****{t.ultimos_digitos}",
+            "tipo_general_id": t.medio_pago.tipo_pago_id,
+            "entidad": _entidad(t),
+            "content_type_id": cts[TarjetaNacional].id,
+            "moneda_code": getattr(t.medio_pago.moneda, "code", None),
+        })
+
+    for t in (
+        TarjetaInternacional.objects
+        .filter(medio_pago__cliente_id=cliente_id, medio_pago__activo=True)
+        .select_related("medio_pago__moneda")
+    ):
+        metodo_pago.append({
+            "id": t.id,
+            "tipo": "tarjeta_internacional",
+            "nombre": f"{t.medio_pago.nombre} ****{t.ultimos_digitos}",
+            "tipo_general_id": t.medio_pago.tipo_pago_id,
+            "moneda_code": getattr(t.medio_pago.moneda, "code", None),
+            "content_type_id": cts[TarjetaInternacional].id,
+        })
+
+    for t in (
+        Billetera.objects
+        .filter(medio_pago__cliente_id=cliente_id, medio_pago__activo=True)
+        .select_related("medio_pago__moneda", "entidad")
+    ):
+        metodo_pago.append({
+            "id": t.id,
+            "tipo": "billetera",
+            "nombre": f"{t.medio_pago.nombre} ({t.entidad.nombre}) {t.numero_celular}" if t.entidad else t.medio_pago.nombre,
+            "tipo_general_id": t.medio_pago.tipo_pago_id,
+            "entidad": _entidad(t),
+            "moneda_code": getattr(t.medio_pago.moneda, "code", None),
+            "content_type_id": cts[Billetera].id,
+        })
+
+    # Los Tausers son los mismos para pagar y para cobrar: una sola consulta
+    tausers = list(
+        Tauser.objects.filter(activo=True).values_list("id", "nombre", "ubicacion", "tipo_pago_id", "tipo_cobro_id")
+    )
+    for tauser_id, nombre, ubicacion, tipo_pago_id, _ in tausers:
+        metodo_pago.append({
+            "id": tauser_id,
+            "tipo": TIPO_TAUSER,
+            "nombre": f"{nombre} ({ubicacion})",
+            "ubicacion": ubicacion,
+            "tipo_general_id": tipo_pago_id,
+            "moneda_code": None,
+            "content_type_id": cts[Tauser].id,
+        })
+
+    # ---------------- Métodos de Cobro ----------------
+    metodo_cobro = []
+
+    for t in (
+        CuentaBancariaCobro.objects
+        .filter(medio_cobro__cliente_id=cliente_id, medio_cobro__activo=True)
+        .select_related("medio_cobro__moneda", "entidad")
+    ):
+        metodo_cobro.append({
+            "id": t.id,
+            "tipo": "transferencia",
+            "nombre": f"{t.medio_cobro.nombre} ({t.entidad.nombre}) {t.numero_cuenta}" if t.entidad else "Transferencia",
+            "numero_cuenta": t.numero_cuenta,
+            "tipo_general_id": t.medio_cobro.tipo_cobro_id,
+            "entidad": _entidad(t),
+            "moneda_code": t.medio_cobro.moneda.code,
+            "content_type_id": cts[CuentaBancariaCobro].id,
+        })
+
+    for t in (
+        BilleteraCobro.objects
+        .filter(medio_cobro__cliente_id=cliente_id, medio_cobro__activo=True)
+        .select_related("medio_cobro__moneda", "entidad")
+    ):
+        metodo_cobro.append({
+            "id": t.id,
+            "tipo": "billetera",
+            "nombre": f"{t.medio_cobro.nombre} ({t.entidad.nombre}) {t.numero_celular}" if t.entidad else t.medio_cobro.nombre,
+            "tipo_general_id": t.medio_cobro.tipo_cobro_id,
+            "entidad": _entidad(t),
+            "moneda_code": t.medio_cobro.moneda.code,
+            "content_type_id": cts[BilleteraCobro].id,
+        })
+
+    for tauser_id, nombre, ubicacion, _, tipo_cobro_id in tausers:
+        metodo_cobro.append({
+            "id": tauser_id,
+            "tipo": TIPO_TAUSER,
+            "nombre": f"{nombre} ({ubicacion})",
+            "ubicacion": ubicacion,
+            "tipo_general_id": tipo_cobro_id,
+            "moneda_code": None,
+            "content_type_id": cts[Tauser].id,
+        })
+
+    return {"metodo_pago": metodo_pago, "metodo_cobro": metodo_cobro}
+
+
+def payload(cliente_id) -> dict:
+    """Payload cacheado del cliente (no modificar: es compartido)."""
+    clave = _clave_payload(cliente_id)
+    data = cache.get(clave)
+    if data is None:
+        data = construir(cliente_id)
+        cache.set(clave, data, getattr(settings, "METODOS_CLIENTE_TTL", 600))
+    return data
+
+
+def filtrar(metodos, moneda_code, stock=None, exigir_stock=False) -> list:
+    """
+    Aplica en memoria el filtro por moneda y adjunta el stock a los Tausers.
+    Con exigir_stock solo quedan los Tausers que tienen billetes de esa moneda.
+    """
+    resultado = []
+    for m in metodos:
+        if moneda_code and m["tipo"] in _FILTRA_POR_MONEDA and m["moneda_code"] != moneda_code:
+            continue
+        if m["tipo"] == TIPO_TAUSER:
+            stock_tauser = (stock or {}).get(m["id"], {})
+            if exigir_stock and moneda_code and moneda_code != "PYG" and not stock_tauser.get(moneda_code):
+                continue
+            m = {**m, "stock": stock_tauser}
+        resultado.append(m)
+    return resultado
+
+
+def prefetch_medios() -> tuple:
+    """
+    GenericPrefetch de Transaccion.medio_pago / medio_cobro para listados que
+    muestran el __str__ de los medios: cada tipo trae su medio padre, su
+    entidad y el cliente en la misma consulta, en vez de una por fila.
+    """
+    from django.contrib.contenttypes.prefetch import GenericPrefetch
+
+    from webapp.models import (
+        Billetera, BilleteraCobro, CuentaBancaria, CuentaBancariaCobro, CuentaBancariaNegocio, MedioCobro, MedioPago,
+        TarjetaInternacional, TarjetaNacional,
+    )
+
+    return (
+        GenericPrefetch("medio_pago", [
+            TarjetaNacional.objects.select_related("medio_pago", "entidad"),
+            TarjetaInternacional.objects.select_related("medio_pago"),
+            Billetera.objects.select_related("medio_pago", "entidad"),
+            CuentaBancaria.objects.select_related("medio_pago", "entidad"),
+            CuentaBancariaNegocio.objects.select_related("entidad"),
+            MedioPago.objects.select_related("cliente"),
+        ]),
+        GenericPrefetch("medio_cobro", [
+            BilleteraCobro.objects.select_related("medio_cobro", "entidad"),
+            CuentaBancariaCobro.objects.select_related("medio_cobro", "entidad"),
+            MedioCobro.objects.select_related("cliente"),
+        ]),
+    )
+
+
+def invalidar(cliente_id=None):
+    """Sin cliente_id invalida el payload de todos los clientes."""
+    cache_version.invalidar(_clave_version_cliente(cliente_id) if cliente_id else KEY_VERSION)
@@ -0,0 +1,306 @@
+# webapp/services/metricas.py
+"""
+Métricas por request (latencia, consultas SQL, tiempo en SQL y consultas
+repetidas) en formato de texto de Prometheus.
+
+- El middleware (webapp/middleware.py) mide solo una fracción de los
+  requests (settings.METRICAS_MUESTREO) y pasa la medición a registrar_request.
+- Cada proceso acumula deltas en memoria y cada METRICAS_FLUSH_SEGUNDOS los
+  suma en la cache compartida con cache.incr, así /metrics muestra lo de
+  todos los workers y no solo lo del que atiende el scrape.
+- Los histogramas guardan el conteo de cada bucket por separado; los
+  acumulados que pide Prometheus se arman al renderizar. Las sumas van en
+  millonésimas porque incr solo acepta enteros.
+- Una consulta "repetida" es una misma huella (SQL sin valores, con las
+  listas IN colapsadas) ejecutada METRICAS_REPETIDAS_MIN o más veces en un
+  request: el patrón típico de un N+1.
+- Las tareas de Celery registran sus métricas por el mismo camino
+  (services/telemetria_tareas.py) y salen en el mismo /metrics.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "metricas:v1"
+KEY_SERIES = f"{CACHE_PREFIX}:series"
+ESCALA = 1_000_000
+SQL_MUESTRA_MAX = 300
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BUCKETS_TAREAS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+# nombre: (tipo, ayuda, buckets)
+METRICAS = {
+    "webapp_request_duracion_segundos": (
+        "histogram", "Latencia del request por vista (solo requests muestreados)", BUCKETS_SEGUNDOS),
+    "webapp_request_consultas_sql": (
+        "histogram", "Consultas SQL por request", BUCKETS_CONSULTAS),
+    "webapp_request_sql_segundos": (
+        "histogram", "Tiempo total en SQL por request", BUCKETS_SEGUNDOS),
+    "webapp_sql_repetidas_total": (
+        "counter", "Requests en los que una misma consulta se repitió METRICAS_REPETIDAS_MIN+ veces (posible N+1)", None),
+    "webapp_sql_repetida_info": (
+        "gauge", "Texto (truncado) de cada huella de consulta repetida", None),
+    "webapp_tarea_duracion_segundos": (
+        "histogram", "Duración de cada ejecución de tarea Celery por estado final", BUCKETS_TAREAS),
+    "webapp_tarea_espera_segundos": (
+        "histogram", "Tiempo entre el encolado (o la ETA) y el inicio de la tarea", BUCKETS_TAREAS),
+    "webapp_tarea_reintentos_total": (
+        "counter", "Reintentos pedidos por la tarea", None),
+    "webapp_tarea_fallos_total": (
+        "counter", "Ejecuciones que terminaron en excepción, por tipo", None),
+    "webapp_tarea_omitidas_total": (
+        "counter", "Ejecuciones que no hicieron nada (lock tomado por otra, precondición)", None),
+}
+
+
+# ================================================================
+# HUELLAS DE CONSULTAS
+# ================================================================
+
+_LISTA_PARAMS = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+_CADENAS = re.compile(r"'(?:[^']|'')*'")
+_NUMEROS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def _normalizar(sql: str) -> str:
+    sql = _LISTA_PARAMS.sub("(%s…)", sql)
+    sql = _CADENAS.sub("?", sql)
+    sql = _NUMEROS.sub("?", sql)
+    return _ESPACIOS.sub(" ", sql).strip()
+
+
+def huella(sql: str) -> str:
+    return hashlib.sha1(_normalizar(sql).encode()).hexdigest()[:12]
+
+
+class Medicion:
+    """execute_wrapper que cuenta consultas, tiempo en SQL y huellas durante un request."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+        self.huellas = Counter()
+        self.textos = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.segundos += time.perf_counter() - inicio
+            self.consultas += 1
+            h = huella(sql)
+            self.huellas[h] += 1
+            self.textos.setdefault(h, sql)
+
+    def repetidas(self, minimo: int) -> dict:
+        """{huella: veces} de las que llegaron al mínimo."""
+        return {h: n for h, n in self.huellas.items() if n >= minimo}
+
+
+# ================================================================
+# REGISTRO (por proceso) Y VOLCADO A LA CACHE
+# ================================================================
+
+def _serie_id(metrica: str, etiquetas: tuple) -> str:
+    return hashlib.sha1(repr((metrica, etiquetas)).encode()).hexdigest()[:16]
+
+
+def _clave(serie: str, campo) -> str:
+    return f"{CACHE_PREFIX}:{serie}:{campo}"
+
+
+class _Registro:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.deltas = defaultdict(int)    # (serie, campo) -> incremento pendiente
+        self.series = {}                  # serie -> (métrica, etiquetas)
+        self.ultimo_volcado = time.monotonic()
+
+    def observar(self, metrica, etiquetas, valor):
+        buckets = METRICAS[metrica][2]
+        serie = _serie_id(metrica, etiquetas)
+        with self.lock:
+            self.series[serie] = (metrica, etiquetas)
+            self.deltas[(serie, bisect_left(buckets, valor))] += 1
+            self.deltas[(serie, "count")] += 1
+            self.deltas[(serie, "sum")] += round(valor * ESCALA)
+
+    def sumar(self, metrica, etiquetas, n=1):
+        serie = _serie_id(metrica, etiquetas)
+        with self.lock:
+            self.series[serie] = (metrica, etiquetas)
+            self.deltas[(serie, "valor")] += n
+
+    def volcar(self):
+        with self.lock:
+            deltas, self.deltas = self.deltas, defaultdict(int)
+            series = dict(self.series)
+            self.ultimo_volcado = time.monotonic()
+        if not series:
+            return
+
+        # Índice compartido de series: se re-agregan las propias que falten (escrituras concurrentes)
+        indice = cache.get(KEY_SERIES) or {}
+        if not series.keys() <= indice.keys():
+            cache.set(KEY_SERIES, {**indice, **series}, None)
+
+        for (serie, campo), n in deltas.items():
+            clave = _clave(serie, campo)
+            try:
+                cache.incr(clave, n)
+            except ValueError:
+                # Primera vez (o la cache la descartó): se crea y se suma
+                cache.add(clave, 0, None)
+                cache.incr(clave, n)
+
+
+_registro = _Registro()
+
+
+def observar(metrica: str, etiquetas: tuple, valor: float):
+    """Suma una observación a un histograma de METRICAS (etiquetas: tupla de pares)."""
+    _registro.observar(metrica, etiquetas, valor)
+
+
+def sumar(metrica: str, etiquetas: tuple, n: int = 1):
+    """Incrementa un contador de METRICAS."""
+    _registro.sumar(metrica, etiquetas, n)
+
+
+def volcar(forzar: bool = False):
+    """Pasa a la cache lo pendiente de este proceso si pasó METRICAS_FLUSH_SEGUNDOS (o si se fuerza)."""
+    if not forzar and time.monotonic() - _registro.ultimo_volcado < getattr(settings, "METRICAS_FLUSH_SEGUNDOS", 10):
+        return
+    try:
+        _registro.volcar()
+    except Exception as e:
+        # Las métricas nunca deben romper un request ni una tarea
+        logger.warning("No se pudieron volcar las métricas: %s", e)
+
+
+def registrar_request(vista: str, segundos: float, medicion: Medicion):
+    etiquetas = (("vista", vista),)
+    observar("webapp_request_duracion_segundos", etiquetas, segundos)
+    observar("webapp_request_consultas_sql", etiquetas, medicion.consultas)
+    observar("webapp_request_sql_segundos", etiquetas, medicion.segundos)
+
+    for h in medicion.repetidas(getattr(settings, "METRICAS_REPETIDAS_MIN", 5)):
+        sumar("webapp_sql_repetidas_total", (("vista", vista), ("huella", h)))
+        sql = _normalizar(medicion.textos[h])[:SQL_MUESTRA_MAX]
+        sumar("webapp_sql_repetida_info", (("huella", h), ("sql", sql)), 0)
+
+    volcar()
+
+
+def reiniciar():
+    """Borra las métricas acumuladas (locales y compartidas)."""
+    global _registro
+    indice = cache.get(KEY_SERIES) or {}
+    claves = [KEY_SERIES]
+    for serie, (metrica, _) in indice.items():
+        buckets = METRICAS[metrica][2]
+        campos = [*range(len(buckets) + 1), "sum", "count"] if buckets else ["valor"]
+        claves += [_clave(serie, c) for c in campos]
+    cache.delete_many(claves)
+    _registro = _Registro()
+
+
+# ================================================================
+# FORMATO DE TEXTO DE PROMETHEUS
+# ================================================================
+
+def _escapar(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(etiquetas, extra=()) -> str:
+    pares = [*etiquetas, *extra]
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}" if pares else ""
+
+
+def _numero(valor) -> str:
+    return f"{valor:g}" if isinstance(valor, float) else str(valor)
+
+
+def leer() -> dict:
+    """
+    Vuelca lo pendiente de este proceso y lee lo acumulado en la cache:
+    {métrica: [(etiquetas, valores)]}. Para histogramas `valores` tiene
+    "buckets" (conteo por bucket, sin acumular, el último es +Inf), "sum" y
+    "count"; para contadores, "valor".
+    """
+    _registro.volcar()
+    indice = cache.get(KEY_SERIES) or {}
+
+    campos_por_serie = {}
+    for serie, (metrica, _) in indice.items():
+        buckets = METRICAS[metrica][2]
+        campos_por_serie[serie] = [*range(len(buckets) + 1), "sum", "count"] if buckets else ["valor"]
+    valores = cache.get_many([_clave(s, c) for s, campos in campos_por_serie.items() for c in campos])
+
+    leidas = defaultdict(list)
+    for serie, (metrica, etiquetas) in indice.items():
+        v = {c: valores.get(_clave(serie, c), 0) for c in campos_por_serie[serie]}
+        if METRICAS[metrica][2]:
+            v = {"buckets": [v[i] for i in range(len(METRICAS[metrica][2]) + 1)],
+                 "sum": v["sum"] / ESCALA, "count": v["count"]}
+        leidas[metrica].append((etiquetas, v))
+    for series in leidas.values():
+        series.sort(key=lambda s: s[0])
+    return dict(leidas)
+
+
+def cuantil(buckets_def: tuple, conteos: list, q: float) -> float | None:
+    """Cuantil estimado de un histograma interpolando dentro del bucket (como histogram_quantile)."""
+    total = sum(conteos)
+    if not total:
+        return None
+    objetivo, acumulado = q * total, 0
+    for i, n in enumerate(conteos):
+        if n and acumulado + n >= objetivo:
+            if i == len(buckets_def):
+                return float(buckets_def[-1])   # bucket +Inf: no hay techo
+            piso = buckets_def[i - 1] if i else 0
+            return piso + (buckets_def[i] - piso) * (objetivo - acumulado) / n
+        acumulado += n
+    return float(buckets_def[-1])
+
+
+def renderizar() -> str:
+    """Arma el texto de Prometheus con lo acumulado por todos los procesos."""
+    leidas = leer()
+
+    lineas = []
+    for metrica, (tipo, ayuda, buckets) in METRICAS.items():
+        series = leidas.get(metrica)
+        if not series:
+            continue
+        lineas += [f"# HELP {metrica} {ayuda}", f"# TYPE {metrica} {tipo}"]
+        for etiquetas, v in series:
+            if tipo == "histogram":
+                acumulado = 0
+                for le, n in zip([*buckets, "+Inf"], v["buckets"]):
+                    acumulado += n
+                    lineas.append(f"{metrica}_bucket{_etiquetas(etiquetas, [('le', _numero(le))])} {acumulado}")
+                lineas.append(f"{metrica}_sum{_etiquetas(etiquetas)} {_numero(v['sum'])}")
+                lineas.append(f"{metrica}_count{_etiquetas(etiquetas)} {v['count']}")
+            elif tipo == "gauge":
+                lineas.append(f"{metrica}{_etiquetas(etiquetas)} 1")
+            else:
+                lineas.append(f"{metrica}{_etiquetas(etiquetas)} {v['valor']}")
+    return "\n".join(lineas) + "\n"
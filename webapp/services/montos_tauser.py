@@ -0,0 +1,159 @@
+# webapp/services/montos_tauser.py
+"""
+Búsqueda del menor monto factible para una operación Tauser → Tauser.
+
+El stock de ambos Tausers llega ya cargado y todo se decide en memoria:
+
+- Si el Tauser que ENTREGA tiene stock acotado, se arma la máscara de montos
+  de destino alcanzables (cambio_billetes.montos_alcanzables) y se recorren
+  solo esos montos, de menor a mayor y sin pasar el tope del cliente; por
+  cada uno se obtiene el origen con la conversión inversa. El primero que el
+  Tauser que RECIBE puede armar es el menor.
+- Si el destino no tiene tope de stock (PYG sin stock cargado), se recorre la
+  red de orígenes múltiplos del paso; pasado el número de Frobenius todos los
+  múltiplos del MCD son armables, así que se corta enseguida.
+
+En ambos casos hay presupuesto de iteraciones y de tiempo
+(MONTOS_TAUSER_MAX_ITERACIONES / MONTOS_TAUSER_MAX_SEGUNDOS). Cada vez que se
+agota se incrementa un contador en la cache compartida.
+"""
+import logging
+import time
+from decimal import ROUND_CEILING, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from webapp.services import cache_version, cambio_billetes
+
+logger = logging.getLogger(__name__)
+
+KEY_BUSQUEDAS = "metricas:montos_tauser:busquedas"
+KEY_PRESUPUESTO_AGOTADO = "metricas:montos_tauser:presupuesto_agotado"
+
+
+def metricas() -> dict:
+    """Búsquedas hechas y cuántas agotaron el presupuesto."""
+    return {
+        "busquedas": int(cache.get(KEY_BUSQUEDAS) or 0),
+        "presupuesto_agotado": int(cache.get(KEY_PRESUPUESTO_AGOTADO) or 0),
+    }
+
+
+def alinear(monto: Decimal, paso: Decimal) -> Decimal:
+    """Menor múltiplo de `paso` mayor o igual a `monto`."""
+    return (monto / paso).to_integral_value(rounding=ROUND_CEILING) * paso
+
+
+class _Presupuesto:
+    def __init__(self):
+        self.restantes = getattr(settings, "MONTOS_TAUSER_MAX_ITERACIONES", 10_000)
+        self.limite = time.monotonic() + getattr(settings, "MONTOS_TAUSER_MAX_SEGUNDOS", 0.5)
+        self.agotado = False
+
+    def consumir(self) -> bool:
+        self.restantes -= 1
+        if self.restantes < 0 or time.monotonic() > self.limite:
+            self.agotado = True
+        return not self.agotado
+
+
+def _bits_desde(mascara: int, desde: int):
+    """Posiciones de los bits encendidos de `mascara`, desde `desde` en adelante."""
+    x = mascara >> desde
+    pos = desde
+    while x:
+        bajo = (x & -x).bit_length() - 1
+        pos += bajo
+        yield pos
+        x >>= bajo + 1
+        pos += 1
+
+
+def buscar_monto_factible(
+    monto_inicial: Decimal,
+    paso: Decimal,
+    denominaciones_recibe,
+    stock_entrega,
+    convertir,
+    invertir,
+    tope_destino: Decimal | None = None,
+):
+    """
+    Menor (origen, destino) con origen >= monto_inicial y múltiplo de `paso`,
+    tal que el Tauser que recibe arma `origen` con `denominaciones_recibe`
+    (stock ilimitado) y el que entrega arma destino = convertir(origen) con
+    `stock_entrega` ([(valor, cantidad)], o None si no tiene tope de stock),
+    sin superar `tope_destino`. `invertir` es la conversión inversa.
+
+    Devuelve (None, None) si no hay monto factible o se agotó el presupuesto.
+    """
+    cache_version.incrementar(KEY_BUSQUEDAS)
+    denominaciones_recibe = list(denominaciones_recibe)
+    if not denominaciones_recibe or monto_inicial <= 0 or paso <= 0:
+        return (None, None)
+
+    presupuesto = _Presupuesto()
+    inicio = alinear(monto_inicial, paso)
+
+    def _candidato(origen):
+        destino = convertir(origen)
+        if destino <= 0 or (tope_destino is not None and destino > tope_destino):
+            return None
+        if cambio_billetes.resolver_ilimitado(origen, denominaciones_recibe) is None:
+            return None
+        return destino
+
+    resultado = (None, None)
+
+    if stock_entrega is None:
+        # Destino sin tope de stock: recorrer orígenes múltiplos del paso
+        origen = inicio
+        while presupuesto.consumir():
+            destino = convertir(origen)
+            if tope_destino is not None and destino > tope_destino:
+                break
+            if cambio_billetes.a_centavos(destino) is not None and _candidato(origen) is not None:
+                resultado = (origen, destino)
+                break
+            origen += paso
+    else:
+        tope_centavos = int(tope_destino * cambio_billetes.CENTAVOS) if tope_destino is not None else None
+        alcanzables = cambio_billetes.montos_alcanzables(stock_entrega, tope_centavos)
+
+        if alcanzables is not None:
+            mascara, unidad = alcanzables
+            # Destinos por debajo del mínimo posible no pueden venir de un origen >= inicio
+            piso = int(convertir(inicio) * cambio_billetes.CENTAVOS) // unidad
+            for pos in _bits_desde(mascara, max(piso - 1, 0)):
+                if not presupuesto.consumir():
+                    break
+                destino_objetivo = Decimal(pos * unidad) / cambio_billetes.CENTAVOS
+                origen = invertir(destino_objetivo)
+                if origen < inicio or origen % paso:
+                    continue
+                # Se valida con la conversión directa, igual que el flujo de confirmación
+                destino = _candidato(origen)
+                if destino is not None and destino == destino_objetivo:
+                    resultado = (origen, destino)
+                    break
+        else:
+            # Stock demasiado grande para la máscara: recorrer orígenes con el solver acotado
+            origen = inicio
+            while presupuesto.consumir():
+                destino = convertir(origen)
+                if tope_destino is not None and destino > tope_destino:
+                    break
+                if (_candidato(origen) is not None
+                        and cambio_billetes.resolver(destino, stock_entrega) is not None):
+                    resultado = (origen, destino)
+                    break
+                origen += paso
+
+    if presupuesto.agotado:
+        cache_version.incrementar(KEY_PRESUPUESTO_AGOTADO)
+        logger.warning(
+            "Búsqueda de monto Tauser→Tauser cortada por presupuesto (inicio=%s, paso=%s)",
+            monto_inicial, paso,
+        )
+    return resultado
@@ -0,0 +1,296 @@
+# webapp/services/quote_matrix.py
+"""
+Matriz de cotizaciones precalculada.
+
+El resultado de /api/currencies/active/ depende únicamente de
+(descuento de categoría, tipo de pago, tipo de cobro). En lugar de recalcular
+venta/compra de todas las monedas en cada consulta, se guarda en la cache
+compartida una "celda" por combinación con la lista de items lista para
+devolver en JSON.
+
+- Las celdas se reconstruyen desde las señales post_save/post_delete de
+  Currency, TipoPago, TipoCobro y Categoria (solo las celdas afectadas).
+- El descuento del cliente seleccionado también se cachea, para que una
+  consulta de cotización no haga trabajo de ORM.
+"""
+import hashlib
+import logging
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import transaction
+
+from webapp.pricing import Tarifa, quote_many
+from webapp.services import cache_version
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "quote_matrix"
+CACHE_TIMEOUT = 60 * 60 * 24  # red de seguridad: las señales mantienen la matriz al día
+
+KEY_INSUMOS = f"{CACHE_PREFIX}:insumos"
+KEY_ESTADO = f"{CACHE_PREFIX}:estado"   # token de versión + última modificación (validadores HTTP)
+KEY_GEN_CLIENTES = f"{CACHE_PREFIX}:gen_clientes"
+
+PYG_FALLBACK = {
+    "code": "PYG",
+    "name": "Guaraní",
+    "decimals": 0,
+    "venta": 1.0,
+    "compra": 1.0,
+    "flag_url": "/static/webapp/flags/pyg.png",
+}
+
+
+# ----------------------------
+# Claves
+# ----------------------------
+def _norm_descuento(descuento) -> str:
+    return f"{Decimal(descuento or 0):.3f}"
+
+
+def _norm_id(valor):
+    """IDs de tipo de pago/cobro como int o None (valores inválidos → None)."""
+    if valor in (None, ""):
+        return None
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _clave_celda(descuento, pago_id, cobro_id) -> str:
+    return f"{CACHE_PREFIX}:celda:{_norm_descuento(descuento)}:{pago_id or 0}:{cobro_id or 0}"
+
+
+# ----------------------------
+# Insumos (lo único que se lee de la BD)
+# ----------------------------
+def _cargar_insumos() -> dict:
+    from webapp.models import Categoria, Currency, TipoCobro, TipoPago
+
+    monedas = []
+    for c in Currency.objects.filter(is_active=True).order_by("code"):
+        monedas.append({
+            "code": c.code,
+            "name": c.name,
+            "decimals": int(c.decimales_monto or 2),
+            "tarifa": Tarifa.desde(c),
+            "flag_url": c.flag_image.url if c.flag_image else "",
+            "updated_at": c.updated_at,
+        })
+
+    descuentos = {_norm_descuento(0)}
+    descuentos.update(_norm_descuento(d) for d in Categoria.objects.values_list("descuento", flat=True))
+
+    return {
+        "monedas": monedas,
+        # Todos los tipos existentes; los inactivos se calculan como "sin método"
+        "pagos": {tp.id: (Decimal(tp.comision) if tp.activo else None) for tp in TipoPago.objects.all()},
+        "cobros": {tc.id: (Decimal(tc.comision) if tc.activo else None) for tc in TipoCobro.objects.all()},
+        "descuentos": sorted(descuentos),
+    }
+
+
+def _nuevo_estado(insumos: dict) -> dict:
+    estado = {
+        "token": uuid.uuid4().hex,
+        "modificado": max((m["updated_at"] for m in insumos["monedas"]), default=None),
+    }
+    cache.set(KEY_ESTADO, estado, CACHE_TIMEOUT)
+    return estado
+
+
+def _guardar_insumos(insumos: dict) -> dict:
+    """Guarda los insumos y un nuevo token de versión de la matriz."""
+    cache.set(KEY_INSUMOS, insumos, CACHE_TIMEOUT)
+    return _nuevo_estado(insumos)
+
+
+def obtener_insumos() -> dict:
+    insumos = cache.get(KEY_INSUMOS)
+    if insumos is None:
+        insumos = _cargar_insumos()
+        _guardar_insumos(insumos)
+    return insumos
+
+
+def obtener_estado() -> dict:
+    estado = cache.get(KEY_ESTADO)
+    if estado is None:
+        estado = _guardar_insumos(_cargar_insumos())
+    return estado
+
+
+def validadores(descuento, pago_id=None, cobro_id=None):
+    """
+    (ETag, Last-Modified) de una celda sin calcularla: el token cambia con
+    cada reconstrucción (moneda, tipo de pago/cobro o categoría) y la fecha
+    es el updated_at más reciente de las monedas activas.
+    """
+    estado = obtener_estado()
+    clave = f"{estado['token']}:{_norm_descuento(descuento)}:{_norm_id(pago_id) or 0}:{_norm_id(cobro_id) or 0}"
+    return hashlib.md5(clave.encode()).hexdigest(), estado["modificado"]
+
+
+# ----------------------------
+# Cálculo de una celda
+# ----------------------------
+def calcular_celdas(insumos: dict, descuentos, pago_id=None, cobro_id=None) -> dict:
+    """
+    Items de todas las celdas (descuento, pago_id, cobro_id) para los
+    descuentos dados, en una sola pasada del motor de precios.
+    """
+    com_pago = insumos["pagos"].get(pago_id) if pago_id else None
+    com_cobro = insumos["cobros"].get(cobro_id) if cobro_id else None
+    monedas = insumos["monedas"]
+    tabla = quote_many([m["tarifa"] for m in monedas], descuentos, com_pago, com_cobro)
+
+    celdas = {}
+    for d in descuentos:
+        items = []
+        for m, (_, cot) in zip(monedas, tabla.columna(d)):
+            items.append({
+                "code": m["code"],
+                "name": m["name"],
+                "decimals": m["decimals"],
+                "venta": float(cot.venta),
+                "compra": float(cot.compra),
+                "flag_url": m["flag_url"],
+            })
+        # Asegurar que PYG siempre exista
+        if not any(x["code"] == "PYG" for x in items):
+            items.append(dict(PYG_FALLBACK))
+        celdas[d] = items
+    return celdas
+
+
+def calcular_celda(insumos: dict, descuento, pago_id=None, cobro_id=None) -> list:
+    descuento = Decimal(descuento or 0)
+    return calcular_celdas(insumos, [descuento], pago_id, cobro_id)[descuento]
+
+
+# ----------------------------
+# Lectura
+# ----------------------------
+def obtener_cotizaciones(descuento, pago_id=None, cobro_id=None) -> list:
+    """
+    Devuelve los items de la celda (descuento, pago, cobro).
+    Camino normal: una sola lectura de cache.
+    """
+    pago_id, cobro_id = _norm_id(pago_id), _norm_id(cobro_id)
+    clave = _clave_celda(descuento, pago_id, cobro_id)
+    items = cache.get(clave)
+    if items is not None:
+        return items
+
+    insumos = obtener_insumos()
+    # IDs que no existen se tratan como "sin método" y no generan celdas nuevas
+    if pago_id not in insumos["pagos"]:
+        pago_id = None
+    if cobro_id not in insumos["cobros"]:
+        cobro_id = None
+    items = calcular_celda(insumos, descuento, pago_id, cobro_id)
+    cache.set(_clave_celda(descuento, pago_id, cobro_id), items, CACHE_TIMEOUT)
+    return items
+
+
+def descuento_cliente(usuario, cliente_id) -> Decimal:
+    """
+    Descuento de la categoría del cliente seleccionado (0 para invitados).
+    Se cachea por (usuario, cliente) con un contador de generación que las
+    señales de Cliente/ClienteUsuario/Categoria incrementan.
+    """
+    if not usuario.is_authenticated or not cliente_id:
+        return Decimal("0")
+
+    gen = cache_version.leer(KEY_GEN_CLIENTES)
+    clave = f"{CACHE_PREFIX}:descuento:{gen}:{usuario.pk}:{cliente_id}"
+    valor = cache.get(clave)
+    if valor is not None:
+        return Decimal(valor)
+
+    from webapp.models import ClienteUsuario
+
+    descuento = Decimal("0")
+    try:
+        cu = (ClienteUsuario.objects
+              .filter(usuario=usuario, cliente_id=cliente_id)
+              .select_related("cliente__categoria")
+              .first())
+        if cu and cu.cliente.categoria:
+            descuento = cu.cliente.categoria.descuento or Decimal("0")
+    except Exception:
+        descuento = Decimal("0")
+
+    cache.set(clave, str(descuento), CACHE_TIMEOUT)
+    return descuento
+
+
+# ----------------------------
+# Reconstrucción (llamada desde signals)
+# ----------------------------
+def _escribir_celdas(insumos, descuentos=None, pagos=None, cobros=None):
+    """
+    Recalcula y guarda las celdas del producto cartesiano indicado.
+    Cada dimensión en None significa "todas".
+    """
+    descuentos = descuentos if descuentos is not None else insumos["descuentos"]
+    pagos = pagos if pagos is not None else [None, *insumos["pagos"].keys()]
+    cobros = cobros if cobros is not None else [None, *insumos["cobros"].keys()]
+
+    descuentos = [Decimal(d) for d in descuentos]
+    celdas = {}
+    for p in pagos:
+        for c in cobros:
+            for d, items in calcular_celdas(insumos, descuentos, p, c).items():
+                celdas[_clave_celda(d, p, c)] = items
+    cache.set_many(celdas, CACHE_TIMEOUT)
+    return len(celdas)
+
+
+def reconstruir(moneda=False, pago_id=None, cobro_id=None, descuento=None):
+    """
+    Recarga los insumos y reescribe solo las celdas afectadas:
+    - moneda=True        → todas las celdas (cada celda lista todas las monedas)
+    - pago_id / cobro_id → celdas de ese tipo de pago / cobro
+    - descuento          → celdas de ese descuento de categoría
+    Sin argumentos reconstruye la matriz completa.
+    """
+    insumos = _cargar_insumos()
+    cache.set(KEY_INSUMOS, insumos, CACHE_TIMEOUT)
+
+    if moneda or (pago_id is None and cobro_id is None and descuento is None):
+        n = _escribir_celdas(insumos)
+    elif pago_id is not None:
+        n = _escribir_celdas(insumos, pagos=[pago_id])
+    elif cobro_id is not None:
+        n = _escribir_celdas(insumos, cobros=[cobro_id])
+    else:
+        n = _escribir_celdas(insumos, descuentos=[_norm_descuento(descuento)])
+
+    # El token se renueva recién con las celdas escritas: un ETag nuevo nunca
+    # apunta a contenido viejo
+    _nuevo_estado(insumos)
+    logger.debug("Matriz de cotizaciones: %s celdas reescritas", n)
+
+
+def programar_reconstruccion(**kwargs):
+    """
+    Reconstruye ya (para que la misma transacción vea los cambios) y, si hay
+    un bloque atómico abierto, otra vez al confirmar: así otros procesos no
+    dejan en cache valores leídos antes del commit.
+    """
+    try:
+        reconstruir(**kwargs)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: reconstruir(**kwargs))
+    except Exception as e:
+        # La matriz es solo una cache: ante un error se descarta y se recalcula al leer
+        logger.warning("No se pudo reconstruir la matriz de cotizaciones: %s", e)
+        cache.delete_many([KEY_INSUMOS, KEY_ESTADO])
+
+
+def invalidar_descuentos_clientes():
+    cache_version.invalidar(KEY_GEN_CLIENTES)
@@ -0,0 +1,183 @@
+# webapp/services/quote_snapshots.py
+"""
+Snapshots de cotización para la compraventa.
+
+Al pedir confirmar una operación se congela en la cache, con un ID y un TTL,
+todo lo que la transacción necesita (tasa, montos, porcentajes de los
+métodos, descuento, precio base y comisión de la moneda). Los pasos
+MFA → PIN → confirmar solo viajan con el ID, y la transacción se guarda
+desde el snapshot: sin volver a leer Currency/TipoPago/TipoCobro y sin
+aceptar tasas que el navegador haya calculado con datos viejos.
+
+La confirmación final toma el snapshot con reclamar() (cache.add, atómico)
+antes de cobrar: dos envíos del mismo quote_id no pueden registrar dos
+transacciones. Si la confirmación no llega a registrar, soltar() lo deja
+disponible de nuevo (p. ej. para reintentar el PIN de la billetera).
+
+Cada paso puede caer en otro worker, así que snapshot y reclamo necesitan la
+cache compartida (Redis): con una cache por proceso `check --deploy` falla
+(webapp.checks.cache_compartida).
+"""
+import secrets
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from webapp import pricing
+
+CACHE_PREFIX = "quote_snapshot"
+
+
+class CotizacionInvalida(ValueError):
+    """No se puede cotizar la operación pedida (monedas, montos o métodos)."""
+
+
+def ttl_segundos() -> int:
+    return int(getattr(settings, "QUOTE_SNAPSHOT_TTL", 300))
+
+
+def _clave(quote_id: str) -> str:
+    return f"{CACHE_PREFIX}:{quote_id}"
+
+
+def _clave_reclamo(quote_id: str) -> str:
+    return f"{CACHE_PREFIX}:{quote_id}:reclamo"
+
+
+def normalizar_nombre_tipo(nombre: str) -> str:
+    """'Tarjeta Nacional' → 'tarjetanacional' (mismo criterio que compraventa_view)."""
+    return nombre.replace(" ", "").replace("_", "").lower()
+
+
+def _cuantizar(monto: Decimal, moneda) -> Decimal:
+    decimales = 0 if moneda.code == "PYG" else int(moneda.decimales_monto or 0)
+    return monto.quantize(Decimal(10) ** (-decimales), rounding=ROUND_HALF_UP)
+
+
+def crear(cliente, usuario, moneda_origen, moneda_destino, monto_origen, tipo_pago, tipo_cobro) -> dict:
+    """
+    Cotiza en el servidor y guarda el snapshot. Devuelve el snapshot (con "id" y "expira").
+
+    - moneda_origen / moneda_destino: instancias de Currency
+    - tipo_pago / tipo_cobro: instancias activas de TipoPago / TipoCobro
+    """
+    try:
+        monto_origen = Decimal(str(monto_origen))
+    except Exception:
+        raise CotizacionInvalida("Debés ingresar un monto válido.")
+    if monto_origen <= 0:
+        raise CotizacionInvalida("Debés ingresar un monto válido.")
+
+    if moneda_origen.code == "PYG" and moneda_destino.code != "PYG":
+        tipo, moneda = "VENTA", moneda_destino
+        base, comision = moneda.base_price, moneda.comision_venta
+    elif moneda_origen.code != "PYG" and moneda_destino.code == "PYG":
+        tipo, moneda = "COMPRA", moneda_origen
+        base, comision = moneda.base_price, moneda.comision_compra
+    else:
+        raise CotizacionInvalida("Sólo se permiten conversiones con Guaraníes.")
+
+    categoria = getattr(cliente, "categoria", None)
+    descuento = Decimal(getattr(categoria, "descuento", None) or 0)
+    porc_pago = Decimal(tipo_pago.comision or 0)
+    porc_cobro = Decimal(tipo_cobro.comision or 0)
+
+    tasa = pricing.quote_one(moneda, descuento, porc_pago, porc_cobro).tasa(tipo)
+    if tasa <= 0:
+        raise CotizacionInvalida("La moneda seleccionada no tiene una cotización válida.")
+
+    if tipo == "VENTA":
+        monto_destino = _cuantizar(monto_origen / tasa, moneda_destino)
+    else:
+        monto_destino = _cuantizar(monto_origen * tasa, moneda_destino)
+    if monto_destino <= 0:
+        raise CotizacionInvalida("El monto es demasiado bajo para la cotización actual.")
+
+    ahora = timezone.now()
+    ttl = ttl_segundos()
+    snapshot = {
+        "id": secrets.token_urlsafe(16),
+        "cliente_id": cliente.pk,
+        "usuario_id": usuario.pk,
+        "tipo": tipo,
+        "moneda_origen": moneda_origen.code,
+        "moneda_origen_id": moneda_origen.pk,
+        "moneda_destino": moneda_destino.code,
+        "moneda_destino_id": moneda_destino.pk,
+        "tasa_cambio": tasa,
+        "monto_origen": monto_origen,
+        "monto_destino": monto_destino,
+        "tipo_pago_id": tipo_pago.pk,
+        "tipo_pago_nombre": normalizar_nombre_tipo(tipo_pago.nombre),
+        "tipo_cobro_id": tipo_cobro.pk,
+        "tipo_cobro_nombre": normalizar_nombre_tipo(tipo_cobro.nombre),
+        "medio_pago_porc": porc_pago,
+        "medio_cobro_porc": porc_cobro,
+        "desc_cliente": descuento,
+        "monto_base_moneda": base,
+        "comision_vta_com": comision,
+        "creado": ahora,
+        "expira": ahora + timedelta(seconds=ttl),
+        "ttl": ttl,
+    }
+    cache.set(_clave(snapshot["id"]), snapshot, ttl)
+    return snapshot
+
+
+def obtener(quote_id, cliente_id, usuario_id):
+    """Snapshot vigente del cliente/usuario, o None si no existe, expiró o es de otro."""
+    if not quote_id:
+        return None
+    snapshot = cache.get(_clave(quote_id))
+    if not snapshot:
+        return None
+    if snapshot["cliente_id"] != cliente_id or snapshot["usuario_id"] != usuario_id:
+        return None
+    if snapshot["expira"] <= timezone.now():
+        return None
+    return snapshot
+
+
+def reclamar(quote_id) -> bool:
+    """
+    Toma el snapshot para confirmarlo. False si otra confirmación lo tiene
+    tomado o ya lo usó: en ese caso no hay que cobrar ni registrar nada.
+    """
+    if not cache.add(_clave_reclamo(quote_id), True, ttl_segundos()):
+        return False
+    if cache.get(_clave(quote_id)) is None:
+        # Ya consumido (o expirado) entre obtener() y el reclamo
+        return False
+    return True
+
+
+def soltar(quote_id):
+    """Libera el reclamo de una confirmación que no llegó a registrar la transacción."""
+    cache.delete(_clave_reclamo(quote_id))
+
+
+def consumir(quote_id):
+    """
+    Invalida el snapshot una vez registrada la transacción. El reclamo queda
+    hasta su TTL, así un envío repetido tampoco puede volver a tomarlo.
+    """
+    cache.delete(_clave(quote_id))
+
+
+def aplicar_a_datos(snapshot: dict, data: dict) -> dict:
+    """Sobrescribe en los datos del formulario los valores que manda el snapshot."""
+    data.update({
+        "quote_id": snapshot["id"],
+        "tipo": snapshot["tipo"],
+        "moneda_origen": snapshot["moneda_origen"],
+        "moneda_destino": snapshot["moneda_destino"],
+        "tasa_cambio": str(snapshot["tasa_cambio"]),
+        "monto_origen": str(snapshot["monto_origen"]),
+        "monto_destino": str(snapshot["monto_destino"]),
+        "medio_pago_tipo": str(snapshot["tipo_pago_id"]),
+        "medio_cobro_tipo": str(snapshot["tipo_cobro_id"]),
+    })
+    return data
@@ -0,0 +1,202 @@
+# webapp/services/rate_impact.py
+"""
+Impacto de un cambio de cotización sobre las transacciones PENDIENTES.
+
+Reemplaza el recorrido fila por fila que se hacía dentro del request del
+admin (dos GenericForeignKey, cálculo de tasa, correo y save por cada
+transacción). Acá:
+
+- Las transacciones se leen por lotes con sus relaciones ya cargadas.
+- La tasa nueva se calcula UNA vez por grupo
+  (moneda, tipo, categoría, tipo de pago, tipo de cobro).
+- El stock de los Tausers y los saldos de cupo que necesitan las
+  transacciones Tauser → Tauser se cargan con una consulta cada uno por lote.
+- `cambio_pendiente` se marca con un bulk_update por lote (auditado en lote).
+- Los avisos se envían por lotes sobre una sola conexión SMTP.
+
+Se ejecuta desde la tarea Celery recalcular_transacciones_pendientes_task.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.utils import timezone
+
+from webapp import pricing
+from webapp.emails import send_transaction_cancellation_prompts
+from webapp.models import CuentaBancariaNegocio, Tauser, TauserCurrencyStock, TipoCobro, TipoPago, Transaccion
+from webapp.services import auditoria_transacciones, limites
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 500
+
+
+def _pendientes(moneda: str | None = None):
+    ct_cuenta_bancaria_negocio = ContentType.objects.get_for_model(CuentaBancariaNegocio)
+
+    transacciones = (
+        Transaccion.objects
+        .filter(estado=Transaccion.Estado.PENDIENTE)
+        .exclude(medio_pago_type=ct_cuenta_bancaria_negocio)
+        .select_related("cliente__categoria", "usuario", "moneda_origen", "moneda_destino")
+        # Los GenericForeignKey se resuelven con una consulta por tipo de medio y lote
+        .prefetch_related("medio_pago", "medio_cobro")
+        .order_by("id")
+    )
+
+    if moneda:
+        transacciones = transacciones.filter(
+            Q(moneda_origen__code=moneda) |
+            Q(moneda_destino__code=moneda)
+        )
+    return transacciones
+
+
+class TasasPorGrupo:
+    """
+    Tasa vigente por (moneda, tipo, descuento, tipo de pago, tipo de cobro),
+    calculada con el motor de precios la primera vez que se pide.
+    Mismo criterio que calcularTasa: un medio sin tipo global no suma comisión.
+    """
+
+    def __init__(self):
+        self.com_pagos = dict(TipoPago.objects.values_list("id", "comision"))
+        self.com_cobros = dict(TipoCobro.objects.values_list("id", "comision"))
+        self._tasas = {}
+
+    def para(self, transaccion) -> Decimal:
+        moneda = transaccion.moneda_destino if transaccion.tipo == "VENTA" else transaccion.moneda_origen
+        categoria = transaccion.cliente.categoria if transaccion.cliente_id else None
+        descuento = (categoria.descuento if categoria else None) or Decimal("0")
+        pago_id = getattr(transaccion.medio_pago, "tipo_pago_id", None)
+        cobro_id = getattr(transaccion.medio_cobro, "tipo_cobro_id", None)
+
+        clave = (moneda.id, transaccion.tipo, descuento, pago_id, cobro_id)
+        tasa = self._tasas.get(clave)
+        if tasa is None:
+            cotizacion = pricing.quote_one(
+                moneda,
+                descuento,
+                Decimal(self.com_pagos.get(pago_id) or 0),
+                Decimal(self.com_cobros.get(cobro_id) or 0),
+            )
+            tasa = self._tasas[clave] = cotizacion.tasa(transaccion.tipo)
+        return tasa
+
+    def __len__(self):
+        return len(self._tasas)
+
+
+class InsumosTauser:
+    """
+    Stock de los Tausers y saldos de cupo de los clientes que usan las
+    transacciones Tauser → Tauser de un lote, con una consulta cada uno
+    (recalcularMontosAmbosTauser los consultaba por transacción).
+    """
+
+    def __init__(self, transacciones):
+        ct_tauser = ContentType.objects.get_for_model(Tauser)
+        ambos = [
+            t for t in transacciones
+            if t.medio_pago_type_id == ct_tauser.id and t.medio_cobro_type_id == ct_tauser.id
+        ]
+
+        self._stock = defaultdict(list)
+        tausers = {t.medio_pago_id for t in ambos} | {t.medio_cobro_id for t in ambos}
+        if tausers:
+            for tauser_id, currency_id, valor, qty, reservado in (
+                TauserCurrencyStock.objects
+                .filter(tauser_id__in=tausers)
+                .values_list("tauser_id", "currency_id", "denomination__value", "quantity", "reservado")
+            ):
+                self._stock[(tauser_id, currency_id)].append((valor, qty, reservado))
+
+        # Mismo criterio que recalcularMontosAmbosTauser: solo las ventas de divisa tienen tope
+        self._saldos = limites.saldos_por_cliente(
+            t.cliente_id for t in ambos
+            if t.tipo == Transaccion.Tipo.VENTA and t.moneda_destino.code != "PYG"
+        )
+
+    def stock(self, tauser_id, currency_id) -> list:
+        """[(valor, quantity, reservado)] del Tauser en la moneda."""
+        return self._stock.get((tauser_id, currency_id), [])
+
+    def saldo(self, cliente_id, moneda_id) -> dict | None:
+        return self._saldos.get((cliente_id, moneda_id))
+
+
+def _evaluar(transaccion, tasas: TasasPorGrupo, insumos: InsumosTauser | None = None):
+    """Aviso para la transacción si su tasa cambió, o None."""
+    from webapp.views.compraventa_y_conversión import calcularMontosCambio, formatearMontos
+
+    try:
+        tasa_antigua = transaccion.tasa_cambio.quantize(Decimal("1"), rounding=ROUND_HALF_UP)
+    except Exception:
+        # Si no hay tasa guardada o es inválida, la salteamos
+        return None
+
+    tasa_actual = tasas.para(transaccion)
+    if tasa_actual == tasa_antigua or tasa_actual <= 0:
+        return None
+
+    montos = calcularMontosCambio(transaccion, tasa_actual=tasa_actual, insumos=insumos)
+    if montos["montoOrigenNuevo"] is None or montos["montoDestinoNuevo"] is None:
+        return None
+
+    return {
+        "transaccion": transaccion,
+        "tasa_actual": tasa_actual,
+        "tasa_antigua": tasa_antigua,
+        "montoOrigenNuevo": formatearMontos(montos["montoOrigenNuevo"], transaccion.moneda_origen, True),
+        "montoDestinoNuevo": formatearMontos(montos["montoDestinoNuevo"], transaccion.moneda_destino, True),
+    }
+
+
+def recalcular_pendientes(moneda: str | None = None, tamano_lote: int = TAMANO_LOTE) -> dict:
+    """
+    Recalcula las transacciones pendientes (opcionalmente solo las de una moneda),
+    marca `cambio_pendiente` y envía los avisos. Devuelve un resumen con
+    revisadas / notificadas / marcadas / grupos.
+    """
+    tasas = TasasPorGrupo()
+    resumen = {"revisadas": 0, "notificadas": 0, "marcadas": 0}
+
+    lote = []
+    for transaccion in _pendientes(moneda).iterator(chunk_size=tamano_lote):
+        lote.append(transaccion)
+        if len(lote) >= tamano_lote:
+            _procesar_lote(lote, tasas, resumen)
+            lote = []
+    if lote:
+        _procesar_lote(lote, tasas, resumen)
+
+    resumen["grupos"] = len(tasas)
+    logger.info("Recálculo por cambio de cotización: %s", resumen)
+    return resumen
+
+
+def _procesar_lote(lote, tasas: TasasPorGrupo, resumen: dict):
+    insumos = InsumosTauser(lote)
+    avisos = []
+    for transaccion in lote:
+        aviso = _evaluar(transaccion, tasas, insumos)
+        if aviso:
+            avisos.append(aviso)
+
+    marcar = [a["transaccion"] for a in avisos if not a["transaccion"].cambio_pendiente]
+    ahora = timezone.now()  # bulk_update no aplica auto_now
+    for transaccion in marcar:
+        transaccion.cambio_pendiente = True
+        transaccion.fecha_actualizacion = ahora
+    if marcar:
+        Transaccion.objects.bulk_update(marcar, ["cambio_pendiente", "fecha_actualizacion"])
+        auditoria_transacciones.registrar_lote(marcar, ["cambio_pendiente"], origen="tarea")
+
+    send_transaction_cancellation_prompts(avisos)
+
+    resumen["revisadas"] += len(lote)
+    resumen["notificadas"] += len(avisos)
+    resumen["marcadas"] += len(marcar)
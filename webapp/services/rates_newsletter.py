@@ -0,0 +1,244 @@
+# webapp/services/rates_newsletter.py
+"""
+Envío del boletín de tasas de cambio por lotes.
+
+Por corrida:
+
+- La tabla de precios se calcula UNA vez por descuento de categoría.
+- La tabla de cada descuento (html y txt) se renderiza una sola vez; por
+  usuario solo se arma el contenedor con los fragmentos ya renderizados.
+- Los destinatarios se recorren con iterator(), por lotes.
+- Todo sale por una misma conexión, limitada por un token bucket
+  configurable (NEWSLETTER_RATE_PER_SECOND / NEWSLETTER_BURST).
+"""
+import logging
+import secrets
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+from django.utils.safestring import mark_safe
+
+from webapp import pricing
+
+logger = logging.getLogger(__name__)
+
+ASUNTO = "Simulador - Tasas de cambio"
+TAMANO_LOTE = 500
+
+
+class TokenBucket:
+    """
+    Limitador de tasa: `tasa` tokens por segundo, hasta `capacidad` acumulados.
+    tasa <= 0 desactiva el límite.
+    """
+
+    def __init__(self, tasa: float, capacidad: float = 1, reloj=time.monotonic, dormir=time.sleep):
+        self.tasa = float(tasa)
+        self.capacidad = max(float(capacidad), 1.0)
+        self.tokens = self.capacidad
+        self._reloj = reloj
+        self._dormir = dormir
+        self._ultimo = reloj()
+
+    def tomar(self) -> float:
+        """Consume un token, esperando si hace falta. Devuelve los segundos esperados."""
+        if self.tasa <= 0:
+            return 0.0
+
+        ahora = self._reloj()
+        self.tokens = min(self.capacidad, self.tokens + (ahora - self._ultimo) * self.tasa)
+        self._ultimo = ahora
+
+        espera = 0.0
+        if self.tokens < 1:
+            espera = (1 - self.tokens) / self.tasa
+            self._dormir(espera)
+            self._ultimo = self._reloj()
+            self.tokens = 1.0
+        self.tokens -= 1
+        return espera
+
+
+def bucket_desde_settings() -> TokenBucket:
+    return TokenBucket(
+        getattr(settings, "NEWSLETTER_RATE_PER_SECOND", 5),
+        getattr(settings, "NEWSLETTER_BURST", 10),
+    )
+
+
+# ----------------------------
+# Tablas y fragmentos (una vez por corrida)
+# ----------------------------
+def _descuento_de(cliente) -> Decimal:
+    return getattr(getattr(cliente, "categoria", None), "descuento", None) or Decimal("0")
+
+
+class Fragmentos:
+    """
+    Tabla de precios y su html/txt por descuento. Las monedas se leen una vez;
+    cada descuento se calcula y renderiza la primera vez que aparece.
+    """
+
+    def __init__(self, descuentos=()):
+        from webapp.models import Currency
+
+        self.monedas = list(Currency.objects.filter(is_active=True).exclude(code="PYG").order_by("code"))
+        self._cache = {}
+        self.preparar(descuentos)
+
+    def preparar(self, descuentos):
+        nuevos = sorted({Decimal(d) for d in descuentos} - self._cache.keys())
+        if not nuevos:
+            return
+        tabla = pricing.quote_many(self.monedas, nuevos, redondear=False)
+        for d in nuevos:
+            monedas_info = [
+                {
+                    "name": c.name,
+                    "code": c.code,
+                    "precio_compra": f"{cot.compra:.2f}",
+                    "precio_venta": f"{cot.venta:.2f}",
+                }
+                for c, (_, cot) in zip(self.monedas, tabla.columna(d))
+            ]
+            self._cache[d] = {
+                "monedas": monedas_info,
+                "tabla_html": mark_safe(render_to_string("emails/_exchange_rates_tabla.html", {"monedas": monedas_info})),
+                "tabla_txt": mark_safe(render_to_string("emails/_exchange_rates_tabla.txt", {"monedas": monedas_info})),
+            }
+
+    def para(self, descuento) -> dict:
+        descuento = Decimal(descuento)
+        if descuento not in self._cache:
+            self.preparar([descuento])
+        return self._cache[descuento]
+
+
+# ----------------------------
+# Mensajes
+# ----------------------------
+def unsubscribe_url(user) -> str:
+    uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
+    return f"{settings.SITE_URL}/unsubscribe/{uidb64}/{user.unsubscribe_token}/"
+
+
+def mensaje_para(user, clientes, fragmentos: Fragmentos, connection=None) -> EmailMultiAlternatives:
+    """
+    Correo de un usuario. `clientes` es la lista de clientes asociados
+    (vacía → una sola tabla "Sin cliente asociado" con descuento 0).
+    """
+    clientes_data = []
+    for cliente in (clientes or [None]):
+        descuento = _descuento_de(cliente) if cliente else Decimal("0")
+        clientes_data.append({
+            "cliente": cliente,
+            "descuento": f"{(descuento * 100):.0f}%" if descuento else "0%",
+            **fragmentos.para(descuento),
+        })
+
+    context = {
+        "user": user,
+        "clientes_data": clientes_data,
+        "unsubscribe_url": unsubscribe_url(user),
+    }
+    text_content = render_to_string("emails/exchange_rates.txt", context)
+    html_content = render_to_string("emails/exchange_rates.html", context)
+
+    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@simulador.com")
+    email = EmailMultiAlternatives(ASUNTO, text_content, from_email, [user.email], connection=connection)
+    email.attach_alternative(html_content, "text/html")
+    return email
+
+
+# ----------------------------
+# Destinatarios
+# ----------------------------
+def suscriptores():
+    from webapp.models import CustomUser
+
+    return (
+        CustomUser.objects
+        .filter(is_active=True, receive_exchange_emails=True)
+        .exclude(email="")
+        .only("id", "email", "unsubscribe_token")
+        .order_by("id")
+    )
+
+
+def destinatarios(usuarios, tamano_lote: int = TAMANO_LOTE):
+    """
+    Genera (usuario, [clientes]) recorriendo `usuarios` con iterator(): una
+    consulta de ClienteUsuario por lote y los tokens de baja faltantes
+    guardados con un bulk_update por lote.
+    """
+    from webapp.models import ClienteUsuario, CustomUser
+
+    def _lote(usuarios_lote):
+        sin_token = [u for u in usuarios_lote if not u.unsubscribe_token]
+        for u in sin_token:
+            u.unsubscribe_token = secrets.token_urlsafe(32)
+        if sin_token:
+            CustomUser.objects.bulk_update(sin_token, ["unsubscribe_token"])
+
+        clientes = {}
+        for cu in (ClienteUsuario.objects
+                   .filter(usuario_id__in=[u.pk for u in usuarios_lote])
+                   .select_related("cliente__categoria")):
+            clientes.setdefault(cu.usuario_id, []).append(cu.cliente)
+        for u in usuarios_lote:
+            yield u, clientes.get(u.pk, [])
+
+    lote = []
+    for user in usuarios.iterator(chunk_size=tamano_lote):
+        lote.append(user)
+        if len(lote) >= tamano_lote:
+            yield from _lote(lote)
+            lote = []
+    if lote:
+        yield from _lote(lote)
+
+
+# ----------------------------
+# Envío
+# ----------------------------
+def enviar(destinatarios_iter, fragmentos: Fragmentos = None, connection=None, bucket: TokenBucket = None) -> dict:
+    """
+    Envía un correo por destinatario (pares (usuario, clientes)) sobre una sola
+    conexión, respetando el token bucket. Devuelve enviados/fallidos/segundos.
+    """
+    fragmentos = fragmentos or Fragmentos()
+    bucket = bucket or bucket_desde_settings()
+    connection = connection or get_connection()
+
+    resumen = {"enviados": 0, "fallidos": 0, "espera": 0.0}
+    inicio = time.monotonic()
+    connection.open()
+    try:
+        for user, clientes in destinatarios_iter:
+            resumen["espera"] += bucket.tomar()
+            try:
+                email = mensaje_para(user, clientes, fragmentos, connection=connection)
+                resumen["enviados"] += connection.send_messages([email]) or 0
+            except Exception as e:
+                resumen["fallidos"] += 1
+                logger.warning("Error enviando tasas a %s: %s", user.email, e)
+    finally:
+        connection.close()
+
+    resumen["segundos"] = time.monotonic() - inicio
+    return resumen
+
+
+def enviar_a_suscriptores(usuarios=None) -> dict:
+    """Corrida completa: todos los suscriptores (o el queryset recibido)."""
+    from webapp.models import Categoria
+
+    fragmentos = Fragmentos(d or 0 for d in Categoria.objects.values_list("descuento", flat=True))
+    resumen = enviar(destinatarios(usuarios if usuarios is not None else suscriptores()), fragmentos)
+    logger.info("Boletín de tasas: %s", resumen)
+    return resumen
@@ -0,0 +1,626 @@
+# webapp/services/seeds.py
+"""
+Datos iniciales (roles, monedas, clientes de prueba, límites, medios, stock…).
+
+Reemplaza la cadena de receivers de post_migrate (setup_database,
+seed_limite_config, clear_sessions), que en cada `migrate` hacía cientos de
+exists()/first() por cliente, recorría Categoría × Moneda con get_or_create,
+descargaba banderas por HTTP, regeneraba un año de históricos y borraba
+todas las sesiones.
+
+- Cada Seeder declara sus datos y una versión; la huella (sha256 de eso, de
+  las huellas de los seeders de los que depende y, si hace falta, de una
+  consulta barata de `estado`) se guarda en SeedRegistro al aplicarlo.
+- sembrar() lee el registro con UNA consulta: los seeders cuya huella no
+  cambió se saltean sin tocar sus tablas.
+- Lo que sí corre trabaja por conjuntos: bulk_create(ignore_conflicts=True)
+  sobre las restricciones únicas y UPDATE filtrados, sin sondas por fila.
+- Se ejecuta con `manage.py sembrar`; en post_migrate solo si
+  SEED_EN_MIGRATE (por defecto sí, para que una base nueva quede usable).
+
+Cambiar los datos de un seeder (o subir su `version`) lo vuelve a aplicar.
+"""
+import hashlib
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Callable
+
+import requests
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.contrib.sessions.models import Session
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q
+from django.utils import timezone
+
+from webapp.models import (
+    Billetera, BilleteraCobro, Categoria, Cliente, ClienteUsuario, CuentaBancariaCobro, CuentaBancariaNegocio,
+    Currency, CurrencyDenomination, CurrencyHistory, Entidad, LimiteIntercambioCliente, LimiteIntercambioConfig,
+    MedioCobro, MedioPago, SeedRegistro, TarjetaInternacional, TarjetaNacional, Tauser, TauserCurrencyStock,
+    TipoCobro, TipoPago,
+)
+from webapp.services import catalog_registry, metodos_cliente, quote_matrix, tauser_stock
+
+logger = logging.getLogger(__name__)
+User = get_user_model()
+
+# ================================================================
+# CONFIGURACIONES POR DEFECTO
+# ================================================================
+
+ROLES_POR_DEFECTO = ["Usuario", "Empleado", "Administrador", "Analista"]
+
+PERMISOS_ANALISTA = [
+    "Can change Moneda", "Can view Moneda",
+    "Can access analyst panel",
+    "Can change Límite de Intercambio", "Can view Límite de Intercambio",
+    "Can change Método de Cobro", "Can view Método de Cobro",
+    "Can change Medio de Pago", "Can view Medio de Pago",
+    "Puede ver los reportes de la empresa",
+]
+
+USUARIOS_POR_DEFECTO = [
+    {"username": "superadmin2", "password": "password12345", "email": "admin2@example.com", "grupo": "Administrador"},
+    {"username": "usuario1", "password": "password12345", "email": "usuario1@example.com", "grupo": "Usuario"},
+    {"username": "analista1", "password": "password12345", "email": "analista1@example.com", "grupo": "Analista"},
+]
+
+CATEGORIAS_POR_DEFECTO = [
+    {"nombre": "Minorista", "descuento": "0"},
+    {"nombre": "Corporativo", "descuento": "0.05"},
+    {"nombre": "VIP", "descuento": "0.1"},
+]
+
+CLIENTES_POR_DEFECTO = [
+    {
+        "tipoCliente": "persona_fisica",
+        "nombre": "Cliente Persona",
+        "documento": "1234567",
+        "correo": "clientep@ejemplo.com",
+        "telefono": "123456789",
+        "direccion": "Dirección Cliente Persona",
+        "categoria": "Minorista",
+    },
+    {
+        "tipoCliente": "persona_juridica",
+        "nombre": "Cliente Jurídico Corporativo",
+        "razonSocial": "Cliente Corporativo",
+        "documento": "5666888",
+        "ruc": "5666888-9",
+        "correo": "clientej@ejemplo.com",
+        "telefono": "123456789",
+        "direccion": "Dirección Cliente Jurídico",
+        "categoria": "Corporativo",
+    },
+    {
+        "tipoCliente": "persona_juridica",
+        "nombre": "Cliente Jurídico VIP",
+        "razonSocial": "Cliente VIP",
+        "documento": "5666888",
+        "ruc": "5666888-9",
+        "correo": "clientevip@ejemplo.com",
+        "telefono": "123456789",
+        "direccion": "Dirección Cliente VIP",
+        "categoria": "VIP",
+    },
+]
+
+ENTIDADES_POR_DEFECTO = {
+    "banco": ["Banco Nacional de Paraguay", "Banco Regional", "Banco Continental"],
+    "telefono": ["Bancard Wallet", "Tigo Money", "Personal Wallet"],
+}
+
+MONEDAS_POR_DEFECTO = [
+    {"code": "PYG", "name": "Guaraní Paraguayo", "symbol": "G", "base_price": "1.0", "comision_venta": "1.0",
+     "comision_compra": "1.0", "decimales_cotizacion": 2, "decimales_monto": 0},
+    {"code": "USD", "name": "Dólar Estadounidense", "symbol": "$", "base_price": "7500", "comision_venta": "200",
+     "comision_compra": "300", "decimales_cotizacion": 4, "decimales_monto": 2},
+    {"code": "EUR", "name": "Euro", "symbol": "€", "base_price": "8000", "comision_venta": "200",
+     "comision_compra": "300", "decimales_cotizacion": 4, "decimales_monto": 2},
+    {"code": "BRL", "name": "Real Brasileño", "symbol": "R$", "base_price": "1500", "comision_venta": "100",
+     "comision_compra": "200", "decimales_cotizacion": 4, "decimales_monto": 2},
+    {"code": "ARS", "name": "Peso Argentino", "symbol": "$", "base_price": "5", "comision_venta": "1",
+     "comision_compra": "2", "decimales_cotizacion": 4, "decimales_monto": 2},
+]
+
+DEFAULT_DENOMINATIONS = {
+    "PYG": {"bills": [100000, 50000], "coins": []},
+    "USD": {"bills": [100, 50], "coins": []},
+    "EUR": {"bills": [500, 200, 100, 50], "coins": []},
+    "BRL": {"bills": [200, 100], "coins": []},
+    "ARS": {"bills": [20000, 10000, 2000, 1000], "coins": []},
+}
+
+VALORES_POR_MONEDA = {"PYG": 100000000, "USD": 50000, "EUR": 50000, "BRL": 200000, "ARS": 20000000}
+DEFAULT_NO_LISTADA = 0
+
+# nombre → comisión (%)
+TIPOS_PAGO_POR_DEFECTO = {
+    "Billetera": 2, "Cuenta Bancaria": 0, "Tauser": 0, "Tarjeta Nacional": 3, "Tarjeta Internacional": 3,
+}
+TIPOS_COBRO_POR_DEFECTO = {"Billetera": 2, "Cuenta Bancaria": 0, "Tauser": 0}
+
+CUENTA_NEGOCIO_POR_DEFECTO = {
+    "numero_cuenta": "000100000001", "alias_cbu": "CUENTA_NEGOCIO_DEFECTO",
+    "entidad": "Banco Continental", "moneda": "PYG",
+}
+
+# Medios de los clientes por defecto: nombre = f"{prefijo}_{cliente con _}"
+MEDIOS_PAGO_POR_DEFECTO = [
+    {"prefijo": "Billetera", "tipo": "billetera", "moneda": "PYG",
+     "detalle": {"numero_celular": "123456789", "entidad": "Personal Wallet"}},
+    {"prefijo": "Tarjeta_Nacional", "tipo": "tarjeta_nacional", "moneda": "PYG",
+     "detalle": {"numero_tokenizado": "1234567", "fecha_vencimiento": "2029-02-04", "ultimos_digitos": "4567",
+                 "entidad": "Banco Continental"}},
+    {"prefijo": "Tarjeta_Internacional", "tipo": "tarjeta_internacional", "moneda": "PYG",
+     "detalle": {"stripe_payment_method_id": "pm_card_visa", "ultimos_digitos": "4242", "exp_month": 4,
+                 "exp_year": 2029}},
+]
+MEDIOS_COBRO_POR_DEFECTO = [
+    {"prefijo": "Billetera_Cobro", "tipo": "billetera", "moneda": "PYG",
+     "detalle": {"numero_celular": "123456788", "entidad": "Tigo Money"}},
+    {"prefijo": "Cuenta_Bancaria_PYG", "tipo": "cuenta_bancaria", "moneda": "PYG",
+     "detalle": {"numero_cuenta": "123456789", "alias_cbu": "1354544444", "entidad": "Banco Nacional de Paraguay"}},
+    {"prefijo": "Cuenta_Bancaria_USD", "tipo": "cuenta_bancaria", "moneda": "USD",
+     "detalle": {"numero_cuenta": "112233445", "alias_cbu": "1212121212", "entidad": "Banco Nacional de Paraguay"}},
+]
+_DETALLE_PAGO = {"billetera": Billetera, "tarjeta_nacional": TarjetaNacional, "tarjeta_internacional": TarjetaInternacional}
+_DETALLE_COBRO = {"billetera": BilleteraCobro, "cuenta_bancaria": CuentaBancariaCobro}
+_TIPO_COBRO = {"billetera": "Billetera", "cuenta_bancaria": "Cuenta Bancaria", "tauser": "Tauser"}
+
+STOCK_INICIAL_TAUSER = 1000
+
+# OJO si se agregan mas sucursales, agregar a esta lista
+SUCURSALES = [
+    "Casa Central", "Sucursal Pinedo", "Sucursal Villamorra", "Sucursal Multiplaza", "Sucursal Mariano Roque Alonso",
+    "Sucursal Ciudad del Este", "Sucursal Encarnación", "Sucursal Mercado San Lorenzo", "Sucursal Itaugua",
+    "Sucursal Capiata", "Sucursal Lambaré",
+]
+
+# Todas las monedas tienen imagen en este repositorio de filegarden; si quieren
+# agregar alguna contactar a Raquel para que suba la imagen correspondiente
+URL_BANDERAS = "https://file.garden/aTR_tQRLDge8swJl/banderas_paises/"
+
+DIAS_HISTORICO = 365
+
+
+# ================================================================
+# REGISTRO
+# ================================================================
+
+@dataclass(frozen=True)
+class Seeder:
+    nombre: str
+    aplicar: Callable[[], None]
+    datos: Any = None
+    version: int = 1
+    # Consulta barata cuyo resultado, si cambia, obliga a re-aplicar (p. ej. monedas nuevas)
+    estado: Callable[[], Any] | None = None
+    depende: tuple = field(default_factory=tuple)
+
+
+def huella(seeder: Seeder, huellas: dict) -> str:
+    contenido = {
+        "version": seeder.version,
+        "datos": seeder.datos,
+        "depende": [huellas.get(n) for n in seeder.depende],
+        "estado": seeder.estado() if seeder.estado else None,
+    }
+    return hashlib.sha256(json.dumps(contenido, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _resumen(qs):
+    """(cantidad, id máximo): cambia si se agregan o borran filas."""
+    r = qs.aggregate(n=Count("id"), m=Max("id"))
+    return [r["n"], r["m"]]
+
+
+def _ids(modelo, campo, valores) -> dict:
+    return dict(modelo.objects.filter(**{f"{campo}__in": valores}).values_list(campo, "id"))
+
+
+# ================================================================
+# SEEDERS
+# ================================================================
+
+def _roles_y_usuarios():
+    Group.objects.bulk_create([Group(name=r) for r in ROLES_POR_DEFECTO], ignore_conflicts=True)
+    grupos = {g.name: g for g in Group.objects.filter(name__in=ROLES_POR_DEFECTO)}
+    grupos["Administrador"].permissions.set(Permission.objects.all())
+    grupos["Analista"].permissions.set(Permission.objects.filter(name__in=PERMISOS_ANALISTA))
+
+    existentes = set(
+        User.objects.filter(username__in=[u["username"] for u in USUARIOS_POR_DEFECTO]).values_list("username", flat=True)
+    )
+    for data in USUARIOS_POR_DEFECTO:
+        if data["username"] in existentes:
+            continue
+        # create_user dispara assign_default_role (grupo "Usuario")
+        user = User.objects.create_user(username=data["username"], email=data["email"], password=data["password"])
+        user.groups.add(grupos[data["grupo"]])
+
+
+def _entidades():
+    Entidad.objects.bulk_create(
+        [Entidad(nombre=n, tipo=tipo, activo=True) for tipo, nombres in ENTIDADES_POR_DEFECTO.items() for n in nombres],
+        ignore_conflicts=True,
+    )
+
+
+def _monedas():
+    Currency.objects.bulk_create([Currency(**m) for m in MONEDAS_POR_DEFECTO], ignore_conflicts=True)
+
+    # Las que ya existían: completar solo los campos vacíos
+    por_code = {m["code"]: m for m in MONEDAS_POR_DEFECTO}
+    for currency in Currency.objects.filter(code__in=por_code):
+        vacios = {k: v for k, v in por_code[currency.code].items() if getattr(currency, k, None) in (None, "")}
+        if vacios:
+            Currency.objects.filter(pk=currency.pk).update(**vacios)
+
+    monedas = _ids(Currency, "code", list(DEFAULT_DENOMINATIONS))
+    por_tipo = {}
+    for code, tipos in DEFAULT_DENOMINATIONS.items():
+        if code not in monedas:
+            continue
+        for tipo, valores in tipos.items():
+            for v in valores:
+                por_tipo.setdefault(tipo[:-1], []).append((monedas[code], Decimal(str(v))))  # "bills" -> "bill"
+
+    CurrencyDenomination.objects.bulk_create(
+        [
+            CurrencyDenomination(currency_id=m, value=v, type=tipo, is_active=True)
+            for tipo, pares in por_tipo.items() for m, v in pares
+        ],
+        ignore_conflicts=True,
+    )
+    # Las que ya existían con otro tipo o inactivas
+    for tipo, pares in por_tipo.items():
+        filtro = Q()
+        for m, v in pares:
+            filtro |= Q(currency_id=m, value=v)
+        CurrencyDenomination.objects.filter(filtro).exclude(type=tipo, is_active=True).update(type=tipo, is_active=True)
+
+
+def _clientes():
+    Categoria.objects.bulk_create(
+        [Categoria(nombre=c["nombre"], descuento=Decimal(c["descuento"])) for c in CATEGORIAS_POR_DEFECTO],
+        ignore_conflicts=True,
+    )
+    for c in CATEGORIAS_POR_DEFECTO:
+        Categoria.objects.filter(nombre=c["nombre"]).exclude(descuento=Decimal(c["descuento"])).update(
+            descuento=Decimal(c["descuento"])
+        )
+
+    usuario = User.objects.filter(username="usuario1").first()
+    if not usuario:
+        logger.warning("Usuario base 'usuario1' no existe todavía; clientes por defecto no creados.")
+        return
+    categorias = _ids(Categoria, "nombre", [c["nombre"] for c in CATEGORIAS_POR_DEFECTO])
+    existentes = set(
+        Cliente.objects.filter(nombre__in=[c["nombre"] for c in CLIENTES_POR_DEFECTO]).values_list("nombre", flat=True)
+    )
+    # Los saldos de límites los crea el seeder de límites (bulk_create no dispara post_save)
+    Cliente.objects.bulk_create([
+        Cliente(**{k: v for k, v in c.items() if k != "categoria"}, categoria_id=categorias[c["categoria"]])
+        for c in CLIENTES_POR_DEFECTO if c["nombre"] not in existentes
+    ])
+    ClienteUsuario.objects.bulk_create(
+        [
+            ClienteUsuario(cliente_id=cid, usuario=usuario)
+            for cid in Cliente.objects.filter(nombre__in=[c["nombre"] for c in CLIENTES_POR_DEFECTO]).values_list("id", flat=True)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+_SALDOS_FALTANTES = f"""
+    INSERT INTO {LimiteIntercambioCliente._meta.db_table} (config_id, cliente_id, limite_dia_actual, limite_mes_actual)
+    SELECT cfg.id, c.id, cfg.limite_dia_max, cfg.limite_mes_max
+      FROM {Cliente._meta.db_table} c
+      JOIN {LimiteIntercambioConfig._meta.db_table} cfg ON cfg.categoria_id = c.categoria_id
+    ON CONFLICT (cliente_id, config_id) DO NOTHING
+"""
+
+
+def _limites():
+    monedas = list(Currency.objects.values_list("id", "code"))
+    LimiteIntercambioConfig.objects.bulk_create(
+        [
+            LimiteIntercambioConfig(
+                categoria_id=categoria_id, moneda_id=moneda_id,
+                limite_dia_max=Decimal(VALORES_POR_MONEDA.get(code, DEFAULT_NO_LISTADA)),
+                limite_mes_max=Decimal(VALORES_POR_MONEDA.get(code, DEFAULT_NO_LISTADA)),
+            )
+            for categoria_id in Categoria.objects.values_list("id", flat=True)
+            for moneda_id, code in monedas
+        ],
+        ignore_conflicts=True,
+    )
+    # Solo se completan los máximos vacíos (en cero)
+    for code, valor in VALORES_POR_MONEDA.items():
+        LimiteIntercambioConfig.objects.filter(moneda__code=code, limite_dia_max=0).update(limite_dia_max=valor)
+        LimiteIntercambioConfig.objects.filter(moneda__code=code, limite_mes_max=0).update(limite_mes_max=valor)
+    # Saldo de cada cliente para cada config de su categoría (lo que hace crear_saldos_cliente al crear uno)
+    with connection.cursor() as cur:
+        cur.execute(_SALDOS_FALTANTES)
+
+
+def _tipos_pago_cobro():
+    for modelo, tipos in ((TipoPago, TIPOS_PAGO_POR_DEFECTO), (TipoCobro, TIPOS_COBRO_POR_DEFECTO)):
+        modelo.objects.bulk_create(
+            [modelo(nombre=n, activo=True, comision=Decimal(c)) for n, c in tipos.items()], ignore_conflicts=True,
+        )
+    tipo_pago = TipoPago.objects.filter(nombre__icontains="tauser").first()
+    tipo_cobro = TipoCobro.objects.filter(nombre__icontains="tauser").first()
+    if tipo_pago and tipo_cobro:
+        Tauser.objects.filter(tipo_pago__isnull=True).update(tipo_pago=tipo_pago)
+        Tauser.objects.filter(tipo_cobro__isnull=True).update(tipo_cobro=tipo_cobro)
+
+
+def _cuenta_negocio():
+    if CuentaBancariaNegocio.objects.exists():
+        return
+    datos = CUENTA_NEGOCIO_POR_DEFECTO
+    banco, _ = Entidad.objects.get_or_create(nombre=datos["entidad"], defaults={"tipo": "banco"})
+    CuentaBancariaNegocio.objects.create(
+        numero_cuenta=datos["numero_cuenta"], alias_cbu=datos["alias_cbu"], entidad=banco,
+        moneda=Currency.objects.filter(code=datos["moneda"]).first(),
+    )
+
+
+def _crear_medios(modelo, especificaciones, detalles, campo_medio, asignar_tipo):
+    """Alta en bloque de medios (y su detalle) para los clientes por defecto que no los tengan."""
+    clientes = list(Cliente.objects.filter(nombre__in=[c["nombre"] for c in CLIENTES_POR_DEFECTO]))
+    existentes = set(modelo.objects.filter(cliente__in=clientes).values_list("cliente_id", "nombre"))
+    monedas = _ids(Currency, "code", {e["moneda"] for e in especificaciones})
+    entidades = _ids(Entidad, "nombre", {e["detalle"]["entidad"] for e in especificaciones if "entidad" in e["detalle"]})
+
+    nuevos = []
+    for cliente in clientes:
+        sufijo = cliente.nombre.replace(" ", "_")
+        for spec in especificaciones:
+            nombre = f"{spec['prefijo']}_{sufijo}"
+            if (cliente.id, nombre) in existentes:
+                continue
+            medio = modelo(
+                cliente=cliente, tipo=spec["tipo"], nombre=nombre, moneda_id=monedas.get(spec["moneda"]), activo=True,
+            )
+            asignar_tipo(medio)
+            nuevos.append((medio, spec))
+    modelo.objects.bulk_create([m for m, _ in nuevos])
+
+    por_modelo = {}
+    for medio, spec in nuevos:
+        detalle_modelo = detalles[spec["tipo"]]
+        campos = dict(spec["detalle"])
+        if "entidad" in campos:
+            campos["entidad_id"] = entidades.get(campos.pop("entidad"))
+        if any(f.name == "moneda" for f in detalle_modelo._meta.fields):
+            campos["moneda_id"] = medio.moneda_id
+        por_modelo.setdefault(detalle_modelo, []).append(detalle_modelo(**{campo_medio: medio}, **campos))
+    for detalle_modelo, filas in por_modelo.items():
+        detalle_modelo.objects.bulk_create(filas)
+
+
+def _medios_pago():
+    # Igual que la señal asignar_tipo_pago: "tarjeta_nacional" → "Tarjeta Nacional"
+    tipos = {t.nombre: t.id for t in TipoPago.objects.all()}
+
+    def asignar(medio):
+        medio.tipo_pago_id = tipos.get(" ".join(p.capitalize() for p in medio.tipo.split("_")))
+
+    _crear_medios(MedioPago, MEDIOS_PAGO_POR_DEFECTO, _DETALLE_PAGO, "medio_pago", asignar)
+
+
+def _medios_cobro():
+    tipos = {t.nombre.lower(): t.id for t in TipoCobro.objects.all()}
+
+    def asignar(medio):
+        medio.tipo_cobro_id = tipos.get(_TIPO_COBRO[medio.tipo].lower())
+
+    _crear_medios(MedioCobro, MEDIOS_COBRO_POR_DEFECTO, _DETALLE_COBRO, "medio_cobro", asignar)
+
+
+def _stock_tauser():
+    tausers = list(Tauser.objects.filter(activo=True).values_list("id", flat=True))
+    # Solo billetes
+    billetes = list(CurrencyDenomination.objects.filter(is_active=True, type="bill").values_list("id", "currency_id"))
+    TauserCurrencyStock.objects.bulk_create(
+        [
+            TauserCurrencyStock(tauser_id=t, denomination_id=d, currency_id=c, quantity=STOCK_INICIAL_TAUSER)
+            for t in tausers for d, c in billetes
+        ],
+        ignore_conflicts=True,
+    )
+    TauserCurrencyStock.objects.filter(
+        tauser_id__in=tausers, denomination_id__in=[d for d, _ in billetes], quantity=0,
+    ).update(quantity=STOCK_INICIAL_TAUSER)
+
+
+def _nombres_tauser():
+    # Los Tausers de la migración inicial se llaman "Sucursal N": se renombran en orden
+    renombrar = []
+    for i, tauser in enumerate(Tauser.objects.filter(activo=True).order_by("id")):
+        if i >= len(SUCURSALES) or tauser.ubicacion != f"Sucursal {i + 1}":
+            break
+        tauser.ubicacion = SUCURSALES[i]
+        renombrar.append(tauser)
+    Tauser.objects.bulk_update(renombrar, ["ubicacion"])
+
+
+def _banderas():
+    # Una descarga fallida no frena el resto: se reintenta con `sembrar --solo banderas --forzar`
+    for moneda in Currency.objects.filter(Q(flag_image__isnull=True) | Q(flag_image="")):
+        nombre = f"{moneda.code.lower()}.png"
+        try:
+            response = requests.get(URL_BANDERAS + nombre, timeout=10)
+        except requests.RequestException as e:
+            logger.warning("No se pudo descargar la bandera de %s: %s", moneda.code, e)
+            continue
+        if response.status_code == 200:
+            moneda.flag_image.save(nombre, ContentFile(response.content), save=False)
+            Currency.objects.filter(pk=moneda.pk).update(flag_image=moneda.flag_image.name)
+
+
+def _daily_spread_variation(code: str, day_index: int) -> Decimal:
+    """
+    Small ± variation applied to the buy/sell spread.
+    """
+    spread_map = {
+        "USD": Decimal("0.01"),   # 1% spread
+        "EUR": Decimal("0.012"),
+        "BRL": Decimal("0.015"),
+        "ARS": Decimal("0.03"),
+    }
+    base_spread = spread_map.get(code.upper(), Decimal("0.01"))
+
+    key = f"{code}-{day_index}-spread"
+    h = int(hashlib.sha256(key.encode()).hexdigest(), 16)
+    frac = Decimal(h % 10001) / Decimal("5000") - Decimal("1")
+
+    # ± 10% variation of the spread
+    variation = base_spread * Decimal("0.10") * frac
+    return base_spread + variation
+
+
+def _daily_variation(code: str, day_index: int) -> Decimal:
+    """
+    Deterministic pseudo-random variation in [-max_change, max_change],
+    so results are realistic but reproducible.
+    """
+    # Volatility per currency (roughly daily % max change)
+    vol_map = {
+        "USD": Decimal("0.004"),  # ±0.4% per day
+        "EUR": Decimal("0.004"),  # ±0.4%
+        "BRL": Decimal("0.008"),  # ±0.8%
+        "ARS": Decimal("0.020"),  # ±2%
+    }
+    default_vol = Decimal("0.003")  # ±0.3%
+
+    max_change = vol_map.get(code.upper(), default_vol)
+
+    # Turn (code, day_index) into a deterministic "random" number
+    key = f"{code}-{day_index}-base"
+    h = int(hashlib.sha256(key.encode()).hexdigest(), 16)
+
+    # Map hash → [-1, 1]
+    frac = Decimal(h % 10001) / Decimal("5000") - Decimal("1")  # [-1, 1]
+
+    # Scale to [-max_change, max_change]
+    return frac * max_change
+
+
+def _historico_tasas():
+    """
+    Up to 1 year of historical FX prices (ambiente de pruebas).
+
+    TODAY is always equal to currency.base_price; historical values are a
+    deterministic random walk backwards. PYG stays constant.
+    - compra = price * (1 - spread) - comision_compra
+    - venta  = price * (1 + spread) + comision_venta
+    """
+    today = timezone.localdate()
+    histories = []
+
+    for currency in Currency.objects.filter(is_active=True):
+        code = currency.code.upper()
+        base_price = Decimal(currency.base_price)
+        com_com = Decimal(currency.comision_compra)
+        com_ven = Decimal(currency.comision_venta)
+
+        histories.append(
+            CurrencyHistory(currency=currency, date=today, compra=base_price - com_com, venta=base_price + com_ven)
+        )
+        current_price = base_price
+        for i in range(1, DIAS_HISTORICO + 1):
+            if code == "PYG":
+                compra, venta = base_price - com_com, base_price + com_ven
+            else:
+                current_price = current_price * (Decimal("1") + _daily_variation(code, i))
+                spread = _daily_spread_variation(code, i)
+                compra = max((current_price * (Decimal("1") - spread)) - com_com, Decimal("0.01"))
+                venta = max(current_price * (Decimal("1") + spread) + com_ven, Decimal("0.01"))
+            histories.append(
+                CurrencyHistory(currency=currency, date=today - timedelta(days=i), compra=compra, venta=venta)
+            )
+
+    CurrencyHistory.objects.bulk_create(histories, ignore_conflicts=True)
+
+
+def _monedas_estado():
+    return _resumen(Currency.objects.all())
+
+
+SEEDERS = [
+    Seeder("roles_y_usuarios", _roles_y_usuarios,
+           datos=[ROLES_POR_DEFECTO, PERMISOS_ANALISTA, USUARIOS_POR_DEFECTO],
+           estado=lambda: _resumen(Permission.objects.all())),  # permisos de modelos nuevos → Administrador
+    Seeder("entidades", _entidades, datos=ENTIDADES_POR_DEFECTO),
+    Seeder("monedas", _monedas, datos=[MONEDAS_POR_DEFECTO, DEFAULT_DENOMINATIONS]),
+    Seeder("clientes", _clientes, datos=[CATEGORIAS_POR_DEFECTO, CLIENTES_POR_DEFECTO], depende=("roles_y_usuarios",)),
+    Seeder("limites", _limites, datos=[VALORES_POR_MONEDA, DEFAULT_NO_LISTADA], depende=("monedas", "clientes"),
+           estado=lambda: [_monedas_estado(), _resumen(Categoria.objects.all())]),
+    Seeder("tipos_pago_cobro", _tipos_pago_cobro, datos=[TIPOS_PAGO_POR_DEFECTO, TIPOS_COBRO_POR_DEFECTO],
+           estado=lambda: _resumen(Tauser.objects.all())),
+    Seeder("cuenta_negocio", _cuenta_negocio, datos=CUENTA_NEGOCIO_POR_DEFECTO, depende=("entidades", "monedas")),
+    Seeder("medios_pago", _medios_pago, datos=MEDIOS_PAGO_POR_DEFECTO,
+           depende=("clientes", "entidades", "tipos_pago_cobro")),
+    Seeder("medios_cobro", _medios_cobro, datos=MEDIOS_COBRO_POR_DEFECTO,
+           depende=("clientes", "entidades", "tipos_pago_cobro")),
+    Seeder("stock_tauser", _stock_tauser, datos=STOCK_INICIAL_TAUSER, depende=("monedas",),
+           estado=lambda: [_resumen(Tauser.objects.filter(activo=True)), _resumen(CurrencyDenomination.objects.all())]),
+    Seeder("nombres_tauser", _nombres_tauser, datos=SUCURSALES, estado=lambda: _resumen(Tauser.objects.all())),
+    Seeder("banderas", _banderas, datos=URL_BANDERAS, estado=_monedas_estado),
+    Seeder("historico_tasas", _historico_tasas, datos=DIAS_HISTORICO, depende=("monedas",)),
+]
+
+
+# ================================================================
+# EJECUCIÓN
+# ================================================================
+
+def _invalidar_caches():
+    # bulk_create/update no disparan las señales que mantienen estas caches
+    catalog_registry.invalidar()
+    tauser_stock.invalidar()
+    metodos_cliente.invalidar()
+    quote_matrix.invalidar_descuentos_clientes()
+    quote_matrix.programar_reconstruccion()
+
+
+def sembrar(forzar: bool = False, solo=None) -> dict:
+    """
+    Aplica los seeders cuya huella cambió (todos con forzar=True; solo los
+    nombrados con `solo`). Devuelve {nombre: "aplicado" | "sin cambios" | "error"}.
+    Un seeder que falla no registra su huella: se reintenta la próxima vez.
+    """
+    registradas = dict(SeedRegistro.objects.values_list("nombre", "huella"))
+    huellas, resultado = {}, {}
+    for seeder in SEEDERS:
+        h = huellas[seeder.nombre] = huella(seeder, huellas)
+        if solo and seeder.nombre not in solo:
+            continue
+        if not forzar and registradas.get(seeder.nombre) == h:
+            resultado[seeder.nombre] = "sin cambios"
+            continue
+        try:
+            with transaction.atomic():
+                seeder.aplicar()
+                SeedRegistro.objects.update_or_create(nombre=seeder.nombre, defaults={"huella": h})
+            resultado[seeder.nombre] = "aplicado"
+        except Exception:
+            logger.exception("Error en el seeder %s", seeder.nombre)
+            resultado[seeder.nombre] = "error"
+
+    if "aplicado" in resultado.values():
+        _invalidar_caches()
+    return resultado
+
+
+def limpiar_sesiones() -> int:
+    """Cierra todas las sesiones."""
+    return Session.objects.all().delete()[0]
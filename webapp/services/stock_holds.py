@@ -0,0 +1,212 @@
+# webapp/services/stock_holds.py
+"""
+Reservas (holds) de billetes de Tauser para transacciones que los entregan.
+
+- Cada fila de stock lleva `reservado` (suma de sus holds ACTIVOS);
+  disponible = quantity - reservado.
+- reservar() elige el desglose óptimo sobre lo disponible y lo toma con UN
+  UPDATE condicional por Tauser/moneda (solo pasa si cada fila todavía tiene
+  lo necesario). Si otro operador ganó la carrera se reintenta con el stock
+  fresco.
+- Los holds vencen con la transacción (expira_en); al pagarse se limpia el
+  vencimiento.
+- liberar() y consumir() resuelven muchas transacciones en una sola
+  sentencia (UPDATE ... RETURNING de los holds + UPDATE del stock agregado),
+  sin riesgo de liberar dos veces.
+"""
+import logging
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection, transaction
+from django.utils import timezone
+
+from webapp.models import (
+    CuentaBancariaNegocio,
+    ExpiracionTransaccionConfig,
+    Tauser,
+    TauserCurrencyStock,
+    TauserStockHold,
+    Transaccion,
+)
+from webapp.services import cambio_billetes, tauser_stock
+
+logger = logging.getLogger(__name__)
+
+REINTENTOS = 3
+
+_T_STOCK = TauserCurrencyStock._meta.db_table
+_T_HOLD = TauserStockHold._meta.db_table
+
+
+class StockInsuficiente(ValueError):
+    """El Tauser no tiene billetes disponibles para armar el monto."""
+
+
+class _Conflicto(Exception):
+    """Otra reserva tomó el stock entre la lectura y el UPDATE condicional."""
+
+
+def _entrega_por_tauser(transaccion) -> bool:
+    ct_tauser = ContentType.objects.get_for_model(Tauser)
+    return transaccion.medio_cobro_type_id == ct_tauser.id and transaccion.moneda_destino.code != "PYG"
+
+
+def vencimiento_para(transaccion):
+    """Vencimiento del hold: el de la transacción si sigue PENDIENTE, ninguno si ya se pagó."""
+    if transaccion.estado != Transaccion.Estado.PENDIENTE:
+        return None
+
+    medio = None
+    if transaccion.medio_pago_type_id == ContentType.objects.get_for_model(Tauser).id:
+        medio = "tauser"
+    elif transaccion.medio_pago_type_id == ContentType.objects.get_for_model(CuentaBancariaNegocio).id:
+        medio = "cuenta_bancaria_negocio"
+    config = ExpiracionTransaccionConfig.objects.filter(medio=medio).first() if medio else None
+    if not config:
+        return None
+    return (transaccion.fecha_creacion or timezone.now()) + timedelta(minutes=config.minutos_expiracion)
+
+
+def disponible(tauser_id, currency_id) -> list:
+    """[(valor, disponible)] del Tauser en la moneda (on-hand menos holds activos)."""
+    return [
+        (valor, max(qty - reservado, 0))
+        for valor, qty, reservado in TauserCurrencyStock.objects
+        .filter(tauser_id=tauser_id, currency_id=currency_id)
+        .values_list("denomination__value", "quantity", "reservado")
+    ]
+
+
+def alcanza(tauser_id, currency_id, monto) -> bool:
+    """Chequeo previo (sin reservar): si hoy se puede armar el monto con lo disponible."""
+    return cambio_billetes.resolver(monto, disponible(tauser_id, currency_id)) is not None
+
+
+def _tomar(asignaciones):
+    """UPDATE condicional de todas las filas; falla (_Conflicto) si alguna ya no alcanza. Devuelve los ids."""
+    valores = ", ".join(["(%s::bigint, %s::integer)"] * len(asignaciones))
+    params = [p for par in asignaciones for p in par]
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            UPDATE {_T_STOCK} AS s
+               SET reservado = s.reservado + v.cant
+              FROM (VALUES {valores}) AS v(id, cant)
+             WHERE s.id = v.id
+               AND s.quantity - s.reservado >= v.cant
+         RETURNING s.id
+            """,
+            params,
+        )
+        tomadas = [fila[0] for fila in cur.fetchall()]
+    if len(tomadas) != len(asignaciones):
+        raise _Conflicto
+    return tomadas
+
+
+def reservar(transaccion, expira_en=None):
+    """
+    Crea los holds de la transacción (idempotente: si ya tiene holds activos
+    solo actualiza el vencimiento). Devuelve la lista de holds.
+    Levanta StockInsuficiente si no hay billetes disponibles.
+    """
+    if not _entrega_por_tauser(transaccion) or not transaccion.monto_destino:
+        return []
+
+    with transaction.atomic():
+        activos = TauserStockHold.objects.filter(transaccion=transaccion, estado=TauserStockHold.Estado.ACTIVA)
+        if activos.exists():
+            activos.update(expira_en=expira_en, actualizado=timezone.now())
+            return list(activos)
+
+        for _ in range(REINTENTOS):
+            filas = list(
+                TauserCurrencyStock.objects
+                .filter(tauser_id=transaccion.medio_cobro_id, currency_id=transaccion.moneda_destino_id)
+                .values_list("id", "denomination__value", "quantity", "reservado")
+            )
+            desglose = cambio_billetes.resolver(
+                transaccion.monto_destino,
+                [(valor, max(qty - reservado, 0)) for _, valor, qty, reservado in filas],
+            )
+            if desglose is None:
+                raise StockInsuficiente(
+                    f"Stock insuficiente del Tauser {transaccion.medio_cobro_id} para "
+                    f"{transaccion.monto_destino} {transaccion.moneda_destino.code}"
+                )
+
+            # (moneda, valor) es único, así que cada billete del desglose es una sola fila
+            por_valor = {valor: stock_id for stock_id, valor, _, _ in filas}
+            asignaciones = [(por_valor[valor], cantidad) for valor, cantidad in desglose]
+            try:
+                with transaction.atomic():
+                    tauser_stock.invalidar(_tomar(asignaciones))
+                    return TauserStockHold.objects.bulk_create([
+                        TauserStockHold(
+                            transaccion=transaccion, stock_id=stock_id, cantidad=cantidad, expira_en=expira_en,
+                        )
+                        for stock_id, cantidad in asignaciones
+                    ])
+            except _Conflicto:
+                continue
+
+    raise StockInsuficiente(
+        f"El stock del Tauser {transaccion.medio_cobro_id} cambió mientras se reservaba; reintente."
+    )
+
+
+def _cerrar(transacciones_ids, nuevo_estado, descontar_quantity: bool) -> int:
+    """Pasa los holds ACTIVOS de esas transacciones a `nuevo_estado` y ajusta el stock."""
+    ids = list(transacciones_ids)
+    if not ids:
+        return 0
+
+    quantity = "quantity = GREATEST(s.quantity - c.total, 0)," if descontar_quantity else ""
+    with connection.cursor() as cur:
+        cur.execute(
+            f"""
+            WITH cerrados AS (
+                UPDATE {_T_HOLD}
+                   SET estado = %s, actualizado = NOW()
+                 WHERE estado = %s AND transaccion_id = ANY(%s)
+             RETURNING stock_id, cantidad
+            )
+            UPDATE {_T_STOCK} AS s
+               SET {quantity}
+                   reservado = GREATEST(s.reservado - c.total, 0),
+                   updated_at = NOW()
+              FROM (SELECT stock_id, SUM(cantidad) AS total FROM cerrados GROUP BY stock_id) AS c
+             WHERE s.id = c.stock_id
+         RETURNING s.id
+            """,
+            [nuevo_estado, TauserStockHold.Estado.ACTIVA, ids],
+        )
+        stock_ids = [fila[0] for fila in cur.fetchall()]
+    if stock_ids:
+        tauser_stock.invalidar(stock_ids)
+    return len(stock_ids)
+
+
+def liberar(transacciones_ids) -> int:
+    """Devuelve al stock los holds activos de esas transacciones (canceladas / vencidas)."""
+    return _cerrar(transacciones_ids, TauserStockHold.Estado.LIBERADA, descontar_quantity=False)
+
+
+def consumir(transacciones_ids) -> int:
+    """Los billetes salieron del Tauser: se descuentan de quantity y de reservado."""
+    return _cerrar(transacciones_ids, TauserStockHold.Estado.CONSUMIDA, descontar_quantity=True)
+
+
+def liberar_vencidos(ahora=None) -> int:
+    """Libera los holds activos cuyo vencimiento ya pasó."""
+    ahora = ahora or timezone.now()
+    ids = set(
+        TauserStockHold.objects
+        .filter(estado=TauserStockHold.Estado.ACTIVA, expira_en__lt=ahora)
+        .values_list("transaccion_id", flat=True)
+    )
+    filas = liberar(ids)
+    if filas:
+        logger.info("Holds de stock vencidos liberados: %s transacciones, %s filas de stock", len(ids), filas)
+    return filas
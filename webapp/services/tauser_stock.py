@@ -0,0 +1,78 @@
+# webapp/services/tauser_stock.py
+"""
+Snapshot del stock disponible de los Tausers activos, versionado en la cache
+compartida: { tauser_id: { code: [{"value", "quantity"}, ...] } }.
+
+- El snapshot se arma con una consulta y se guarda bajo una clave que
+  incluye la versión (tauser_stock:snapshot:<v>).
+- Cada mutación de stock (señales de TauserCurrencyStock / Tauser /
+  CurrencyDenomination, y los UPDATE masivos de stock_holds y del reset de
+  manage_tausers que no disparan señales) incrementa la versión
+  (services/cache_version.py).
+- Si se pasan las filas tocadas, invalidar() también publica sus deltas al
+  stream SSE (services/live_quotes.py).
+- para_par() recorta el snapshot a las monedas de un par from/to.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from webapp.services import cache_version, live_quotes
+
+KEY_VERSION = "tauser_stock:version"
+
+
+def version() -> int:
+    return cache_version.leer(KEY_VERSION)
+
+
+def _clave_snapshot(v: int) -> str:
+    return f"tauser_stock:snapshot:{v}"
+
+
+def _construir() -> dict:
+    from webapp.models import TauserCurrencyStock
+
+    data = {}
+    filas = (
+        TauserCurrencyStock.objects
+        .filter(tauser__activo=True)
+        .values_list("tauser_id", "currency__code", "denomination__value", "quantity", "reservado")
+        .order_by("tauser_id", "currency_id", "-denomination__value")
+    )
+    # Cantidad disponible: en mano menos lo reservado por otras transacciones
+    for tauser_id, code, valor, quantity, reservado in filas:
+        if quantity > reservado:
+            data.setdefault(tauser_id, {}).setdefault(code, []).append({
+                "value": float(valor),
+                "quantity": quantity - reservado,
+            })
+    return data
+
+
+def snapshot() -> dict:
+    """Stock disponible por Tauser y moneda (no modificar: es compartido)."""
+    v = version()
+    clave = _clave_snapshot(v)
+    data = cache.get(clave)
+    if data is None:
+        data = _construir()
+        cache.set(clave, data, getattr(settings, "TAUSER_STOCK_SNAPSHOT_TTL", 300))
+    return data
+
+
+def para_par(data: dict, codigos) -> dict:
+    """Solo las monedas de `codigos` (las que no tienen stock quedan fuera)."""
+    codigos = {c for c in codigos if c}
+    return {
+        tauser_id: {code: filas for code, filas in por_moneda.items() if code in codigos}
+        for tauser_id, por_moneda in data.items()
+    }
+
+
+def invalidar(stock_ids=()):
+    """
+    Marca el snapshot como viejo (y de nuevo al confirmar si hay un bloque
+    atómico abierto) y publica al stream las filas `stock_ids` modificadas.
+    """
+    cache_version.invalidar(KEY_VERSION)
+    live_quotes.publicar_stock(stock_ids)
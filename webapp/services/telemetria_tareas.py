@@ -0,0 +1,159 @@
+# webapp/services/telemetria_tareas.py
+"""
+Telemetría de las tareas de Celery, por el mismo registro que las métricas
+web (services/metricas.py) y expuesta en el mismo /metrics.
+
+Los receptores de señales están en signals.py:
+- before_task_publish: estampa la hora de encolado en los headers del mensaje.
+- task_prerun / task_postrun: espera en cola (encolado o ETA → inicio) y
+  duración por estado final (ok, fallo, reintento, ignorada, omitida).
+- task_retry / task_failure: reintentos y fallos por tipo de excepción.
+
+Una ejecución "omitida" es la que no hizo nada porque otra tenía el lock (o
+no se cumplía una precondición): la tarea llama a marcar_omitida(), o
+devuelve {"skipped": motivo} como sync_facturas_pendientes_task.
+
+Cada worker vuelca a la cache cada METRICAS_FLUSH_SEGUNDOS y al apagarse.
+"""
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from celery import current_task
+from django.conf import settings
+
+from webapp.services import metricas
+
+HEADER_ENCOLADA = "encolada"
+
+ESTADOS = {
+    "SUCCESS": "ok",
+    "FAILURE": "fallo",
+    "RETRY": "reintento",
+    "IGNORED": "ignorada",
+    "REJECTED": "rechazada",
+}
+
+_en_curso = {}   # task_id -> {"inicio": perf_counter, "omitida": motivo | None}
+
+
+def _activa() -> bool:
+    return getattr(settings, "METRICAS_TAREAS", True)
+
+
+def _segundos_epoch(valor) -> float | None:
+    if valor is None:
+        return None
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    try:
+        return datetime.fromisoformat(str(valor)).timestamp()
+    except ValueError:
+        return None
+
+
+# ================================================================
+# GANCHOS (llamados desde signals.py)
+# ================================================================
+
+def marcar_encolado(headers: dict | None):
+    """before_task_publish: hora de encolado en los headers (protocolo 2). Los reintentos la renuevan."""
+    if _activa() and headers is not None and "task" in headers:
+        headers[HEADER_ENCOLADA] = time.time()
+
+
+def inicio(task_id: str, task):
+    if not _activa() or not task_id:
+        return
+    _en_curso[task_id] = {"inicio": time.perf_counter(), "omitida": None}
+
+    request = task.request
+    encolada = getattr(request, HEADER_ENCOLADA, None) or (getattr(request, "headers", None) or {}).get(HEADER_ENCOLADA)
+    desde = max(filter(None, [_segundos_epoch(encolada), _segundos_epoch(request.eta)]), default=None)
+    if desde is not None:
+        metricas.observar("webapp_tarea_espera_segundos", (("tarea", task.name),), max(0.0, time.time() - desde))
+
+
+def marcar_omitida(motivo: str = "lock"):
+    """Desde dentro de una tarea: esta ejecución no hizo nada (p. ej. lock tomado por otra)."""
+    task = current_task
+    en_curso = _en_curso.get(task.request.id) if task else None
+    if en_curso is not None:
+        en_curso["omitida"] = motivo
+
+
+def fin(task_id: str, task, estado: str, retval=None):
+    en_curso = _en_curso.pop(task_id, None)
+    if en_curso is None:
+        return
+    segundos = time.perf_counter() - en_curso["inicio"]
+
+    motivo = en_curso["omitida"]
+    if motivo is None and isinstance(retval, dict) and retval.get("skipped"):
+        motivo = str(retval["skipped"])
+    estado = "omitida" if motivo else ESTADOS.get(estado, str(estado).lower())
+
+    if motivo:
+        metricas.sumar("webapp_tarea_omitidas_total", (("tarea", task.name), ("motivo", motivo)))
+    metricas.observar("webapp_tarea_duracion_segundos", (("tarea", task.name), ("estado", estado)), segundos)
+    metricas.volcar()
+
+
+def reintento(task):
+    if _activa():
+        metricas.sumar("webapp_tarea_reintentos_total", (("tarea", task.name),))
+
+
+def fallo(task, exception):
+    if _activa():
+        metricas.sumar("webapp_tarea_fallos_total", (("tarea", task.name), ("excepcion", type(exception).__name__)))
+
+
+# ================================================================
+# RESUMEN POR TAREA (celery_top)
+# ================================================================
+
+def resumen() -> list[dict]:
+    """Una fila por tarea con lo acumulado por todos los workers (segundos; None si no hay datos)."""
+    leidas = metricas.leer()
+    buckets = metricas.METRICAS["webapp_tarea_duracion_segundos"][2]
+    filas = defaultdict(lambda: {
+        "ejecuciones": 0, "por_estado": defaultdict(int), "segundos": 0.0, "buckets": [0] * (len(buckets) + 1),
+        "esperas": 0, "espera_segundos": 0.0, "espera_buckets": [0] * (len(buckets) + 1),
+        "reintentos": 0, "fallos": 0, "omitidas": 0,
+    })
+
+    for etiquetas, v in leidas.get("webapp_tarea_duracion_segundos", []):
+        e = dict(etiquetas)
+        f = filas[e["tarea"]]
+        f["ejecuciones"] += v["count"]
+        f["por_estado"][e["estado"]] += v["count"]
+        f["segundos"] += v["sum"]
+        f["buckets"] = [a + b for a, b in zip(f["buckets"], v["buckets"])]
+    for etiquetas, v in leidas.get("webapp_tarea_espera_segundos", []):
+        f = filas[dict(etiquetas)["tarea"]]
+        f["esperas"] += v["count"]
+        f["espera_segundos"] += v["sum"]
+        f["espera_buckets"] = [a + b for a, b in zip(f["espera_buckets"], v["buckets"])]
+    for metrica, campo in (("webapp_tarea_reintentos_total", "reintentos"),
+                           ("webapp_tarea_fallos_total", "fallos"),
+                           ("webapp_tarea_omitidas_total", "omitidas")):
+        for etiquetas, v in leidas.get(metrica, []):
+            filas[dict(etiquetas)["tarea"]][campo] += v["valor"]
+
+    resultado = []
+    for tarea, f in filas.items():
+        resultado.append({
+            "tarea": tarea,
+            "ejecuciones": f["ejecuciones"],
+            "ok": f["por_estado"]["ok"],
+            "fallos": f["fallos"],
+            "reintentos": f["reintentos"],
+            "omitidas": f["omitidas"],
+            "segundos": f["segundos"],
+            "media": f["segundos"] / f["ejecuciones"] if f["ejecuciones"] else None,
+            "p95": metricas.cuantil(buckets, f["buckets"], 0.95),
+            "espera_media": f["espera_segundos"] / f["esperas"] if f["esperas"] else None,
+            "espera_p95": metricas.cuantil(buckets, f["espera_buckets"], 0.95),
+        })
+    return resultado
@@ -1,29 +1,24 @@
 from datetime import datetime, timedelta
-from decimal import Decimal
-import secrets
 from celery import shared_task
 from celery.exceptions import MaxRetriesExceededError, Ignore
-from django.core.mail import send_mail, EmailMultiAlternatives
+from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.template.loader import render_to_string
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
-from django.db.models import  F, OuterRef, Subquery
+from django.db.models import  F
 
 from webapp.services.invoice_retry import retry_factura_numdoc
 from webapp.services.invoice_sync import sync_facturas_pendientes
+from webapp.services.rate_impact import recalcular_pendientes
+from webapp.services import auditoria_archivo, auditoria_transacciones, limites, rates_newsletter, stock_holds, telemetria_tareas
 
-from .models import Currency, ClienteUsuario, CustomUser, EmailScheduleConfig, ExpiracionTransaccionConfig, LimiteIntercambioCliente, LimiteIntercambioConfig, LimiteIntercambioScheduleConfig, MFACode, SyncLog, Tauser, Transaccion, CuentaBancariaNegocio
+from .models import CustomUser, EmailScheduleConfig, ExpiracionTransaccionConfig, MFACode, SyncLog, Tauser, Transaccion, CuentaBancariaNegocio
 from .views.payments.pagos_simulados_a_clientes import pagar_al_cliente
 
 from django.utils import timezone
 
-from django.utils.http import urlsafe_base64_encode
-from django.utils.encoding import force_bytes
-
 import logging
-import calendar
 from django.core.cache import cache
 from webapp.emails import send_fallo_acreditacion_email
 
@@ -42,6 +37,7 @@ def check_and_send_exchange_rates():
     # ---- Lock to prevent duplicate runs ----
     if cache.get("check_and_send_exchange_rates_lock"):
         logger.warning("Skipping run — another check_and_send_exchange_rates task is still active.")
+        telemetria_tareas.marcar_omitida()
         return
     cache.set("check_and_send_exchange_rates_lock", True, timeout=LOCK_EXPIRE)
 
@@ -89,15 +85,24 @@ def check_and_send_exchange_rates():
         cache.delete("check_and_send_exchange_rates_lock")
 
 
+NEWSLETTER_LOCK = "send_exchange_rates_newsletter_lock"
+
+
 @shared_task
 def _send_to_all_users():
     """
-    Dispatches one subtask per user, staggered to avoid rate limits.
+    Sends the exchange-rate newsletter to every subscriber in one batched run
+    (services/rates_newsletter.py): prices and table fragments computed once,
+    one mail connection, throughput limited by a token bucket.
     """
-    users = CustomUser.objects.filter(is_active=True, receive_exchange_emails=True).exclude(email="")
-    for i, user in enumerate(users):
-        # space out each email by 2 seconds
-        send_exchange_rates_email.apply_async(args=[user.id], countdown=i * 2)
+    if not cache.add(NEWSLETTER_LOCK, True, timeout=getattr(settings, "NEWSLETTER_LOCK_SECONDS", 60 * 60)):
+        logger.warning("Skipping run — another exchange-rate newsletter is still being sent.")
+        telemetria_tareas.marcar_omitida()
+        return
+    try:
+        return rates_newsletter.enviar_a_suscriptores()
+    finally:
+        cache.delete(NEWSLETTER_LOCK)
 
 
 @shared_task
@@ -105,71 +110,7 @@ def send_exchange_rates_email(user_id):
     """
     Sends one email with exchange rates to a single user.
     """
-    try:
-        user = CustomUser.objects.get(id=user_id)
-    except CustomUser.DoesNotExist:
-        return
-
-    # generate persistent unsubscribe token
-    if not getattr(user, "unsubscribe_token", None):
-        user.unsubscribe_token = secrets.token_urlsafe(32)
-        user.save(update_fields=["unsubscribe_token"])
-
-    uidb64 = urlsafe_base64_encode(force_bytes(user.id))
-    unsubscribe_url = f"{settings.SITE_URL}/unsubscribe/{uidb64}/{user.unsubscribe_token}/"
-
-    cliente_usuarios = (
-        ClienteUsuario.objects.select_related("cliente__categoria").filter(usuario=user)
-    )
-    if not cliente_usuarios.exists():
-        cliente_usuarios = [None]
-
-    currencies = Currency.objects.filter(is_active=True).exclude(code="PYG")
-    clientes_data = []
-
-    for cu in cliente_usuarios:
-        if cu:
-            cliente = cu.cliente
-            descuento = getattr(getattr(cliente, "categoria", None), "descuento", None) or Decimal("0")
-        else:
-            cliente = None
-            descuento = Decimal("0")
-
-        monedas_info = []
-        for c in currencies:
-            precio_compra = c.base_price - (c.comision_compra * (Decimal("1") - descuento))
-            precio_venta = c.base_price + (c.comision_venta * (Decimal("1") - descuento))
-            monedas_info.append({
-                "name": c.name,
-                "code": c.code,
-                "precio_compra": f"{precio_compra:.2f}",
-                "precio_venta": f"{precio_venta:.2f}",
-            })
-
-        clientes_data.append({
-            "cliente": cliente,
-            "descuento": f"{(descuento * 100):.0f}%" if descuento else "0%",
-            "monedas": monedas_info,
-        })
-
-    context = {
-        "user": user,
-        "clientes_data": clientes_data,
-        "unsubscribe_url": unsubscribe_url,
-    }
-
-    text_content = render_to_string("emails/exchange_rates.txt", context)
-    html_content = render_to_string("emails/exchange_rates.html", context)
-
-    subject = "Simulador - Tasas de cambio"
-    from_email = getattr(settings, "DEFAULT_FROM_EMAIL", "noreply@simulador.com")
-    email = EmailMultiAlternatives(subject, text_content, from_email, [user.email])
-    email.attach_alternative(html_content, "text/html")
-
-    try:
-        email.send(fail_silently=False)
-    except Exception as e:
-        print(f"Error sending email to {user.email}: {e}")
+    return rates_newsletter.enviar_a_suscriptores(CustomUser.objects.filter(id=user_id))
 
 @shared_task
 def send_welcome_email(user_email):
@@ -188,6 +129,46 @@ def cleanup_expired_mfa_codes():
     MFACode.objects.filter(created_at__lt=timezone.now() - timedelta(hours=1)).delete()
 
 
+def _cancelar_y_liberar(vencidas) -> int:
+    """Cancela las transacciones vencidas y devuelve en bloque los billetes reservados y el cupo consumido."""
+    with transaction.atomic():
+        # Bloqueadas: ninguna puede pagarse entre la lectura y la cancelación
+        ids = list(vencidas.select_for_update().values_list("id", flat=True))
+        cantidad = auditoria_transacciones.actualizar(
+            Transaccion.objects.filter(id__in=ids, estado=Transaccion.Estado.PENDIENTE),
+            origen="tarea",
+            estado=Transaccion.Estado.CANCELADA,
+            fecha_actualizacion=timezone.now(),
+        )
+        stock_holds.liberar(ids)
+        limites.restaurar(ids)
+    return cantidad
+
+
+@shared_task
+def liberar_holds_stock_vencidos():
+    """Red de seguridad: libera holds de stock de Tauser cuyo vencimiento ya pasó."""
+    return stock_holds.liberar_vencidos()
+
+
+AUDITORIA_ARCHIVO_LOCK = "archivar_auditoria_transacciones_lock"
+
+
+@shared_task
+def archivar_auditoria_transacciones():
+    """Pasa la auditoría vieja a los archivos mensuales comprimidos (services/auditoria_archivo.py)."""
+    if not cache.add(AUDITORIA_ARCHIVO_LOCK, True, timeout=6 * 60 * 60):
+        logger.warning("Archivado de auditoría ya en ejecución. Omitiendo.")
+        telemetria_tareas.marcar_omitida()
+        return None
+    try:
+        resumen = auditoria_archivo.archivar()
+        logger.info("Auditoría archivada: %s", resumen)
+        return resumen
+    finally:
+        cache.delete(AUDITORIA_ARCHIVO_LOCK)
+
+
 @shared_task
 def cancelar_transacciones_vencidas_cbn():
     """Expira transacciones con medio 'Transferencia' según la config definida en el panel."""
@@ -195,7 +176,8 @@ def cancelar_transacciones_vencidas_cbn():
         config = ExpiracionTransaccionConfig.objects.get(medio="cuenta_bancaria_negocio")
         limite_min = config.minutos_expiracion
     except ExpiracionTransaccionConfig.DoesNotExist:
-        print("[WARN] No existe configuración para 'Transferencia'. No se ejecuta.")
+        logger.warning("No existe configuración de expiración para 'Transferencia'. No se ejecuta.")
+        telemetria_tareas.marcar_omitida("sin_config")
         return
 
     limite_tiempo = timezone.now() - timedelta(minutes=limite_min)
@@ -207,8 +189,8 @@ def cancelar_transacciones_vencidas_cbn():
         fecha_creacion__lt=limite_tiempo,
     )
 
-    cantidad = vencidas.update(estado=Transaccion.Estado.CANCELADA)
-    print(f"[INFO] {cantidad} transacciones con Transferencia canceladas automáticamente (> {limite_min} min).")
+    cantidad = _cancelar_y_liberar(vencidas)
+    logger.info("%s transacciones con Transferencia canceladas automáticamente (> %s min).", cantidad, limite_min)
 
 
 @shared_task
@@ -218,7 +200,8 @@ def cancelar_transacciones_vencidas_tauser():
         config = ExpiracionTransaccionConfig.objects.get(medio="tauser")
         limite_min = config.minutos_expiracion
     except ExpiracionTransaccionConfig.DoesNotExist:
-        print("[WARN] No existe configuración para 'Tauser'. No se ejecuta.")
+        logger.warning("No existe configuración de expiración para 'Tauser'. No se ejecuta.")
+        telemetria_tareas.marcar_omitida("sin_config")
         return
 
     limite_tiempo = timezone.now() - timedelta(minutes=limite_min)
@@ -230,8 +213,18 @@ def cancelar_transacciones_vencidas_tauser():
         fecha_creacion__lt=limite_tiempo,
     )
 
-    cantidad = vencidas.update(estado=Transaccion.Estado.CANCELADA)
-    print(f"[INFO] {cantidad} transacciones con Tauser canceladas automáticamente (> {limite_min} min).")
+    cantidad = _cancelar_y_liberar(vencidas)
+    logger.info("%s transacciones con Tauser canceladas automáticamente (> %s min).", cantidad, limite_min)
+
+
+@shared_task
+def recalcular_transacciones_pendientes_task(moneda=None):
+    """
+    Recalcula las transacciones PENDIENTES tras un cambio de cotización,
+    categoría o método global: marca `cambio_pendiente` y avisa por correo.
+    Se encola desde las vistas del admin para no bloquear el request.
+    """
+    return recalcular_pendientes(moneda)
 
 
 # Resetear límites de intercambio
@@ -240,74 +233,26 @@ LOCK_KEY = "check_and_reset_limites_intercambio_lock"
 @shared_task
 def check_and_reset_limites_intercambio():
     """
-    Ejecuta el reset GLOBAL con tolerancia de ±3 minutos:
-      - DAILY   → resetea limite_dia_actual
-      - MONTHLY → resetea limite_mes_actual
-    Cada uno se ejecuta solo si:
-      - is_active=True
-      - estamos dentro del minuto exacto o los 2 siguientes (tolerancia)
-      - no fue ejecutado ya en este mismo día/mes (anti doble ejecución)
+    Compactación de los límites de intercambio (ver services/limites.py).
+
+    Cada saldo guarda su período y, si quedó viejo, se lee como renovado y se
+    renueva al primer consumo. Esta tarea solo normaliza en lotes los saldos
+    viejos de clientes que no operaron (LIMITES_COMPACTAR=False la desactiva).
     """
+    if not getattr(settings, "LIMITES_COMPACTAR", True):
+        return 0
 
     if cache.get(LOCK_KEY):
-        logger.warning("⏭️  Reset ya en ejecución. Omitiendo este tick.")
-        return
+        logger.warning("⏭️  Compactación de límites ya en ejecución. Omitiendo este tick.")
+        telemetria_tareas.marcar_omitida()
+        return 0
     cache.set(LOCK_KEY, True, timeout=LOCK_EXPIRE)
 
     try:
-        now = timezone.localtime()
-        now_minute_key = now.strftime("%Y-%m-%d %H:%M")  # resolución minuto
-
-        # ---------- DAILY ----------
-        config_daily = LimiteIntercambioScheduleConfig.get_by_frequency("daily")
-        if config_daily.is_active:
-            target_time = now.replace(hour=config_daily.hour, minute=config_daily.minute, second=0, microsecond=0)
-            diff_seconds = abs((now - target_time).total_seconds())
-
-            # <= 180 segundos de tolerancia (3 minutos)
-            if diff_seconds <= 180:
-                # Evitar repetir si ya se ejecutó este mismo día
-                if not config_daily.last_executed_at or config_daily.last_executed_at.strftime("%Y-%m-%d") != now.strftime("%Y-%m-%d"):
-                    with transaction.atomic():
-                        tope_dia_subq = LimiteIntercambioConfig.objects.filter(
-                            id=OuterRef("config_id")
-                        ).values("limite_dia_max")[:1]
-
-                        updated = LimiteIntercambioCliente.objects.update(
-                            limite_dia_actual=Subquery(tope_dia_subq)
-                        )
-                        config_daily.last_executed_at = now
-                        config_daily.save(update_fields=["last_executed_at"])
-
-                    logger.info(f"✅ Reset DIARIO aplicado. {updated} filas afectadas.")
-                else:
-                    logger.info("⏭️ Reset diario ya se ejecutó hoy. Ignorando.")
-
-        # ---------- MONTHLY ----------
-        config_monthly = LimiteIntercambioScheduleConfig.get_by_frequency("monthly")
-        if config_monthly.is_active and config_monthly.month_day:
-            last_day = calendar.monthrange(now.year, now.month)[1]
-            run_day = min(config_monthly.month_day, last_day)
-            if now.day == run_day:
-                target_time = now.replace(hour=config_monthly.hour, minute=config_monthly.minute, second=0, microsecond=0)
-                diff_seconds = abs((now - target_time).total_seconds())
-
-                if diff_seconds <= 180:
-                    if not config_monthly.last_executed_at or config_monthly.last_executed_at.strftime("%Y-%m") != now.strftime("%Y-%m"):
-                        with transaction.atomic():
-                            tope_mes_subq = LimiteIntercambioConfig.objects.filter(
-                                id=OuterRef("config_id")
-                            ).values("limite_mes_max")[:1]
-
-                            updated = LimiteIntercambioCliente.objects.update(
-                                limite_mes_actual=Subquery(tope_mes_subq)
-                            )
-                            config_monthly.last_executed_at = now
-                            config_monthly.save(update_fields=["last_executed_at"])
-
-                        logger.info(f"✅ Reset MENSUAL aplicado. {updated} filas afectadas.")
-                    else:
-                        logger.info("⏭️ Reset mensual ya se ejecutó este mes. Ignorando.")
+        filas = limites.compactar()
+        if filas:
+            logger.info(f"✅ Límites compactados al período vigente. {filas} filas normalizadas.")
+        return filas
 
     except Exception as e:
         logger.exception(f"💥 Error en check_and_reset_limites_intercambio: {e}")
@@ -349,6 +294,7 @@ def pagar_al_cliente_task(self, transaccion_id: int) -> None:
                 transaccion.id, transaccion.estado
             )
             # No reintentar ni marcar error: simplemente se ignora.
+            telemetria_tareas.marcar_omitida("estado")
             raise Ignore()
 
     try:
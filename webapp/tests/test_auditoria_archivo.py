@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Categoria, Cliente, Currency, CustomUser, Tauser, Transaccion, TransaccionAuditoria
+from ..services import auditoria_archivo
+
+
+class AuditoriaArchivoTests(TestCase):
+    """Archivado comprimido de la auditoría y lectura transparente del historial"""
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        categoria = Categoria.objects.create(nombre="AA Cat", descuento=Decimal("0"))
+        self.cliente = Cliente.objects.create(nombre="Cliente AA", documento="11223399", categoria=categoria)
+        self.user = CustomUser.objects.create_user(username="aa_user", password="x", email="aa@example.com")
+        self.tauser = Tauser.objects.create(nombre="Tauser AA", ubicacion="AA")
+
+    def _transaccion(self):
+        ct = ContentType.objects.get_for_model(Tauser)
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaccion.objects.create(
+                cliente=self.cliente, usuario=self.user, tipo=Transaccion.Tipo.VENTA,
+                moneda_origen=self.pyg, moneda_destino=self.usd, tasa_cambio=Decimal("7500"),
+                monto_origen=Decimal("750000"), monto_destino=Decimal("100"),
+                medio_pago_type=ct, medio_pago_id=self.tauser.id, medio_cobro_type=ct, medio_cobro_id=self.tauser.id,
+            )
+
+    def _cambiar(self, t, estado, dias_atras):
+        t.estado = estado
+        with self.captureOnCommitCallbacks(execute=True):
+            t.save(update_fields=["estado"])
+        ultimo = TransaccionAuditoria.objects.filter(transaccion=t).latest("id")
+        TransaccionAuditoria.objects.filter(pk=ultimo.pk).update(fecha_snapshot=timezone.now() - timedelta(days=dias_atras))
+
+    def test_archiva_por_mes_y_el_historial_une_tabla_y_archivos(self):
+        a, b = self._transaccion(), self._transaccion()
+        TransaccionAuditoria.objects.update(fecha_snapshot=timezone.now() - timedelta(days=120))
+        self._cambiar(a, Transaccion.Estado.PAGADA, 80)
+        self._cambiar(b, Transaccion.Estado.CANCELADA, 75)
+        self._cambiar(a, Transaccion.Estado.COMPLETA, 1)  # queda en la tabla
+
+        resumen = auditoria_archivo.archivar(dias=30, lote=1)
+        self.assertEqual(resumen["filas"], 4)
+        self.assertEqual(TransaccionAuditoria.objects.count(), 1)
+        self.assertTrue(all(m["archivo"].endswith(".jsonl.gz") for m in auditoria_archivo.leer_indice()))
+
+        historial = auditoria_archivo.historial(a.id)
+        self.assertEqual(
+            [h["estado"] for h in historial],
+            [Transaccion.Estado.PENDIENTE, Transaccion.Estado.PAGADA, Transaccion.Estado.COMPLETA],
+        )
+        self.assertEqual(historial[0]["cambios"]["monto_destino"], "100")
+        self.assertEqual(historial[0]["transaccion_id"], a.id)
+        self.assertEqual([h["estado"] for h in auditoria_archivo.historial(b.id)][-1], Transaccion.Estado.CANCELADA)
+
+        # Segunda pasada: no queda nada por archivar
+        call_command("archivar_auditoria", dias=30, stdout=StringIO())
+        self.assertEqual(len(auditoria_archivo.historial(a.id)), 3)
+
+    def test_lote_archivado_pero_no_borrado_no_se_duplica(self):
+        t = self._transaccion()
+        TransaccionAuditoria.objects.update(fecha_snapshot=timezone.now() - timedelta(days=90))
+        filas = list(TransaccionAuditoria.objects.values(*auditoria_archivo.COLUMNAS))
+        auditoria_archivo.directorio().mkdir(parents=True)
+        # Simula un corte entre escribir el miembro y borrar las filas
+        auditoria_archivo._guardar_indice([auditoria_archivo._escribir_miembro("x.jsonl.gz", filas)])
+        self.assertEqual(len(auditoria_archivo.historial(t.id)), 1)
+        auditoria_archivo.archivar(dias=30)
+        self.assertEqual(len(auditoria_archivo.historial(t.id)), 1)
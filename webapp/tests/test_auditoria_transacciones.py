@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.test import TestCase
+
+from ..models import Categoria, Cliente, Currency, CustomUser, Tauser, Transaccion, TransaccionAuditoria
+from ..services import auditoria_transacciones
+
+
+class AuditoriaTransaccionesTests(TestCase):
+    """Auditoría de transacciones por diferencias, escrita en lote al confirmar"""
+
+    def setUp(self):
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        categoria = Categoria.objects.create(nombre="AT Cat", descuento=Decimal("0"))
+        self.cliente = Cliente.objects.create(nombre="Cliente AT", documento="99887766", categoria=categoria)
+        self.user = CustomUser.objects.create_user(username="at_user", password="x", email="at@example.com")
+        self.tauser = Tauser.objects.create(nombre="Tauser AT", ubicacion="AT")
+
+    def _transaccion(self):
+        ct = ContentType.objects.get_for_model(Tauser)
+        return Transaccion.objects.create(
+            cliente=self.cliente, usuario=self.user, tipo=Transaccion.Tipo.VENTA,
+            moneda_origen=self.pyg, moneda_destino=self.usd, tasa_cambio=Decimal("7500"),
+            monto_origen=Decimal("750000"), monto_destino=Decimal("100"),
+            medio_pago_type=ct, medio_pago_id=self.tauser.id, medio_cobro_type=ct, medio_cobro_id=self.tauser.id,
+        )
+
+    def _cambios(self, t):
+        return list(TransaccionAuditoria.objects.filter(transaccion=t).order_by("id").values_list("cambios", flat=True))
+
+    def test_solo_diferencias(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                t = self._transaccion()
+                t.cambio_pendiente = True
+                t.save(update_fields=["cambio_pendiente"])
+                t.save()  # sin cambios: no deja registro
+        self.assertEqual(len(callbacks), 2)
+
+        creacion, cambio = self._cambios(t)
+        self.assertEqual(creacion["monto_destino"], "100")
+        self.assertEqual(creacion["moneda_origen_id"], self.pyg.id)
+        self.assertEqual(cambio, {"cambio_pendiente": True})
+
+    def test_save_de_instancia_leida_compara_contra_la_base(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            t = self._transaccion()
+        t = Transaccion.objects.get(pk=t.pk)
+        t.estado = Transaccion.Estado.PAGADA
+        t.monto_destino = Decimal("100.00")  # mismo valor: no cuenta
+        with self.captureOnCommitCallbacks(execute=True):
+            # Sin consulta extra por el estado anterior ni por las monedas
+            with self.assertNumQueries(1):
+                t.save()
+        cambio = self._cambios(t)[-1]
+        self.assertEqual(set(cambio), {"estado", "fecha_pago"})
+        self.assertEqual(TransaccionAuditoria.objects.filter(transaccion=t).last().estado, Transaccion.Estado.PAGADA)
+
+    def test_rollback_no_escribe(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            t = self._transaccion()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        t.cambio_pendiente = True
+                        t.save(update_fields=["cambio_pendiente"])
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+                t.estado = Transaccion.Estado.CANCELADA
+                t.save(update_fields=["estado"])
+        self.assertEqual(self._cambios(t)[1:], [{"estado": Transaccion.Estado.CANCELADA}])
+
+    def test_actualizar_en_bloque_audita(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            a, b = self._transaccion(), self._transaccion()
+        with self.captureOnCommitCallbacks(execute=True):
+            cantidad = auditoria_transacciones.actualizar(
+                Transaccion.objects.filter(pk__in=[a.pk, b.pk]), origen="tarea", estado=Transaccion.Estado.CANCELADA,
+            )
+        self.assertEqual(cantidad, 2)
+        for t in (a, b):
+            ultimo = TransaccionAuditoria.objects.filter(transaccion=t).last()
+            self.assertEqual((ultimo.origen, ultimo.estado), ("tarea", Transaccion.Estado.CANCELADA))
+            self.assertEqual(ultimo.cambios, {"estado": Transaccion.Estado.CANCELADA})
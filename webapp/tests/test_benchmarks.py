@@ -0,0 +1,48 @@
+import json
+import tempfile
+from dataclasses import replace
+from datetime import date
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, tag
+
+from .. import benchmarks
+from ..models import Factura
+from ..services import dataset_sintetico
+
+
+@tag("benchmark")
+class BenchmarksTests(TestCase):
+    """Suite de benchmarks: todos los caminos corren y respetan su presupuesto de consultas"""
+
+    @classmethod
+    def setUpTestData(cls):
+        dataset_sintetico.generar(clientes=25, transacciones=600, tausers=3, dias=30, seed=5, fin=date(2026, 6, 30))
+
+    def test_casos_dentro_del_presupuesto_de_consultas(self):
+        resultado = benchmarks.correr(repeticiones=2, factor_latencia=0)
+
+        self.assertEqual(set(resultado["casos"]), {c.nombre for c in benchmarks.CASOS})
+        for nombre, r in resultado["casos"].items():
+            self.assertEqual(r["excedidos"], [], nombre)
+        self.assertTrue(resultado["ok"])
+        # Los savepoints se descartan: la sincronización no dejó facturas emitidas
+        self.assertFalse(Factura.objects.filter(estado="emitida").exists())
+
+    def test_comando_escribe_json_y_falla_si_se_excede(self):
+        salida = Path(tempfile.mkdtemp()) / "bench.json"
+        ajustados = [replace(c, max_consultas=0) if c.nombre == "transaccion_list" else c for c in benchmarks.CASOS]
+
+        with mock.patch.object(benchmarks.casos, "CASOS", ajustados), self.assertRaises(CommandError):
+            call_command("run_benchmarks", "--solo", "transaccion_list", "--solo", "api_active_currencies",
+                         "--repeticiones", "1", "--factor-latencia", "0", "--salida", str(salida), stdout=StringIO())
+
+        resultado = json.loads(salida.read_text(encoding="utf-8"))
+        self.assertFalse(resultado["ok"])
+        self.assertEqual(set(resultado["casos"]), {"transaccion_list", "api_active_currencies"})
+        self.assertTrue(resultado["casos"]["transaccion_list"]["excedidos"])
+        self.assertEqual(resultado["casos"]["api_active_currencies"]["excedidos"], [])
@@ -0,0 +1,29 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+
+from ..services import cache_version
+
+
+class CacheVersionTests(TestCase):
+    """Contadores de versión compartidos por las caches derivadas"""
+
+    CLAVE = "test:cache_version"
+
+    def setUp(self):
+        cache.delete(self.CLAVE)
+        self.addCleanup(cache.delete, self.CLAVE)
+
+    def test_incrementar_arranca_en_uno(self):
+        self.assertEqual(cache_version.leer(self.CLAVE), 0)
+        self.assertEqual(cache_version.incrementar(self.CLAVE), 1)
+        self.assertEqual(cache_version.incrementar(self.CLAVE), 2)
+
+    def test_invalidar_vuelve_a_incrementar_al_confirmar(self):
+        confirmados = []
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                cache_version.invalidar(self.CLAVE, al_confirmar=lambda: confirmados.append(True))
+                self.assertEqual(cache_version.leer(self.CLAVE), 1)
+        self.assertEqual(cache_version.leer(self.CLAVE), 2)
+        self.assertEqual(confirmados, [True])
@@ -0,0 +1,72 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..models import Currency, CurrencyDenomination, Tauser, TauserCurrencyStock
+from ..services import cambio_billetes
+from ..views.compraventa_y_conversión import tauser_puede_entregar, tauser_puede_recibir
+
+
+class CambioBilletesTests(SimpleTestCase):
+    """Cambio exacto con la menor cantidad de billetes"""
+
+    def test_juego_no_canonico_con_stock(self):
+        # El greedy tomaba un 50 y quedaba 10 sin poder entregar
+        desglose = cambio_billetes.resolver(60, [(50, 3), (20, 5)])
+        self.assertEqual(desglose.billetes, ((Decimal("20"), 3),))
+        self.assertEqual(desglose.monto, Decimal("60"))
+
+    def test_minimiza_billetes(self):
+        desglose = cambio_billetes.resolver_ilimitado(6, [1, 3, 4])
+        self.assertEqual(desglose.billetes, ((Decimal("3"), 2),))
+        self.assertEqual(desglose.cantidad_billetes, 2)
+
+    def test_respeta_el_stock(self):
+        desglose = cambio_billetes.resolver(170, [(100, 1), (50, 1), (20, 1), (10, 10)])
+        self.assertEqual(desglose.cantidad_billetes, 3)
+        self.assertIsNone(cambio_billetes.resolver(300, [(100, 1), (50, 2)]))
+
+    def test_montos_no_armables(self):
+        self.assertIsNone(cambio_billetes.resolver(30, [(50, 1), (20, 5)]))
+        self.assertIsNone(cambio_billetes.resolver(Decimal("10.005"), [(1, None)]))
+        self.assertIsNone(cambio_billetes.resolver(0, [(1, None)]))
+        self.assertIsNone(cambio_billetes.resolver(10, []))
+
+    @override_settings(CAMBIO_MAX_ESTADOS=1)
+    def test_presupuesto_agotado_es_no_factible(self):
+        cambio_billetes.limpiar_memo()
+        self.assertIsNone(cambio_billetes.resolver(9999, [(100, 10), (50, 10), (20, 10), (7, 10000)]))
+        cambio_billetes.limpiar_memo()
+
+
+class CambioTauserTests(TestCase):
+    """Chequeos de factibilidad del Tauser"""
+
+    def setUp(self):
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        self.tauser = Tauser.objects.create(nombre="Tauser CB", ubicacion="CB")
+        for valor, qty in [(50, 2), (20, 3)]:
+            denom, _ = CurrencyDenomination.objects.get_or_create(currency=self.usd, value=Decimal(valor))
+            TauserCurrencyStock.objects.create(tauser=self.tauser, currency=self.usd, denomination=denom, quantity=qty)
+
+    def _stock(self):
+        return dict(
+            TauserCurrencyStock.objects.filter(tauser=self.tauser)
+            .values_list("denomination__value", "quantity")
+        )
+
+    def test_factibilidad(self):
+        self.assertTrue(tauser_puede_entregar(self.tauser, self.usd, Decimal("60")))
+        self.assertFalse(tauser_puede_entregar(self.tauser, self.usd, Decimal("170")))
+        self.assertTrue(tauser_puede_recibir(self.tauser, self.usd, Decimal("110")))
+        self.assertFalse(tauser_puede_recibir(self.tauser, self.usd, Decimal("15")))
+
+    def test_benchmark(self):
+        salida = StringIO()
+        call_command("benchmark_cambio", tablas=2, montos=20, stdout=salida)
+        self.assertIn("Greedy rechazó montos factibles", salida.getvalue())
+        self.assertIn("llamadas/s", salida.getvalue())
@@ -0,0 +1,64 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..models import Currency, CurrencyDenomination, TipoPago
+from ..services import catalog_registry
+
+
+class CatalogRegistryTests(TestCase):
+    """Pruebas del registro de catálogos en memoria"""
+
+    def setUp(self):
+        cache.clear()
+        catalog_registry.invalidar()
+        self.moneda = Currency.objects.create(
+            code="CRX", name="Moneda CR", base_price=Decimal("500"),
+            comision_venta=Decimal("10"), comision_compra=Decimal("5"), is_active=True,
+        )
+        CurrencyDenomination.objects.create(currency=self.moneda, value=Decimal("10"))
+        CurrencyDenomination.objects.create(currency=self.moneda, value=Decimal("50"))
+        self.tipo = TipoPago.objects.create(nombre="Pago CR Test", activo=True, comision=Decimal("1.5"))
+
+    def test_busquedas_sin_consultas(self):
+        catalog_registry.snapshot()
+        with self.assertNumQueries(0):
+            self.assertEqual(catalog_registry.moneda("CRX").base_price, Decimal("500"))
+            self.assertEqual(catalog_registry.moneda_por_id(self.moneda.id).code, "CRX")
+            self.assertEqual([d.value for d in catalog_registry.denominaciones("CRX")], [Decimal("50"), Decimal("10")])
+            self.assertEqual(catalog_registry.tipo_pago(self.tipo.id).comision, Decimal("1.5"))
+            self.assertEqual(catalog_registry.tipo_pago_por_nombre("pago_cr test").id, self.tipo.id)
+
+    def test_inexistente_levanta_does_not_exist(self):
+        with self.assertRaises(Currency.DoesNotExist):
+            catalog_registry.moneda("???")
+        with self.assertRaises(TipoPago.DoesNotExist):
+            catalog_registry.tipo_pago("no-es-un-id")
+
+    def test_entradas_inmutables(self):
+        with self.assertRaises(Exception):
+            catalog_registry.moneda("CRX").base_price = Decimal("1")
+
+    def test_guardar_invalida(self):
+        catalog_registry.snapshot()
+        self.moneda.base_price = Decimal("600")
+        self.moneda.save()
+        self.assertEqual(catalog_registry.moneda("CRX").base_price, Decimal("600"))
+
+    @override_settings(CATALOG_REGISTRY_CHECK_SECONDS=0)
+    def test_version_compartida_recarga_otros_procesos(self):
+        """Si otro proceso incrementa la versión, este recarga aunque no haya recibido la señal"""
+        viejo = catalog_registry.snapshot()
+        Currency.objects.filter(pk=self.moneda.pk).update(base_price=Decimal("700"))
+        self.assertIs(catalog_registry.snapshot(), viejo)
+
+        cache.incr(catalog_registry.KEY_VERSION)
+        self.assertEqual(catalog_registry.moneda("CRX").base_price, Decimal("700"))
+
+    @override_settings(CATALOG_REGISTRY_MAX_SECONDS=0)
+    def test_snapshot_vencido_se_recarga(self):
+        """Un cambio que no pasa por señales ni por la versión se ve al vencer el snapshot"""
+        catalog_registry.snapshot()
+        Currency.objects.filter(pk=self.moneda.pk).update(base_price=Decimal("800"))
+        self.assertEqual(catalog_registry.moneda("CRX").base_price, Decimal("800"))
@@ -187,4 +187,25 @@ class CurrencyTests(TestCase):
         response = self.client.get(reverse('modify_currency', kwargs={'currency_id': self.currency.id}))
         self.assertEqual(response.status_code, 200)
         # Verificar que muestra el código de la moneda (más confiable que el nombre)
-        self.assertContains(response, 'USD')
\ No newline at end of file
+        self.assertContains(response, 'USD')
+    def test_api_currency_history_etag(self):
+        """El histórico responde 304 mientras la moneda no cambie"""
+        url = reverse('api_currency_history')
+        params = {'code': 'USD', 'range': 'year'}
+
+        primera = self.client.get(url, params)
+        self.assertEqual(primera.status_code, 200)
+        self.assertTrue(primera.has_header('ETag'))
+
+        segunda = self.client.get(url, params, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(segunda.status_code, 304)
+
+        # Otro rango es otro recurso
+        otro_rango = self.client.get(url, {'code': 'USD', 'range': 'week'}, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(otro_rango.status_code, 200)
+
+        # Guardar la moneda actualiza el histórico del día → nuevo ETag
+        self.currency.base_price = 800
+        self.currency.save()
+        tercera = self.client.get(url, params, HTTP_IF_NONE_MATCH=primera['ETag'])
+        self.assertEqual(tercera.status_code, 200)
@@ -0,0 +1,70 @@
+from datetime import date
+from io import StringIO
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import (
+    Cliente, CuentaBancariaCobro, Factura, LimiteIntercambioCliente, MedioCobro, MedioPago, Tauser, TauserCurrencyStock,
+    Transaccion,
+)
+from ..services import dataset_sintetico
+
+
+class DatasetSinteticoTests(TestCase):
+    """Generador de datos sintéticos para carga y benchmarks"""
+
+    PARAMS = dict(clientes=25, transacciones=400, tausers=2, dias=60, seed=3, fin=date(2026, 6, 30))
+
+    def _firma(self):
+        dataset = Transaccion.objects.filter(cliente__correo__endswith=f"@{dataset_sintetico.DOMINIO}").order_by("id")
+        return list(dataset.values_list("tipo", "estado", "monto_origen", "monto_destino", "fecha_creacion"))
+
+    def test_carga_completa_y_consistente(self):
+        resumen = dataset_sintetico.generar(**self.PARAMS)
+
+        clientes = Cliente.objects.filter(correo__endswith=f"@{dataset_sintetico.DOMINIO}")
+        self.assertEqual(clientes.count(), 25)
+        self.assertEqual(resumen[Transaccion._meta.db_table][0], 400)
+        transacciones = Transaccion.objects.filter(cliente__in=clientes)
+        self.assertEqual(set(transacciones.values_list("estado", flat=True)), set(Transaccion.Estado.values))
+        self.assertEqual(
+            Factura.objects.filter(cliente__in=clientes).count(),
+            transacciones.filter(estado__in=dataset_sintetico.CON_FACTURA, factura_asociada__isnull=False).count(),
+        )
+        self.assertFalse(transacciones.filter(estado=Transaccion.Estado.COMPLETA, fecha_pago__isnull=True).exists())
+
+        # Cada medio con su detalle y cada cliente con sus saldos de límites
+        self.assertFalse(MedioPago.objects.filter(cliente__in=clientes, tipo_pago__isnull=True).exists())
+        for medio in MedioCobro.objects.filter(cliente__in=clientes, tipo="cuenta_bancaria"):
+            self.assertEqual(CuentaBancariaCobro.objects.get(medio_cobro=medio).moneda_id, medio.moneda_id)
+        self.assertTrue(LimiteIntercambioCliente.objects.filter(cliente__in=clientes).exists())
+
+        # Las transacciones apuntan al subtipo del medio (como las que arma la app), de su mismo cliente
+        tipos_detalle = {ContentType.objects.get_for_model(m).id: m for m in (
+            *dataset_sintetico._DETALLE_PAGO.values(), *dataset_sintetico._DETALLE_COBRO.values(), Tauser)}
+        for tx in transacciones[:50]:
+            for ct, obj_id, campo in ((tx.medio_pago_type_id, tx.medio_pago_id, "medio_pago"),
+                                      (tx.medio_cobro_type_id, tx.medio_cobro_id, "medio_cobro")):
+                detalle = tipos_detalle[ct].objects.get(pk=obj_id)
+                if not isinstance(detalle, Tauser):
+                    self.assertEqual(getattr(detalle, campo).cliente_id, tx.cliente_id)
+        tausers = Tauser.objects.filter(nombre__startswith=dataset_sintetico.PREFIJO_TAUSER)
+        self.assertEqual(tausers.count(), 2)
+        self.assertTrue(TauserCurrencyStock.objects.filter(tauser__in=tausers).exists())
+
+        # Secuencias reajustadas: el ORM sigue creando sin chocar
+        Cliente.objects.create(nombre="Post dataset", documento="1", correo="post@example.com",
+                               categoria_id=clientes.first().categoria_id)
+
+    def test_misma_semilla_mismos_datos(self):
+        dataset_sintetico.generar(**self.PARAMS)
+        primera = self._firma()
+        call_command("generate_dataset", "--limpiar", "--clients", "0", "--transactions", "0", "--tausers", "0",
+                     "--days", "0", stdout=StringIO())
+        self.assertEqual(self._firma(), [])
+        self.assertFalse(Tauser.objects.filter(nombre__startswith=dataset_sintetico.PREFIJO_TAUSER).exists())
+
+        dataset_sintetico.generar(**self.PARAMS)
+        self.assertEqual(self._firma(), primera)
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Categoria, Cliente, ClienteUsuario, Currency, CustomUser, Tauser, Transaccion
+from ..services import keyset
+
+
+class HistorialPaginadoTests(TestCase):
+    """Historial de transacciones paginado por cursor (fecha_creacion, id)"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="hp_user", password="x", email="hp@example.com")
+        categoria = Categoria.objects.create(nombre="HP Cat", descuento=Decimal("0"))
+        self.cliente = Cliente.objects.create(nombre="Cliente HP", documento="66778899", categoria=categoria)
+        ClienteUsuario.objects.create(cliente=self.cliente, usuario=self.user)
+        pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        tauser = Tauser.objects.create(nombre="Tauser HP", ubicacion="Test")
+        ct = ContentType.objects.get_for_model(Tauser)
+
+        base = timezone.now()
+        self.ids = []
+        for i in range(5):
+            t = Transaccion.objects.create(
+                cliente=self.cliente, usuario=self.user, tipo="VENTA",
+                moneda_origen=pyg, moneda_destino=usd, tasa_cambio=Decimal("7600"),
+                monto_origen=Decimal("760000"), monto_destino=Decimal("100"),
+                medio_pago_type=ct, medio_pago_id=tauser.id, medio_cobro_type=ct, medio_cobro_id=tauser.id,
+                estado=Transaccion.Estado.COMPLETA,
+            )
+            # Dos filas con la misma fecha: el id desempata
+            Transaccion.objects.filter(pk=t.pk).update(fecha_creacion=base - timedelta(minutes=min(i, 3)))
+            self.ids.append(t.pk)
+
+        self.http = Client()
+        self.http.login(username="hp_user", password="x")
+        session = self.http.session
+        session["cliente_id"] = self.cliente.id
+        session.save()
+
+    def _ids(self, response):
+        return [t.pk for t in response.context["transacciones"]]
+
+    @override_settings(TRANSACCIONES_POR_PAGINA=2)
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        vistos = []
+        response = self.http.get(reverse("transaccion_list"))
+        paginas = [response]
+        while response.context["pagina"].siguiente:
+            response = self.http.get(reverse("transaccion_list"), {"despues": response.context["pagina"].siguiente})
+            paginas.append(response)
+        for r in paginas:
+            vistos.extend(self._ids(r))
+
+        self.assertEqual(len(paginas), 3)
+        self.assertEqual(sorted(vistos), sorted(self.ids))
+        self.assertEqual(len(vistos), len(set(vistos)))
+
+        # Volver una página atrás desde la última
+        anterior = self.http.get(reverse("transaccion_list"), {"antes": paginas[-1].context["pagina"].anterior})
+        self.assertEqual(self._ids(anterior), self._ids(paginas[1]))
+
+    def test_consultas_no_crecen_con_las_filas(self):
+        def contar(tamano):
+            with override_settings(TRANSACCIONES_POR_PAGINA=tamano), CaptureQueriesContext(connection) as ctx:
+                self.http.get(reverse("transaccion_list"))
+            return len(ctx)
+
+        self.assertEqual(contar(1), contar(5))
+
+    def test_cursor_invalido_es_primera_pagina(self):
+        pagina = keyset.paginar(Transaccion.objects.filter(cliente=self.cliente), "fecha_creacion", 10,
+                                despues="no-es-un-cursor")
+        self.assertEqual(len(pagina), 5)
+        self.assertIsNone(pagina.siguiente)
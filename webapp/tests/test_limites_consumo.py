@@ -0,0 +1,204 @@
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import (
+    Categoria, Cliente, Currency, CustomUser, LimiteIntercambioCliente, LimiteIntercambioConfig,
+    LimiteIntercambioLog, LimiteIntercambioScheduleConfig, Tauser, Transaccion,
+)
+from ..services import limites
+
+
+class LimitesConsumoTests(TestCase):
+    """Consumo atómico del cupo de intercambio y devolución en bloque"""
+
+    def setUp(self):
+        cache.clear()
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        categoria = Categoria.objects.create(nombre="LC Cat", descuento=Decimal("0"))
+        LimiteIntercambioConfig.objects.update_or_create(
+            categoria=categoria, moneda=self.usd,
+            defaults={"limite_dia_max": Decimal("100"), "limite_mes_max": Decimal("150")},
+        )
+        # Al crear el cliente se generan sus saldos a partir de la config de su categoría
+        self.cliente = Cliente.objects.create(nombre="Cliente LC", documento="66554433", categoria=categoria)
+        self.user = CustomUser.objects.create_user(username="lc_user", password="x", email="lc@example.com")
+        self.tauser = Tauser.objects.create(nombre="Tauser LC", ubicacion="LC")
+
+    def _saldo(self):
+        return tuple(
+            LimiteIntercambioCliente.objects
+            .filter(cliente=self.cliente, config__moneda=self.usd)
+            .values_list("limite_dia_actual", "limite_mes_actual")
+            .get()
+        )
+
+    def _transaccion(self, monto):
+        ct = ContentType.objects.get_for_model(Tauser)
+        return Transaccion.objects.create(
+            cliente=self.cliente, usuario=self.user, tipo=Transaccion.Tipo.VENTA,
+            moneda_origen=self.pyg, moneda_destino=self.usd, tasa_cambio=Decimal("7500"),
+            monto_origen=monto * 7500, monto_destino=monto,
+            medio_pago_type=ct, medio_pago_id=self.tauser.id, medio_cobro_type=ct, medio_cobro_id=self.tauser.id,
+        )
+
+    def test_consumir_descuenta_dia_y_mes(self):
+        consumo = limites.consumir(self.cliente, self.usd.id, Decimal("60"))
+        self.assertEqual(consumo.monto, Decimal("60"))
+        self.assertEqual(self._saldo(), (Decimal("40"), Decimal("90")))
+
+    def test_no_alcanza_no_toca_nada(self):
+        limites.consumir(self.cliente, self.usd.id, Decimal("60"))
+        with self.assertRaisesMessage(limites.LimiteExcedido, "DIARIO"):
+            limites.consumir(self.cliente, self.usd.id, Decimal("50"))
+        self.assertEqual(self._saldo(), (Decimal("40"), Decimal("90")))
+
+    def test_save_de_transaccion_ya_no_descuenta(self):
+        t = self._transaccion(Decimal("30"))
+        t.estado = Transaccion.Estado.PAGADA
+        t.save()
+        self.assertEqual(self._saldo(), (Decimal("100"), Decimal("150")))
+        self.assertFalse(LimiteIntercambioLog.objects.filter(transaccion=t).exists())
+
+    def test_restaurar_en_bloque_una_sola_vez(self):
+        a, b = self._transaccion(Decimal("30")), self._transaccion(Decimal("20"))
+        for t in (a, b):
+            limites.registrar(t, limites.consumir(self.cliente, self.usd.id, t.monto_destino))
+        self.assertEqual(self._saldo(), (Decimal("50"), Decimal("100")))
+
+        limites.restaurar([a.id, b.id])
+        limites.restaurar([a.id, b.id])  # segunda vez no devuelve nada
+        self.assertEqual(self._saldo(), (Decimal("100"), Decimal("150")))
+
+    def test_devolver_consumo_no_registrado(self):
+        limites.devolver(limites.consumir(self.cliente, self.usd.id, Decimal("60")))
+        self.assertEqual(self._saldo(), (Decimal("100"), Decimal("150")))
+
+    def test_cancelar_transaccion_devuelve_cupo(self):
+        t = self._transaccion(Decimal("30"))
+        limites.registrar(t, limites.consumir(self.cliente, self.usd.id, Decimal("30")))
+        http = Client()
+        http.login(username="lc_user", password="x")
+        http.post(reverse("cancelar_transaccion", args=[t.pk]))
+        self.assertEqual(self._saldo(), (Decimal("100"), Decimal("150")))
+
+    def test_anular_o_cancelar_por_orm_devuelve_cupo_una_vez(self):
+        a, b = self._transaccion(Decimal("30")), self._transaccion(Decimal("20"))
+        for t in (a, b):
+            limites.registrar(t, limites.consumir(self.cliente, self.usd.id, t.monto_destino))
+
+        a.estado = Transaccion.Estado.ANULADA
+        a.save()
+        b = Transaccion.objects.get(pk=b.pk)   # instancia fresca (p. ej. desde el shell)
+        b.estado = Transaccion.Estado.CANCELADA
+        b.save()
+        self.assertEqual(self._saldo(), (Decimal("100"), Decimal("150")))
+
+        # Otro save() ya cancelada no vuelve a devolver; los que no cancelan no tocan el cupo
+        c = self._transaccion(Decimal("10"))
+        limites.registrar(c, limites.consumir(self.cliente, self.usd.id, Decimal("10")))
+        b.save()
+        c.estado = Transaccion.Estado.PAGADA
+        c.save()
+        self.assertEqual(self._saldo(), (Decimal("90"), Decimal("140")))
+
+
+class LimitesPeriodoTests(TestCase):
+    """Reseteo perezoso por período en lugar del UPDATE masivo"""
+
+    def setUp(self):
+        cache.clear()
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        diario = LimiteIntercambioScheduleConfig.get_by_frequency("daily")
+        diario.hour, diario.minute, diario.is_active = 0, 0, True
+        diario.save()
+        mensual = LimiteIntercambioScheduleConfig.get_by_frequency("monthly")
+        mensual.month_day, mensual.hour, mensual.minute, mensual.is_active = 1, 0, 0, True
+        mensual.save()
+
+        self.categoria = Categoria.objects.create(nombre="LP Cat", descuento=Decimal("0"))
+        LimiteIntercambioConfig.objects.update_or_create(
+            categoria=self.categoria, moneda=self.usd,
+            defaults={"limite_dia_max": Decimal("100"), "limite_mes_max": Decimal("150")},
+        )
+        self.cliente = Cliente.objects.create(nombre="Cliente LP", documento="77665544", categoria=self.categoria)
+        self.vigente = limites.periodos_vigentes()
+
+    def _fila(self, cliente=None):
+        return LimiteIntercambioCliente.objects.get(cliente=cliente or self.cliente, config__moneda=self.usd)
+
+    def test_calculo_de_periodos(self):
+        self.assertEqual(limites.periodo_dia(datetime(2026, 3, 10, 5, 0), 6, 0), date(2026, 3, 9))
+        self.assertEqual(limites.periodo_dia(datetime(2026, 3, 10, 6, 0), 6, 0), date(2026, 3, 10))
+        # Día 31 en febrero corta el último día del mes
+        self.assertEqual(limites.periodo_mes(datetime(2026, 3, 5, 0, 0), 31, 0, 0), date(2026, 2, 28))
+        self.assertEqual(limites.periodo_mes(datetime(2026, 1, 15, 0, 0), 20, 0, 0), date(2025, 12, 20))
+        self.assertEqual(
+            limites.periodos_desde(datetime(2026, 3, 5, 0, 0), (False, 0, 0, None), None),
+            limites.Periodos(dia=None, mes=None),
+        )
+
+    def test_periodo_viejo_se_lee_renovado_y_se_renueva_al_consumir(self):
+        # Saldo diario agotado en un período anterior; el mensual sigue vigente
+        LimiteIntercambioCliente.objects.filter(cliente=self.cliente).update(
+            limite_dia_actual=0, periodo_dia=date(2000, 1, 1),
+            limite_mes_actual=Decimal("120"), periodo_mes=self.vigente.mes,
+        )
+        saldo = limites.saldos(self.cliente).get()
+        self.assertEqual((saldo["dia"], saldo["mes"]), (Decimal("100"), Decimal("120")))
+
+        limites.consumir(self.cliente, self.usd.id, Decimal("30"))
+        fila = self._fila()
+        self.assertEqual((fila.limite_dia_actual, fila.limite_mes_actual), (Decimal("70"), Decimal("90")))
+        self.assertEqual((fila.periodo_dia, fila.periodo_mes), (self.vigente.dia, self.vigente.mes))
+
+    def test_compactar_en_lotes(self):
+        otro = Cliente.objects.create(
+            nombre="Cliente LP 2", documento="77665545", correo="lp2@example.com", categoria=self.categoria,
+        )
+        LimiteIntercambioCliente.objects.filter(cliente__in=[self.cliente, otro]).update(
+            limite_dia_actual=0, limite_mes_actual=0, periodo_dia=date(2000, 1, 1), periodo_mes=date(2000, 1, 1),
+        )
+        self.assertGreaterEqual(limites.compactar(lote=1), 2)
+        for cliente in (self.cliente, otro):
+            fila = self._fila(cliente)
+            self.assertEqual((fila.limite_dia_actual, fila.limite_mes_actual), (Decimal("100"), Decimal("150")))
+            self.assertEqual(fila.periodo_dia, self.vigente.dia)
+        self.assertEqual(limites.compactar(lote=1), 0)
+
+    def test_restaurar_solo_devuelve_al_periodo_del_consumo(self):
+        pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        user = CustomUser.objects.create_user(username="lp_user", password="x", email="lp@example.com")
+        tauser = Tauser.objects.create(nombre="Tauser LP", ubicacion="LP")
+        ct = ContentType.objects.get_for_model(Tauser)
+        t = Transaccion.objects.create(
+            cliente=self.cliente, usuario=user, tipo=Transaccion.Tipo.VENTA,
+            moneda_origen=pyg, moneda_destino=self.usd, tasa_cambio=Decimal("7500"),
+            monto_origen=Decimal("225000"), monto_destino=Decimal("30"),
+            medio_pago_type=ct, medio_pago_id=tauser.id, medio_cobro_type=ct, medio_cobro_id=tauser.id,
+        )
+        log = limites.registrar(t, limites.consumir(self.cliente, self.usd.id, Decimal("30")))
+        self.assertEqual((log.periodo_dia, log.periodo_mes), (self.vigente.dia, self.vigente.mes))
+
+        # Cortó el día y el cliente ya operó en el período nuevo (saldo diario renovado y usado)
+        LimiteIntercambioCliente.objects.filter(cliente=self.cliente).update(
+            limite_dia_actual=Decimal("80"), periodo_dia=self.vigente.dia + timedelta(days=1),
+        )
+        limites.restaurar([t.id])
+
+        fila = self._fila()
+        # El consumo de ayer no vuelve al cupo de hoy; el mensual sí (mismo período)
+        self.assertEqual((fila.limite_dia_actual, fila.limite_mes_actual), (Decimal("80"), Decimal("150")))
@@ -0,0 +1,94 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import (
+    Categoria, Cliente, Currency, CustomUser, LimiteIntercambioCliente, LimiteIntercambioConfig,
+    Tauser, Transaccion, UsoLimiteIntercambio,
+)
+from ..services import limites, limites_ventana
+
+
+@override_settings(LIMITES_MODO="ventana")
+class LimitesVentanaTests(TestCase):
+    """Límites por ventana móvil de 24 h / 30 días sobre el libro de uso"""
+
+    def setUp(self):
+        cache.clear()
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        categoria = Categoria.objects.create(nombre="LV Cat", descuento=Decimal("0"))
+        LimiteIntercambioConfig.objects.update_or_create(
+            categoria=categoria, moneda=self.usd,
+            defaults={"limite_dia_max": Decimal("100"), "limite_mes_max": Decimal("150")},
+        )
+        self.cliente = Cliente.objects.create(nombre="Cliente LV", documento="88776655", categoria=categoria)
+        self.user = CustomUser.objects.create_user(username="lv_user", password="x", email="lv@example.com")
+        self.tauser = Tauser.objects.create(nombre="Tauser LV", ubicacion="LV")
+
+    def _saldo(self):
+        saldo = limites.saldo(self.cliente, self.usd.id)
+        return saldo["dia"], saldo["mes"]
+
+    def _transaccion(self, monto):
+        ct = ContentType.objects.get_for_model(Tauser)
+        return Transaccion.objects.create(
+            cliente=self.cliente, usuario=self.user, tipo=Transaccion.Tipo.VENTA,
+            moneda_origen=self.pyg, moneda_destino=self.usd, tasa_cambio=Decimal("7500"),
+            monto_origen=monto * 7500, monto_destino=monto,
+            medio_pago_type=ct, medio_pago_id=self.tauser.id, medio_cobro_type=ct, medio_cobro_id=self.tauser.id,
+        )
+
+    def _uso_pasado(self, monto, antiguedad):
+        UsoLimiteIntercambio.objects.create(
+            cliente=self.cliente, moneda=self.usd, monto=monto, fecha=timezone.now() - antiguedad,
+        )
+
+    def test_consumir_agrega_al_libro_sin_tocar_contadores(self):
+        consumo = limites.consumir(self.cliente, self.usd.id, Decimal("60"))
+        self.assertIsNotNone(consumo.uso_id)
+        self.assertEqual(self._saldo(), (Decimal("40"), Decimal("90")))
+        fila = LimiteIntercambioCliente.objects.get(cliente=self.cliente, config__moneda=self.usd)
+        self.assertEqual(fila.limite_dia_actual, Decimal("100"))
+        with self.assertRaisesMessage(limites.LimiteExcedido, "DIARIO"):
+            limites.consumir(self.cliente, self.usd.id, Decimal("50"))
+        self.assertEqual(UsoLimiteIntercambio.objects.filter(cliente=self.cliente).count(), 1)
+
+    def test_lo_que_sale_de_la_ventana_no_cuenta(self):
+        self._uso_pasado(Decimal("90"), timedelta(hours=25))   # fuera del día, dentro del mes
+        self._uso_pasado(Decimal("500"), timedelta(days=31))   # fuera de ambas ventanas
+        self.assertEqual(self._saldo(), (Decimal("100"), Decimal("60")))
+        with self.assertRaisesMessage(limites.LimiteExcedido, "MENSUAL"):
+            limites.consumir(self.cliente, self.usd.id, Decimal("70"))
+        limites.consumir(self.cliente, self.usd.id, Decimal("60"))
+
+    def test_saldos_cacheados_se_invalidan_al_consumir(self):
+        limites.saldos(self.cliente)
+        with self.assertNumQueries(1):  # solo la config; el uso sale de la cache
+            limites.saldos(self.cliente)
+        limites.consumir(self.cliente, self.usd.id, Decimal("30"))
+        self.assertEqual(limites.saldos(self.cliente)[0]["dia"], Decimal("70"))
+
+    def test_devolver_y_restaurar_una_sola_vez(self):
+        limites.devolver(limites.consumir(self.cliente, self.usd.id, Decimal("60")))
+        self.assertEqual(self._saldo(), (Decimal("100"), Decimal("150")))
+
+        a, b = self._transaccion(Decimal("30")), self._transaccion(Decimal("20"))
+        for t in (a, b):
+            limites.registrar(t, limites.consumir(self.cliente, self.usd.id, t.monto_destino))
+        self.assertEqual(self._saldo(), (Decimal("50"), Decimal("100")))
+
+        self.assertEqual(limites.restaurar([a.id, b.id]), 2)
+        self.assertEqual(limites_ventana.restaurar([a.id, b.id]), 0)
+        self.assertEqual(self._saldo(), (Decimal("100"), Decimal("150")))
+        devolucion = UsoLimiteIntercambio.objects.get(transaccion=a, tipo=UsoLimiteIntercambio.Tipo.DEVOLUCION)
+        consumo = UsoLimiteIntercambio.objects.get(transaccion=a, tipo=UsoLimiteIntercambio.Tipo.CONSUMO)
+        self.assertEqual((devolucion.monto, devolucion.fecha), (-consumo.monto, consumo.fecha))
@@ -0,0 +1,87 @@
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from ..models import Currency
+from ..services import live_quotes
+
+
+class LiveQuotesTests(TestCase):
+    """Pruebas del log de eventos y del stream SSE de cotizaciones"""
+
+    def setUp(self):
+        cache.clear()
+        self.moneda, _ = Currency.objects.update_or_create(
+            code="LQX",
+            defaults={
+                "name": "Moneda LQ",
+                "base_price": Decimal("1000"),
+                "comision_venta": Decimal("100"),
+                "comision_compra": Decimal("50"),
+                "is_active": True,
+            },
+        )
+
+    def test_guardar_moneda_publica_un_evento(self):
+        desde = live_quotes.ultimo_id()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.moneda.base_price = Decimal("1200")
+            self.moneda.save()
+
+        eventos, ultimo = live_quotes.eventos_desde(desde)
+        cotizaciones = [data for _, tipo, data in eventos if tipo == live_quotes.TIPO_COTIZACION]
+        self.assertEqual(len(cotizaciones), 1)
+        self.assertEqual(cotizaciones[0]["code"], "LQX")
+        self.assertEqual(cotizaciones[0]["base"], "1200")
+        self.assertEqual(live_quotes.eventos_desde(ultimo)[0], [])
+
+    def test_hueco_reciente_espera_al_evento(self):
+        """Un id reservado cuyo evento todavía no se escribió no es un RESET"""
+        desde = live_quotes.ultimo_id()
+        live_quotes.publicar(live_quotes.TIPO_STOCK, {"tauser_id": 1})
+        live_quotes.publicar(live_quotes.TIPO_STOCK, {"tauser_id": 2})
+        cache.delete(live_quotes._clave_evento(desde + 2))
+
+        eventos, ultimo = live_quotes.eventos_desde(desde)
+        self.assertEqual([data for _, _, data in eventos], [{"tauser_id": 1}])
+        self.assertEqual(ultimo, desde + 1)
+
+        cache.set(live_quotes._clave_evento(desde + 2), {"tipo": live_quotes.TIPO_STOCK, "data": {"tauser_id": 2}})
+        eventos, ultimo = live_quotes.eventos_desde(ultimo)
+        self.assertEqual([data for _, _, data in eventos], [{"tauser_id": 2}])
+        self.assertEqual(ultimo, desde + 2)
+
+    def test_eventos_perdidos_devuelven_reset(self):
+        desde = live_quotes.ultimo_id()
+        live_quotes.publicar(live_quotes.TIPO_STOCK, {"tauser_id": 1})
+        cache.delete(live_quotes._clave_evento(desde + 1))
+        # el hueco se vio por primera vez hace más que la gracia
+        cache.set(live_quotes._clave_hueco(desde + 1), time.time() - live_quotes.GRACIA_HUECO_SEGUNDOS - 1)
+        eventos, _ = live_quotes.eventos_desde(desde)
+        self.assertEqual(eventos[0][1], live_quotes.TIPO_RESET)
+
+    @override_settings(LIVE_QUOTES_STREAM_SECONDS=0.05, LIVE_QUOTES_POLL_SECONDS=0.01)
+    def test_stream_envia_la_tasa_calculada(self):
+        desde = live_quotes.ultimo_id()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.moneda.save()
+
+        response = Client().get(reverse("stream_cotizaciones"), {"desde": desde})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        contenido = b"".join(response.streaming_content).decode()
+        self.assertIn("event: quote", contenido)
+        self.assertIn('"venta": 1100.0', contenido)   # invitado: base + comision_venta
+
+    @override_settings(LIVE_QUOTES_MAX_STREAMS=1, LIVE_QUOTES_STREAM_SECONDS=0.05, LIVE_QUOTES_POLL_SECONDS=0.01)
+    def test_sin_lugar_responde_204_y_el_stream_suelta_el_suyo(self):
+        lugar = live_quotes.tomar_lugar_stream()
+        self.assertEqual(Client().get(reverse("stream_cotizaciones")).status_code, 204)
+
+        live_quotes.soltar_lugar_stream(lugar)
+        response = Client().get(reverse("stream_cotizaciones"))
+        self.assertEqual(response.status_code, 200)
+        b"".join(response.streaming_content)   # al terminar el cliente de prueba cierra la respuesta
+        self.assertIsNotNone(live_quotes.tomar_lugar_stream())
@@ -0,0 +1,92 @@
+from datetime import date
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import (
+    Categoria, Cliente, ClienteUsuario, Currency, CustomUser, Entidad, MedioCobro, MedioPago,
+    BilleteraCobro, TarjetaNacional, Tauser, TipoPago,
+)
+from ..services import metodos_cliente
+
+
+class MetodosClienteTests(TestCase):
+    """Payload cacheado de medios de pago/cobro por cliente"""
+
+    def setUp(self):
+        cache.clear()
+        categoria = Categoria.objects.create(nombre="MC Cat", descuento=Decimal("0"))
+        self.cliente = Cliente.objects.create(nombre="Cliente MC", documento="55443322", categoria=categoria)
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        self.banco, _ = Entidad.objects.get_or_create(nombre="Banco MC", defaults={"tipo": "banco"})
+        self.telefonica, _ = Entidad.objects.get_or_create(nombre="Telefónica MC", defaults={"tipo": "telefono"})
+
+    def _tarjeta(self, nombre, moneda):
+        medio = MedioPago.objects.create(cliente=self.cliente, tipo="tarjeta_nacional", nombre=nombre, moneda=moneda)
+        return TarjetaNacional.objects.create(
+            medio_pago=medio, numero_tokenizado="tok", fecha_vencimiento=date(2030, 1, 1),
+            ultimos_digitos="1234", entidad=self.banco, moneda=moneda,
+        )
+
+    def _consultas_construir(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            metodos_cliente.construir(self.cliente.id)
+        return len(ctx.captured_queries)
+
+    def test_consultas_constantes(self):
+        self._tarjeta("Tarjeta 1", self.pyg)
+        una = self._consultas_construir()
+        for i in range(2, 6):
+            self._tarjeta(f"Tarjeta {i}", self.usd if i % 2 else self.pyg)
+        medio = MedioCobro.objects.create(cliente=self.cliente, tipo="billetera", nombre="Billetera MC", moneda=self.pyg)
+        BilleteraCobro.objects.create(medio_cobro=medio, numero_celular="0981", entidad=self.telefonica, moneda=self.pyg)
+        self.assertEqual(self._consultas_construir(), una)
+
+    def test_cache_e_invalidacion_por_cliente_y_global(self):
+        self._tarjeta("Tarjeta 1", self.pyg)
+        self.assertEqual(len([m for m in metodos_cliente.payload(self.cliente.id)["metodo_pago"]
+                              if m["tipo"] == "tarjeta_nacional"]), 1)
+        with self.assertNumQueries(0):
+            metodos_cliente.payload(self.cliente.id)
+
+        # Un medio nuevo del cliente invalida su payload
+        self._tarjeta("Tarjeta 2", self.usd)
+        tarjetas = [m for m in metodos_cliente.payload(self.cliente.id)["metodo_pago"] if m["tipo"] == "tarjeta_nacional"]
+        self.assertEqual(len(tarjetas), 2)
+
+        # Desactivar el tipo de pago sincroniza con .update(): la señal del TipoPago invalida a todos
+        tipo = TipoPago.objects.get(pk=MedioPago.objects.filter(cliente=self.cliente).first().tipo_pago_id)
+        tipo.activo = False
+        tipo.save()
+        self.assertFalse([m for m in metodos_cliente.payload(self.cliente.id)["metodo_pago"]
+                          if m["tipo"] == "tarjeta_nacional"])
+
+    def test_endpoint_filtra_por_moneda_en_memoria(self):
+        self._tarjeta("Tarjeta PYG", self.pyg)
+        self._tarjeta("Tarjeta USD", self.usd)
+        tauser = Tauser.objects.create(
+            nombre="Tauser MC", ubicacion="MC", tipo_pago=TipoPago.objects.first(),
+        )
+        user = CustomUser.objects.create_user(username="mc_user", password="x", email="mc@example.com")
+        ClienteUsuario.objects.create(cliente=self.cliente, usuario=user)
+        http = Client()
+        http.login(username="mc_user", password="x")
+        session = http.session
+        session["cliente_id"] = self.cliente.id
+        session.save()
+
+        data = http.get(reverse("get_metodos_pago_cobro"), {"from": "USD", "to": "PYG"}).json()
+        nombres = [m["nombre"] for m in data["metodo_pago"] if m["tipo"] == "tarjeta_nacional"]
+        self.assertEqual(nombres, ["Tarjeta USD ****1234"])
+        pago_tauser = next(m for m in data["metodo_pago"] if m["tipo"] == "Tauser" and m["id"] == tauser.id)
+        self.assertEqual(pago_tauser["stock"], {})
@@ -0,0 +1,91 @@
+import re
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import CustomUser, Currency
+from ..services import metricas
+
+
+def _valor(texto, linea):
+    """Valor de la primera línea que empieza con `linea` en la salida de /metrics."""
+    m = re.search(rf"^{re.escape(linea)} (\S+)$", texto, re.M)
+    return float(m.group(1)) if m else None
+
+
+@override_settings(METRICAS_MUESTREO=1, METRICAS_TOKEN="secreto", METRICAS_FLUSH_SEGUNDOS=3600)
+class MetricasTests(TestCase):
+    """Métricas por vista (latencia, SQL y N+1) expuestas en /metrics"""
+
+    def setUp(self):
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+
+    def _scrape(self, token="secreto"):
+        return self.client.get(reverse("metricas"), HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_request_medido_por_vista(self):
+        self.client.get(reverse("login"))
+        self.client.get(reverse("login"))
+
+        response = self._scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        texto = response.content.decode()
+
+        self.assertIn("# TYPE webapp_request_duracion_segundos histogram", texto)
+        self.assertEqual(_valor(texto, 'webapp_request_duracion_segundos_count{vista="login"}'), 2)
+        self.assertEqual(_valor(texto, 'webapp_request_duracion_segundos_bucket{vista="login",le="+Inf"}'), 2)
+        self.assertEqual(_valor(texto, 'webapp_request_consultas_sql_count{vista="login"}'), 2)
+        self.assertIsNotNone(_valor(texto, 'webapp_request_sql_segundos_sum{vista="login"}'))
+        # El propio scrape no se mide
+        self.assertNotIn('vista="metricas"', texto)
+
+    def test_buckets_acumulados(self):
+        medicion = metricas.Medicion()
+        medicion.consultas = 7
+        metricas.registrar_request("prueba", 0.03, medicion)
+        metricas.registrar_request("prueba", 2.0, metricas.Medicion())
+
+        texto = metricas.renderizar()
+        bucket = 'webapp_request_duracion_segundos_bucket{{vista="prueba",le="{}"}}'
+        self.assertEqual(_valor(texto, bucket.format("0.025")), 0)
+        self.assertEqual(_valor(texto, bucket.format("0.05")), 1)
+        self.assertEqual(_valor(texto, bucket.format("2.5")), 2)
+        self.assertEqual(_valor(texto, 'webapp_request_duracion_segundos_sum{vista="prueba"}'), 2.03)
+        self.assertEqual(_valor(texto, 'webapp_request_consultas_sql_bucket{vista="prueba",le="5"}'), 1)
+        self.assertEqual(_valor(texto, 'webapp_request_consultas_sql_bucket{vista="prueba",le="10"}'), 2)
+        self.assertEqual(_valor(texto, 'webapp_request_consultas_sql_sum{vista="prueba"}'), 7)
+
+    @override_settings(METRICAS_REPETIDAS_MIN=3)
+    def test_consultas_repetidas_por_huella(self):
+        ids = list(Currency.objects.values_list("id", flat=True)[:2])
+        medicion = metricas.Medicion()
+        with connection.execute_wrapper(medicion):
+            for i in range(4):
+                Currency.objects.filter(pk=ids[i % len(ids)]).first()   # mismo SQL, distinto valor
+            list(Currency.objects.filter(pk__in=ids))
+            list(Currency.objects.filter(pk__in=ids[:1]))                # IN colapsado: misma huella que la anterior
+        metricas.registrar_request("detalle", 0.1, medicion)
+
+        repetidas = medicion.repetidas(3)
+        self.assertEqual(list(repetidas.values()), [4])
+        (h,) = repetidas
+        texto = metricas.renderizar()
+        self.assertEqual(_valor(texto, f'webapp_sql_repetidas_total{{vista="detalle",huella="{h}"}}'), 1)
+        self.assertRegex(texto, rf'webapp_sql_repetida_info{{huella="{h}",sql="SELECT .*webapp_currency.*"}} 1')
+        self.assertEqual(len(set(medicion.huellas)), 2)
+
+    def test_acceso_y_muestreo(self):
+        self.assertEqual(self._scrape("otro").status_code, 403)
+        with override_settings(METRICAS_TOKEN="", DEBUG=False):
+            self.assertEqual(self.client.get(reverse("metricas")).status_code, 403)
+            staff = CustomUser.objects.create_user(username="met_staff", password="x", email="ms@example.com",
+                                                   is_staff=True)
+            self.client.force_login(staff)
+            self.assertEqual(self.client.get(reverse("metricas")).status_code, 200)
+
+        with override_settings(METRICAS_MUESTREO=0):
+            self.client.get(reverse("login"))
+        self.assertNotIn('vista="login"', self._scrape().content.decode())
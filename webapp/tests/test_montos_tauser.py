@@ -0,0 +1,116 @@
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..models import (
+    Categoria, Cliente, Currency, CurrencyDenomination, CustomUser, Tauser, TauserCurrencyStock, Transaccion,
+)
+from ..services import montos_tauser
+
+TASA = Decimal("7500")
+
+
+def _a_usd(monto):
+    return monto / TASA
+
+
+def _a_pyg(monto):
+    return monto * TASA
+
+
+class BuscarMontoFactibleTests(TestCase):
+    """Menor monto factible Tauser → Tauser calculado en memoria"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_salta_al_menor_destino_alcanzable(self):
+        # 400.000 PYG ≈ 53,33 USD; con 50×2 y 20×3 el menor destino armable es 60 (3 × 20)
+        origen, destino = montos_tauser.buscar_monto_factible(
+            Decimal("400000"), Decimal("50000"), [Decimal("50000"), Decimal("100000")],
+            [(Decimal("50"), 2), (Decimal("20"), 3)], _a_usd, _a_pyg,
+        )
+        self.assertEqual((origen, destino), (Decimal("450000"), Decimal("60")))
+
+    def test_respeta_tope_del_cliente(self):
+        resultado = montos_tauser.buscar_monto_factible(
+            Decimal("400000"), Decimal("50000"), [Decimal("50000")],
+            [(Decimal("50"), 2), (Decimal("20"), 3)], _a_usd, _a_pyg, tope_destino=Decimal("50"),
+        )
+        self.assertEqual(resultado, (None, None))
+
+    def test_destino_sin_tope_de_stock(self):
+        origen, destino = montos_tauser.buscar_monto_factible(
+            Decimal("30"), Decimal("20"), [Decimal("20"), Decimal("50")], None, _a_pyg, _a_usd,
+        )
+        self.assertEqual((origen, destino), (Decimal("40"), Decimal("300000")))
+
+    @override_settings(MONTOS_TAUSER_MAX_ITERACIONES=1)
+    def test_presupuesto_agotado_se_cuenta(self):
+        # 7 no es armable con billetes de 5 y 3 (Frobenius) → se necesita más de una iteración
+        resultado = montos_tauser.buscar_monto_factible(
+            Decimal("7"), Decimal("1"), [Decimal("5"), Decimal("3")], None, _a_pyg, _a_usd,
+        )
+        self.assertEqual(resultado, (None, None))
+        self.assertEqual(montos_tauser.metricas(), {"busquedas": 1, "presupuesto_agotado": 1})
+
+
+class RecalcularAmbosTauserTests(TestCase):
+    """recalcularMontosAmbosTauser carga el stock de ambos Tausers una sola vez"""
+
+    def setUp(self):
+        cache.clear()
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        self.recibe = Tauser.objects.create(nombre="Tauser Recibe", ubicacion="MT")
+        self.entrega = Tauser.objects.create(nombre="Tauser Entrega", ubicacion="MT")
+        for tauser, moneda, valor, qty in [
+            (self.recibe, self.pyg, 50000, 10), (self.recibe, self.pyg, 100000, 10),
+            (self.entrega, self.usd, 50, 2), (self.entrega, self.usd, 20, 3),
+        ]:
+            denom, _ = CurrencyDenomination.objects.get_or_create(currency=moneda, value=Decimal(valor))
+            TauserCurrencyStock.objects.create(tauser=tauser, currency=moneda, denomination=denom, quantity=qty)
+
+        categoria = Categoria.objects.create(nombre="MT Cat", descuento=Decimal("0"))
+        cliente = Cliente.objects.create(nombre="Cliente MT", documento="99887766", categoria=categoria)
+        user = CustomUser.objects.create_user(username="mt_user", password="x", email="mt@example.com")
+        ct = ContentType.objects.get_for_model(Tauser)
+        self.transaccion = Transaccion.objects.create(
+            cliente=cliente, usuario=user, tipo=Transaccion.Tipo.VENTA,
+            moneda_origen=self.pyg, moneda_destino=self.usd, tasa_cambio=TASA,
+            monto_origen=Decimal("400000"), monto_destino=Decimal("53.33"),
+            medio_pago_type=ct, medio_pago_id=self.recibe.id, medio_cobro_type=ct, medio_cobro_id=self.entrega.id,
+        )
+
+    def test_una_consulta_de_stock(self):
+        from ..views.compraventa_y_conversión import recalcularMontosAmbosTauser
+
+        transaccion = Transaccion.objects.get(pk=self.transaccion.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            resultado = recalcularMontosAmbosTauser(transaccion, tasa_actual=TASA)
+
+        self.assertEqual(resultado, (Decimal("450000"), Decimal("60")))
+        consultas_stock = [q for q in ctx.captured_queries if "tausercurrencystock" in q["sql"]]
+        self.assertEqual(len(consultas_stock), 1)
+
+    def test_insumos_del_lote_sin_consultas(self):
+        from ..services.rate_impact import InsumosTauser
+        from ..views.compraventa_y_conversión import recalcularMontosAmbosTauser
+
+        lote = list(
+            Transaccion.objects.filter(pk=self.transaccion.pk)
+            .select_related("cliente__categoria", "moneda_origen", "moneda_destino")
+            .prefetch_related("medio_pago", "medio_cobro")
+        )
+        insumos = InsumosTauser(lote)
+        with self.assertNumQueries(0):
+            resultado = recalcularMontosAmbosTauser(lote[0], tasa_actual=TASA, insumos=insumos)
+        self.assertEqual(resultado, (Decimal("450000"), Decimal("60")))
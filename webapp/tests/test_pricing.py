@@ -0,0 +1,76 @@
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+
+from ..models import Categoria, Cliente, Currency, CustomUser, Tauser, Transaccion
+from ..pricing import Tarifa, ganancia_expression, quote_many, quote_one
+
+
+class PricingEngineTests(TestCase):
+    """Pruebas del motor de cotizaciones (webapp/pricing)"""
+
+    def setUp(self):
+        self.usd = Tarifa("USD", Decimal("7500"), Decimal("100"), Decimal("50"))
+        self.eur = Tarifa("EUR", Decimal("8200"), Decimal("80"), Decimal("60"))
+
+    def test_quote_many_coincide_con_quote_one(self):
+        """La matriz batch y el helper escalar dan el mismo resultado"""
+        descuentos = [Decimal("0"), Decimal("0.05"), Decimal("0.10")]
+        tabla = quote_many([self.usd, self.eur], descuentos, Decimal("2"), Decimal("1"))
+        for tarifa in (self.usd, self.eur):
+            for d in descuentos:
+                self.assertEqual(
+                    tabla.get(tarifa.code, d),
+                    quote_one(tarifa, d, Decimal("2"), Decimal("1")),
+                )
+
+    def test_formula_venta_compra(self):
+        """venta = (base + com*(1-desc)) * (1 + p%), compra = (base - com*(1-desc)) * (1 - p%)"""
+        cot = quote_one(self.usd, Decimal("0.10"), Decimal("2"))
+        self.assertEqual(cot.venta, Decimal("7742"))    # 7590 * 1.02 = 7741.8
+        self.assertEqual(cot.compra, Decimal("7306"))   # 7455 * 0.98 = 7305.9
+        self.assertEqual(cot.tasa("VENTA"), cot.venta)
+        self.assertEqual(cot.tasa("COMPRA"), cot.compra)
+
+    def test_sin_redondeo(self):
+        cot = quote_one(self.usd, Decimal("0.05"), redondear=False)
+        self.assertEqual(cot.venta, Decimal("7595.00"))
+        self.assertEqual(cot.compra, Decimal("7452.50"))
+
+
+class GananciaTests(TestCase):
+    """La expresión ORM de ganancia coincide con Transaccion.ganancia_en_pyg"""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user(username="gan_user", password="x", email="gan@example.com")
+        categoria = Categoria.objects.create(nombre="Gan Cat", descuento=Decimal("0.1"))
+        cliente = Cliente.objects.create(nombre="Cliente Gan", documento="55443322", categoria=categoria)
+        pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        tauser = Tauser.objects.first() or Tauser.objects.create(nombre="Tauser Gan", ubicacion="Test")
+        ct = ContentType.objects.get_for_model(Tauser)
+        comunes = dict(
+            cliente=cliente, usuario=user, tasa_cambio=Decimal("7590"),
+            medio_pago_type=ct, medio_pago_id=tauser.id,
+            medio_cobro_type=ct, medio_cobro_id=tauser.id,
+            desc_cliente=Decimal("0.1"), monto_base_moneda=Decimal("7500.4"),
+        )
+        Transaccion.objects.create(
+            tipo="VENTA", moneda_origen=pyg, moneda_destino=usd,
+            monto_origen=Decimal("759000"), monto_destino=Decimal("100"),
+            comision_vta_com=Decimal("100"), **comunes,
+        )
+        Transaccion.objects.create(
+            tipo="COMPRA", moneda_origen=usd, moneda_destino=pyg,
+            monto_origen=Decimal("37.5"), monto_destino=Decimal("279000"),
+            comision_vta_com=Decimal("50.7"), **comunes,
+        )
+
+    def test_expresion_orm_igual_a_propiedad(self):
+        for t in Transaccion.objects.annotate(ganancia_pyg=ganancia_expression()):
+            self.assertEqual(t.ganancia_pyg, t.ganancia_en_pyg)
@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import CustomUser, Cliente, ClienteUsuario, Categoria, Currency, TipoPago
+from ..services import quote_matrix
+
+
+class QuoteMatrixTests(TestCase):
+    """Pruebas de la matriz de cotizaciones precalculada"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="qm_user", password="testpass123", email="qm@example.com")
+        self.categoria = Categoria.objects.create(nombre="QM Cat", descuento=Decimal("0.100"))
+        self.cliente = Cliente.objects.create(nombre="Cliente QM", documento="998877", categoria=self.categoria)
+        ClienteUsuario.objects.create(cliente=self.cliente, usuario=self.user)
+        self.moneda, _ = Currency.objects.update_or_create(
+            code="QMX",
+            defaults={
+                "name": "Moneda QM",
+                "base_price": Decimal("1000"),
+                "comision_venta": Decimal("100"),
+                "comision_compra": Decimal("50"),
+                "is_active": True,
+            },
+        )
+        self.tipo_pago = TipoPago.objects.create(nombre="QM Pago", activo=True, comision=Decimal("2.00"))
+        self.client = Client()
+        self.client.login(username="qm_user", password="testpass123")
+        session = self.client.session
+        session["cliente_id"] = self.cliente.id
+        session.save()
+
+    def _item(self, response, code="QMX"):
+        return next(x for x in response.json()["items"] if x["code"] == code)
+
+    def test_aplica_descuento_y_comision_de_pago(self):
+        """venta = (base + com*(1-desc)) * (1 + pago%), redondeado"""
+        response = self.client.get(reverse("api_active_currencies"), {"tipo_metodo_pago_id": self.tipo_pago.id})
+        item = self._item(response)
+        self.assertEqual(item["venta"], 1112.0)   # (1000 + 90) * 1.02 = 1111.8 → 1112
+        self.assertEqual(item["compra"], 936.0)   # (1000 - 45) * 0.98 = 935.9 → 936
+
+    def test_cambio_de_moneda_actualiza_la_matriz(self):
+        """Guardar la moneda reescribe las celdas ya cacheadas"""
+        self.client.get(reverse("api_active_currencies"))
+        self.moneda.base_price = Decimal("2000")
+        self.moneda.save()
+        item = self._item(self.client.get(reverse("api_active_currencies")))
+        self.assertEqual(item["venta"], 2090.0)
+
+    def test_cambio_de_tipo_pago_actualiza_la_matriz(self):
+        """Desactivar el tipo de pago hace que se cotice como 'sin método'"""
+        params = {"tipo_metodo_pago_id": self.tipo_pago.id}
+        self.client.get(reverse("api_active_currencies"), params)
+        self.tipo_pago.activo = False
+        self.tipo_pago.save()
+        item = self._item(self.client.get(reverse("api_active_currencies"), params))
+        self.assertEqual(item["venta"], 1090.0)
+
+    def test_cambio_de_categoria_actualiza_descuento(self):
+        self.client.get(reverse("api_active_currencies"))
+        self.categoria.descuento = Decimal("0")
+        self.categoria.save()
+        item = self._item(self.client.get(reverse("api_active_currencies")))
+        self.assertEqual(item["venta"], 1100.0)
+
+    def test_consulta_cacheada_sin_queries_de_cotizacion(self):
+        """Con la matriz caliente solo quedan las queries de sesión y usuario"""
+        url = reverse("api_active_currencies")
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+
+    def test_tipo_inexistente_se_trata_como_sin_metodo(self):
+        sin_metodo = quote_matrix.obtener_cotizaciones(Decimal("0.1"))
+        inexistente = quote_matrix.obtener_cotizaciones(Decimal("0.1"), 999999, "abc")
+        self.assertEqual(sin_metodo, inexistente)
+
+    def test_etag_devuelve_304_si_no_hubo_cambios(self):
+        url = reverse("api_active_currencies")
+        primera = self.client.get(url)
+        self.assertTrue(primera.has_header("ETag"))
+        self.assertTrue(primera.has_header("Last-Modified"))
+
+        segunda = self.client.get(url, HTTP_IF_NONE_MATCH=primera["ETag"])
+        self.assertEqual(segunda.status_code, 304)
+
+        # Cambió una moneda: el ETag anterior deja de valer
+        self.moneda.base_price = Decimal("1500")
+        self.moneda.save()
+        tercera = self.client.get(url, HTTP_IF_NONE_MATCH=primera["ETag"])
+        self.assertEqual(tercera.status_code, 200)
+
+    def test_etag_depende_del_tipo_de_pago(self):
+        url = reverse("api_active_currencies")
+        sin_metodo = self.client.get(url)
+        con_metodo = self.client.get(url, {"tipo_metodo_pago_id": self.tipo_pago.id})
+        self.assertNotEqual(sin_metodo["ETag"], con_metodo["ETag"])
+
+    def test_solo_acepta_get(self):
+        response = self.client.post(reverse("api_active_currencies"))
+        self.assertEqual(response.status_code, 405)
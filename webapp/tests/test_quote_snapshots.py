@@ -0,0 +1,128 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Categoria, Cliente, ClienteUsuario, Currency, CustomUser, TipoCobro, TipoPago
+from ..services import quote_snapshots
+
+
+class QuoteSnapshotTests(TestCase):
+    """Pruebas del snapshot de cotización usado en la confirmación de compraventa"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username="qs_user", password="x", email="qs@example.com")
+        categoria = Categoria.objects.create(nombre="QS Cat", descuento=Decimal("0.10"))
+        self.cliente = Cliente.objects.create(nombre="Cliente QS", documento="99887766", categoria=categoria)
+        ClienteUsuario.objects.create(cliente=self.cliente, usuario=self.user)
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.qsx = Currency.objects.create(
+            code="QSX", name="Moneda QS", base_price=Decimal("7500"),
+            comision_venta=Decimal("100"), comision_compra=Decimal("50"), decimales_monto=2, is_active=True,
+        )
+        self.pago = TipoPago.objects.create(nombre="Pago QS", activo=True, comision=Decimal("2"))
+        self.cobro = TipoCobro.objects.create(nombre="Cobro QS", activo=True, comision=Decimal("0"))
+
+    def _crear(self, monto="759000"):
+        return quote_snapshots.crear(self.cliente, self.user, self.pyg, self.qsx, monto, self.pago, self.cobro)
+
+    def test_crear_cotiza_en_el_servidor(self):
+        snap = self._crear()
+        # (7500 + 100*0.9) * 1.02 = 7741.8 → 7742
+        self.assertEqual(snap["tipo"], "VENTA")
+        self.assertEqual(snap["tasa_cambio"], Decimal("7742"))
+        self.assertEqual(snap["monto_destino"], Decimal("98.04"))
+        self.assertEqual(snap["tipo_pago_nombre"], "pagoqs")
+        self.assertEqual(quote_snapshots.obtener(snap["id"], self.cliente.id, self.user.id), snap)
+
+    def test_obtener_rechaza_otro_cliente_y_expirado(self):
+        snap = self._crear()
+        self.assertIsNone(quote_snapshots.obtener(snap["id"], self.cliente.id + 1, self.user.id))
+
+        with patch("webapp.services.quote_snapshots.timezone.now",
+                   return_value=timezone.now() + timedelta(seconds=snap["ttl"] + 1)):
+            self.assertIsNone(quote_snapshots.obtener(snap["id"], self.cliente.id, self.user.id))
+
+        quote_snapshots.consumir(snap["id"])
+        self.assertIsNone(quote_snapshots.obtener(snap["id"], self.cliente.id, self.user.id))
+
+    def test_monto_invalido(self):
+        with self.assertRaises(quote_snapshots.CotizacionInvalida):
+            self._crear(monto="0")
+        with self.assertRaises(quote_snapshots.CotizacionInvalida):
+            quote_snapshots.crear(self.cliente, self.user, self.qsx, self.qsx, "10", self.pago, self.cobro)
+
+    def _cliente_http(self):
+        http = Client()
+        http.login(username="qs_user", password="x")
+        session = http.session
+        session["cliente_id"] = self.cliente.id
+        session.save()
+        return http
+
+    @patch.dict("os.environ", {"MFA_ENABLED": "true"})
+    @patch("webapp.views.compraventa_y_conversión.MFACode.generate_for_user")
+    def test_confirmar_ignora_la_tasa_del_navegador(self, _mock_mfa):
+        """El paso MFA muestra la tasa del servidor y propaga solo el quote_id"""
+        response = self._cliente_http().post(reverse("compraventa"), {
+            "confirmar": "1",
+            "moneda_origen": "PYG",
+            "moneda_destino": "QSX",
+            "monto_origen": "759000",
+            "monto_destino": "500",        # valores manipulados por el navegador
+            "tasa_cambio": "1",
+            "medio_pago_tipo": self.pago.id,
+            "medio_cobro_tipo": self.cobro.id,
+        })
+        self.assertEqual(response.status_code, 200)
+        cotizacion = response.context["cotizacion"]
+        self.assertEqual(cotizacion["tasa_cambio"], Decimal("7742"))
+        self.assertEqual(response.context["data"]["monto_destino"], "98.04")
+        self.assertContains(response, f'name="quote_id" value="{cotizacion["id"]}"')
+
+    def test_quote_id_vencido_redirige(self):
+        response = self._cliente_http().post(reverse("compraventa"), {
+            "confirmar": "1", "mfa_code": "123456", "quote_id": "inexistente",
+        })
+        self.assertEqual(response.status_code, 302)
+
+    def test_reclamar_es_exclusivo(self):
+        snap = self._crear()
+        self.assertTrue(quote_snapshots.reclamar(snap["id"]))
+        self.assertFalse(quote_snapshots.reclamar(snap["id"]))   # confirmación concurrente
+
+        quote_snapshots.soltar(snap["id"])                        # la primera no llegó a registrar
+        self.assertTrue(quote_snapshots.reclamar(snap["id"]))
+
+        quote_snapshots.consumir(snap["id"])
+        quote_snapshots.soltar(snap["id"])
+        self.assertFalse(quote_snapshots.reclamar(snap["id"]))   # ya usado
+
+    @patch.dict("os.environ", {"MFA_ENABLED": "false"})
+    def test_confirmacion_concurrente_no_registra_dos_veces(self):
+        from ..models import Transaccion
+
+        snap = self._crear()
+        self.assertTrue(quote_snapshots.reclamar(snap["id"]))    # otra pestaña está cobrando
+        response = self._cliente_http().post(reverse("compraventa"), {"confirmar": "1", "quote_id": snap["id"]})
+
+        self.assertRedirects(response, reverse("transaccion_list"), fetch_redirect_response=False)
+        self.assertFalse(Transaccion.objects.filter(cliente=self.cliente).exists())
+
+    def test_check_deploy_rechaza_cache_por_proceso(self):
+        from django.test import override_settings
+        from ..checks import cache_compartida
+
+        locmem = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://x:6379/1"}}
+        with override_settings(CACHES=locmem):
+            self.assertEqual([e.id for e in cache_compartida(None)], ["webapp.E001"])
+        with override_settings(CACHES=redis):
+            self.assertEqual(cache_compartida(None), [])
@@ -0,0 +1,95 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import (
+    Categoria, Cliente, Currency, CurrencyDenomination, CustomUser, MedioCobro, Tauser, TauserCurrencyStock, TipoCobro,
+    Transaccion,
+)
+from ..services.rate_impact import recalcular_pendientes
+
+
+class RateImpactTests(TestCase):
+    """Pruebas del recálculo masivo de transacciones pendientes ante un cambio de cotización"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="ri_user", password="x", email="ri@example.com")
+        categoria = Categoria.objects.create(nombre="RI Cat", descuento=Decimal("0"))
+        self.cliente = Cliente.objects.create(nombre="Cliente RI", documento="11223399", categoria=categoria)
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.rix = Currency.objects.create(
+            code="RIX", name="Moneda RI", base_price=Decimal("7000"),
+            comision_venta=Decimal("100"), comision_compra=Decimal("50"), decimales_monto=2, is_active=True,
+        )
+        tipo_cobro = TipoCobro.objects.create(nombre="Cobro RI", activo=True, comision=Decimal("0"))
+        tauser = Tauser.objects.create(nombre="Tauser RI", ubicacion="Test")
+        medio_cobro = MedioCobro.objects.create(
+            cliente=self.cliente, tipo="billetera", nombre="Billetera RI", moneda=self.rix, tipo_cobro=tipo_cobro,
+        )
+        self.comunes = dict(
+            cliente=self.cliente, usuario=self.user, tipo="VENTA",
+            moneda_origen=self.pyg, moneda_destino=self.rix,
+            monto_origen=Decimal("710000"), monto_destino=Decimal("100"),
+            medio_pago_type=ContentType.objects.get_for_model(Tauser), medio_pago_id=tauser.id,
+            medio_cobro_type=ContentType.objects.get_for_model(MedioCobro), medio_cobro_id=medio_cobro.id,
+            estado=Transaccion.Estado.PENDIENTE,
+        )
+
+    def test_marca_y_avisa_solo_las_que_cambiaron(self):
+        vieja = Transaccion.objects.create(tasa_cambio=Decimal("7000"), **self.comunes)
+        vigente = Transaccion.objects.create(tasa_cambio=Decimal("7100"), **self.comunes)
+
+        resumen = recalcular_pendientes()
+
+        self.assertEqual(resumen["revisadas"], 2)
+        self.assertEqual(resumen["notificadas"], 1)
+        self.assertEqual(resumen["grupos"], 1)   # una sola tasa calculada para ambas
+        vieja.refresh_from_db()
+        vigente.refresh_from_db()
+        self.assertTrue(vieja.cambio_pendiente)
+        self.assertFalse(vigente.cambio_pendiente)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["ri@example.com"])
+
+    def test_filtra_por_moneda(self):
+        Transaccion.objects.create(tasa_cambio=Decimal("7000"), **self.comunes)
+        self.assertEqual(recalcular_pendientes(moneda="XXX")["revisadas"], 0)
+
+    def test_tauser_a_tauser_no_consulta_por_transaccion(self):
+        # Stock y cupo se cargan una vez por lote: las consultas no crecen con las transacciones Tauser → Tauser
+        denom, _ = CurrencyDenomination.objects.get_or_create(currency=self.rix, value=Decimal("10"))
+        entrega = Tauser.objects.create(nombre="Tauser RI Entrega", ubicacion="Test")
+        TauserCurrencyStock.objects.create(tauser=entrega, currency=self.rix, denomination=denom, quantity=100)
+        comunes = {**self.comunes, "medio_cobro_type": self.comunes["medio_pago_type"], "medio_cobro_id": entrega.id}
+
+        def consultas(cantidad):
+            Transaccion.objects.filter(cliente=self.cliente).delete()
+            for _ in range(cantidad):
+                Transaccion.objects.create(tasa_cambio=Decimal("7000"), **comunes)
+            with CaptureQueriesContext(connection) as ctx:
+                resumen = recalcular_pendientes()
+            self.assertEqual(resumen["revisadas"], cantidad)
+            return len(ctx.captured_queries)
+
+        consultas(1)   # calienta ContentType y el cronograma de límites
+        self.assertEqual(consultas(1), consultas(4))
+
+    @patch("webapp.tasks.recalcular_transacciones_pendientes_task.delay")
+    def test_modify_quote_encola_la_tarea(self, mock_delay):
+        admin = CustomUser.objects.create_superuser(username="ri_admin", password="x", email="ria@example.com")
+        http = Client()
+        http.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = http.post(reverse("modify_quote", args=[self.rix.id]), {
+                "base_price": "7200", "comision_compra": "50", "comision_venta": "100", "is_active": "on",
+            })
+        self.assertEqual(response.status_code, 302)
+        mock_delay.assert_called_once_with("RIX")
@@ -0,0 +1,88 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Categoria, Cliente, ClienteUsuario, Currency, CustomUser
+from ..services import rates_newsletter
+
+
+class TokenBucketTests(TestCase):
+    """El limitador deja pasar la ráfaga y después espera 1/tasa por mensaje"""
+
+    def test_rafaga_y_espera(self):
+        reloj = [0.0]
+        esperas = []
+
+        def dormir(s):
+            esperas.append(s)
+            reloj[0] += s
+
+        bucket = rates_newsletter.TokenBucket(2, capacidad=3, reloj=lambda: reloj[0], dormir=dormir)
+        for _ in range(5):
+            bucket.tomar()
+        self.assertEqual(len(esperas), 2)
+        self.assertAlmostEqual(sum(esperas), 1.0)
+
+    def test_tasa_cero_sin_limite(self):
+        bucket = rates_newsletter.TokenBucket(0, dormir=lambda s: self.fail("no debería esperar"))
+        for _ in range(100):
+            self.assertEqual(bucket.tomar(), 0.0)
+
+
+class NewsletterTests(TestCase):
+    """Pruebas del envío por lotes del boletín de tasas"""
+
+    def setUp(self):
+        Currency.objects.update_or_create(
+            code="NLX",
+            defaults={"name": "Moneda NL", "base_price": Decimal("1000"),
+                      "comision_venta": Decimal("100"), "comision_compra": Decimal("50"), "is_active": True},
+        )
+        categoria = Categoria.objects.create(nombre="NL Cat", descuento=Decimal("0.10"))
+        cliente = Cliente.objects.create(nombre="Cliente NL", documento="44556677", categoria=categoria)
+        self.con_cliente = CustomUser.objects.create_user(
+            username="nl_1", password="x", email="nl1@example.com", receive_exchange_emails=True,
+        )
+        ClienteUsuario.objects.create(cliente=cliente, usuario=self.con_cliente)
+        CustomUser.objects.create_user(username="nl_2", password="x", email="nl2@example.com",
+                                       receive_exchange_emails=True)
+        CustomUser.objects.create_user(username="nl_3", password="x", email="nl3@example.com",
+                                       receive_exchange_emails=False)
+
+    def test_envia_a_los_suscriptores_con_su_descuento(self):
+        usuarios = rates_newsletter.suscriptores().filter(username__startswith="nl_")
+        resumen = rates_newsletter.enviar_a_suscriptores(usuarios)
+
+        self.assertEqual(resumen["enviados"], 2)
+        por_destino = {m.to[0]: m for m in mail.outbox}
+        self.assertEqual(set(por_destino), {"nl1@example.com", "nl2@example.com"})
+        # Con descuento 10%: venta = 1000 + 100*0.9, compra = 1000 - 50*0.9
+        self.assertIn("1090.00", por_destino["nl1@example.com"].body)
+        self.assertIn("955.00", por_destino["nl1@example.com"].body)
+        self.assertIn("1100.00", por_destino["nl2@example.com"].body)
+
+        self.con_cliente.refresh_from_db()
+        self.assertTrue(self.con_cliente.unsubscribe_token)
+        self.assertIn(self.con_cliente.unsubscribe_token, por_destino["nl1@example.com"].body)
+
+    def test_fragmentos_se_renderizan_una_vez_por_descuento(self):
+        fragmentos = rates_newsletter.Fragmentos([Decimal("0.10")])
+        primero = fragmentos.para(Decimal("0.1"))
+        self.assertIs(fragmentos.para(Decimal("0.10")), primero)
+
+    def test_tarea_unica_para_todos(self):
+        from ..tasks import _send_to_all_users
+
+        _send_to_all_users()
+        destinos = {m.to[0] for m in mail.outbox}
+        self.assertIn("nl1@example.com", destinos)
+        self.assertNotIn("nl3@example.com", destinos)
+
+    def test_benchmark_reporta_throughput(self):
+        salida = StringIO()
+        call_command("benchmark_newsletter", destinatarios=20, backend="locmem", stdout=salida)
+        self.assertIn("Enviados: 20", salida.getvalue())
+        self.assertIn("mensajes/s", salida.getvalue())
@@ -0,0 +1,74 @@
+from dataclasses import replace
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import (
+    Cliente, Currency, LimiteIntercambioCliente, LimiteIntercambioConfig, MedioCobro, MedioPago, SeedRegistro,
+    Tauser, TauserCurrencyStock,
+)
+from ..services import seeds
+
+# Sin red en los tests: las banderas "no existen"
+sin_red = mock.patch("webapp.services.seeds.requests.get", return_value=mock.Mock(status_code=404))
+
+
+class SeedsTests(TestCase):
+    """Datos iniciales aplicados una sola vez por huella"""
+
+    def test_base_migrada_queda_sembrada(self):
+        # La base de tests pasó por migrate: los seeders corrieron y quedaron registrados
+        self.assertEqual(set(SeedRegistro.objects.values_list("nombre", flat=True)), {s.nombre for s in seeds.SEEDERS})
+        self.assertTrue(Currency.objects.filter(code="USD").exists())
+        for cliente in Cliente.objects.filter(nombre__in=[c["nombre"] for c in seeds.CLIENTES_POR_DEFECTO]):
+            configs = LimiteIntercambioConfig.objects.filter(categoria=cliente.categoria_id).count()
+            self.assertEqual(LimiteIntercambioCliente.objects.filter(cliente=cliente).count(), configs)
+            self.assertEqual(MedioPago.objects.filter(cliente=cliente).count(), len(seeds.MEDIOS_PAGO_POR_DEFECTO))
+            self.assertEqual(MedioCobro.objects.filter(cliente=cliente).count(), len(seeds.MEDIOS_COBRO_POR_DEFECTO))
+            self.assertFalse(MedioPago.objects.filter(cliente=cliente, tipo_pago__isnull=True).exists())
+        if Tauser.objects.filter(activo=True).exists():
+            self.assertFalse(TauserCurrencyStock.objects.filter(quantity=0).exists())
+
+    def test_segunda_pasada_no_toca_nada(self):
+        # Una consulta para el registro más las (agregadas) de `estado` de los seeders que lo declaran
+        with self.assertNumQueries(9):
+            resultado = seeds.sembrar()
+        self.assertEqual(set(resultado.values()), {"sin cambios"})
+
+    def test_forzar_es_idempotente(self):
+        antes = (Cliente.objects.count(), MedioPago.objects.count(), LimiteIntercambioCliente.objects.count())
+        with sin_red:
+            resultado = seeds.sembrar(forzar=True)
+        self.assertNotIn("error", resultado.values())
+        self.assertEqual(
+            (Cliente.objects.count(), MedioPago.objects.count(), LimiteIntercambioCliente.objects.count()), antes
+        )
+
+    def test_cambio_de_datos_o_estado_reaplica(self):
+        Currency.objects.create(code="CLP", name="Peso Chileno", base_price=8, comision_venta=1, comision_compra=1)
+        with sin_red:
+            resultado = seeds.sembrar()
+        # Moneda nueva: cambia el `estado` de límites y banderas; lo demás no se toca
+        self.assertEqual(resultado["limites"], "aplicado")
+        self.assertEqual(resultado["banderas"], "aplicado")
+        self.assertEqual(resultado["entidades"], "sin cambios")
+        self.assertTrue(LimiteIntercambioConfig.objects.filter(moneda__code="CLP").exists())
+
+        # Nueva versión de un seeder: se re-aplica él y los que dependen de él
+        nuevos = [replace(s, version=2) if s.nombre == "roles_y_usuarios" else s for s in seeds.SEEDERS]
+        with mock.patch.object(seeds, "SEEDERS", nuevos):
+            resultado = seeds.sembrar()
+        self.assertEqual(
+            {n for n, r in resultado.items() if r == "aplicado"},
+            {"roles_y_usuarios", "clientes", "limites", "medios_pago", "medios_cobro"},
+        )
+
+    def test_comando(self):
+        out = StringIO()
+        call_command("sembrar", "--listar", stdout=out)
+        self.assertIn("limites", out.getvalue())
+        with sin_red:
+            call_command("sembrar", "--solo", "entidades", "--forzar", stdout=out)
+        self.assertIn("entidades            aplicado", out.getvalue())
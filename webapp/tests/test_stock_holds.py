@@ -0,0 +1,205 @@
+import os
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.test import TestCase, Client
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import (
+    Categoria, Cliente, ClienteUsuario, Currency, CurrencyDenomination, CustomUser, ExpiracionTransaccionConfig,
+    Tauser, TauserCurrencyStock, TauserStockHold, TipoCobro, TipoPago, Transaccion,
+)
+from ..services import live_quotes, stock_holds
+from ..views.compraventa_y_conversión import tauser_puede_entregar
+
+
+class StockHoldsTests(TestCase):
+    """Reservas de billetes de Tauser: toma condicional, liberación y consumo"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="sh_user", password="x", email="sh@example.com")
+        categoria = Categoria.objects.create(nombre="SH Cat", descuento=Decimal("0"))
+        self.cliente = Cliente.objects.create(nombre="Cliente SH", documento="11224433", categoria=categoria)
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        self.tauser = Tauser.objects.create(nombre="Tauser SH", ubicacion="SH")
+        self.stock = {}
+        for valor, qty in [(50, 2), (20, 3)]:
+            denom, _ = CurrencyDenomination.objects.get_or_create(currency=self.usd, value=Decimal(valor))
+            self.stock[valor] = TauserCurrencyStock.objects.create(
+                tauser=self.tauser, currency=self.usd, denomination=denom, quantity=qty,
+            )
+
+    def _transaccion(self, monto_destino, estado=Transaccion.Estado.PENDIENTE):
+        ct = ContentType.objects.get_for_model(Tauser)
+        return Transaccion.objects.create(
+            cliente=self.cliente, usuario=self.user, tipo=Transaccion.Tipo.VENTA,
+            moneda_origen=self.pyg, moneda_destino=self.usd, tasa_cambio=Decimal("7500"),
+            monto_origen=monto_destino * 7500, monto_destino=monto_destino,
+            medio_pago_type=ct, medio_pago_id=self.tauser.id, medio_cobro_type=ct, medio_cobro_id=self.tauser.id,
+            estado=estado,
+        )
+
+    def _filas(self):
+        return {
+            int(v): (q, r) for v, q, r in TauserCurrencyStock.objects.filter(tauser=self.tauser)
+            .values_list("denomination__value", "quantity", "reservado")
+        }
+
+    def test_reserva_descuenta_disponible_sin_tocar_quantity(self):
+        holds = stock_holds.reservar(self._transaccion(Decimal("60")))
+        self.assertEqual([(h.stock_id, h.cantidad) for h in holds], [(self.stock[20].id, 3)])
+        self.assertEqual(self._filas(), {50: (2, 0), 20: (3, 3)})
+        self.assertFalse(tauser_puede_entregar(self.tauser, self.usd, Decimal("20")))
+        self.assertTrue(tauser_puede_entregar(self.tauser, self.usd, Decimal("100")))
+
+    def test_no_se_vende_dos_veces(self):
+        stock_holds.reservar(self._transaccion(Decimal("100")))
+        with self.assertRaises(stock_holds.StockInsuficiente):
+            stock_holds.reservar(self._transaccion(Decimal("50")))
+        self.assertEqual(self._filas(), {50: (2, 2), 20: (3, 0)})
+
+    def test_reserva_idempotente(self):
+        t = self._transaccion(Decimal("60"))
+        stock_holds.reservar(t)
+        stock_holds.reservar(t)
+        self.assertEqual(TauserStockHold.objects.filter(transaccion=t).count(), 1)
+        self.assertEqual(self._filas()[20], (3, 3))
+
+    def test_update_condicional_rechaza_si_no_alcanza(self):
+        # Dentro de reservar() corre en un savepoint: si una fila no alcanza no queda nada tomado
+        with self.assertRaises(stock_holds._Conflicto), transaction.atomic():
+            stock_holds._tomar([(self.stock[50].id, 1), (self.stock[20].id, 4)])
+        self.assertEqual(self._filas(), {50: (2, 0), 20: (3, 0)})
+
+    def test_reservar_y_liberar_publican_stock_disponible(self):
+        # Los UPDATE masivos no disparan post_save: el stream se entera por tauser_stock.invalidar()
+        t = self._transaccion(Decimal("60"))
+        desde = live_quotes.ultimo_id()
+        with self.captureOnCommitCallbacks(execute=True):
+            stock_holds.reservar(t)
+        eventos, desde = live_quotes.eventos_desde(desde)
+        self.assertEqual(
+            [(tipo, data["value"], data["quantity"]) for _, tipo, data in eventos],
+            [(live_quotes.TIPO_STOCK, 20.0, 0)],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            stock_holds.liberar([t.id])
+        eventos, _ = live_quotes.eventos_desde(desde)
+        self.assertEqual([(data["value"], data["quantity"]) for _, _, data in eventos], [(20.0, 3)])
+
+    def test_liberar_y_consumir_en_bloque(self):
+        a, b = self._transaccion(Decimal("50")), self._transaccion(Decimal("40"))
+        stock_holds.reservar(a)
+        stock_holds.reservar(b)
+
+        stock_holds.liberar([a.id])
+        stock_holds.liberar([a.id])  # segunda vez no hace nada
+        self.assertEqual(self._filas(), {50: (2, 0), 20: (3, 2)})
+
+        stock_holds.consumir([b.id])
+        self.assertEqual(self._filas(), {50: (2, 0), 20: (1, 0)})
+        estados = dict(TauserStockHold.objects.values_list("transaccion_id", "estado"))
+        self.assertEqual(estados, {a.id: "LIBERADA", b.id: "CONSUMIDA"})
+
+    def test_vencimiento_cancela_y_libera(self):
+        from ..tasks import cancelar_transacciones_vencidas_tauser
+
+        ExpiracionTransaccionConfig.objects.update_or_create(medio="tauser", defaults={"minutos_expiracion": 5})
+        t = self._transaccion(Decimal("60"))
+        Transaccion.objects.filter(pk=t.pk).update(fecha_creacion=timezone.now() - timedelta(minutes=10))
+        t.refresh_from_db()
+        holds = stock_holds.reservar(t, stock_holds.vencimiento_para(t))
+        self.assertLess(holds[0].expira_en, timezone.now())
+
+        cancelar_transacciones_vencidas_tauser()
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Transaccion.Estado.CANCELADA)
+        self.assertEqual(self._filas()[20], (3, 0))
+
+    def test_liberar_vencidos(self):
+        t = self._transaccion(Decimal("60"))
+        stock_holds.reservar(t, timezone.now() - timedelta(minutes=1))
+        stock_holds.reservar(self._transaccion(Decimal("50")), timezone.now() + timedelta(minutes=10))
+        stock_holds.liberar_vencidos()
+        self.assertEqual(self._filas(), {50: (2, 1), 20: (3, 0)})
+
+    def test_cancelar_transaccion_libera(self):
+        t = self._transaccion(Decimal("60"))
+        stock_holds.reservar(t)
+        http = Client()
+        http.login(username="sh_user", password="x")
+        http.post(reverse("cancelar_transaccion", args=[t.pk]))
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Transaccion.Estado.CANCELADA)
+        self.assertEqual(self._filas()[20], (3, 0))
+
+    def _http(self):
+        http = Client()
+        http.login(username="sh_user", password="x")
+        return http
+
+    @patch.dict(os.environ, {"MFA_ENABLED": "false"})
+    @patch("webapp.services.limites.aplica", return_value=False)
+    def test_compraventa_reserva_al_registrar_y_no_cobra_sin_billetes(self, _aplica):
+        tipo_pago, _ = TipoPago.objects.get_or_create(nombre="Tauser", defaults={"activo": True, "comision": 0})
+        tipo_cobro, _ = TipoCobro.objects.get_or_create(nombre="Tauser", defaults={"activo": True, "comision": 0})
+        ClienteUsuario.objects.create(cliente=self.cliente, usuario=self.user)
+        http = self._http()
+        session = http.session
+        session["cliente_id"] = self.cliente.id
+        session.save()
+        ct = ContentType.objects.get_for_model(Tauser).id
+        tasa = self.usd.base_price + self.usd.comision_venta
+
+        def confirmar(monto_usd):
+            return http.post(reverse("compraventa"), {
+                "tipo": "VENTA", "moneda_origen": "PYG", "moneda_destino": "USD",
+                "monto_origen": str(tasa * monto_usd),
+                "medio_pago_tipo": tipo_pago.id, "medio_pago": self.tauser.id, "medio_pago_contenttype": ct,
+                "medio_cobro_tipo": tipo_cobro.id, "medio_cobro": self.tauser.id, "medio_cobro_contenttype": ct,
+                "confirmar": "true",
+            })
+
+        # 300 USD no se arman con 2x50 + 3x20: no se registra nada
+        self.assertRedirects(confirmar(300), reverse("compraventa"), fetch_redirect_response=False)
+        self.assertFalse(Transaccion.objects.filter(cliente=self.cliente).exists())
+
+        self.assertRedirects(confirmar(60), reverse("transaccion_list"), fetch_redirect_response=False)
+        t = Transaccion.objects.get(cliente=self.cliente)
+        self.assertEqual(TauserStockHold.objects.get(transaccion=t).cantidad, 3)
+        self.assertEqual(self._filas()[20], (3, 3))
+
+    def test_transferencia_vencida_libera_billetes(self):
+        t = self._transaccion(Decimal("60"))
+        stock_holds.reservar(t)
+        Transaccion.objects.filter(pk=t.pk).update(
+            fecha_creacion=timezone.now() - timedelta(minutes=5),
+            fecha_actualizacion=timezone.now() - timedelta(minutes=5),
+        )
+
+        self._http().get(reverse("ingresar_idTransferencia", args=[t.pk]))
+
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Transaccion.Estado.CANCELADA)
+        self.assertGreater(t.fecha_actualizacion, timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self._filas()[20], (3, 0))
+
+    def test_transferencia_sin_billetes_no_queda_pagada(self):
+        t = self._transaccion(Decimal("60"))
+        stock_holds.reservar(self._transaccion(Decimal("160")))   # otra operación se llevó todo
+
+        self._http().post(reverse("ingresar_idTransferencia", args=[t.pk]), {"id_transferencia": "ABC120"})
+
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Transaccion.Estado.PENDIENTE)
+        self.assertFalse(TauserStockHold.objects.filter(transaccion=t).exists())
@@ -0,0 +1,132 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ..models import Categoria, Cliente, Currency, CustomUser, Tauser, Transaccion
+
+
+class TauserHomeTests(TestCase):
+    """Pantalla del Tauser: UNION por medio de pago/cobro, paginación y deltas"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username="th_user", password="x", email="th@example.com")
+        categoria = Categoria.objects.create(nombre="TH Cat", descuento=Decimal("0"))
+        self.cliente = Cliente.objects.create(nombre="Cliente TH", documento="55443322", categoria=categoria)
+        self.pyg, _ = Currency.objects.get_or_create(
+            code="PYG", defaults={"name": "Guaraní", "base_price": 1, "comision_venta": 0, "comision_compra": 0}
+        )
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        self.tauser = Tauser.objects.create(nombre="Tauser TH", ubicacion="Sucursal TH")
+        self.otro = Tauser.objects.create(nombre="Tauser Otro", ubicacion="Otra sucursal")
+        self.ct = ContentType.objects.get_for_model(Tauser)
+
+        self.http = Client()
+        session = self.http.session
+        session["tauser_ubicacion"] = "Sucursal TH"
+        session.save()
+
+    def _crear(self, pago, cobro, estado=Transaccion.Estado.PENDIENTE):
+        return Transaccion.objects.create(
+            cliente=self.cliente, usuario=self.user, tipo="VENTA",
+            moneda_origen=self.pyg, moneda_destino=self.usd, tasa_cambio=Decimal("7600"),
+            monto_origen=Decimal("760000"), monto_destino=Decimal("100"),
+            medio_pago_type=self.ct, medio_pago_id=pago.id,
+            medio_cobro_type=self.ct, medio_cobro_id=cobro.id,
+            estado=estado,
+        )
+
+    def test_union_de_pago_y_cobro_solo_activas(self):
+        por_pago = self._crear(self.tauser, self.otro)
+        por_cobro = self._crear(self.otro, self.tauser, Transaccion.Estado.PAGADA)
+        self._crear(self.tauser, self.tauser, Transaccion.Estado.COMPLETA)
+        self._crear(self.otro, self.otro)
+
+        response = self.http.get(reverse("tauser_home"))
+        filas = {t.pk: t for t in response.context["transacciones"]}
+        self.assertEqual(set(filas), {por_pago.pk, por_cobro.pk})
+        self.assertTrue(filas[por_pago.pk].es_pago_tauser)
+        self.assertFalse(filas[por_pago.pk].es_cobro_tauser)
+        self.assertTrue(filas[por_cobro.pk].es_cobro_tauser)
+
+    @override_settings(TAUSER_TRANSACCIONES_POR_PAGINA=2)
+    def test_paginacion_por_cursor(self):
+        ids = [self._crear(self.tauser, self.tauser).pk for _ in range(5)]
+
+        vistos = []
+        response = self.http.get(reverse("tauser_home"))
+        while True:
+            vistos += [t.pk for t in response.context["transacciones"]]
+            siguiente = response.context["pagina"].siguiente
+            if not siguiente:
+                break
+            response = self.http.get(reverse("tauser_home"), {"despues": siguiente})
+
+        self.assertEqual(vistos, sorted(ids, reverse=True))
+
+    def test_cambios_desde_timestamp(self):
+        viejo = self._crear(self.tauser, self.tauser)
+        cancelada = self._crear(self.tauser, self.tauser)
+        self._crear(self.otro, self.otro)
+        desde = timezone.now()
+        Transaccion.objects.filter(pk=viejo.pk).update(fecha_actualizacion=desde - timedelta(minutes=5))
+
+        cancelada.estado = Transaccion.Estado.CANCELADA
+        cancelada.save()
+        nueva = self._crear(self.otro, self.tauser)
+
+        response = self.http.get(reverse("tauser_cambios"), {"desde": desde.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        cambios = {t["id"]: t for t in data["transacciones"]}
+        self.assertEqual(set(cambios), {cancelada.pk, nueva.pk})
+        self.assertFalse(cambios[cancelada.pk]["activa"])
+        self.assertTrue(cambios[nueva.pk]["activa"])
+        self.assertFalse(data["recargar"])
+        self.assertIn(f'data-transaction-row="{nueva.pk}"', cambios[nueva.pk]["html"])
+        self.assertEqual(cambios[cancelada.pk]["html"], "")
+
+        # "hasta" es la última fecha vista menos el solape: lo reciente se repite (el kiosco lo descarta por id)
+        nueva.refresh_from_db()
+        self.assertEqual(parse_datetime(data["hasta"]), max(desde, nueva.fecha_actualizacion - timedelta(seconds=5)))
+        response = self.http.get(reverse("tauser_cambios"), {"desde": data["hasta"]})
+        self.assertIn(nueva.pk, [t["id"] for t in response.json()["transacciones"]])
+
+        with override_settings(TAUSER_CAMBIOS_SOLAPE_SEGUNDOS=0):
+            hasta = self.http.get(reverse("tauser_cambios"), {"desde": desde.isoformat()}).json()["hasta"]
+            response = self.http.get(reverse("tauser_cambios"), {"desde": hasta})
+        self.assertEqual(response.json()["transacciones"], [])
+
+    def test_cambios_sin_novedades_no_retrocede(self):
+        desde = timezone.now()
+        data = self.http.get(reverse("tauser_cambios"), {"desde": desde.isoformat()}).json()
+        self.assertEqual(parse_datetime(data["hasta"]), desde)
+
+    def test_cambios_valida_parametros(self):
+        self.assertEqual(self.http.get(reverse("tauser_cambios"), {"desde": "ayer"}).status_code, 400)
+        sin_ubicacion = Client()
+        self.assertEqual(
+            sin_ubicacion.get(reverse("tauser_cambios"), {"desde": timezone.now().isoformat()}).status_code, 403
+        )
+
+    def test_vencidas_actualizan_fecha_actualizacion(self):
+        from ..models import ExpiracionTransaccionConfig
+        from ..tasks import cancelar_transacciones_vencidas_tauser
+
+        t = self._crear(self.tauser, self.tauser)
+        antes = timezone.now() - timedelta(days=2)
+        Transaccion.objects.filter(pk=t.pk).update(fecha_creacion=antes, fecha_actualizacion=antes)
+        ExpiracionTransaccionConfig.objects.update_or_create(
+            medio="tauser", defaults={"minutos_expiracion": 1}
+        )
+
+        cancelar_transacciones_vencidas_tauser()
+        t.refresh_from_db()
+        self.assertEqual(t.estado, Transaccion.Estado.CANCELADA)
+        self.assertGreater(t.fecha_actualizacion, antes)
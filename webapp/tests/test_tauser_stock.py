@@ -0,0 +1,69 @@
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import (
+    Categoria, Cliente, ClienteUsuario, Currency, CurrencyDenomination, CustomUser,
+    Tauser, TauserCurrencyStock, TipoCobro, TipoPago,
+)
+from ..services import tauser_stock
+
+
+class TauserStockSnapshotTests(TestCase):
+    """Snapshot versionado del stock disponible de los Tausers"""
+
+    def setUp(self):
+        cache.clear()
+        self.usd, _ = Currency.objects.get_or_create(
+            code="USD", defaults={"name": "Dólar", "base_price": 7500, "comision_venta": 100, "comision_compra": 50}
+        )
+        self.eur, _ = Currency.objects.get_or_create(
+            code="EUR", defaults={"name": "Euro", "base_price": 8000, "comision_venta": 100, "comision_compra": 50}
+        )
+        tipo_pago = TipoPago.objects.filter(nombre__icontains="tauser").first() or TipoPago.objects.create(nombre="Tauser")
+        tipo_cobro = TipoCobro.objects.filter(nombre__icontains="tauser").first() or TipoCobro.objects.create(nombre="Tauser")
+        self.con_usd = Tauser.objects.create(nombre="Con USD", ubicacion="TS", tipo_pago=tipo_pago, tipo_cobro=tipo_cobro)
+        self.con_eur = Tauser.objects.create(nombre="Con EUR", ubicacion="TS", tipo_pago=tipo_pago, tipo_cobro=tipo_cobro)
+
+        denom_usd, _ = CurrencyDenomination.objects.get_or_create(currency=self.usd, value=Decimal("20"))
+        denom_eur, _ = CurrencyDenomination.objects.get_or_create(currency=self.eur, value=Decimal("50"))
+        self.fila_usd = TauserCurrencyStock.objects.create(
+            tauser=self.con_usd, currency=self.usd, denomination=denom_usd, quantity=5,
+        )
+        TauserCurrencyStock.objects.create(tauser=self.con_usd, currency=self.eur, denomination=denom_eur, quantity=1)
+        TauserCurrencyStock.objects.create(tauser=self.con_eur, currency=self.eur, denomination=denom_eur, quantity=2)
+
+    def test_se_sirve_desde_cache_hasta_que_cambia_el_stock(self):
+        primero = tauser_stock.snapshot()
+        self.assertEqual(primero[self.con_usd.id]["USD"], [{"value": 20.0, "quantity": 5}])
+
+        with self.assertNumQueries(0):
+            tauser_stock.snapshot()
+
+        self.fila_usd.quantity = 7
+        self.fila_usd.save()
+        self.assertEqual(tauser_stock.snapshot()[self.con_usd.id]["USD"][0]["quantity"], 7)
+
+    def test_endpoint_solo_par(self):
+        user = CustomUser.objects.create_user(username="ts_user", password="x", email="ts@example.com")
+        categoria = Categoria.objects.create(nombre="TS Cat", descuento=Decimal("0"))
+        cliente = Cliente.objects.create(nombre="Cliente TS", documento="33221144", categoria=categoria)
+        ClienteUsuario.objects.create(cliente=cliente, usuario=user)
+        http = Client()
+        http.login(username="ts_user", password="x")
+        session = http.session
+        session["cliente_id"] = cliente.id
+        session.save()
+
+        data = http.get(reverse("get_metodos_pago_cobro"), {"from": "PYG", "to": "USD", "solo_par": "1"}).json()
+        cobro = {m["id"]: m for m in data["metodo_cobro"] if m["tipo"] == "Tauser"}
+        self.assertIn(self.con_usd.id, cobro)
+        self.assertNotIn(self.con_eur.id, cobro)
+        self.assertEqual(set(cobro[self.con_usd.id]["stock"]), {"USD"})
+
+        completo = http.get(reverse("get_metodos_pago_cobro"), {"from": "PYG", "to": "USD"}).json()
+        cobro = {m["id"]: m for m in completo["metodo_cobro"] if m["tipo"] == "Tauser"}
+        self.assertIn(self.con_eur.id, cobro)
+        self.assertEqual(set(cobro[self.con_usd.id]["stock"]), {"USD", "EUR"})
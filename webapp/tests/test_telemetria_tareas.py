@@ -0,0 +1,85 @@
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..services import metricas, telemetria_tareas
+
+
+@override_settings(METRICAS_TAREAS=True, METRICAS_TOKEN="secreto", METRICAS_FLUSH_SEGUNDOS=3600)
+class TelemetriaTareasTests(TestCase):
+    """Duración, espera en cola, reintentos, fallos y omisiones de las tareas Celery"""
+
+    def setUp(self):
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+
+    def _fila(self, tarea):
+        return next(f for f in telemetria_tareas.resumen() if f["tarea"] == tarea)
+
+    def test_omitida_por_lock_y_espera_en_cola(self):
+        from ..tasks import AUDITORIA_ARCHIVO_LOCK, archivar_auditoria_transacciones
+
+        cache.add(AUDITORIA_ARCHIVO_LOCK, True, 60)
+        self.addCleanup(cache.delete, AUDITORIA_ARCHIVO_LOCK)
+        archivar_auditoria_transacciones.apply(headers={telemetria_tareas.HEADER_ENCOLADA: time.time() - 5})
+
+        fila = self._fila("webapp.tasks.archivar_auditoria_transacciones")
+        self.assertEqual((fila["ejecuciones"], fila["omitidas"], fila["ok"]), (1, 1, 0))
+        self.assertGreaterEqual(fila["espera_media"], 5)
+
+        texto = self.client.get(reverse("metricas"), HTTP_AUTHORIZATION="Bearer secreto").content.decode()
+        self.assertIn('webapp_tarea_omitidas_total{tarea="webapp.tasks.archivar_auditoria_transacciones",motivo="lock"} 1',
+                      texto)
+        self.assertIn('webapp_tarea_duracion_segundos_count{tarea="webapp.tasks.archivar_auditoria_transacciones",'
+                      'estado="omitida"} 1', texto)
+        self.assertIn('webapp_tarea_espera_segundos_bucket{tarea="webapp.tasks.archivar_auditoria_transacciones",'
+                      'le="1"} 0', texto)
+
+    def test_omitida_por_resultado_skipped(self):
+        from ..tasks import LOCK_KEY, sync_facturas_pendientes_task
+
+        cache.add(LOCK_KEY, "1", 60)
+        self.addCleanup(cache.delete, LOCK_KEY)
+        resultado = sync_facturas_pendientes_task.apply().get()
+
+        self.assertEqual(resultado, {"ok": False, "skipped": "locked"})
+        fila = self._fila("webapp.tasks.sync_facturas_pendientes_task")
+        self.assertEqual(fila["omitidas"], 1)
+        self.assertIsNone(fila["espera_media"])   # apply() local: no pasó por la cola
+
+    def test_reintentos_y_fallo(self):
+        from ..tasks import generate_invoice_task
+
+        resultado = generate_invoice_task.apply(args=[-1])
+
+        self.assertEqual(resultado.state, "FAILURE")
+        fila = self._fila("webapp.tasks.generate_invoice_task")
+        self.assertEqual(fila["reintentos"], generate_invoice_task.max_retries)
+        self.assertEqual(fila["fallos"], 1)
+        self.assertEqual(fila["ejecuciones"], generate_invoice_task.max_retries + 1)
+        self.assertIn('webapp_tarea_fallos_total{tarea="webapp.tasks.generate_invoice_task",excepcion="DoesNotExist"} 1',
+                      metricas.renderizar())
+
+    def test_desactivada(self):
+        from ..tasks import generate_invoice_task
+
+        with override_settings(METRICAS_TAREAS=False):
+            generate_invoice_task.apply(args=[-1])
+        self.assertEqual(telemetria_tareas.resumen(), [])
+
+    def test_celery_top(self):
+        metricas.observar("webapp_tarea_duracion_segundos", (("tarea", "webapp.tasks.lenta"), ("estado", "ok")), 3.0)
+        metricas.observar("webapp_tarea_duracion_segundos", (("tarea", "webapp.tasks.rapida"), ("estado", "ok")), 0.02)
+
+        out = StringIO()
+        call_command("celery_top", iteraciones=1, stdout=out)
+        lineas = out.getvalue().splitlines()
+
+        self.assertIn("2 tareas, 2 ejecuciones", lineas[0])
+        self.assertTrue(lineas[1].startswith("TAREA"))
+        self.assertTrue(lineas[2].startswith("lenta"))   # orden por tiempo total
+        self.assertTrue(lineas[3].startswith("rapida"))
@@ -131,6 +131,7 @@ urlpatterns = [
     path("api/currencies/", views.api_active_currencies, name="api_currencies"),
     path("api/currencies/active/", views.api_active_currencies, name="api_active_currencies"),
     path("api/currencies/history/", views.api_currency_history, name="api_currency_history"),
+    path("api/currencies/stream/", views.stream_cotizaciones, name="stream_cotizaciones"),
     path("historical/", views.historical_view, name="historical"),   
     path("cliente-seleccionado/", views.set_cliente_seleccionado, name="set_cliente_seleccionado"),
     path("metodos-pago-cobro/", views.get_metodos_pago_cobro, name="get_metodos_pago_cobro"),
@@ -150,6 +151,7 @@ urlpatterns = [
 
     # Tauser
     path("tauser/", views.tauser_home, name="tauser_home"),
+    path("tauser/cambios/", views.tauser_cambios, name="tauser_cambios"),
     path("tauser/login/", views.tauser_login, name="tauser_login"),
     path("tauser/pagar/<int:pk>/", views.tauser_pagar, name="tauser_pagar"),
     path("tauser/cobrar/<int:pk>/", views.tauser_cobrar, name="tauser_cobrar"),
@@ -170,4 +172,7 @@ urlpatterns = [
 
     # Administracion global de transacciones
     path("reportes/", reporte_transacciones, name="reporte_transacciones"),
+
+    # Métricas Prometheus (latencia y SQL por vista)
+    path("metrics", views.exportar_metricas, name="metricas"),
 ]
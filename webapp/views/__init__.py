@@ -20,4 +20,5 @@ from .vistas_varias import *
 from .tauser import *
 from .schedule_config import *
 from .factura import *
-from .reportes_transacciones_ganancias import *
\ No newline at end of file
+from .reportes_transacciones_ganancias import *
+from .metricas import *
@@ -1,24 +1,36 @@
-from django.db import connections
+from django.db import connections, transaction
 from django.utils import timezone
 from django.core.serializers.json import DjangoJSONEncoder
 import json
 from datetime import datetime, timedelta
 import os
+import time
+from django.conf import settings
 from webapp.services.invoice_from_tx import generate_invoice_for_transaccion
+from webapp.services import cambio_billetes, catalog_registry, keyset, live_quotes, metodos_cliente, montos_tauser, quote_matrix, quote_snapshots, stock_holds
+from webapp.services import limites as limites_service
+from webapp.services import tauser_stock as tauser_stock_service
+from webapp.services.rate_impact import TasasPorGrupo
+from webapp import pricing
 from .constants import *
 from django.shortcuts import render, redirect, get_object_or_404, reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET, require_POST
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.views.decorators.cache import cache_control
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import F, Q, prefetch_related_objects
 from ..models import LimiteIntercambioCliente, MFACode, MedioCobro, MedioPago, Transaccion, Tauser, Currency, Cliente, ClienteUsuario, TarjetaNacional, TarjetaInternacional, CuentaBancariaNegocio, Billetera, TipoCobro, TipoPago, CuentaBancariaCobro, BilleteraCobro, TauserCurrencyStock
 from decimal import Decimal, ROUND_HALF_UP
-from .payments.stripe_utils import procesar_pago_stripe
-from .payments.cobros_simulados_a_clientes import cobrar_al_cliente_tarjeta_nacional, cobrar_al_cliente_billetera, validar_id_transferencia
+from .payments.stripe_utils import procesar_pago_stripe, reembolsar_pago_stripe
+from .payments.cobros_simulados_a_clientes import cobrar_al_cliente_tarjeta_nacional, cobrar_al_cliente_billetera, reembolsar_al_cliente, validar_id_transferencia
 from webapp.tasks import pagar_al_cliente_task
 from webapp.views.tauser import reservarStock
 from typing import Tuple, Optional, Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
 
 try:
     from weasyprint import HTML
@@ -26,7 +38,6 @@ try:
 except Exception:
     HTML = None
     WEASYPRINT_AVAILABLE = False
-from collections import defaultdict
 # ----------------------
 # Vistas de compraventa
 # ----------------------
@@ -45,34 +56,62 @@ tipos_cobro_nombres = {
     "tauser": "Tauser"
 }
 
-def guardar_transaccion(cliente: Cliente, usuario, data: dict, estado: str, payment_intent_id = None) -> Transaccion:
+def guardar_transaccion(cliente: Cliente, usuario, data: dict, estado: str, payment_intent_id = None, snapshot: dict = None) -> Transaccion:
     """
     Crea y guarda una transacción con el estado indicado.
+    Si se recibe el snapshot de cotización (services/quote_snapshots.py), tasa,
+    montos, porcentajes y datos de la moneda salen de él sin consultar catálogos.
     """
+    if snapshot:
+        transaccion = Transaccion(
+            cliente=cliente,
+            usuario=usuario,
+            tipo=snapshot["tipo"],
+            estado=estado,
+            moneda_origen_id=snapshot["moneda_origen_id"],
+            moneda_destino_id=snapshot["moneda_destino_id"],
+            tasa_cambio=snapshot["tasa_cambio"],
+            monto_origen=snapshot["monto_origen"],
+            monto_destino=snapshot["monto_destino"],
+            medio_pago_type=ContentType.objects.get_for_id(data["medio_pago_contenttype"]),
+            medio_pago_id=data["medio_pago"],
+            medio_pago_porc=snapshot["medio_pago_porc"],
+            medio_cobro_type=ContentType.objects.get_for_id(data["medio_cobro_contenttype"]),
+            medio_cobro_id=data["medio_cobro"],
+            medio_cobro_porc=snapshot["medio_cobro_porc"],
+            stripe_payment_intent_id=payment_intent_id,
+            desc_cliente=snapshot["desc_cliente"],
+            monto_base_moneda=snapshot["monto_base_moneda"],
+            comision_vta_com=snapshot["comision_vta_com"],
+        )
+        transaccion.save()
+        return transaccion
+
     medio_pago = MedioPago.objects.get(id=data["medio_pago"])
     tipo_pago_nombre = medio_pago.tipo #almacenado en minuscula
-    tipo_pago = TipoPago.objects.get(nombre=tipos_pago_nombres[tipo_pago_nombre])
+    tipo_pago = catalog_registry.tipo_pago_por_nombre(tipos_pago_nombres[tipo_pago_nombre])
 
-    print(f"Nombre de medio de pago: {tipo_pago_nombre}")
+    logger.debug("Nombre de medio de pago: %s", tipo_pago_nombre)
 
     medio_cobro = MedioCobro.objects.get(id=data["medio_cobro"])
     tipo_cobro_nombre = medio_cobro.tipo
-    tipo_cobro = TipoCobro.objects.get(nombre=tipos_cobro_nombres[tipo_cobro_nombre])
+    tipo_cobro = catalog_registry.tipo_cobro_por_nombre(tipos_cobro_nombres[tipo_cobro_nombre])
 
-    print(f"Nombre de medio de cobro: {tipo_cobro_nombre}")
+    logger.debug("Nombre de medio de cobro: %s", tipo_cobro_nombre)
 
     tipo_cliente = cliente.categoria
 
 
+    moneda_origen = catalog_registry.moneda(data["moneda_origen"])
+    moneda_destino = catalog_registry.moneda(data["moneda_destino"])
+
     if (data["moneda_origen"] == "PYG"):
         # Guardar el monto base de la moneda destino
         # Esto es una venta
-        moneda_destino=Currency.objects.get(code=data["moneda_destino"])
         monto_base = moneda_destino.base_price
         comision = moneda_destino.comision_venta
 
     else:
-        moneda_origen = Currency.objects.get(code=data["moneda_origen"])
         monto_base = moneda_origen.base_price
         comision = moneda_origen.comision_compra
 
@@ -81,8 +120,8 @@ def guardar_transaccion(cliente: Cliente, usuario, data: dict, estado: str, paym
         usuario=usuario,
         tipo=data["tipo"],
         estado=estado,
-        moneda_origen=Currency.objects.get(code=data["moneda_origen"]),
-        moneda_destino=Currency.objects.get(code=data["moneda_destino"]),
+        moneda_origen_id=moneda_origen.id,
+        moneda_destino_id=moneda_destino.id,
         tasa_cambio=Decimal(data["tasa_cambio"]),
         monto_origen=Decimal(data["monto_origen"]),
         monto_destino=Decimal(data["monto_destino"]),
@@ -134,18 +173,9 @@ def compraventa_view(request):
 
     cliente = get_object_or_404(Cliente, id=cliente_id)
 
-    # --- obtener tipos generales activos desde la base ---
-    tipos_pago = list(
-        TipoPago.objects.filter(activo=True)
-        .order_by("-nombre")
-        .values("id", "nombre")
-    )
-
-    tipos_cobro = list(
-        TipoCobro.objects.filter(activo=True)
-        .order_by("-nombre")
-        .values("id", "nombre")
-    )
+    # --- obtener tipos generales activos (registro de catálogos en memoria) ---
+    tipos_pago = [{"id": t.id, "nombre": t.nombre} for t in catalog_registry.tipos_pago_activos()]
+    tipos_cobro = [{"id": t.id, "nombre": t.nombre} for t in catalog_registry.tipos_cobro_activos()]
 
     if request.method == "POST":
         # ------------------------------
@@ -153,32 +183,61 @@ def compraventa_view(request):
         # ------------------------------
         data = request.POST.dict()
         MFA_ENABLED = os.getenv("MFA_ENABLED", "true").lower() not in ("0", "false", "no", "off")
-        # Pasos previo antes del MFA
-        # Para metodos inactivos
-        tipo_pago_id = data.get("medio_pago_tipo")
-        
-        try:
-            tipo_pago_obj = TipoPago.objects.get(pk=tipo_pago_id)
-            if not tipo_pago_obj.activo:
-                messages.error(request, "El tipo de pago seleccionado ya no está disponible. Actualizá la página.")
+        # --- Snapshot de cotización: se crea al pedir confirmar y viaja por MFA → PIN → confirmar ---
+        cotizacion = None
+        if data.get("quote_id"):
+            cotizacion = quote_snapshots.obtener(data["quote_id"], cliente.id, request.user.id)
+            if not cotizacion:
+                messages.error(request, "La cotización expiró. Volvé a cotizar la operación.")
+                return redirect("compraventa")
+        elif "confirmar" in data:
+            # Pasos previo antes del MFA
+            # Para metodos inactivos
+            tipo_pago_id = data.get("medio_pago_tipo")
+
+            try:
+                tipo_pago_obj = catalog_registry.tipo_pago(tipo_pago_id)
+                if not tipo_pago_obj.activo:
+                    messages.error(request, "El tipo de pago seleccionado ya no está disponible. Actualizá la página.")
+                    return redirect("compraventa")
+            except (TipoPago.DoesNotExist, ValueError):
+                messages.error(request, "Tipo de pago inválido.")
                 return redirect("compraventa")
-        except TipoPago.DoesNotExist:
-            messages.error(request, "Tipo de pago inválido.")
-            return redirect("compraventa")
-        
-        tipo_cobro_id = data.get("medio_cobro_tipo")
 
-        try:
-            tipo_cobro_obj = TipoCobro.objects.get(pk=tipo_cobro_id)
-            if not tipo_cobro_obj.activo:
-                messages.error(
-                    request,
-                    "El tipo de cobro seleccionado ya no está disponible. Actualizá la página."
+            tipo_cobro_id = data.get("medio_cobro_tipo")
+
+            try:
+                tipo_cobro_obj = catalog_registry.tipo_cobro(tipo_cobro_id)
+                if not tipo_cobro_obj.activo:
+                    messages.error(
+                        request,
+                        "El tipo de cobro seleccionado ya no está disponible. Actualizá la página."
+                    )
+                    return redirect("compraventa")
+            except (TipoCobro.DoesNotExist, ValueError):
+                messages.error(request, "Tipo de cobro inválido.")
+                return redirect("compraventa")
+
+            # Cotizar en el servidor: la tasa enviada por el navegador no se usa
+            try:
+                moneda_origen = catalog_registry.moneda(data.get("moneda_origen"))
+                moneda_destino = catalog_registry.moneda(data.get("moneda_destino"))
+                if not (moneda_origen.is_active and moneda_destino.is_active):
+                    raise Currency.DoesNotExist
+                cotizacion = quote_snapshots.crear(
+                    cliente, request.user, moneda_origen, moneda_destino,
+                    data.get("monto_origen"), tipo_pago_obj, tipo_cobro_obj,
                 )
+            except Currency.DoesNotExist:
+                messages.error(request, "Moneda inválida.")
+                return redirect("compraventa")
+            except quote_snapshots.CotizacionInvalida as e:
+                messages.error(request, str(e))
                 return redirect("compraventa")
-        except TipoCobro.DoesNotExist:
-            messages.error(request, "Tipo de cobro inválido.")
-            return redirect("compraventa")
+
+        if cotizacion:
+            quote_snapshots.aplicar_a_datos(cotizacion, data)
+
         # --- Si venimos desde el flujo de PIN, no regenerar MFA ---
         if "from_pin" in data:
             data.pop("from_pin", None)  # eliminamos la marca
@@ -197,7 +256,7 @@ def compraventa_view(request):
         if MFA_ENABLED and "confirmar" in data and "mfa_code" not in data:
             MFACode.generate_for_user(request.user)
             messages.info(request, "Se envió un código de verificación a tu correo electrónico.")
-            return render(request, "webapp/compraventa_y_conversion/verificar_mfa.html", {"data": data})
+            return render(request, "webapp/compraventa_y_conversion/verificar_mfa.html", {"data": data, "cotizacion": cotizacion})
 
         # === Paso 2: Verificar código MFA ===
         if "mfa_code" in data:
@@ -206,7 +265,7 @@ def compraventa_view(request):
 
             if not skip_mfa and (not mfa_entry or not mfa_entry.is_valid()):
                 messages.error(request, "El código de verificación no es válido o ha expirado. Intente de nuevo.")
-                return render(request, "webapp/compraventa_y_conversion/verificar_mfa.html", {"data": data})
+                return render(request, "webapp/compraventa_y_conversion/verificar_mfa.html", {"data": data, "cotizacion": cotizacion})
 
             if not skip_mfa:
                 # marcar MFA como usado
@@ -215,7 +274,7 @@ def compraventa_view(request):
 
             # Confirmación final
             if "confirmar" in request.POST:
-                if not data:
+                if not data or not cotizacion:
                     messages.error(request, "No se recibieron datos del formulario. Intenta nuevamente.")
                     return redirect("compraventa")
 
@@ -237,177 +296,201 @@ def compraventa_view(request):
                     messages.error(request, "Debés ingresar un monto válido.")
                     return redirect('compraventa')
                 
-                # === Validar límite (venta PYG) contra saldo del CLIENTE ===
-                if data.get("moneda_origen") == "PYG":
+                # === Tomar la cotización antes de cobrar: un solo registro por quote_id ===
+                if not quote_snapshots.reclamar(cotizacion["id"]):
+                    messages.error(request, "Esta operación ya se está procesando o ya fue registrada.")
+                    return redirect("transaccion_list")
+                reclamada = True
 
-                    try:
-                        limite_cli = (
-                            LimiteIntercambioCliente.objects
-                            .select_related("config__moneda")
-                            .filter(cliente=cliente, config__moneda__code=data.get("moneda_destino"))
-                            .order_by('-id')  # tomamos el último creado
-                            .first()
-                        )
-                        if monto_destino > limite_cli.limite_dia_actual:
-                            messages.error(request, f"El monto {monto_destino} supera el límite DIARIO disponible ({limite_cli.limite_dia_actual} {limite_cli.moneda.code}).")
-                            return redirect("compraventa")
-                        if monto_destino > limite_cli.limite_mes_actual:
-                            messages.error(request, f"El monto {monto_destino} supera el límite MENSUAL disponible ({limite_cli.limite_mes_actual} {limite_cli.moneda.code}).")
+                consumo = None
+                try:
+                    # === Consumir el cupo (venta PYG) antes de cobrar: UPDATE condicional, sin carrera ===
+                    if limites_service.aplica(data.get("moneda_origen")):
+                        try:
+                            consumo = limites_service.consumir(cliente, cotizacion["moneda_destino_id"], monto_destino)
+                        except limites_service.LimiteExcedido as e:
+                            messages.error(request, str(e))
                             return redirect("compraventa")
 
-                    except LimiteIntercambioCliente.DoesNotExist:
-                        messages.error(request, "No hay límites configurados para tu cuenta en esa moneda. Contactá soporte.")
+                    # === Billetes del Tauser de cobro: verificar antes de cobrar ===
+                    entrega_tauser = cotizacion["tipo_cobro_nombre"] == "tauser" and tipo == Transaccion.Tipo.VENTA
+                    if entrega_tauser and not stock_holds.alcanza(
+                        data.get("medio_cobro"), cotizacion["moneda_destino_id"], monto_destino
+                    ):
+                        messages.error(
+                            request,
+                            "El Tauser elegido no tiene billetes disponibles para este monto. "
+                            "Elegí otro Tauser o cambiá el monto.",
+                        )
                         return redirect("compraventa")
-                
+
     #//////////////////////////////////////////////////////////////////////////////////////////////////////
     # Cobrar al cliente
     #//////////////////////////////////////////////////////////////////////////////////////////////////////
 
-                # Obtener tipo de pago
-                tipo_pago_raw = data.get("medio_pago_tipo")
-
-                # Si el valor viene vacío o como 'undefined', lo tratamos como transferencia (cuentabancaria)
-                if not tipo_pago_raw or tipo_pago_raw == "undefined":
-                    tipo_pago_nombre = "cuentabancaria"  # nombre normalizado que usás internamente
-                else:
-                    try:
-                        tipo_pago_general = TipoPago.objects.get(pk=tipo_pago_raw)
-                        tipo_pago_nombre = tipo_pago_general.nombre.replace(" ", "").replace("_", "").lower()
-                    except (TipoPago.DoesNotExist, ValueError):
-                        messages.error(request, "Método de pago inválido.")
-                        return redirect("compraventa")
-
-                # Inicializar el estado
-                estado = Transaccion.Estado.PENDIENTE
-                payment_intent_id = None
-
-                # TARJETA INTERNACIONAL
-                # Pagos con Stripe (Tarjeta Internacional) se procesa inmediatamente
-                if tipo_pago_nombre == "tarjetainternacional":
-                    # Conseguir el id de la tarjeta generado por Stripe
-                    tarjeta_internacional = TarjetaInternacional.objects.get(id=data["medio_pago"])
-                    stripe_payment_method_id = tarjeta_internacional.stripe_payment_method_id
-
-                    resultado = procesar_pago_stripe(
-                        cliente_stripe_id=cliente.stripe_customer_id,
-                        metodo_pago_id=stripe_payment_method_id,
-                        # función que retorna el monto válido según las reglas de stripe
-                        monto=monto_stripe(monto_origen, data["moneda_origen"]),
-                        moneda=data["moneda_origen"],
-                        descripcion=f"Compra/Venta de divisas ({data['tipo']})",
-                    )
-
-                    if not resultado.get("success"):
-                        # Pago falló
-                        messages.error(request, f"No se pudo procesar el pago: {resultado.get('message')}")
-                        return redirect("compraventa")
+                    # Obtener tipo de pago
+                    tipo_pago_raw = data.get("medio_pago_tipo")
 
-                    estado = Transaccion.Estado.PAGADA
-                    payment_intent_id = resultado.get("payment_intent_id")
+                    # Si el valor viene vacío o como 'undefined', lo tratamos como transferencia (cuentabancaria)
+                    if not tipo_pago_raw or tipo_pago_raw == "undefined":
+                        tipo_pago_nombre = "cuentabancaria"  # nombre normalizado que usás internamente
+                    else:
+                        # Nombre normalizado congelado en el snapshot (sin volver a consultar TipoPago)
+                        tipo_pago_nombre = cotizacion["tipo_pago_nombre"]
+
+                    # Inicializar el estado
+                    estado = Transaccion.Estado.PENDIENTE
+                    payment_intent_id = None
+
+                    # TARJETA INTERNACIONAL
+                    # Pagos con Stripe (Tarjeta Internacional) se procesa inmediatamente
+                    if tipo_pago_nombre == "tarjetainternacional":
+                        # Conseguir el id de la tarjeta generado por Stripe
+                        tarjeta_internacional = TarjetaInternacional.objects.get(id=data["medio_pago"])
+                        stripe_payment_method_id = tarjeta_internacional.stripe_payment_method_id
+
+                        resultado = procesar_pago_stripe(
+                            cliente_stripe_id=cliente.stripe_customer_id,
+                            metodo_pago_id=stripe_payment_method_id,
+                            # función que retorna el monto válido según las reglas de stripe
+                            monto=monto_stripe(monto_origen, data["moneda_origen"]),
+                            moneda=data["moneda_origen"],
+                            descripcion=f"Compra/Venta de divisas ({data['tipo']})",
+                        )
 
-                # TARJETA NACIONAL
-                elif tipo_pago_nombre == "tarjetanacional":
-                    tarjeta_nacional = TarjetaNacional.objects.get(id=data["medio_pago"])
-                    # Validar que la el monto a cobrar(vista de la casa) esté en guaranies
-                    if(data["moneda_origen"] == "PYG"):
-                        resultado = cobrar_al_cliente_tarjeta_nacional(monto_origen, tarjeta_nacional.numero_tokenizado)
                         if not resultado.get("success"):
                             # Pago falló
                             messages.error(request, f"No se pudo procesar el pago: {resultado.get('message')}")
                             return redirect("compraventa")
-                        
-                        estado = Transaccion.Estado.PAGADA
-                    else:
-                        messages.error(request, f"No se puede seleccionar una tarjeta como medio de cobro")
-                        return redirect("compraventa")
 
-                # BILLETERA    
-                elif tipo_pago_nombre == "billetera":
-                    billetera = Billetera.objects.get(id=data["medio_pago"])
-                    pin = request.POST.get("pin")  # Puede venir vacío si es la primera vez
-                    cancelar = request.POST.get("cancelar")
+                        estado = Transaccion.Estado.PAGADA
+                        payment_intent_id = resultado.get("payment_intent_id")
+
+                    # TARJETA NACIONAL
+                    elif tipo_pago_nombre == "tarjetanacional":
+                        tarjeta_nacional = TarjetaNacional.objects.get(id=data["medio_pago"])
+                        # Validar que la el monto a cobrar(vista de la casa) esté en guaranies
+                        if(data["moneda_origen"] == "PYG"):
+                            resultado = cobrar_al_cliente_tarjeta_nacional(monto_origen, tarjeta_nacional.numero_tokenizado)
+                            if not resultado.get("success"):
+                                # Pago falló
+                                messages.error(request, f"No se pudo procesar el pago: {resultado.get('message')}")
+                                return redirect("compraventa")
+                        
+                            estado = Transaccion.Estado.PAGADA
+                        else:
+                            messages.error(request, f"No se puede seleccionar una tarjeta como medio de cobro")
+                            return redirect("compraventa")
 
-                    if cancelar:
-                        messages.info(request, "El pago con billetera fue cancelado.")
-                        return redirect("compraventa")
+                    # BILLETERA    
+                    elif tipo_pago_nombre == "billetera":
+                        billetera = Billetera.objects.get(id=data["medio_pago"])
+                        pin = request.POST.get("pin")  # Puede venir vacío si es la primera vez
+                        cancelar = request.POST.get("cancelar")
 
-                    resultado = cobrar_al_cliente_billetera(billetera.numero_celular, pin)
+                        if cancelar:
+                            messages.info(request, "El pago con billetera fue cancelado.")
+                            return redirect("compraventa")
 
-                    if resultado.get("require_pin"):
-                        # Renderiza el formulario para ingresar o reintentar el PIN
-                        return render(
-                            request,
-                            "webapp/compraventa_y_conversion/ingresar_pin.html",
-                            {
-                                "numero_celular": billetera.numero_celular,
-                                "data": data,
-                                "mensaje": resultado.get("message"),
-                                "allow_retry": resultado.get("allow_retry", True),
-                            },
-                        )
+                        resultado = cobrar_al_cliente_billetera(billetera.numero_celular, pin)
+
+                        if resultado.get("require_pin"):
+                            # Renderiza el formulario para ingresar o reintentar el PIN
+                            return render(
+                                request,
+                                "webapp/compraventa_y_conversion/ingresar_pin.html",
+                                {
+                                    "numero_celular": billetera.numero_celular,
+                                    "data": data,
+                                    "mensaje": resultado.get("message"),
+                                    "allow_retry": resultado.get("allow_retry", True),
+                                },
+                            )
 
-                    if not resultado.get("success"):
-                        messages.error(request, f"No se pudo procesar el pago: {resultado.get('message')}")
-                        return redirect("compraventa")
+                        if not resultado.get("success"):
+                            messages.error(request, f"No se pudo procesar el pago: {resultado.get('message')}")
+                            return redirect("compraventa")
 
-                    estado = Transaccion.Estado.PAGADA
+                        estado = Transaccion.Estado.PAGADA
 
-                # TRANSFERENCIA    
-                elif tipo_pago_nombre == "cuentabancaria":
-                    # Como no hay medio de pago seleccionado, prevenimos errores
-                    try:
-                        cuenta_defecto = CuentaBancariaNegocio.objects.first()
-                        if not cuenta_defecto:
-                            raise Exception("No existe ninguna cuenta bancaria de negocio configurada.")
+                    # TRANSFERENCIA    
+                    elif tipo_pago_nombre == "cuentabancaria":
+                        # Como no hay medio de pago seleccionado, prevenimos errores
+                        try:
+                            cuenta_defecto = catalog_registry.cuenta_negocio()
+                            if not cuenta_defecto:
+                                raise Exception("No existe ninguna cuenta bancaria de negocio configurada.")
 
-                        data["medio_pago"] = cuenta_defecto.id
-                        data["medio_pago_contenttype"] = ContentType.objects.get_for_model(CuentaBancariaNegocio).id
-                        data["medio_pago_tipo"] = TipoPago.objects.get(nombre__iexact="Cuenta Bancaria").pk
+                            data["medio_pago"] = cuenta_defecto.id
+                            data["medio_pago_contenttype"] = ContentType.objects.get_for_model(CuentaBancariaNegocio).id
+                            data["medio_pago_tipo"] = catalog_registry.tipo_pago_por_nombre("Cuenta Bancaria").pk
 
-                    except Exception as e:
-                        messages.error(request, f"No se pudo vincular la cuenta bancaria del negocio: {e}")
-                        return redirect("compraventa")
+                        except Exception as e:
+                            messages.error(request, f"No se pudo vincular la cuenta bancaria del negocio: {e}")
+                            return redirect("compraventa")
                     
-                # TAUSER
-                elif tipo_pago_nombre == "tauser":
-                    print("")
+                    # TAUSER
+                    elif tipo_pago_nombre == "tauser":
+                        pass
 
     #//////////////////////////////////////////////////////////////////////////////////////////////////////
     # Pagar al cliente
     #//////////////////////////////////////////////////////////////////////////////////////////////////////
 
-                # --- Guardar transacción ---
-                transaccion = guardar_transaccion(cliente, request.user, data, estado, payment_intent_id)
-                
-
-                # Obtener tipo de cobro
-                try:
-                    tipo_cobro_general = TipoCobro.objects.get(id=data["medio_cobro_tipo"])
-                    tipo_cobro_nombre = tipo_cobro_general.nombre.replace(" ", "").replace("_", "").lower()
-                except TipoPago.DoesNotExist:
-                    messages.error(request, "Método de pago inválido.")
-                    return redirect("compraventa")
-
-                # --- Pago al cliente en background ---
-                if tipo_cobro_nombre != "tauser" and tipo_pago_nombre != "tauser":
-                    pagar_al_cliente_task.delay(transaccion.id)
-                elif tipo_cobro_nombre == "tauser" and data["tipo"] == "VENTA" and estado == Transaccion.Estado.PAGADA:
-                    reservarStock(data["medio_cobro"], data["moneda_destino"], data["monto_destino"])
-
-                if estado == Transaccion.Estado.PAGADA:
+                    # --- Guardar transacción (desde el snapshot de cotización) con su cupo y sus billetes ---
                     try:
-                        if os.getenv("GENERAR_FACTURA"):
-                            result = generate_invoice_for_transaccion(transaccion)
-                        # Si preferís async:
-                        # generate_invoice_task.delay(transaccion.id)
-                        # messages.success(request, f"Factura emitida. Nro {result['dNumDoc']} (DE {result['de_id']}).")
-                    except Exception as e:
-                        messages.warning(request, f"La transacción se registró, pero falló la emisión de la factura: {e}")
-                        with open("error.txt", "a") as f: f.write(f"[{datetime.now()}] {type(e).__name__}: {e}\n")
-
-                # limpiar la sesión
-                messages.success(request, "Transacción registrada.")
-                return redirect("transaccion_list")
+                        with transaction.atomic():
+                            transaccion = guardar_transaccion(cliente, request.user, data, estado, payment_intent_id, snapshot=cotizacion)
+                            if consumo:
+                                limites_service.registrar(transaccion, consumo)
+                            if entrega_tauser:
+                                # PENDIENTE: el hold vence con la transacción; pagada: sin vencimiento
+                                reservarStock(transaccion)
+                    except stock_holds.StockInsuficiente:
+                        # Otra operación se llevó los billetes entre el chequeo y la reserva
+                        devuelto = estado != Transaccion.Estado.PAGADA or _reembolsar(
+                            tipo_pago_nombre, data, monto_origen, payment_intent_id
+                        )
+                        messages.error(
+                            request,
+                            "El Tauser se quedó sin billetes para este monto mientras se procesaba la operación; "
+                            "no se registró. "
+                            + ("Si se te cobró, el monto fue devuelto." if devuelto
+                               else "No se pudo devolver el cobro automáticamente: contactá con soporte."),
+                        )
+                        return redirect("compraventa")
+                    consumo = None
+                    quote_snapshots.consumir(cotizacion["id"])
+                    reclamada = False
+
+                    # Tipo de cobro congelado en el snapshot
+                    tipo_cobro_nombre = cotizacion["tipo_cobro_nombre"]
+
+                    # --- Pago al cliente en background ---
+                    if tipo_cobro_nombre != "tauser" and tipo_pago_nombre != "tauser":
+                        pagar_al_cliente_task.delay(transaccion.id)
+
+                    if estado == Transaccion.Estado.PAGADA:
+                        try:
+                            if os.getenv("GENERAR_FACTURA"):
+                                result = generate_invoice_for_transaccion(transaccion)
+                            # Si preferís async:
+                            # generate_invoice_task.delay(transaccion.id)
+                            # messages.success(request, f"Factura emitida. Nro {result['dNumDoc']} (DE {result['de_id']}).")
+                        except Exception as e:
+                            messages.warning(request, f"La transacción se registró, pero falló la emisión de la factura: {e}")
+                            with open("error.txt", "a") as f: f.write(f"[{datetime.now()}] {type(e).__name__}: {e}\n")
+
+                    # limpiar la sesión
+                    messages.success(request, "Transacción registrada.")
+                    return redirect("transaccion_list")
+                finally:
+                    # Si la transacción no llegó a crearse, el cupo tomado vuelve al cliente
+                    # y la cotización queda disponible (p. ej. para reintentar el PIN)
+                    if consumo:
+                        limites_service.devolver(consumo)
+                    if reclamada:
+                        quote_snapshots.soltar(cotizacion["id"])
 
     for tipo in tipos_pago:
         nombre_normalizado = tipo["nombre"].replace(" ", "").replace("_", "").lower()
@@ -417,24 +500,19 @@ def compraventa_view(request):
     # Obtener la categoría del cliente
     categoria_cliente = cliente.categoria
 
-    limites = LimiteIntercambioCliente.objects.select_related("config__moneda") \
-        .filter(cliente=cliente) \
-        .values(
-            "config__moneda__code",
-            "limite_dia_actual",
-            "limite_mes_actual"
-        )
+    # Saldos vigentes: si el período del saldo ya cortó, se muestra renovado
+    limites = limites_service.saldos(cliente)
 
     limites_dict = {
         item["config__moneda__code"]: {
-            "dia": float(item["limite_dia_actual"]),
-            "mes": float(item["limite_mes_actual"]),
+            "dia": float(item["dia"]),
+            "mes": float(item["mes"]),
         }
         for item in limites
     }
 
     # Obtener los datos de la cuenta del negocio para recibir transferencias
-    cuenta_negocio = CuentaBancariaNegocio.objects.first()
+    cuenta_negocio = catalog_registry.cuenta_negocio()
 
     ct_tauser = ContentType.objects.get_for_model(Tauser)
 
@@ -450,6 +528,28 @@ def compraventa_view(request):
     return render(request, "webapp/compraventa_y_conversion/compraventa.html", context)
 
 
+def _reembolsar(tipo_pago_nombre: str, data: dict, monto_origen: Decimal, payment_intent_id=None) -> bool:
+    """Devuelve un cobro ya aprobado cuando la transacción no llegó a registrarse. True si se devolvió."""
+    if tipo_pago_nombre == "tarjetainternacional":
+        resultado = reembolsar_pago_stripe(payment_intent_id)
+    elif tipo_pago_nombre == "tarjetanacional":
+        tarjeta = TarjetaNacional.objects.get(id=data["medio_pago"])
+        resultado = reembolsar_al_cliente(monto_origen, tarjeta.numero_tokenizado)
+    elif tipo_pago_nombre == "billetera":
+        billetera = Billetera.objects.get(id=data["medio_pago"])
+        resultado = reembolsar_al_cliente(monto_origen, billetera.numero_celular)
+    else:
+        return True
+
+    if not resultado.get("success"):
+        logger.error(
+            "[REEMBOLSO_FALLIDO] Cotización %s, %s %s por %s: %s",
+            data.get("quote_id"), monto_origen, data.get("moneda_origen"), tipo_pago_nombre, resultado.get("message"),
+        )
+        return False
+    return True
+
+
 def get_metodos_pago_cobro(request):
     cliente_id = request.session.get("cliente_id")
     if not cliente_id:
@@ -457,151 +557,27 @@ def get_metodos_pago_cobro(request):
 
     moneda_pago = request.GET.get("from")
     moneda_cobro = request.GET.get("to")
+    # ?solo_par=1 → stock de Tausers solo en las monedas del par y, para cobrar,
+    # solo los Tausers que tienen billetes de la moneda destino
+    solo_par = request.GET.get("solo_par") in ("1", "true")
 
     tauser_stock = get_tauser_stock_dict()
-
-    # ---------------- ContentTypes ----------------
-    ct_tarjetaNacional = ContentType.objects.get_for_model(TarjetaNacional)
-    ct_tarjetaInternacional = ContentType.objects.get_for_model(TarjetaInternacional)
-    ct_billetera = ContentType.objects.get_for_model(Billetera)
-    ct_tauser = ContentType.objects.get_for_model(Tauser)
-    ct_transferencia_cobro = ContentType.objects.get_for_model(CuentaBancariaCobro)
-    ct_billetera_cobro = ContentType.objects.get_for_model(BilleteraCobro)
-
-    # ---------------- Métodos de Pago ----------------
-    metodo_pago = []
-
-    tarjetasNacionales = TarjetaNacional.objects.filter(
-        medio_pago__cliente__id=cliente_id, medio_pago__activo=True
-    ).select_related("medio_pago__tipo_pago", "entidad")
-    for t in tarjetasNacionales:
-        if moneda_pago and t.medio_pago.moneda.code != moneda_pago:
-            continue
-        metodo_pago.append({
-            "id": t.id,
-            "tipo": "tarjeta_nacional",
-            "nombre": f"{t.medio_pago.nombre} ****{t.ultimos_digitos}",
-            "tipo_general_id": t.medio_pago.tipo_pago_id,
-            "entidad": {"nombre": t.entidad.nombre} if t.entidad else None,
-            "content_type_id": ct_tarjetaNacional.id,
-            "moneda_code": t.medio_pago.moneda.code
-        })
-
-    # 🔹 Tarjetas Internacionales
-    tarjetas_internacionales = (
-        TarjetaInternacional.objects
-        .filter(medio_pago__cliente_id=cliente_id, medio_pago__activo=True)
-        .select_related("medio_pago__tipo_pago")
+    if solo_par:
+        tauser_stock = tauser_stock_service.para_par(tauser_stock, [moneda_pago, moneda_cobro])
+
+    # Payload del cliente cacheado (services/metodos_cliente); filtros y stock en memoria
+    metodos = metodos_cliente.payload(cliente_id)
+    metodo_pago = metodos_cliente.filtrar(metodos["metodo_pago"], moneda_pago, tauser_stock)
+    metodo_cobro = metodos_cliente.filtrar(
+        metodos["metodo_cobro"], moneda_cobro, tauser_stock, exigir_stock=solo_par,
     )
-    for t in tarjetas_internacionales:
-        metodo_pago.append({
-            "id": t.id,
-            "tipo": "tarjeta_internacional",
-            "nombre": f"{t.medio_pago.nombre} ****{t.ultimos_digitos}",
-            "tipo_general_id": t.medio_pago.tipo_pago_id,
-            "moneda_code": getattr(t.medio_pago.moneda, "code", None),
-            "content_type_id": ct_tarjetaInternacional.id,
-        })
-
-    
-    billeteras = Billetera.objects.filter(
-        medio_pago__cliente__id=cliente_id, medio_pago__activo=True
-    ).select_related("medio_pago__tipo_pago", "entidad")
-    for t in billeteras:
-        if moneda_pago and t.medio_pago.moneda.code != moneda_pago:
-            continue
-        metodo_pago.append({
-            "id": t.id,
-            "tipo": "billetera",
-            "nombre": f"{t.medio_pago.nombre} ({t.entidad.nombre}) {t.numero_celular}" if t.entidad else f"{t.nombre}",
-            "tipo_general_id": t.medio_pago.tipo_pago_id,
-            "entidad": {"nombre": t.entidad.nombre} if t.entidad else None,
-            "moneda_code": t.medio_pago.moneda.code,
-            "content_type_id": ct_billetera.id
-        })
-
-    tausers = Tauser.objects.filter(activo=True)
-    for t in tausers:
-        metodo_pago.append({
-            "id": t.id,
-            "tipo": t.tipo,
-            "nombre": f"{t.nombre} ({t.ubicacion})",
-            "ubicacion": t.ubicacion,
-            "tipo_general_id": t.tipo_pago.id,
-            "moneda_code": None,
-            "content_type_id": ct_tauser.id,
-            "stock": tauser_stock.get(t.id, {})
-        })
-
-    # ---------------- Métodos de Cobro ----------------
-    metodo_cobro = []
-
-    transferencias = CuentaBancariaCobro.objects.filter(
-        medio_cobro__cliente__id=cliente_id, medio_cobro__activo=True
-    ).select_related("medio_cobro__tipo_cobro", "entidad")
-    for t in transferencias:
-        if moneda_cobro and t.medio_cobro.moneda.code != moneda_cobro:
-            continue
-        metodo_cobro.append({
-            "id": t.id,
-            "tipo": "transferencia",
-            "nombre": f"{t.medio_cobro.nombre} ({t.entidad.nombre}) {t.numero_cuenta}" if t.entidad else "Transferencia",
-            "numero_cuenta": t.numero_cuenta,
-            "tipo_general_id": t.medio_cobro.tipo_cobro_id,
-            "entidad": {"nombre": t.entidad.nombre} if t.entidad else None,
-            "moneda_code": t.medio_cobro.moneda.code,
-            "content_type_id": ct_transferencia_cobro.id
-        })
-
-    billeteras = BilleteraCobro.objects.filter(
-        medio_cobro__cliente__id=cliente_id, medio_cobro__activo=True
-    ).select_related("medio_cobro__tipo_cobro", "entidad")
-    for t in billeteras:
-        if moneda_cobro and t.medio_cobro.moneda.code != moneda_cobro:
-            continue
-        metodo_cobro.append({
-            "id": t.id,
-            "tipo": "billetera",
-            "nombre": f"{t.medio_cobro.nombre} ({t.entidad.nombre}) {t.numero_celular}" if t.entidad else f"{t.nombre}",
-            "tipo_general_id": t.medio_cobro.tipo_cobro_id,
-            "entidad": {"nombre": t.entidad.nombre} if t.entidad else None,
-            "moneda_code": t.medio_cobro.moneda.code,
-            "content_type_id": ct_billetera_cobro.id
-        })
-
-    tausers = Tauser.objects.filter(activo=True)
-    for t in tausers:
-        metodo_cobro.append({
-            "id": t.id,
-            "tipo": t.tipo,
-            "nombre": f"{t.nombre} ({t.ubicacion})",
-            "ubicacion": t.ubicacion,
-            "tipo_general_id": t.tipo_cobro.id,
-            "moneda_code": None,
-            "content_type_id": ct_tauser.id,
-            "stock": tauser_stock.get(t.id, {})
-        })
 
     return JsonResponse({"metodo_pago": metodo_pago, "metodo_cobro": metodo_cobro})
 
 
 def get_tauser_stock_dict():
-    data = defaultdict(lambda: defaultdict(list))
-
-    stocks = (
-        TauserCurrencyStock.objects
-        .select_related("tauser", "currency", "denomination")
-        .filter(tauser__activo=True, quantity__gt=0)
-        .order_by("tauser_id", "currency_id", "-denomination__value")
-    )
-
-    for s in stocks:
-        data[s.tauser_id][s.currency.code].append({
-            "value": float(s.denomination.value),
-            "quantity": s.quantity
-        })
-
-    return data
+    """Stock disponible por Tauser y moneda, desde el snapshot versionado (services/tauser_stock)."""
+    return tauser_stock_service.snapshot()
 
 
 # ----------------------------------
@@ -609,11 +585,15 @@ def get_tauser_stock_dict():
 # ----------------------------------
 def transaccion_list(request):
     """
-    Muestra el historial de transacciones del cliente actual.
+    Muestra el historial de transacciones del cliente actual, paginado por
+    cursor sobre (fecha_creacion, id) (ver services/keyset.py).
+    - Los medios de pago/cobro de la página se cargan por lotes, una consulta
+      por tipo de contenido.
     - Marca si el medio de pago es CuentaBancariaNegocio.
     - Prepara montos formateados para la tabla.
     - Si la transacción tiene cambio_pendiente y está PENDIENTE, adjunta al objeto
-      las tasas y montos nuevos ya formateados, para usarlos en el modal 'Ver Cambios'.
+      las tasas y montos nuevos ya formateados, para usarlos en el modal 'Ver Cambios'
+      (solo para las filas de la página visible).
     """
     cliente_id = request.session.get("cliente_id")
     if not cliente_id:
@@ -622,17 +602,28 @@ def transaccion_list(request):
 
     transacciones = (
         Transaccion.objects.select_related(
-            "cliente",
+            "cliente__categoria",
             "usuario",
             "moneda_origen",
             "moneda_destino",
             "factura_asociada",
         )
         .filter(cliente_id=cliente_id)
-        .order_by("-fecha_creacion")
     )
 
-    for t in transacciones:
+    pagina = keyset.paginar(
+        transacciones,
+        "fecha_creacion",
+        getattr(settings, "TRANSACCIONES_POR_PAGINA", 50),
+        despues=request.GET.get("despues"),
+        antes=request.GET.get("antes"),
+    )
+
+    # GenericForeignKey: una consulta por tipo de medio para toda la página
+    prefetch_related_objects(pagina.filas, *metodos_cliente.prefetch_medios())
+
+    tasas = None
+    for t in pagina:
         # 🔹 Flag para saber si se pagó desde cuenta bancaria negocio
         t.es_pago_cuenta_bancaria = isinstance(t.medio_pago, CuentaBancariaNegocio)
 
@@ -655,7 +646,10 @@ def transaccion_list(request):
         #     - la transacción tiene cambio_pendiente
         #     - y sigue en estado PENDIENTE
         if t.cambio_pendiente and t.estado == Transaccion.Estado.PENDIENTE:
-            montos = calcularMontosCambio(t)
+            # Tasas vigentes por grupo (moneda, categoría, tipos de pago/cobro), solo si hacen falta
+            if tasas is None:
+                tasas = TasasPorGrupo()
+            montos = calcularMontosCambio(t, tasa_actual=tasas.para(t))
 
             monto_origen_nuevo = montos.get("montoOrigenNuevo")
             monto_destino_nuevo = montos.get("montoDestinoNuevo")
@@ -688,7 +682,8 @@ def transaccion_list(request):
                 t.cambio_pendiente = False  # opcional: o solo dejas los *_nuevo_fmt en None
 
     context = {
-        "transacciones": transacciones,
+        "transacciones": pagina.filas,
+        "pagina": pagina,
     }
     return render(
         request,
@@ -709,8 +704,11 @@ def ingresar_idTransferencia(request, transaccion_id: int):
     if transaccion.estado == Transaccion.Estado.PENDIENTE:
         tiempo_limite = transaccion.fecha_creacion + timedelta(minutes=2)
         if timezone.now() > tiempo_limite:
-            transaccion.estado = Transaccion.Estado.CANCELADA
-            transaccion.save(update_fields=["estado"])
+            with transaction.atomic():
+                transaccion.estado = Transaccion.Estado.CANCELADA
+                # El cupo se devuelve en la señal (signals.devolver_cupo_al_cancelar)
+                transaccion.save(update_fields=["estado", "fecha_actualizacion"])
+                stock_holds.liberar([transaccion.id])
             messages.error(request, "Esta transacción expiró automáticamente.")
             return redirect("transaccion_list")
 
@@ -736,16 +734,32 @@ def ingresar_idTransferencia(request, transaccion_id: int):
                 {"transaccion": transaccion},
             )
 
-        # ✅ Si pasa la validación, actualizar transacción
-        transaccion.id_transferencia = id_ingresado
-        transaccion.estado = Transaccion.Estado.PAGADA
-        transaccion.fecha_pago = timezone.now().date()  # registra la fecha de pago (solo día)
-        transaccion.save(update_fields=["id_transferencia", "estado", "fecha_pago", "fecha_actualizacion"])
+        # ✅ Si pasa la validación, actualizar transacción junto con sus billetes del Tauser
+        entrega_tauser = isinstance(transaccion.medio_cobro, Tauser)
+        try:
+            with transaction.atomic():
+                transaccion.id_transferencia = id_ingresado
+                transaccion.estado = Transaccion.Estado.PAGADA
+                transaccion.fecha_pago = timezone.now().date()  # registra la fecha de pago (solo día)
+                transaccion.save(update_fields=["id_transferencia", "estado", "fecha_pago", "fecha_actualizacion"])
+                if entrega_tauser:
+                    # El hold de la confirmación queda sin vencimiento (o se toma si ya había vencido)
+                    reservarStock(transaccion)
+        except stock_holds.StockInsuficiente as e:
+            transaccion.refresh_from_db()
+            messages.error(
+                request,
+                f"No hay billetes disponibles en el Tauser para entregar esta operación ({e}). "
+                "La transferencia no se registró; contactá con soporte.",
+            )
+            return render(
+                request,
+                "webapp/compraventa_y_conversion/ingresar_idTransferencia.html",
+                {"transaccion": transaccion},
+            )
 
-        if not isinstance(transaccion.medio_cobro, Tauser):
+        if not entrega_tauser:
             pagar_al_cliente_task.delay(transaccion.id)
-        else:
-            reservarStock(transaccion.medio_cobro.id, transaccion.moneda_destino.code, transaccion.monto_destino)
 
         messages.success(
             request,
@@ -765,106 +779,132 @@ def ingresar_idTransferencia(request, transaccion_id: int):
 # Vistas de conversión
 # ----------------------
 
+def _validadores_cotizaciones(request):
+    """(ETag, Last-Modified) de api_active_currencies, calculados una vez por request."""
+    if not hasattr(request, "_validadores_cotizaciones"):
+        request._validadores_cotizaciones = quote_matrix.validadores(
+            quote_matrix.descuento_cliente(request.user, request.session.get("cliente_id")),
+            request.GET.get("tipo_metodo_pago_id"),
+            request.GET.get("tipo_metodo_cobro_id"),
+        )
+    return request._validadores_cotizaciones
+
+
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=lambda request: _validadores_cotizaciones(request)[0],
+    last_modified_func=lambda request: _validadores_cotizaciones(request)[1],
+)
 def api_active_currencies(request):
-    user = request.user
-    descuentoCategoria = Decimal('0')  # Por defecto para invitados
+    """
+    Cotizaciones de las monedas activas para el cliente seleccionado.
+    Se sirven desde la matriz precalculada (webapp/services/quote_matrix.py):
+    el resultado solo depende de (descuento de categoría, tipo de pago, tipo de cobro).
+    Si el cliente envía el ETag vigente recibe 304 sin cuerpo.
+    """
+    descuentoCategoria = quote_matrix.descuento_cliente(request.user, request.session.get("cliente_id"))
 
-    if user.is_authenticated:
-        try:
-            # Obtener cliente asociado al usuario
-            cliente_id = request.session.get("cliente_id")
-            cliente_usuario = None
-            if cliente_id:
-                cliente_usuario = ClienteUsuario.objects.filter(
-                    usuario=user,
-                    cliente_id=cliente_id
-                ).select_related("cliente__categoria").first()
-            else:
-                descuentoCategoria = Decimal('0')
+    items = quote_matrix.obtener_cotizaciones(
+        descuentoCategoria,
+        request.GET.get("tipo_metodo_pago_id"),
+        request.GET.get("tipo_metodo_cobro_id"),
+    )
+    return JsonResponse({"items": items})
 
-            if cliente_usuario and cliente_usuario.cliente.categoria:
-                descuentoCategoria = cliente_usuario.cliente.categoria.descuento or Decimal('0')
-        except Exception:
-            descuentoCategoria = Decimal('0')
 
-    # Intentar obtener IDs de método de pago/cobro
-    tipo_metodo_pago_id = request.GET.get("tipo_metodo_pago_id")
-    tipo_metodo_cobro_id = request.GET.get("tipo_metodo_cobro_id")
+def _formato_sse(evento_id, tipo, data) -> str:
+    return f"id: {evento_id}\nevent: {tipo}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
 
-    metodo_pago = None
-    metodo_cobro = None
-    if tipo_metodo_pago_id:
-        try:
-            metodo_pago = TipoPago.objects.get(id=tipo_metodo_pago_id, activo=True)
-        except TipoPago.DoesNotExist:
-            metodo_pago = None
-    if tipo_metodo_cobro_id:
-        try:
-            metodo_cobro = TipoCobro.objects.get(id=tipo_metodo_cobro_id, activo=True)
-        except TipoCobro.DoesNotExist:
-            metodo_cobro = None
 
-    qs = Currency.objects.filter(is_active=True)
-    items = []
+def _stream_eventos(desde_id, descuento, pago_id, cobro_id, lugar):
+    """
+    Generador SSE: espera eventos nuevos en el log de la cache y los reenvía.
+    Las cotizaciones se recalculan para el descuento y métodos de ESTE cliente.
+    Al terminar (o si el cliente se desconecta) suelta su lugar de stream.
+    """
+    try:
+        yield from _leer_eventos(desde_id, descuento, pago_id, cobro_id)
+    finally:
+        live_quotes.soltar_lugar_stream(lugar)
+
+
+def _leer_eventos(desde_id, descuento, pago_id, cobro_id):
+    duracion = min(getattr(settings, "LIVE_QUOTES_STREAM_SECONDS", 25), live_quotes.STREAM_MAX_SEGUNDOS)
+    intervalo = getattr(settings, "LIVE_QUOTES_POLL_SECONDS", 1.0)
+    latido = getattr(settings, "LIVE_QUOTES_HEARTBEAT_SECONDS", 15)
+
+    # El stream dura poco (ocupa un worker); el navegador reconecta solo al cerrarse
+    yield "retry: 1000\n\n"
+
+    inicio = ultimo_envio = time.monotonic()
+    while time.monotonic() - inicio < duracion:
+        eventos, desde_id = live_quotes.eventos_desde(desde_id)
+        for evento_id, tipo, data in eventos:
+            if tipo == live_quotes.TIPO_COTIZACION:
+                data = _delta_cotizacion(data, descuento, pago_id, cobro_id)
+            yield _formato_sse(evento_id, tipo, data)
+            ultimo_envio = time.monotonic()
+
+        if time.monotonic() - ultimo_envio >= latido:
+            yield ": ping\n\n"
+            ultimo_envio = time.monotonic()
+        time.sleep(intervalo)
+
+
+def _delta_cotizacion(data, descuento, pago_id, cobro_id):
+    insumos = quote_matrix.obtener_insumos()
+    com_pago = insumos["pagos"].get(pago_id) if pago_id else None
+    com_cobro = insumos["cobros"].get(cobro_id) if cobro_id else None
+    tarifa = pricing.Tarifa(data["code"], Decimal(data["base"]), Decimal(data["com_venta"]), Decimal(data["com_compra"]))
+    cotizacion = pricing.quote_one(tarifa, descuento, com_pago, com_cobro)
+    return {
+        "code": data["code"],
+        "name": data["name"],
+        "decimals": data["decimals"],
+        "activo": data["activo"],
+        "venta": float(cotizacion.venta),
+        "compra": float(cotizacion.compra),
+        "flag_url": data["flag_url"],
+    }
 
-    for c in qs:
-        base = Decimal(c.base_price)
-        com_venta = Decimal(c.comision_venta)
-        com_compra = Decimal(c.comision_compra)
 
-        # Aplicar fórmulas según descuento del cliente
-        venta = base + (com_venta * (1 - descuentoCategoria))
-        compra = base - (com_compra * (1 - descuentoCategoria))
+@require_GET
+def stream_cotizaciones(request):
+    """
+    Stream SSE con deltas de cotización (event: quote) y de stock de Tausers
+    (event: stock). Si el cliente perdió eventos recibe 'reset' y recarga.
+    Acepta los mismos parámetros tipo_metodo_pago_id/tipo_metodo_cobro_id que
+    api_active_currencies y el encabezado Last-Event-ID al reconectar.
+    Si ya hay LIVE_QUOTES_MAX_STREAMS abiertos responde 204: EventSource no
+    reintenta y la pantalla pasa a consultar api_active_currencies.
+    """
+    lugar = live_quotes.tomar_lugar_stream()
+    if lugar is None:
+        return HttpResponse(status=204)
 
-        # Aplicar comisiones del método seleccionado si existen
-        try:
-            if metodo_pago and metodo_cobro:
-                # Ajusta la venta y la compra con las comisiones
-                venta = venta * (1 + Decimal(metodo_pago.comision)/100 + Decimal(metodo_cobro.comision)/100)
-                compra = compra * (1 - Decimal(metodo_cobro.comision)/100 - Decimal(metodo_pago.comision)/100)
-            elif metodo_pago:
-                # Solo existe método de pago
-                venta = venta * (1 + Decimal(metodo_pago.comision)/100)
-                compra = compra * (1 - Decimal(metodo_pago.comision)/100)
-                # compra queda igual o se deja como estaba
-            elif metodo_cobro:
-                # Solo existe método de cobro
-                compra = compra * (1 - Decimal(metodo_cobro.comision)/100)
-                venta = venta * (1 + Decimal(metodo_cobro.comision)/100)
-                # venta queda igual o se deja como estaba
-        except (AttributeError, TypeError, ValueError) as e:
-            # Aquí podés decidir qué hacer si algo falla:
-            # - loguear el error
-            # - usar comisiones 0
-            # - dejar venta/compra sin modificar
-            print("Error al aplicar comisiones:", e)
-
-        # ✅ Siempre devolver venta/compra sin decimales (PYG siempre)
-        venta = venta.quantize(Decimal("1"), rounding=ROUND_HALF_UP)
-        compra = compra.quantize(Decimal("1"), rounding=ROUND_HALF_UP)
-
-        items.append({
-            "code": c.code,
-            "name": c.name,
-            "decimals": int(c.decimales_monto or 2),
-            "venta": float(venta),
-            "compra": float(compra),
-            "flag_url": c.flag_image.url if c.flag_image else "",
-        })
-
-    # Asegurar que PYG siempre exista
-    if not any(x["code"] == "PYG" for x in items):
-        items.append({
-            "code": "PYG",
-            "name": "Guaraní",
-            "decimals": 0,
-            "venta": 1.0,
-            "compra": 1.0,
-            "flag_url": "/static/webapp/flags/pyg.png",
-        })
+    descuento = quote_matrix.descuento_cliente(request.user, request.session.get("cliente_id"))
+    pago_id = quote_matrix._norm_id(request.GET.get("tipo_metodo_pago_id"))
+    cobro_id = quote_matrix._norm_id(request.GET.get("tipo_metodo_cobro_id"))
 
-    return JsonResponse({"items": items})
+    # Al reconectar se retoma desde el último evento recibido; si no, desde ahora
+    try:
+        desde_id = int(request.headers.get("Last-Event-ID") or request.GET["desde"])
+    except (KeyError, TypeError, ValueError):
+        desde_id = live_quotes.ultimo_id()
+
+    # El stream no usa la base de datos: liberar la conexión mientras dura
+    for conn in connections.all(initialized_only=True):
+        if not conn.in_atomic_block:
+            conn.close()
+
+    response = StreamingHttpResponse(
+        _stream_eventos(desde_id, descuento, pago_id, cobro_id, lugar),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # evitar buffering en nginx
+    return response
 
 
 @login_required
@@ -886,6 +926,10 @@ def set_cliente_seleccionado(request):
 
 
 def calcularTasa(transaccion):
+    """
+    Tasa vigente para la transacción (entera, en PYG) según su tipo, la
+    categoría del cliente y los porcentajes de sus medios de pago/cobro.
+    """
     descuentoCategoria = Decimal('0')
 
     try:
@@ -901,21 +945,8 @@ def calcularTasa(transaccion):
     else:
         moneda = transaccion.moneda_origen
 
-    # Intentar obtener IDs de método de pago/cobro
-    tipo_metodo_pago_id = transaccion.medio_pago
-    tipo_metodo_cobro_id = transaccion.medio_cobro
-
-    medio_pago = None
-    medio_cobro = None
-    if tipo_metodo_pago_id:
-        medio_pago = transaccion.medio_pago
-    if tipo_metodo_cobro_id:
-        medio_cobro = transaccion.medio_cobro
-
-
-    base = Decimal(moneda.base_price)
-    com_venta = Decimal(moneda.comision_venta)
-    com_compra = Decimal(moneda.comision_compra)
+    medio_pago = transaccion.medio_pago
+    medio_cobro = transaccion.medio_cobro
 
     # Porcentajes de comisión, seguros
     porc_medio_pago = Decimal('0')
@@ -927,41 +958,8 @@ def calcularTasa(transaccion):
     if medio_cobro and getattr(medio_cobro, "tipo_cobro", None):
         porc_medio_cobro = Decimal(medio_cobro.tipo_cobro.comision or 0)
 
-    # Aplicar fórmulas según descuento del cliente
-    venta = base + (com_venta * (1 - descuentoCategoria))
-    compra = base - (com_compra * (1 - descuentoCategoria))
-
-    # Aplicar comisiones del método seleccionado si existen
-    try:
-        if porc_medio_cobro and porc_medio_pago:
-            # Ajusta la venta y la compra con las comisiones
-            venta = venta * (1 + porc_medio_pago/100 + porc_medio_cobro/100)
-            compra = compra * (1 - porc_medio_cobro/100 - porc_medio_pago/100)
-        elif porc_medio_pago:
-            # Solo existe método de pago
-            venta = venta * (1 + porc_medio_pago/100)
-            compra = compra * (1 - porc_medio_pago/100)
-            # compra queda igual o se deja como estaba
-        elif porc_medio_cobro:
-            # Solo existe método de cobro
-            compra = compra * (1 - porc_medio_cobro/100)
-            venta = venta * (1 + porc_medio_cobro/100)
-            # venta queda igual o se deja como estaba
-    except (AttributeError, TypeError, ValueError) as e:
-        # Aquí podés decidir qué hacer si algo falla:
-        # - loguear el error
-        # - usar comisiones 0
-        # - dejar venta/compra sin modificar
-        print("Error al aplicar comisiones:", e)
-
-    # ✅ Siempre devolver venta/compra sin decimales (PYG siempre)
-    venta = venta.quantize(Decimal("1"), rounding=ROUND_HALF_UP)
-    compra = compra.quantize(Decimal("1"), rounding=ROUND_HALF_UP)
-
-    if transaccion.tipo == "VENTA":
-        return venta
-
-    return compra
+    cotizacion = pricing.quote_one(moneda, descuentoCategoria, porc_medio_pago, porc_medio_cobro)
+    return cotizacion.tasa(transaccion.tipo)
 
 def formatearMontos(monto: Decimal, moneda: Currency, como_str: bool = False):
     """
@@ -1000,10 +998,12 @@ def formatearMontos(monto: Decimal, moneda: Currency, como_str: bool = False):
 
     return monto_str
 
-def calcularMontosCambio(transaccion) -> Dict[str, Any]:
+def calcularMontosCambio(transaccion, tasa_actual: Optional[Decimal] = None, insumos=None) -> Dict[str, Any]:
     """
     Calcula los montos nuevos ante un cambio de tasa, según la combinación
-    de medios de pago/cobro.
+    de medios de pago/cobro. Si no se recibe la tasa actual se calcula con
+    calcularTasa (el recálculo masivo la pasa ya calculada por grupo, junto
+    con el stock y los saldos del lote en `insumos`).
 
     Devuelve un diccionario con:
       - tasa_actual
@@ -1020,7 +1020,8 @@ def calcularMontosCambio(transaccion) -> Dict[str, Any]:
     moneda_origen = transaccion.moneda_origen
     moneda_destino = transaccion.moneda_destino
 
-    tasa_actual = calcularTasa(transaccion)
+    if tasa_actual is None:
+        tasa_actual = calcularTasa(transaccion)
 
     monto_origen_nuevo= None
     monto_destino_nuevo= None
@@ -1048,6 +1049,7 @@ def calcularMontosCambio(transaccion) -> Dict[str, Any]:
         monto_origen_nuevo, monto_destino_nuevo = recalcularMontosAmbosTauser(
             transaccion=transaccion,
             tasa_actual=tasa_actual,
+            insumos=insumos,
         )
 
     # -------------------------------------------------------
@@ -1098,7 +1100,7 @@ def tauser_puede_recibir(tauser: Tauser, currency: Currency, monto: Decimal) ->
     """
     Verifica si el Tauser puede recibir 'monto' en 'currency' usando
     únicamente las denominaciones que maneja (stock ilimitado).
-    Greedy por denominación descendente.
+    Cambio exacto por programación dinámica (ver services/cambio_billetes).
     """
     if monto <= 0:
         return False
@@ -1109,44 +1111,28 @@ def tauser_puede_recibir(tauser: Tauser, currency: Currency, monto: Decimal) ->
         .values_list("denomination__value", flat=True)
     )
 
-    valores = sorted(
-        [Decimal(v) for v in denoms if Decimal(v) > 0],
-        reverse=True,
-    )
-
-    if not valores:
-        # Si no tiene denominaciones en esa moneda, no puede recibir.
-        return False
-
-    restante = monto
-
-    for v in valores:
-        if v <= 0:
-            continue
-        usar = (restante // v)
-        restante -= usar * v
-        if restante <= 0:
-            return True
-
-    return False
+    # Si no tiene denominaciones en esa moneda, no puede recibir.
+    return cambio_billetes.resolver_ilimitado(monto, denoms) is not None
 
 
 def tauser_puede_entregar(tauser: Tauser, currency: Currency, monto: Decimal) -> bool:
     """
     Verifica si el Tauser puede ENTREGAR 'monto' en 'currency'
     respetando su stock de denominaciones.
-    Greedy por denominación descendente.
+    Cambio exacto por programación dinámica (ver services/cambio_billetes).
     """
     if monto <= 0:
         return False
 
-    qs = TauserCurrencyStock.objects.filter(
-        tauser=tauser,
-        currency=currency,
-        quantity__gt=0,
-    ).select_related("denomination")
+    # Disponible = en mano menos holds activos (services/stock_holds)
+    filas = list(
+        TauserCurrencyStock.objects
+        .filter(tauser=tauser, currency=currency, quantity__gt=F("reservado"))
+        .annotate(disponible=F("quantity") - F("reservado"))
+        .values_list("denomination__value", "disponible")
+    )
 
-    if not qs.exists():
+    if not filas:
         # Criterio: si no hay stock registrado:
         #  - para PYG podrías asumir stock "ilimitado" (si querés),
         #  - para moneda extranjera => no puede entregar.
@@ -1154,30 +1140,7 @@ def tauser_puede_entregar(tauser: Tauser, currency: Currency, monto: Decimal) ->
             return True  # si preferís ignorar stock de PYG
         return False
 
-    # Ordenar de mayor a menor denominación
-    denoms = sorted(
-        [
-            (Decimal(row.denomination.value), row.quantity)
-            for row in qs
-            if Decimal(row.denomination.value) > 0
-        ],
-        key=lambda x: x[0],
-        reverse=True,
-    )
-
-    restante = monto
-
-    for valor, qty in denoms:
-        if valor <= 0 or qty <= 0:
-            continue
-
-        max_units = restante // valor
-        usar = min(max_units, qty)
-        restante -= usar * valor
-        if restante <= 0:
-            return True
-
-    return False
+    return cambio_billetes.resolver(monto, filas) is not None
 
 
 def convertir_monto(moneda_from: Currency, moneda_to: Currency, monto: Decimal, tasa: Decimal) -> Decimal:
@@ -1204,28 +1167,26 @@ def convertir_monto(moneda_from: Currency, moneda_to: Currency, monto: Decimal,
 def obtener_tope_moneda_cliente(
     cliente: Cliente,
     moneda: Currency,
+    insumos=None,
 ) -> Optional[Decimal]:
     """
     Devuelve el tope disponible (min entre día y mes) para un cliente
     en una moneda dada, usando LimiteIntercambioCliente.
 
     Si no existe configuración para esa moneda, devuelve None (sin límite).
+    Con `insumos` (rate_impact.InsumosTauser) el saldo sale de lo ya cargado.
     """
-    limite = (
-        LimiteIntercambioCliente.objects
-        .filter(
-            cliente=cliente,
-            config__moneda=moneda,  # 👈 ajustá el nombre del campo en LimiteIntercambioConfig si es distinto
-        )
-        .first()
-    )
+    if insumos is not None:
+        limite = insumos.saldo(cliente.id, moneda.id)
+    else:
+        limite = limites_service.saldo(cliente, moneda.id)
 
     if not limite:
         # Sin registro → no se aplica límite explícito
         return None
 
-    # Tomamos el más restrictivo entre día y mes
-    tope = min(limite.limite_dia_actual, limite.limite_mes_actual)
+    # Tomamos el más restrictivo entre día y mes (ya renovados si cortó el período)
+    tope = min(limite["dia"], limite["mes"])
 
     # Si ya no hay saldo disponible, devolvemos 0
     if tope <= 0:
@@ -1237,6 +1198,7 @@ def obtener_tope_moneda_cliente(
 def recalcularMontosAmbosTauser(
     transaccion: Transaccion,
     tasa_actual: Optional[Decimal] = None,
+    insumos=None,
 ) -> Tuple[Optional[Decimal], Optional[Decimal]]:
     """
     Tauser -> Tauser:
@@ -1246,6 +1208,9 @@ def recalcularMontosAmbosTauser(
     - Respeta límites del cliente SOLO cuando:
         * Es una VENTA, y
         * La moneda destino NO es PYG (la divisa que le damos al cliente).
+
+    Sin `insumos` consulta el stock y el saldo; el recálculo masivo los pasa
+    ya cargados para todo el lote (rate_impact.InsumosTauser).
     """
 
     medio_pago = transaccion.medio_pago
@@ -1275,7 +1240,7 @@ def recalcularMontosAmbosTauser(
     # Si es VENTA, el cliente recibe divisa = moneda_destino
     # Solo si moneda_destino NO es PYG aplicamos límite.
     if transaccion.tipo == Transaccion.Tipo.VENTA and moneda_destino.code != "PYG":
-        tope_destino = obtener_tope_moneda_cliente(cliente, moneda_destino)
+        tope_destino = obtener_tope_moneda_cliente(cliente, moneda_destino, insumos)
         # Si el tope es 0 o negativo, directamente no hay nada que hacer
         if tope_destino is not None and tope_destino <= 0:
             return (None, None)
@@ -1283,52 +1248,59 @@ def recalcularMontosAmbosTauser(
     # En COMPRA, o si alguna moneda es PYG, tus reglas dicen que NO hay límite.
     # Así que tope_origen/tope_destino se quedan en None en esos casos.
 
-    # Paso mínimo según denominaciones del Tauser que RECIBE (medio_pago)
-    step = paso_minimo_para(medio_pago, moneda_origen)
-
-    def align(x: Decimal, s: Decimal) -> Decimal:
-        # ceil(x / s) * s pero en Decimal
-        return ((x + s - Decimal("0.00000001")) // s) * s
-
-    intento: Decimal = align(monto_inicial, step)
-
-    LIMITE_ABSURDO = Decimal("1000000000000")  # 1 billón
-
-    while intento <= LIMITE_ABSURDO:
-        # 🔹 Límite en ORIGEN: en tu regla actual, no se usa (queda por si algún día lo necesitás)
-        if tope_origen is not None and intento > tope_origen:
-            break
-
-        # Monto destino según conversión
-        intento_destino: Decimal = convertir_monto(
-            moneda_from=moneda_origen,
-            moneda_to=moneda_destino,
-            monto=intento,
-            tasa=tasa_actual,
-        )
-
-        # 🔹 Límite en DESTINO (solo si es VENTA de divisa ≠ PYG)
-        if tope_destino is not None and intento_destino > tope_destino:
-            break
-
-        ok_recibir = tauser_puede_recibir(
-            tauser=medio_pago,
-            currency=moneda_origen,
-            monto=intento,
-        )
-
-        ok_entregar = tauser_puede_entregar(
-            tauser=medio_cobro,
-            currency=moneda_destino,
-            monto=intento_destino,
-        )
-
-        if ok_recibir and ok_entregar:
-            return (intento, intento_destino)
-
-        intento += step
+    # ============================================
+    # 🔹 STOCK DE AMBOS TAUSERS (una sola consulta, o ya cargado)
+    # ============================================
+    if insumos is not None:
+        filas_recibe = insumos.stock(medio_pago.id, moneda_origen.id)
+        filas_entrega = insumos.stock(medio_cobro.id, moneda_destino.id)
+    else:
+        filas_recibe, filas_entrega = [], []
+        for tauser_id, currency_id, valor, qty, reservado in (
+            TauserCurrencyStock.objects
+            .filter(
+                Q(tauser=medio_pago, currency=moneda_origen)
+                | Q(tauser=medio_cobro, currency=moneda_destino)
+            )
+            .values_list("tauser_id", "currency_id", "denomination__value", "quantity", "reservado")
+        ):
+            if tauser_id == medio_pago.id and currency_id == moneda_origen.id:
+                filas_recibe.append((valor, qty, reservado))
+            if tauser_id == medio_cobro.id and currency_id == moneda_destino.id:
+                filas_entrega.append((valor, qty, reservado))
+
+    denoms_recibe = [(Decimal(valor), qty) for valor, qty, _ in filas_recibe]
+    stock_entrega = [(Decimal(valor), qty - reservado) for valor, qty, reservado in filas_entrega if qty > reservado]
+
+    if not stock_entrega:
+        # Mismo criterio que tauser_puede_entregar: sin stock solo PYG se entrega (sin tope)
+        if moneda_destino.code != "PYG":
+            return (None, None)
+        stock_entrega = None
 
-    return (None, None)
+    # Paso mínimo según denominaciones del Tauser que RECIBE (medio_pago), como paso_minimo_para
+    con_stock = [v for v, qty in denoms_recibe if qty > 0 and v > 0]
+    if con_stock:
+        step = min(con_stock)
+    else:
+        step = Decimal("50000") if moneda_origen.code == "PYG" else Decimal("1")
+
+    def convertir(monto: Decimal) -> Decimal:
+        return convertir_monto(moneda_from=moneda_origen, moneda_to=moneda_destino, monto=monto, tasa=tasa_actual)
+
+    def invertir(monto: Decimal) -> Decimal:
+        return convertir_monto(moneda_from=moneda_destino, moneda_to=moneda_origen, monto=monto, tasa=tasa_actual)
+
+    # 🔹 Límite en ORIGEN: en tu regla actual, no se usa (tope_origen queda en None)
+    return montos_tauser.buscar_monto_factible(
+        monto_inicial=monto_inicial,
+        paso=step,
+        denominaciones_recibe=[v for v, _ in denoms_recibe],
+        stock_entrega=stock_entrega,
+        convertir=convertir,
+        invertir=invertir,
+        tope_destino=tope_destino,
+    )
 
 def _get_next_url(request):
     """
@@ -1462,9 +1434,12 @@ def cancelar_transaccion(request, pk):
         messages.warning(request, "La transacción ya no puede cancelarse.")
         return redirect(_get_next_url(request))
 
-    # Cancelar formalmente
-    transaccion.estado = Transaccion.Estado.CANCELADA
-    transaccion.save(update_fields=["estado"])
+    # Cancelar formalmente y devolver los billetes reservados en el Tauser
+    # (el cupo de intercambio lo devuelve la señal al pasar a CANCELADA)
+    with transaction.atomic():
+        transaccion.estado = Transaccion.Estado.CANCELADA
+        transaccion.save(update_fields=["estado", "fecha_actualizacion"])
+        stock_holds.liberar([transaccion.id])
 
     messages.success(request, "Tu transacción fue cancelada correctamente.")
     return redirect(_get_next_url(request))
\ No newline at end of file
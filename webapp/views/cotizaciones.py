@@ -1,20 +1,20 @@
-from webapp.views.compraventa_y_conversión import calcularMontosCambio, calcularTasa, formatearMontos
 from .constants import *
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, permission_required
 from django.http import JsonResponse
-from django.views.decorators.http import require_GET
+from django.views.decorators.http import condition, require_GET
+from django.views.decorators.cache import cache_control
 from django.utils.timezone import now, timedelta
-from django.db.models import Q
+from django.db.models import Count, Max, Q
+import hashlib
 from ..decorators import role_required
 from ..models import CuentaBancariaNegocio, CurrencyHistory, Transaccion, Currency, CuentaBancaria
 from decimal import Decimal, ROUND_HALF_UP, InvalidOperation
 from django.utils.http import urlsafe_base64_decode
 from django.utils.encoding import force_str
 from django.contrib.auth.tokens import default_token_generator
-from webapp.emails import send_transaction_cancellation_prompt
-from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 
 # ---------------------------------
 # Vistas para modificar cotizaciones (Posibles vistas nuevas)
@@ -98,10 +98,8 @@ def modify_quote(request, currency_id):
             currency.is_active = is_active
             currency.save()
             
-            # Avisar sobre los cambios a los usuarios con transacciones pendientes
-            notificados = promtCancelacionTransaccionCambioCotizacion(request)
-
-            print(notificados)
+            # Avisar sobre los cambios a los usuarios con transacciones pendientes (en segundo plano)
+            promtCancelacionTransaccionCambioCotizacion(request, moneda=currency.code)
 
             messages.success(request, f"Cotización de '{currency.name}' actualizada correctamente.")
             return redirect("manage_quotes")
@@ -170,43 +168,78 @@ def edit_prices(request, currency_id):
 # Vistas para el histórico de cotizaciones
 # ----------------------------------------
 
+RANGOS_HISTORIAL = {
+    "week": 7,
+    "month": 30,
+    "6months": 180,
+    "year": 365,
+}
+
+
+def _parametros_historial(request):
+    code = request.GET.get("code", "USD")
+    rango = request.GET.get("range", "week")
+    dias = RANGOS_HISTORIAL.get(rango, 30)
+    return code, rango, now().date() - timedelta(days=dias)
+
+
+def _validadores_historial(request):
+    """
+    (ETag, Last-Modified) del histórico sin ejecutar la consulta de puntos:
+    una sola agregación con la última fila de CurrencyHistory de la moneda y
+    su updated_at (los valores del día se actualizan en la misma fila).
+    """
+    if not hasattr(request, "_validadores_historial"):
+        code, rango, start = _parametros_historial(request)
+        estado = (
+            Currency.objects.filter(code=code)
+            .annotate(ultima=Max("histories__date"), ultima_alta=Max("histories__created_at"), n=Count("histories"))
+            .values("updated_at", "ultima", "ultima_alta", "n")
+            .first()
+        )
+        if estado is None:
+            request._validadores_historial = (None, None)
+        else:
+            clave = f"{code}:{rango}:{start}:{estado['updated_at']}:{estado['ultima']}:{estado['n']}"
+            modificado = max(filter(None, [estado["updated_at"], estado["ultima_alta"]]))
+            request._validadores_historial = (hashlib.md5(clave.encode()).hexdigest(), modificado)
+    return request._validadores_historial
+
+
 @require_GET
+@cache_control(private=True, no_cache=True)
+@condition(
+    etag_func=lambda request: _validadores_historial(request)[0],
+    last_modified_func=lambda request: _validadores_historial(request)[1],
+)
 def api_currency_history(request):
     """
     Devuelve histórico de una moneda en JSON.
     Query params:
       - code: código de moneda (ej: USD, EUR)
       - range: week|month|6months|year
+    Responde 304 si el cliente ya tiene la versión vigente (ETag/Last-Modified).
     """
-    code = request.GET.get("code", "USD")
-    rango = request.GET.get("range", "week")
+    code, rango, start = _parametros_historial(request)
 
     try:
         currency = Currency.objects.get(code=code)
     except Currency.DoesNotExist:
         return JsonResponse({"error": "Moneda no encontrada"}, status=404)
 
-    today = now().date()
-    if rango == "week":
-        start = today - timedelta(days=7)
-    elif rango == "month":
-        start = today - timedelta(days=30)
-    elif rango == "6months":
-        start = today - timedelta(days=180)
-    elif rango == "year":
-        start = today - timedelta(days=365)
-    else:
-        start = today - timedelta(days=30)
-
-    qs = CurrencyHistory.objects.filter(currency=currency, date__gte=start).order_by("date")
+    qs = (
+        CurrencyHistory.objects.filter(currency=currency, date__gte=start)
+        .order_by("date")
+        .values_list("date", "compra", "venta")
+    )
 
     items = [
         {
-            "date": h.date.strftime("%d/%m/%Y"),
-            "compra": float(h.compra),
-            "venta": float(h.venta),
+            "date": fecha.strftime("%d/%m/%Y"),
+            "compra": float(compra),
+            "venta": float(venta),
         }
-        for h in qs
+        for fecha, compra, venta in qs
     ]
     return JsonResponse({"items": items})
 
@@ -243,59 +276,15 @@ def unsubscribe_error(request):
 # -------------------------------------------------------------------------
 
 
-def promtCancelacionTransaccionCambioCotizacion(request, moneda: str | None = None) -> int:
+def promtCancelacionTransaccionCambioCotizacion(request=None, moneda: str | None = None) -> None:
     """
-    Recorre transacciones pendientes y, si la tasa actual difiere
-    de la tasa almacenada en la transacción, envía un correo al usuario
-    preguntando si desea cancelar.
+    Encola el recálculo de las transacciones pendientes (tarea Celery
+    recalcular_transacciones_pendientes_task, ver services/rate_impact.py).
 
-    Devuelve la cantidad de transacciones notificadas.
+    Se encola al confirmar la transacción del request, para que la tarea vea
+    la cotización ya guardada; el admin recibe la respuesta de inmediato sin
+    importar cuántas transacciones pendientes haya.
     """
-    ct_cuenta_bancaria_negocio = ContentType.objects.get_for_model(CuentaBancariaNegocio)
-
-    transacciones = Transaccion.objects.filter(
-        estado=Transaccion.Estado.PENDIENTE,
-    ).exclude(
-        medio_pago_type=ct_cuenta_bancaria_negocio
-    )
-
-    if moneda:
-        transacciones = transacciones.filter(
-            Q(moneda_origen__code=moneda) |
-            Q(moneda_destino__code=moneda)
-        )
+    from webapp.tasks import recalcular_transacciones_pendientes_task
 
-    notificados = 0
-
-    for transaccion in transacciones:
-        montos = calcularMontosCambio(transaccion)
-        if montos["montoOrigenNuevo"] != None and montos["montoDestinoNuevo"] != None:
-            tasa_actual = montos["tasaActual"]
-            montoOrigenNuevo = formatearMontos(montos["montoOrigenNuevo"], transaccion.moneda_origen, True)
-            montoDestinoNuevo = formatearMontos(montos["montoDestinoNuevo"], transaccion.moneda_destino, True)
-
-            if montoDestinoNuevo != None and montoOrigenNuevo != None:
-                try:
-                    tasa_antigua = transaccion.tasa_cambio.quantize(Decimal("1"), rounding=ROUND_HALF_UP)
-                except:
-                    # Si no hay tasa guardada o es inválida, la salteamos
-                    continue
-
-                if tasa_actual != tasa_antigua:
-                    send_transaction_cancellation_prompt(
-                        request,
-                        transaccion,
-                        tasa_actual=tasa_actual,
-                        tasa_antigua=tasa_antigua,
-                        montoOrigenNuevo=montoOrigenNuevo,
-                        montoDestinoNuevo=montoDestinoNuevo,
-                    )
-                    notificados += 1
-
-                    # 🔸 Marcar la transacción como con cambio pendiente
-                    if not transaccion.cambio_pendiente:
-                        transaccion.cambio_pendiente = True
-                        transaccion.save(update_fields=["cambio_pendiente"])
-
-
-    return notificados
\ No newline at end of file
+    transaction.on_commit(lambda: recalcular_transacciones_pendientes_task.delay(moneda))
@@ -0,0 +1,23 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from webapp.services import metricas as metricas_service
+
+
+def exportar_metricas(request):
+    """
+    Métricas por vista en formato de texto de Prometheus.
+    Con settings.METRICAS_TOKEN se exige `Authorization: Bearer <token>`;
+    sin token solo las ve el staff (o cualquiera con DEBUG).
+    """
+    token = getattr(settings, "METRICAS_TOKEN", "")
+    if token:
+        enviado = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        if not hmac.compare_digest(enviado, token):
+            return HttpResponseForbidden("Token inválido")
+    elif not (settings.DEBUG or request.user.is_staff):
+        return HttpResponseForbidden()
+
+    return HttpResponse(metricas_service.renderizar(), content_type="text/plain; version=0.0.4; charset=utf-8")
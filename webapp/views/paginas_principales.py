@@ -8,6 +8,7 @@ from ..utils import get_user_primary_role
 from ..models import Currency, Cliente
 from django.contrib.auth import update_session_auth_hash
 from decimal import Decimal
+from .. import pricing
 
 # -------------
 # Public views
@@ -40,15 +41,17 @@ def public_home(request):
                 # Si el cliente no existe, limpiar la sesión
                 request.session.pop('cliente_id', None)
 
-    # Agregar atributo dinámico "total" a cada moneda
-    for currency in currencies:
-        if current_client and current_client.categoria:
-            descuentoCategoria = Decimal(current_client.categoria.descuento or 0)
-        else:
-            descuentoCategoria = Decimal('0')
-
-        currency.totalVenta = Decimal(currency.base_price) + (Decimal(currency.comision_venta) * (1 - descuentoCategoria)) 
-        currency.totalCompra = Decimal(currency.base_price) - (Decimal(currency.comision_compra) * (1 - descuentoCategoria))
+    # Agregar atributos dinámicos "totalVenta"/"totalCompra" a cada moneda (una sola pasada)
+    if current_client and current_client.categoria:
+        descuentoCategoria = Decimal(current_client.categoria.descuento or 0)
+    else:
+        descuentoCategoria = Decimal('0')
+
+    currencies = list(currencies)
+    tabla = pricing.quote_many(currencies, [descuentoCategoria], redondear=False)
+    for currency, (_, cotizacion) in zip(currencies, tabla.columna(descuentoCategoria)):
+        currency.totalVenta = cotizacion.venta
+        currency.totalCompra = cotizacion.compra
 
     return render(request, "webapp/paginas_principales/home.html", {
         "can_access_gestiones": can_access_gestiones,
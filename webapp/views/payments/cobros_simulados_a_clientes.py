@@ -131,6 +131,23 @@ def cobrar_al_cliente_billetera(numero_celular: str, pin: str | None = None) ->
     }
 
 
+def reembolsar_al_cliente(monto: float, referencia: str) -> Dict[str, Any]:
+    """
+    Simula la devolución de un cobro ya aprobado (tarjeta nacional o billetera),
+    p. ej. cuando la operación no se pudo registrar después de cobrar.
+
+    Args:
+        monto (float): Monto a devolver.
+        referencia (str): Número tokenizado de la tarjeta o celular de la billetera.
+
+    Returns:
+        dict: success (bool) y message (str).
+    """
+    if not referencia:
+        return {"success": False, "message": "Medio de pago inválido para el reembolso."}
+    return {"success": True, "message": f"Se devolvieron {monto} al cliente (modo simulación)."}
+
+
 def validar_id_transferencia(id_transferencia: str) -> Dict[str, Any]:
     """
     Simula la validación de un ID de transferencia bancaria.
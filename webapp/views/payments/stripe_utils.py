@@ -66,4 +66,17 @@ def procesar_pago_stripe(
             "success": False,
             "payment_intent_id": None,
             "message": f"Error inesperado: {str(e)}",
-        }
\ No newline at end of file
+        }
+
+def reembolsar_pago_stripe(payment_intent_id: str) -> dict:
+    """
+    Reembolsa por completo un PaymentIntent ya confirmado.
+
+    Returns:
+        dict con success (bool) y message (str).
+    """
+    try:
+        stripe.Refund.create(payment_intent=payment_intent_id)
+        return {"success": True, "message": "Pago reembolsado."}
+    except stripe.StripeError as e:
+        return {"success": False, "message": f"Error de Stripe al reembolsar: {str(e)}"}
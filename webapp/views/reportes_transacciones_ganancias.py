@@ -6,10 +6,10 @@ from django.http import HttpResponse
 import csv
 from webapp.forms import ReporteTransaccionesForm
 from webapp.models import Transaccion
+from webapp.services import metodos_cliente
+from webapp.pricing import ganancia_expression
 from django.db.models import Q
-from collections import defaultdict
 from django.db.models.functions import TruncDate
-from django.db.models import F, Case, When, DecimalField, ExpressionWrapper
 import json
 from django.core.serializers.json import DjangoJSONEncoder
 
@@ -45,8 +45,11 @@ def reporte_transacciones(request):
                 Q(moneda_destino=moneda)
             )
 
+    # Ganancia por fila calculada en la base de datos (misma fórmula que Transaccion.ganancia_en_pyg)
+    transacciones = transacciones.annotate(ganancia_pyg=ganancia_expression())
+
     # Ganancia total
-    ganancia_total = sum(t.ganancia_en_pyg for t in transacciones)
+    ganancia_total = transacciones.aggregate(total=Sum("ganancia_pyg"))["total"] or 0
 
     # Exportación CSV
     if "export_csv" in request.GET:
@@ -57,72 +60,16 @@ def reporte_transacciones(request):
             "ID", "Fecha", "Tipo", "Estado", "Monto Origen",
             "Monto Destino", "Moneda Origen", "Moneda Destino", "Ganancia"
         ])
-        for t in transacciones:
+        for t in transacciones.iterator():
             writer.writerow([
                 t.id, t.fecha_creacion, t.tipo, t.estado,
                 t.monto_origen, t.monto_destino,
                 t.moneda_origen.code, t.moneda_destino.code,
-                t.ganancia_en_pyg
+                t.ganancia_pyg
             ])
         return response
 
-    # --- NUEVO: AGRUPAR POR FECHA ---
-    # ---------------------------
-    # ANOTAR GANANCIA EN PYG EN EL ORM
-    # ---------------------------
-    ganancia_expr = Case(
-
-        # ---------------------------
-        # CASO 1: moneda_origen = PYG
-        # ---------------------------
-        When(
-            moneda_origen__code="PYG",
-            then=ExpressionWrapper(
-                (F("monto_destino") * F("monto_base_moneda"))  # costo_real
-                - (                                   # tc_venta_final
-                    (
-                        F("monto_base_moneda") +
-                        F("comision_vta_com") -
-                        (F("comision_vta_com") * (F("desc_cliente")/100)) -
-                        (
-                            (F("monto_base_moneda") + F("comision_vta_com")) *
-                            (F("medio_cobro_porc")/100)
-                        )
-                    )
-                ),
-                output_field=DecimalField(max_digits=20, decimal_places=8)
-            )
-        ),
-
-        # ---------------------------
-        # CASO 2: moneda_destino = PYG
-        # ---------------------------
-        When(
-            moneda_destino__code="PYG",
-            then=ExpressionWrapper(
-                (F("monto_origen") * F("monto_base_moneda"))  # costo_real
-                - (                                   # tc_compra_final
-                    (
-                        F("monto_base_moneda") -
-                        F("comision_vta_com") +
-                        (F("comision_vta_com") * (F("desc_cliente")/100)) +
-                        (
-                            (F("monto_base_moneda") - F("comision_vta_com")) *
-                            (F("medio_pago_porc")/100)
-                        )
-                    )
-                ),
-                output_field=DecimalField(max_digits=20, decimal_places=8)
-            )
-        ),
-
-        default=0,
-        output_field=DecimalField(max_digits=20, decimal_places=8)
-    )
-
-    # APLICAR
-    transacciones = transacciones.annotate(ganancia_pyg=ganancia_expr)
-
+    # --- AGRUPAR POR FECHA ---
     ganancias_por_fecha = (
         transacciones
         .annotate(fecha=TruncDate("fecha_creacion"))
@@ -131,18 +78,27 @@ def reporte_transacciones(request):
         .order_by("fecha")
     )
 
-    # --- NUEVO: AGRUPAR POR MONEDA ---
-    ganancias_por_moneda = defaultdict(int)
-    for t in transacciones:
-        # contabilizamos por moneda origen y destino: depende de tu lógica de negocio
-        ganancias_por_moneda[t.moneda_origen.code] += t.ganancia_en_pyg
+    # --- AGRUPAR POR MONEDA ---
+    # contabilizamos por moneda origen: depende de tu lógica de negocio
+    ganancias_por_moneda = {
+        row["moneda_origen__code"]: row["total"]
+        for row in (
+            transacciones
+            .order_by()
+            .values("moneda_origen__code")
+            .annotate(total=Sum("ganancia_pyg"))
+        )
+    }
 
     gpf_json = json.dumps(list(ganancias_por_fecha), cls=DjangoJSONEncoder)
-    gpm_json = json.dumps(dict(ganancias_por_moneda), cls=DjangoJSONEncoder)
+    gpm_json = json.dumps(ganancias_por_moneda, cls=DjangoJSONEncoder)
+
+    # La tabla muestra la factura y los medios (su __str__ lee el medio padre y la entidad): todo en lote
+    filas = transacciones.select_related("factura_asociada").prefetch_related(*metodos_cliente.prefetch_medios())
 
     context = {
         "form": form,
-        "transacciones": transacciones,
+        "transacciones": filas,
         "ganancia_total": ganancia_total,
         "gpf": gpf_json,  # Para gráfico líneas
         "gpm": gpm_json, # Para gráfico barras
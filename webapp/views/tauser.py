@@ -1,22 +1,27 @@
 from django.contrib.auth import authenticate
 from django.shortcuts import render, redirect
+from django.template.loader import render_to_string
 from django.urls import reverse
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_GET, require_http_methods
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from webapp.models import Transaccion, Tauser, TauserCurrencyStock, CurrencyDenomination
-from django.db.models import Q, F
+from django.db.models import Q, F, prefetch_related_objects
 from django.db import transaction
-from datetime import datetime
+from datetime import datetime, timedelta
 import os
 
+from webapp.services import keyset, metodos_cliente, stock_holds, tauser_stock
 from webapp.services.invoice_from_tx import generate_invoice_for_transaccion
 from webapp.tasks import pagar_al_cliente_task
 from ..decorators import role_required
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Union
 
 User = get_user_model()
 
@@ -61,20 +66,111 @@ def tauser_login(request):
     )
 
 
-def tauser_home(request):
-    from webapp.views.compraventa_y_conversión import (
-        calcularMontosCambio,
-        formatearMontos,
+# Estados que todavía requieren una acción en el Tauser (el resto son finales)
+ESTADOS_ACTIVOS_TAUSER = [Transaccion.Estado.PENDIENTE, Transaccion.Estado.PAGADA]
+
+
+def _transacciones_tauser(ct_tauser, tausers_ids, estados=None):
+    """
+    Transacciones con alguno de los Tausers como medio de pago o de cobro.
+
+    El OR se arma como UNION de dos subconsultas, cada una resuelta con su
+    índice (medio_*_type, medio_*_id, estado) en lugar de un scan con OR.
+    """
+    pagos = Transaccion.objects.filter(medio_pago_type=ct_tauser, medio_pago_id__in=tausers_ids)
+    cobros = Transaccion.objects.filter(medio_cobro_type=ct_tauser, medio_cobro_id__in=tausers_ids)
+    if estados is not None:
+        pagos = pagos.filter(estado__in=estados)
+        cobros = cobros.filter(estado__in=estados)
+
+    return Transaccion.objects.filter(id__in=pagos.values("id").union(cobros.values("id")))
+
+
+def _preparar_fila_tauser(t, ct_tauser, tausers_ids, tasas):
+    """Banderas y montos formateados que usa la tabla / modal del Tauser."""
+    from webapp.views.compraventa_y_conversión import calcularMontosCambio, formatearMontos
+
+    t.es_pago_tauser = t.medio_pago_type_id == ct_tauser.id and t.medio_pago_id in tausers_ids
+    t.es_cobro_tauser = t.medio_cobro_type_id == ct_tauser.id and t.medio_cobro_id in tausers_ids
+
+    # 🔹 Montos actuales formateados (para tabla / modal)
+    t.monto_origen_actual_fmt = formatearMontos(
+        t.monto_origen, t.moneda_origen, True
     )
+    t.monto_destino_actual_fmt = formatearMontos(
+        t.monto_destino, t.moneda_destino, True
+    )
+
+    # 🔹 Inicializar atributos usados por el modal "Ver Cambios"
+    t.tasa_antigua = None
+    t.tasa_actual = None
+    t.monto_origen_nuevo_fmt = None
+    t.monto_destino_nuevo_fmt = None
+    t.moneda_cambio_code = t.moneda_origen.code  # mismo criterio que en transaccion_list
+
+    # 🔹 Solo calculamos cambios si:
+    #    - la transacción tiene cambio_pendiente
+    #    - y sigue en estado PENDIENTE
+    if t.cambio_pendiente and t.estado == Transaccion.Estado.PENDIENTE:
+        montos = calcularMontosCambio(t, tasa_actual=tasas().para(t))
+
+        monto_origen_nuevo = montos.get("montoOrigenNuevo")
+        monto_destino_nuevo = montos.get("montoDestinoNuevo")
+        tasa_actual = montos.get("tasaActual")
+
+        if (
+            monto_origen_nuevo is not None
+            and monto_destino_nuevo is not None
+            and tasa_actual is not None
+        ):
+            # Tasa antigua redondeada como en el prompt de email
+            try:
+                t.tasa_antigua = t.tasa_cambio.quantize(
+                    Decimal("1"), rounding=ROUND_HALF_UP
+                )
+            except Exception:
+                t.tasa_antigua = t.tasa_cambio  # fallback
+
+            t.tasa_actual = tasa_actual
+
+            # Montos nuevos formateados (solo para mostrar)
+            t.monto_origen_nuevo_fmt = formatearMontos(
+                monto_origen_nuevo, t.moneda_origen, True
+            )
+            t.monto_destino_nuevo_fmt = formatearMontos(
+                monto_destino_nuevo, t.moneda_destino, True
+            )
+        else:
+            # Si no se pudo calcular, no mostramos "Ver Cambios" en el template
+            t.cambio_pendiente = False
+
+
+def _tasas_perezosas():
+    """Devuelve un getter que crea TasasPorGrupo solo si alguna fila lo necesita."""
+    from webapp.services.rate_impact import TasasPorGrupo
+
+    instancia = []
+
+    def obtener():
+        if not instancia:
+            instancia.append(TasasPorGrupo())
+        return instancia[0]
+    return obtener
+
+
+def tauser_home(request):
     """
     Lista las transacciones vinculadas a Tausers de la ubicación seleccionada.
-    Solo incluye las que no están completas, anuladas, canceladas ni con AC fallida.
+    Solo incluye las que no están completas, anuladas, canceladas ni con AC fallida,
+    paginadas por cursor sobre (fecha_creacion, id).
 
     Además:
     - Marca si el medio de pago/cobro es Tauser (es_pago_tauser / es_cobro_tauser).
     - Prepara montos formateados.
     - Si la transacción tiene cambio_pendiente y está PENDIENTE, adjunta al objeto
       las tasas y montos nuevos ya formateados, para usarlos en el modal 'Ver Cambios'.
+
+    La pantalla se mantiene al día con tauser_cambios (solo los deltas).
     """
     ubicacion = request.session.get("tauser_ubicacion")
 
@@ -96,87 +192,33 @@ def tauser_home(request):
             "ubicacion": ubicacion,
         })
 
-    # Filtrar las transacciones con Tauser en medio_pago o medio_cobro
+    # Marca de tiempo tomada ANTES de la consulta (con el mismo solape que tauser_cambios)
+    desde = timezone.now() - timedelta(seconds=getattr(settings, "TAUSER_CAMBIOS_SOLAPE_SEGUNDOS", 5))
+
     transacciones = (
-        Transaccion.objects.select_related(
-            "cliente", "usuario", "moneda_origen", "moneda_destino"
-        )
-        .filter(
-            (
-                Q(medio_pago_type=ct_tauser, medio_pago_id__in=tausers_ids)
-                | Q(medio_cobro_type=ct_tauser, medio_cobro_id__in=tausers_ids)
-            ),
-            ~Q(
-                estado__in=[
-                    Transaccion.Estado.COMPLETA,
-                    Transaccion.Estado.ANULADA,
-                    Transaccion.Estado.CANCELADA,
-                    Transaccion.Estado.AC_FALLIDA,
-                ]
-            ),
-        )
-        .order_by("-fecha_creacion")
+        _transacciones_tauser(ct_tauser, tausers_ids, ESTADOS_ACTIVOS_TAUSER)
+        .select_related("cliente__categoria", "usuario", "moneda_origen", "moneda_destino")
+    )
+    pagina = keyset.paginar(
+        transacciones,
+        "fecha_creacion",
+        getattr(settings, "TAUSER_TRANSACCIONES_POR_PAGINA", 50),
+        despues=request.GET.get("despues"),
+        antes=request.GET.get("antes"),
     )
+    # El template muestra los medios con su __str__ (medio padre, entidad, cliente)
+    prefetch_related_objects(pagina.filas, *metodos_cliente.prefetch_medios())
 
     # Añadir banderas para el template
-    for t in transacciones:
-        t.es_pago_tauser = t.medio_pago_type == ct_tauser and t.medio_pago_id in tausers_ids
-        t.es_cobro_tauser = t.medio_cobro_type == ct_tauser and t.medio_cobro_id in tausers_ids
-
-        # 🔹 Montos actuales formateados (para tabla / modal)
-        t.monto_origen_actual_fmt = formatearMontos(
-            t.monto_origen, t.moneda_origen, True
-        )
-        t.monto_destino_actual_fmt = formatearMontos(
-            t.monto_destino, t.moneda_destino, True
-        )
-
-        # 🔹 Inicializar atributos usados por el modal "Ver Cambios"
-        t.tasa_antigua = None
-        t.tasa_actual = None
-        t.monto_origen_nuevo_fmt = None
-        t.monto_destino_nuevo_fmt = None
-        t.moneda_cambio_code = t.moneda_origen.code  # mismo criterio que en transaccion_list
-
-        # 🔹 Solo calculamos cambios si:
-        #    - la transacción tiene cambio_pendiente
-        #    - y sigue en estado PENDIENTE
-        if t.cambio_pendiente and t.estado == Transaccion.Estado.PENDIENTE:
-            montos = calcularMontosCambio(t)
-
-            monto_origen_nuevo = montos.get("montoOrigenNuevo")
-            monto_destino_nuevo = montos.get("montoDestinoNuevo")
-            tasa_actual = montos.get("tasaActual")
-
-            if (
-                monto_origen_nuevo is not None
-                and monto_destino_nuevo is not None
-                and tasa_actual is not None
-            ):
-                # Tasa antigua redondeada como en el prompt de email
-                try:
-                    t.tasa_antigua = t.tasa_cambio.quantize(
-                        Decimal("1"), rounding=ROUND_HALF_UP
-                    )
-                except Exception:
-                    t.tasa_antigua = t.tasa_cambio  # fallback
-
-                t.tasa_actual = tasa_actual
-
-                # Montos nuevos formateados (solo para mostrar)
-                t.monto_origen_nuevo_fmt = formatearMontos(
-                    monto_origen_nuevo, t.moneda_origen, True
-                )
-                t.monto_destino_nuevo_fmt = formatearMontos(
-                    monto_destino_nuevo, t.moneda_destino, True
-                )
-            else:
-                # Si no se pudo calcular, no mostramos "Ver Cambios" en el template
-                t.cambio_pendiente = False
+    tasas = _tasas_perezosas()
+    for t in pagina:
+        _preparar_fila_tauser(t, ct_tauser, tausers_ids, tasas)
 
     context = {
-        "transacciones": transacciones,
+        "transacciones": pagina.filas,
+        "pagina": pagina,
         "ubicacion": ubicacion,
+        "cambios_desde": desde.isoformat(),
     }
 
     return render(
@@ -186,6 +228,73 @@ def tauser_home(request):
     )
 
 
+@require_GET
+def tauser_cambios(request):
+    """
+    Deltas para la pantalla del Tauser: transacciones de la ubicación cuya
+    fecha_actualizacion es posterior a ?desde=<ISO 8601>. Las activas traen la
+    fila ya renderizada ("html") para que el kiosco la reemplace o la agregue;
+    las que pasaron a un estado final (activa=false) solo se quitan.
+
+    "hasta" (el próximo ?desde=) es la mayor fecha_actualizacion vista menos
+    TAUSER_CAMBIOS_SOLAPE_SEGUNDOS: fecha_actualizacion se fija en save(),
+    antes del commit, así que una transacción confirmada tarde puede tener una
+    fecha anterior a la última vista. El kiosco descarta por id lo repetido.
+    """
+    ubicacion = request.session.get("tauser_ubicacion")
+    if not ubicacion:
+        return JsonResponse({"error": "Debe seleccionar una ubicación."}, status=403)
+
+    desde = parse_datetime(request.GET.get("desde") or "")
+    if desde is None:
+        return JsonResponse({"error": "Parámetro 'desde' inválido (ISO 8601)."}, status=400)
+    if timezone.is_naive(desde):
+        desde = timezone.make_aware(desde)
+
+    ct_tauser = ContentType.objects.get_for_model(Tauser)
+    tausers_ids = list(Tauser.objects.filter(ubicacion=ubicacion).values_list("id", flat=True))
+
+    limite = getattr(settings, "TAUSER_CAMBIOS_MAX", 200)
+    filas = list(
+        _transacciones_tauser(ct_tauser, tausers_ids)
+        .filter(fecha_actualizacion__gt=desde)
+        .select_related("cliente__categoria", "usuario", "moneda_origen", "moneda_destino")
+        .order_by("fecha_actualizacion", "id")[:limite + 1]
+    ) if tausers_ids else []
+
+    # Demasiados cambios juntos: que el kiosco recargue la página completa
+    if len(filas) > limite:
+        return JsonResponse({"hasta": timezone.now().isoformat(), "recargar": True, "transacciones": []})
+
+    hasta = desde
+    if filas:
+        solape = timedelta(seconds=getattr(settings, "TAUSER_CAMBIOS_SOLAPE_SEGUNDOS", 5))
+        hasta = max(desde, filas[-1].fecha_actualizacion - solape)
+
+    activas = [t for t in filas if t.estado in ESTADOS_ACTIVOS_TAUSER]
+    prefetch_related_objects(activas, *metodos_cliente.prefetch_medios())
+    tasas = _tasas_perezosas()
+    for t in activas:
+        _preparar_fila_tauser(t, ct_tauser, tausers_ids, tasas)
+
+    return JsonResponse({
+        "hasta": hasta.isoformat(),
+        "recargar": False,
+        "transacciones": [
+            {
+                "id": t.id,
+                "estado": t.estado,
+                "activa": t.estado in ESTADOS_ACTIVOS_TAUSER,
+                "fecha_actualizacion": t.fecha_actualizacion.isoformat(),
+                "html": render_to_string(
+                    "webapp/tauser/_fila_transaccion.html", {"transaccion": t}, request=request,
+                ) if t.estado in ESTADOS_ACTIVOS_TAUSER else "",
+            }
+            for t in filas
+        ],
+    })
+
+
 def tauser_pagar(request, pk):
     """
     Simula un pago del cliente al sistema (Tauser como medio de pago).
@@ -213,11 +322,12 @@ def tauser_pagar(request, pk):
             return redirect("tauser_home")
 
         if accion == "confirmar":
+            cantidades: dict[int, int] = {}  # d.id -> qty
+
             # ✅ Si moneda NO es PYG, registrar billetes recibidos
             if moneda.code != "PYG":
                 denoms = CurrencyDenomination.objects.filter(currency=moneda)
                 total: Decimal = Decimal("0")
-                cantidades: dict[int, int] = {}  # d.id -> qty
 
                 # 1️⃣ Solo calculamos total y guardamos cantidades
                 for d in denoms:
@@ -234,20 +344,30 @@ def tauser_pagar(request, pk):
                     )
                     return redirect(request.path)
 
-                # 3️⃣ Ahora sí, actualizar el stock porque el total es correcto
-                for d in denoms:
-                    qty = cantidades.get(d.id, 0)
-                    if qty > 0:
+            entrega_tauser = isinstance(transaccion.medio_cobro, Tauser)
+            try:
+                with transaction.atomic():
+                    # 3️⃣ Ahora sí, actualizar el stock porque el total es correcto
+                    for denomination_id, qty in cantidades.items():
                         TauserCurrencyStock.objects.update_or_create(
                             tauser=tauser,
                             currency=moneda,
-                            denomination=d,
+                            denomination_id=denomination_id,
                             defaults={"quantity": F("quantity") + qty}
                         )
 
-            # ✅ Actualizar estado
-            transaccion.estado = Transaccion.Estado.PAGADA
-            transaccion.save()
+                    # ✅ Actualizar estado junto con los billetes a entregar (mismo commit)
+                    transaccion.estado = Transaccion.Estado.PAGADA
+                    transaccion.save()
+                    if entrega_tauser:
+                        reservarStock(transaccion)
+            except stock_holds.StockInsuficiente as e:
+                messages.error(
+                    request,
+                    f"No hay billetes disponibles para entregar esta operación ({e}). "
+                    "No se registró el pago: devolvé el dinero al cliente."
+                )
+                return redirect("tauser_home")
 
             try:
                 if os.getenv("GENERAR_FACTURA"):
@@ -261,10 +381,8 @@ def tauser_pagar(request, pk):
 
             messages.success(request, f"Transacción #{pk} PAGADA.")
 
-            if not isinstance(transaccion.medio_cobro, Tauser):
+            if not entrega_tauser:
                 pagar_al_cliente_task.delay(transaccion.id)
-            else:
-                reservarStock(transaccion.medio_cobro.id, transaccion.moneda_destino.code, transaccion.monto_destino)
 
             return redirect("tauser_home")
 
@@ -297,8 +415,11 @@ def tauser_cobrar(request, pk):
     if request.method == "POST":
         accion = request.POST.get("accion")
         if accion == "confirmar":
-            transaccion.estado = Transaccion.Estado.COMPLETA
-            transaccion.save(update_fields=["estado", "fecha_actualizacion"])
+            # Los billetes reservados salen del Tauser
+            with transaction.atomic():
+                transaccion.estado = Transaccion.Estado.COMPLETA
+                transaccion.save(update_fields=["estado", "fecha_actualizacion"])
+                stock_holds.consumir([transaccion.id])
 
             messages.success(request, f"Transacción #{pk} completada con éxito.")
             return redirect("tauser_home")
@@ -312,63 +433,6 @@ def tauser_cobrar(request, pk):
     })
 
 
-def actualizar_stock_tauser(tauser_id, currency_code, monto, operacion):
-    """
-    operacion: 'ingreso' (tauser recibe) o 'egreso' (tauser entrega)
-    No modifica stock para PYG.
-    """
-    if currency_code == "PYG":
-        return  # Stock infinito de Guaraníes
-
-    monto = Decimal(monto)
-
-    stock = (
-        TauserCurrencyStock.objects
-        .filter(tauser_id=tauser_id, currency__code=currency_code, quantity__gt=0)
-        .select_related("currency", "denomination")
-        .order_by("-denomination__value")
-    )
-
-    # ✅ ingreso: tauser recibe billetes → sumamos cantidades
-    if operacion == "ingreso":
-        restante = monto
-        for s in stock:
-            denom = Decimal(s.denomination.value)
-
-            # ¿cuántos billetes de este valor entran?
-            q = restante // denom  # Decimal // Decimal ✅
-
-            if q > 0:
-                s.quantity += int(q)
-                s.save(update_fields=["quantity"])
-                restante -= denom * q
-
-            if restante <= 0:
-                break
-        return
-
-    # ✅ egreso: tauser entrega billetes → restamos cantidades
-    restante = monto
-    for s in stock:
-        denom = Decimal(s.denomination.value)
-        max_units = restante // denom
-        usar = min(int(max_units), s.quantity)
-
-        if usar > 0:
-            s.quantity -= usar
-            print(s.quantity)
-            s.save(update_fields=["quantity"])
-            restante -= denom * usar
-
-        if restante <= 0:
-            break
-
-    if restante > 0:
-        raise ValueError(
-            f"Stock insuficiente del Tauser {tauser_id} para {monto} {currency_code}"
-        )
-
-
 login_required
 @role_required("Administrador")
 @require_http_methods(["GET", "POST"])
@@ -400,7 +464,10 @@ def manage_tausers(request):
     if request.method == "POST":
         # Reset total
         if "reset_tauser" in request.POST:
-            TauserCurrencyStock.objects.filter(tauser=selected_tauser).update(quantity=0)
+            filas = TauserCurrencyStock.objects.filter(tauser=selected_tauser)
+            stock_ids = list(filas.values_list("id", flat=True))
+            filas.update(quantity=0)
+            tauser_stock.invalidar(stock_ids)
             messages.success(request, "Stock del Tauser vaciado correctamente.")
             return redirect(f"{request.path}?tauser_id={selected_tauser.id}")
 
@@ -460,72 +527,13 @@ def manage_tausers(request):
     })
 
 
-def reservarStock(
-    tauser_id: int,
-    moneda_code: str,
-    monto: Union[Decimal, float, int],
-) -> None:
+def reservarStock(transaccion: Transaccion):
     """
-    Descuenta del stock del Tauser el monto indicado en una moneda dada.
+    Aparta en el Tauser de cobro los billetes que la transacción va a entregar
+    (TauserStockHold). Idempotente: si ya hay holds activos solo ajusta su
+    vencimiento (PENDIENTE → vence con la transacción; pagada → sin vencimiento).
 
     - Si la moneda es PYG, no hace nada (no llevás stock en PYG).
-    - Envuelve la llamada a `actualizar_stock_tauser` para centralizar la lógica.
-
-    Parámetros:
-        tauser_id: ID del Tauser (medio de cobro).
-        moneda_code: Código de la moneda (por ejemplo 'USD', 'EUR').
-        monto: Monto a egresar del stock del Tauser.
+    - Levanta stock_holds.StockInsuficiente si no hay billetes disponibles.
     """
-
-    if moneda_code == "PYG":
-        # No manejás stock de PYG en Tauser, salís silenciosamente
-        return
-
-    if not monto:
-        return
-
-    # Aseguramos Decimal si estás manejando así los montos
-    if not isinstance(monto, Decimal):
-        monto = Decimal(str(monto))
-
-    actualizar_stock_tauser(
-        tauser_id,
-        moneda_code,
-        monto,
-        "egreso",   # mismo modo que usabas en la view
-    )
-
-def liberarStock(
-    tauser_id: int,
-    moneda_code: str,
-    monto: Union[Decimal, float, int],
-) -> None:
-    """
-    Descuenta del stock del Tauser el monto indicado en una moneda dada.
-
-    - Si la moneda es PYG, no hace nada (no llevás stock en PYG).
-    - Envuelve la llamada a `actualizar_stock_tauser` para centralizar la lógica.
-
-    Parámetros:
-        tauser_id: ID del Tauser (medio de cobro).
-        moneda_code: Código de la moneda (por ejemplo 'USD', 'EUR').
-        monto: Monto a egresar del stock del Tauser.
-    """
-
-    if moneda_code == "PYG":
-        # No manejás stock de PYG en Tauser, salís silenciosamente
-        return
-
-    if not monto:
-        return
-
-    # Aseguramos Decimal si estás manejando así los montos
-    if not isinstance(monto, Decimal):
-        monto = Decimal(str(monto))
-
-    actualizar_stock_tauser(
-        tauser_id,
-        moneda_code,
-        monto,
-        "ingreso",   # mismo modo que usabas en la view
-    )
\ No newline at end of file
+    return stock_holds.reservar(transaccion, stock_holds.vencimiento_para(transaccion))